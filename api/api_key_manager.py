@@ -9,6 +9,7 @@ import secrets
 import string
 import os
 import shutil
+import tempfile
 from datetime import datetime
 import logging
 
@@ -64,20 +65,33 @@ class APIKeyManager:
             config['security']['authentication']['type'] = 'bearer'
             config['security']['authentication']['last_updated'] = datetime.now().isoformat()
             
-            # Write back to file
-            with open(config_file, 'w') as f:
-                json.dump(config, f, indent=2)
+            # Write back to file (atomic, panel yang berjalan tidak pernah membaca file setengah jadi)
+            self.write_json_atomic(config_file, config)
             
             # If production file exists, also update local for development
             if config_file == self.config_path and os.path.exists(self.local_config_path):
-                with open(self.local_config_path, 'w') as f:
-                    json.dump(config, f, indent=2)
+                self.write_json_atomic(self.local_config_path, config)
             
             return True
         except Exception as e:
             self.logger.error(f"Error updating config: {e}")
             return False
     
+    def write_json_atomic(self, path, data):
+        """Tulis JSON ke temp file lalu rename ke path"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".api_config-", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
     def update_postman_collection(self, new_api_key):
         """Update API key in Postman collection"""
         try:
@@ -259,7 +273,7 @@ class APIKeyManager:
                 print(f"\n🎉 API key successfully generated and synced!")
                 print(f"📝 Old API Key: {old_api_key}")
                 print(f"🆕 New API Key: {new_api_key}")
-                print(f"\n⚠️  Restart API service: sudo systemctl restart api-panel")
+                print(f"\nℹ️  API Panel yang berjalan memakai key baru otomatis (tanpa restart)")
                 return new_api_key
             else:
                 print(f"\n⚠️  Some files failed to update. Check logs for details.")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Gunicorn config untuk AlrelShop API Panel
+Semua nilai dibaca dari section "api" dan "server" di api_config.json.
+
+- Worker gthread: beberapa proses, masing-masing dengan thread pool
+- Keep-alive untuk client yang memakai koneksi persisten
+- SIGHUP (systemctl reload api-panel) = graceful reload: worker baru dibuat
+  dengan config terbaru, worker lama menyelesaikan request yang sedang jalan
+
+Worker tidak di-preload: thread background (restart scheduler, Telegram
+notifier) dibuat per worker setelah fork. State bersama di disk (config.json
+Xray, file .db) dijaga flock antar proses, lihat services/file_lock.py.
+"""
+
+import multiprocessing
+import os
+import sys
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, API_DIR)
+
+from services.settings import load_api_config
+
+_config = load_api_config()
+_api = _config.get("api", {})
+_server = _config.get("server", {})
+
+chdir = API_DIR
+wsgi_app = "wsgi:app"
+bind = _server.get("bind", f"{_api.get('host', '0.0.0.0')}:{_api.get('port', 5000)}")
+
+worker_class = "gthread"
+workers = _server.get("workers") or min(multiprocessing.cpu_count() * 2 + 1, 8)
+threads = _server.get("threads", 4)
+keepalive = _server.get("keepalive", 5)
+timeout = _server.get("timeout", 120)
+graceful_timeout = _server.get("graceful_timeout", 30)
+max_requests = _server.get("max_requests", 0)
+max_requests_jitter = _server.get("max_requests_jitter", 0)
+preload_app = False
+
+loglevel = _api.get("log_level", "INFO").lower()
+accesslog = _server.get("access_log", "-")
+errorlog = "-"
+proc_name = "api-panel"
+
+
+def on_starting(server):
+    # File metrics dari worker run sebelumnya tidak ikut dijumlahkan
+    from services.metrics import DEFAULT_DIRECTORY, reset_directory
+    reset_directory(_config.get("metrics", {}).get("directory", DEFAULT_DIRECTORY))
+
+
+def on_reload(arbiter):
+    arbiter.log.info("SIGHUP diterima, reload worker API Panel")
+
+
+def worker_exit(server, worker):
+    # Kirim sisa notifikasi Telegram sebelum worker berhenti (sisanya tetap ada di spool)
+    try:
+        from services import telegram_notifier
+        if telegram_notifier._notifier is not None:
+            telegram_notifier._notifier.flush(timeout=5)
+            telegram_notifier._notifier.stop()
+    except Exception as e:
+        server.log.warning(f"Gagal flush Telegram notifier: {e}")
+    # Counter metrics terakhir worker ini
+    try:
+        from services import metrics
+        if metrics._metrics is not None:
+            metrics._metrics.flush()
+    except Exception as e:
+        server.log.warning(f"Gagal flush metrics: {e}")
+    # Export file config statis yang masih antri
+    try:
+        from services import config_renderer
+        if config_renderer._renderer is not None:
+            config_renderer._renderer.flush(timeout=5)
+    except Exception as e:
+        server.log.warning(f"Gagal flush export config: {e}")
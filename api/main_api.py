@@ -13,10 +13,8 @@ Author: AlrelShop Auto Script
 Version: 1.0.0
 """
 
-from flask import Flask, request, jsonify, g
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
-import subprocess
-import json
 import os
 import re
 import uuid
@@ -33,40 +31,127 @@ from services.vless_service import VLessService
 from services.shadowsocks_service import ShadowsocksService
 from services.trojan_service import TrojanService
 from services.trial_service import TrialService
+from services.restart_scheduler import get_restart_scheduler
+from services.batch_service import BatchService
+from services.telegram_notifier import get_telegram_notifier
+from services.status_cache import get_status_cache
+from services.expiry_scheduler import get_expiry_scheduler
+from services.account_reaper import get_account_reaper
+from services.quota_enforcer import get_quota_enforcer
+from services.account_suspender import get_account_suspender
+from services.ip_limiter import get_ip_limiter
+from services.traffic_ledger import get_traffic_ledger
+from services.api_keys import get_api_key_store, request_scope
+from services.config_registry import get_config_registry
+from services.settings import get_section
+from services.account_query import ndjson_lines, parse_list_query
+from services.config_renderer import get_config_renderer
+from services.host_info import get_host_info
+from services.share_links import get_share_links
+from services.rate_limiter import get_rate_limiter
+from services.metrics import get_metrics, run_command
+from services.request_timing import end_trace, get_slow_request_log, span, start_trace
 from api_key_manager import APIKeyManager
 
 app = Flask(__name__)
 CORS(app)
 
-# Load configuration
-def load_config():
-    try:
-        with open('/etc/API-Panel/config/api_config.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Default config if file not found
-        return {
-            "security": {
-                "authentication": {
-                    "enabled": True,
-                    "type": "bearer",
-                    "api_key": "your-secret-api-key-here"
-                }
-            }
-        }
+# Default jika api_config.json tidak ditemukan
+DEFAULT_AUTH = {
+    "enabled": True,
+    "type": "bearer",
+    "api_key": "your-secret-api-key-here"
+}
+
+def auth_config():
+    """Section security.authentication dari config registry; API key baru langsung terpakai tanpa restart"""
+    return get_section("security", "authentication") or DEFAULT_AUTH
+
+def client_ip():
+    """IP client; X-Real-IP dari nginx hanya dipercaya jika request datang dari localhost"""
+    remote = request.remote_addr or ""
+    if remote in ("127.0.0.1", "::1") and request.headers.get('X-Real-IP'):
+        return request.headers.get('X-Real-IP')
+    return remote
+
+def rate_limited(identity):
+    """Ambil token dari bucket read/mutation identitas; response 429 jika habis, None jika boleh lanjut"""
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return None
+    bucket = "read" if request.method in ("GET", "HEAD") else "mutation"
+    with span("rate_limit"):
+        result = limiter.hit(bucket, identity)
+    g.rate_limit = result
+    if result.allowed:
+        return None
+    return jsonify({
+        "success": False,
+        "message": f"Rate limit exceeded, retry after {result.headers()['Retry-After']}s",
+        "error": "RATE_LIMITED"
+    }), 429
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if get_section("request_timing").get("enabled", True):
+        start_trace(request.method, request.path)
+
+@app.after_request
+def add_server_timing(response):
+    """Header Server-Timing per fase + log JSON jika request lebih lama dari slow_request_ms"""
+    trace = end_trace()
+    if trace is None:
+        return response
+    total = trace.elapsed()
+    if get_section("request_timing").get("server_timing_header", True):
+        response.headers["Server-Timing"] = trace.server_timing(total)
+    identity = g.get("api_key")
+    get_slow_request_log().check(
+        trace, total,
+        endpoint=request.url_rule.rule if request.url_rule else None,
+        status=response.status_code,
+        api_key=identity.id if identity is not None else None,
+        client_ip=client_ip()
+    )
+    return response
+
+@app.teardown_request
+def clear_request_trace(exc):
+    # Request gagal sebelum after_request: jangan sampai trace terbawa ke request berikutnya di thread ini
+    end_trace()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is not None:
+        # Template route (/api/<service_name>/config/<username>), bukan path asli, supaya label terbatas
+        endpoint = request.url_rule.rule if request.url_rule else "<unmatched>"
+        metrics = get_metrics()
+        metrics.inc("api_requests_total", endpoint=endpoint, method=request.method, status=str(response.status_code))
+        metrics.observe("api_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint, method=request.method)
+    return response
 
-config = load_config()
+@app.after_request
+def add_rate_limit_headers(response):
+    result = g.get("rate_limit")
+    if result is not None:
+        response.headers.update(result.headers())
+    return response
 
 # API Key Authentication Decorator
 def require_api_key(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        # Satu snapshot config per request; rotate key di tengah request tidak mempengaruhinya
+        auth = auth_config()
+        
         # Always check authentication - remove bypass
-        auth_enabled = config.get("security", {}).get("authentication", {}).get("enabled", True)
+        auth_enabled = auth.get("enabled", True)
         
         if not auth_enabled:
             logger.warning("Authentication is disabled - this is not recommended for production")
-            return f(*args, **kwargs)
+            return rate_limited(f"ip:{client_ip()}") or f(*args, **kwargs)
         
         # Check for API key in headers (X-API-Key) or Authorization header (Bearer token)
         api_key = None
@@ -85,23 +170,38 @@ def require_api_key(f):
         elif request.args.get('api_key'):
             api_key = request.args.get('api_key')
         
-        expected_key = config.get("security", {}).get("authentication", {}).get("api_key", "")
-        
         # Validate API key
         if not api_key:
-            return jsonify({
+            return rate_limited(f"ip:{client_ip()}") or (jsonify({
                 "success": False,
                 "message": "Missing API key. Provide in X-API-Key header, Authorization: Bearer <token>, or api_key parameter",
                 "error": "MISSING_API_KEY"
-            }), 401
-            
-        if api_key != expected_key:
-            return jsonify({
+            }), 401)
+        
+        # Key reseller (hash, constant-time) atau key lama dari api_config.json
+        with span("auth"):
+            identity = get_api_key_store().verify(api_key, auth.get("api_key"))
+        if identity is None:
+            # Percobaan key salah dibatasi per IP
+            return rate_limited(f"ip:{client_ip()}") or (jsonify({
                 "success": False,
                 "message": "Invalid API key",
                 "error": "INVALID_API_KEY"
-            }), 401
+            }), 401)
+        
+        limited = rate_limited(f"key:{identity.id}")
+        if limited:
+            return limited
+        
+        protocol, action = request_scope(request.path, request.method)
+        if not identity.allows(protocol, action):
+            return jsonify({
+                "success": False,
+                "message": f"API key tidak punya akses {action} untuk {protocol}",
+                "error": "FORBIDDEN_SCOPE"
+            }), 403
         
+        g.api_key = identity
         return f(*args, **kwargs)
     return decorated_function
 
@@ -135,20 +235,101 @@ class APIPanel:
             'trojan': trojan_service,
             'trial': trial_service
         }
+        self.status_cache = get_status_cache(self.services)
         
     def get_service_info(self):
-        """Get info semua service yang tersedia"""
-        info = {}
-        for service_name, service in self.services.items():
-            try:
-                info[service_name] = service.get_info()
-            except Exception as e:
-                logger.error(f"Error getting info for {service_name}: {e}")
-                info[service_name] = {"status": "error", "message": str(e)}
-        return info
+        """Get info semua service yang tersedia (dari status cache)"""
+        return self.status_cache.get()["services"]
 
 # Initialize API Panel
 api_panel = APIPanel()
+batch_service = BatchService({
+    'ssh': ssh_service,
+    'vmess': vmess_service,
+    'vless': vless_service,
+    'shadowsocks': shadowsocks_service,
+    'trojan': trojan_service,
+    'trial': trial_service
+})
+
+def expire_accounts(groups):
+    """Executor expiry scheduler: hapus semua akun jatuh tempo dalam satu batch"""
+    result = batch_service.run_many("delete", groups, "expiry-sweep")
+    return {name: group.get("results", []) for name, group in result["results"].items()}
+
+if get_section("expiry_scheduler").get("enabled", True):
+    get_expiry_scheduler().start(expire_accounts)
+
+def reap_accounts(groups):
+    """Executor account reaper: akun berbayar expired, satu commit config untuk semua protocol"""
+    return batch_service.run_many("delete", groups, "account-reaper")
+
+account_reaper = get_account_reaper(api_panel.services, reap_accounts)
+if get_section("account_reaper").get("enabled", False):
+    account_reaper.start()
+
+XRAY_PROTOCOLS = ('vmess', 'vless', 'trojan', 'shadowsocks')
+
+traffic_ledger = get_traffic_ledger()
+if traffic_ledger is not None:
+    # Counter Xray kembali 0 saat restart: pindahkan dulu ke ledger
+    get_restart_scheduler().before_restart(lambda: traffic_ledger.snapshot(reason="restart"))
+    traffic_ledger.start()
+
+quota_enforcer = get_quota_enforcer(api_panel.services)
+if get_section("quota_enforcer").get("enabled", False):
+    quota_enforcer.start()
+
+ip_limiter = get_ip_limiter(api_panel.services, get_account_suspender())
+if get_section("ip_limiter").get("enabled", False):
+    ip_limiter.start()
+
+DB_FILES = {
+    'ssh': ssh_service.ssh_db_path,
+    'vmess': vmess_service.vmess_db_path,
+    'vless': vless_service.vless_db_path,
+    'shadowsocks': shadowsocks_service.ss_db_path,
+    'trojan': trojan_service.trojan_db_path,
+    'trial': trial_service.trial_db_path
+}
+
+def db_file_gauges():
+    samples = []
+    for protocol, path in DB_FILES.items():
+        try:
+            samples.append(({"protocol": protocol}, os.path.getsize(path)))
+        except OSError:
+            pass
+    return samples
+
+def account_gauges():
+    """Jumlah akun dari status cache (tidak membaca database saat scrape)"""
+    samples = []
+    for protocol, info in api_panel.status_cache.get()["services"].items():
+        if "total_accounts" in info:
+            active, expired = info["active_accounts"], info["expired_accounts"]
+        elif "total_trials" in info:
+            active, expired = info["active_trials"], info["total_trials"] - info["active_trials"]
+        else:
+            continue
+        samples.append(({"protocol": protocol, "state": "active"}, active))
+        samples.append(({"protocol": protocol, "state": "expired"}, expired))
+    return samples
+
+get_metrics().register_gauge("api_db_file_bytes", db_file_gauges)
+get_metrics().register_gauge("api_accounts", account_gauges)
+
+def list_response(service):
+    """Response list akun: satu halaman JSON, atau stream NDJSON jika format=ndjson"""
+    stream = request.args.get('format') == 'ndjson'
+    try:
+        query = parse_list_query(request.args, stream=stream)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if stream:
+        return Response(stream_with_context(ndjson_lines(service.iter_accounts(query))),
+                        mimetype='application/x-ndjson')
+    return jsonify(service.list_accounts(query))
 
 @app.route('/')
 def index():
@@ -161,15 +342,27 @@ def index():
         "services": list(api_panel.services.keys())
     })
 
+@app.route('/metrics')
+@require_api_key
+def prometheus_metrics():
+    """Metrics format Prometheus, dijumlahkan dari semua worker"""
+    try:
+        return Response(get_metrics().render(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @app.route('/api/status')
 def api_status():
-    """Check API status dan semua service"""
+    """Check API status dan semua service (publik: hanya up/down, jumlah akun di /api/admin/status)"""
     try:
+        snapshot = api_panel.status_cache.get()
         return jsonify({
             "status": "success",
             "api_status": "running",
             "timestamp": datetime.now().isoformat(),
-            "services": api_panel.get_service_info()
+            "services": {name: info.get("status", "error") for name, info in snapshot["services"].items()},
+            "updated_at": snapshot["updated_at"]
         })
     except Exception as e:
         logger.error(f"Error checking API status: {e}")
@@ -203,10 +396,9 @@ def trial_ssh():
 @app.route('/api/ssh/list', methods=['GET'])
 @require_api_key
 def list_ssh():
-    """List semua SSH accounts"""
+    """List SSH accounts"""
     try:
-        result = ssh_service.list_accounts()
-        return jsonify(result)
+        return list_response(ssh_service)
     except Exception as e:
         logger.error(f"Error listing SSH accounts: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -263,10 +455,9 @@ def trial_vmess():
 @app.route('/api/vmess/list', methods=['GET'])
 @require_api_key
 def list_vmess():
-    """List semua VMess accounts"""
+    """List VMess accounts"""
     try:
-        result = vmess_service.list_accounts()
-        return jsonify(result)
+        return list_response(vmess_service)
     except Exception as e:
         logger.error(f"Error listing VMess accounts: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -323,10 +514,9 @@ def trial_vless():
 @app.route('/api/vless/list', methods=['GET'])
 @require_api_key
 def list_vless():
-    """List semua VLess accounts"""
+    """List VLess accounts"""
     try:
-        result = vless_service.list_accounts()
-        return jsonify(result)
+        return list_response(vless_service)
     except Exception as e:
         logger.error(f"Error listing VLess accounts: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -383,10 +573,9 @@ def trial_shadowsocks():
 @app.route('/api/shadowsocks/list', methods=['GET'])
 @require_api_key
 def list_shadowsocks():
-    """List semua Shadowsocks accounts"""
+    """List Shadowsocks accounts"""
     try:
-        result = shadowsocks_service.list_accounts()
-        return jsonify(result)
+        return list_response(shadowsocks_service)
     except Exception as e:
         logger.error(f"Error listing Shadowsocks accounts: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -443,10 +632,9 @@ def trial_trojan():
 @app.route('/api/trojan/list', methods=['GET'])
 @require_api_key
 def list_trojan():
-    """List semua Trojan accounts"""
+    """List Trojan accounts"""
     try:
-        result = trojan_service.list_accounts()
-        return jsonify(result)
+        return list_response(trojan_service)
     except Exception as e:
         logger.error(f"Error listing Trojan accounts: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -475,6 +663,66 @@ def renew_trojan():
         logger.error(f"Error renewing Trojan account: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+# Client Config Endpoint
+@app.route('/api/<service_name>/config/<username>', methods=['GET'])
+@require_api_key
+def client_config(service_name, username):
+    """Config client akun (isi file <proto>-<user>.txt), dirender dari record akun"""
+    try:
+        service = api_panel.services.get(service_name)
+        if service is None or not hasattr(service, 'render_config'):
+            return jsonify({"status": "error", "message": f"Service {service_name} tidak punya config client"}), 404
+        options = {key: request.args.get(key) for key in ('variant', 'bug', 'cipher') if request.args.get(key)}
+        rendered = service.render_config(username, options)
+        if rendered is None:
+            return jsonify({"status": "error", "message": f"Akun {username} tidak ditemukan"}), 404
+        text, etag = rendered
+        response = Response(text, mimetype='text/plain')
+        response.set_etag(etag)
+        # If-None-Match cocok -> 304 tanpa body
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error(f"Error rendering {service_name} config {username}: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# Traffic Usage Endpoint
+@app.route('/api/<service_name>/usage/<username>', methods=['GET'])
+@require_api_key
+def account_usage(service_name, username):
+    """Total trafik akun (lifetime, kuota, per hari/bulan) dari traffic ledger"""
+    try:
+        if traffic_ledger is None:
+            return jsonify({"status": "error", "message": "Traffic ledger tidak aktif"}), 404
+        service = api_panel.services.get(service_name)
+        if service_name not in XRAY_PROTOCOLS or service is None:
+            return jsonify({"status": "error", "message": f"Service {service_name} tidak punya data trafik"}), 404
+        if not service.store.exists(username):
+            return jsonify({"status": "error", "message": f"Akun {username} tidak ditemukan"}), 404
+        usage = traffic_ledger.usage(username)
+        if usage is None:
+            # Akun belum pernah tercatat memakai trafik
+            usage = {"username": username, "lifetime": {"uplink": 0, "downlink": 0, "total": 0}}
+        return jsonify(dict(usage, status="success", service=service_name))
+    except Exception as e:
+        logger.error(f"Error reading {service_name} usage {username}: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# Batch Endpoints
+@app.route('/api/<service_name>/batch-<action>', methods=['POST'])
+@require_api_key
+def batch_accounts(service_name, action):
+    """Batch create/delete/renew akun (ssh, vmess, vless, shadowsocks, trojan, trial: delete)"""
+    try:
+        data = request.get_json()
+        items = data.get('items') if isinstance(data, dict) else data
+        result = batch_service.run(service_name, action, items)
+        if result.get("status") == "error" and "results" not in result:
+            return jsonify(result), 400
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error running batch-{action} {service_name}: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 # Trial Management Endpoints
 @app.route('/api/trial/create', methods=['POST'])
 @require_api_key
@@ -533,30 +781,157 @@ def list_trials():
 #         logger.error(f"Error restarting system: {e}")
 #         return jsonify({"status": "error", "message": str(e)}), 500
 
+def service_states():
+    """Status systemd service inti (xray, nginx, ssh)"""
+    status = {}
+    for service in ['xray', 'nginx', 'ssh']:
+        try:
+            result = run_command(['systemctl', 'is-active', service],
+                                 capture_output=True, text=True, check=True)
+            status[service] = result.stdout.strip()
+        except:
+            status[service] = "inactive"
+    return status
+
 @app.route('/api/system/status', methods=['GET'])
 def system_status():
-    """Get system status"""
+    """Get system status (publik: hanya up/down service)"""
     try:
-        services = ['xray', 'nginx', 'ssh']
-        status = {}
-        
-        for service in services:
-            try:
-                result = subprocess.run(['systemctl', 'is-active', service], 
-                                     capture_output=True, text=True, check=True)
-                status[service] = result.stdout.strip()
-            except:
-                status[service] = "inactive"
-                
         return jsonify({
             "status": "success",
-            "services": status,
+            "services": service_states(),
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
         logger.error(f"Error getting system status: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/admin/status', methods=['GET'])
+@require_api_key
+def admin_status():
+    """Statistik internal semua komponen (reload, queue, scheduler, enforcer, cache, dst)"""
+    try:
+        return jsonify({
+            "status": "success",
+            "services": service_states(),
+            "accounts": api_panel.status_cache.get(),
+            "xray_reload": get_restart_scheduler().stats(),
+            "telegram": get_telegram_notifier().stats(),
+            "status_cache": api_panel.status_cache.stats(),
+            "expiry_scheduler": get_expiry_scheduler().stats(),
+            "account_reaper": account_reaper.stats(),
+            "quota_enforcer": quota_enforcer.stats(),
+            "ip_limiter": ip_limiter.stats(),
+            "account_suspender": get_account_suspender().stats(),
+            "traffic_ledger": traffic_ledger.stats() if traffic_ledger else {"enabled": False},
+            "config_render": get_config_renderer().stats(),
+            "share_links": get_share_links().stats(),
+            "host_info": get_host_info().stats(),
+            "config_registry": get_config_registry().stats(),
+            "rate_limit": get_rate_limiter().stats() if get_rate_limiter() else {"enabled": False},
+            "metrics": get_metrics().stats(),
+            "slow_requests": get_slow_request_log().stats(),
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error getting admin status: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# Account Reaper Endpoints
+@app.route('/api/admin/reaper', methods=['GET'])
+@require_api_key
+def reaper_report():
+    """Dry-run: daftar akun expired yang akan dihapus reaper"""
+    try:
+        report = account_reaper.report()
+        return jsonify(dict(report, status="success", stats=account_reaper.stats()))
+    except Exception as e:
+        logger.error(f"Error building reaper report: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/admin/reaper/run', methods=['POST'])
+@require_api_key
+def reaper_run():
+    """Jalankan reaper sekarang; {"dry_run": true} hanya menampilkan report"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = account_reaper.run(dry_run=data.get('dry_run'))
+        if result.get("status") == "error":
+            return jsonify(result), 500
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error running account reaper: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# Quota Enforcer Endpoints
+@app.route('/api/admin/quota', methods=['GET'])
+@require_api_key
+def quota_report():
+    """Dry-run: user yang melewati kuota dan user nonaktif yang akan diaktifkan lagi"""
+    try:
+        report = quota_enforcer.run(dry_run=True)
+        return jsonify(dict(report, disabled=quota_enforcer.disabled(), stats=quota_enforcer.stats()))
+    except Exception as e:
+        logger.error(f"Error building quota report: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/admin/quota/run', methods=['POST'])
+@require_api_key
+def quota_run():
+    """Cek kuota sekarang; {"dry_run": true} hanya menampilkan report"""
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify(quota_enforcer.run(dry_run=data.get('dry_run')))
+    except Exception as e:
+        logger.error(f"Error running quota enforcer: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/admin/quota/enable', methods=['POST'])
+@require_api_key
+def quota_enable():
+    """Aktifkan lagi user yang dinonaktifkan karena kuota; {"username": ..., "reset_usage": true}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        username = data.get('username')
+        if not username:
+            return jsonify({"status": "error", "message": "username wajib diisi"}), 400
+        enabled = quota_enforcer.enable([username], reset_usage=data.get('reset_usage', False))
+        if not enabled:
+            return jsonify({"status": "error", "message": f"User {username} tidak sedang dinonaktifkan karena kuota"}), 404
+        return jsonify({"status": "success", "message": f"User {username} diaktifkan lagi", "enabled": enabled})
+    except Exception as e:
+        logger.error(f"Error enabling quota user: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# IP Limiter Endpoints
+@app.route('/api/admin/ip-limit', methods=['GET'])
+@require_api_key
+def ip_limit_report():
+    """IP aktif per akun dalam window dan akun yang sedang dikunci karena limit IP"""
+    try:
+        report = ip_limiter.report()
+        return jsonify(dict(report, status="success", stats=ip_limiter.stats()))
+    except Exception as e:
+        logger.error(f"Error building IP limit report: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/admin/ip-limit/unlock', methods=['POST'])
+@require_api_key
+def ip_limit_unlock():
+    """Buka kunci akun sebelum lock_seconds habis; {"username": ...}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        username = data.get('username')
+        if not username:
+            return jsonify({"status": "error", "message": "username wajib diisi"}), 400
+        unlocked = ip_limiter.unlock(username)
+        if not unlocked:
+            return jsonify({"status": "error", "message": f"User {username} tidak sedang dikunci karena limit IP"}), 404
+        return jsonify({"status": "success", "message": f"User {username} dibuka kuncinya", "unlocked": unlocked})
+    except Exception as e:
+        logger.error(f"Error unlocking IP limit user: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 # API Key Management Endpoints
 @app.route('/api/admin/generate-api-key', methods=['POST'])
 @require_api_key
@@ -577,12 +952,14 @@ def generate_new_api_key():
         new_api_key = api_key_manager.generate_and_sync_api_key()
         
         if new_api_key:
+            # Key baru aktif di worker ini sekarang, worker lain saat cek mtime berikutnya
+            get_config_registry().reload("api_config")
             return jsonify({
                 "status": "success",
                 "message": "New API key generated and synced successfully",
                 "new_api_key": new_api_key,
                 "timestamp": datetime.now().isoformat(),
-                "notice": "Please restart the API service: sudo systemctl restart api-panel"
+                "notice": "API key baru langsung aktif, tidak perlu restart service"
             })
         else:
             return jsonify({
@@ -594,6 +971,71 @@ def generate_new_api_key():
         logger.error(f"Error generating API key: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/admin/reload-config', methods=['POST'])
+@require_api_key
+def reload_config():
+    """Muat ulang api_config.json dan bot config sekarang, tanpa menunggu cek mtime"""
+    try:
+        registry = get_config_registry()
+        changed = registry.reload()
+        return jsonify({
+            "status": "success",
+            "changed": changed,
+            "sources": registry.stats(),
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error reloading config: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/admin/keys', methods=['GET'])
+@require_api_key
+def list_api_keys():
+    """Daftar API key (tanpa hash/secret)"""
+    try:
+        return jsonify({"status": "success", "data": get_api_key_store().list()})
+    except Exception as e:
+        logger.error(f"Error listing API keys: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/admin/keys', methods=['POST'])
+@require_api_key
+def create_api_key():
+    """Buat API key reseller: {"name", "actions": [...], "protocols": [...], "days": 30}"""
+    try:
+        data = request.get_json() or {}
+        days = data.get('days')
+        expires_at = datetime.now() + timedelta(days=int(days)) if days else None
+        info, token = get_api_key_store().create(
+            data.get('name'),
+            actions=data.get('actions'),
+            protocols=data.get('protocols'),
+            expires_at=expires_at,
+        )
+        return jsonify({
+            "status": "success",
+            "message": "API key dibuat; simpan key ini, tidak bisa ditampilkan lagi",
+            "api_key": token,
+            "data": info
+        }), 201
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error creating API key: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/admin/keys/<key_id>/revoke', methods=['POST'])
+@require_api_key
+def revoke_api_key(key_id):
+    """Revoke API key, berlaku di semua worker tanpa restart"""
+    try:
+        if not get_api_key_store().revoke(key_id):
+            return jsonify({"status": "error", "message": f"API key {key_id} tidak ditemukan"}), 404
+        return jsonify({"status": "success", "message": f"API key {key_id} di-revoke"})
+    except Exception as e:
+        logger.error(f"Error revoking API key {key_id}: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @app.route('/api/admin/validate-api-key', methods=['GET'])
 @require_api_key
 def validate_api_key_sync():
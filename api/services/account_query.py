@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Account Query untuk AlrelShop API Panel
+Pagination, filter dan sort untuk endpoint `/api/<service>/list`, dijalankan di
+atas index terurut account store (store.page), bukan list semua akun.
+
+Query string:
+- limit        : jumlah akun per halaman (default/maksimal dari section pagination)
+- after        : cursor dari `next_cursor` halaman sebelumnya
+- sort         : username (default) atau expiry; order: asc (default) atau desc
+- status       : active / expired (diterjemahkan ke rentang expiry)
+- expiry_from, expiry_to : rentang tanggal expiry YYYY-MM-DD (inklusif)
+- prefix       : awalan username
+- format=ndjson: stream semua akun yang cocok, satu object JSON per baris
+"""
+
+import json
+import re
+from datetime import datetime, timedelta
+
+from services.settings import get_section
+
+DEFAULT_LIMIT = 100
+DEFAULT_MAX_LIMIT = 1000
+STREAM_PAGE_SIZE = 500
+
+SORTS = ("username", "expiry")
+ORDERS = ("asc", "desc")
+STATUSES = ("active", "expired")
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def parse_list_query(args, stream=False):
+    """Validasi query string list -> dict query; ValueError jika ada parameter tidak valid"""
+    settings = get_section("pagination")
+    max_limit = settings.get("max_limit", DEFAULT_MAX_LIMIT)
+
+    limit = args.get("limit")
+    if limit is None or limit == "":
+        # Streaming tanpa limit = semua akun yang cocok
+        limit = None if stream else settings.get("default_limit", DEFAULT_LIMIT)
+    else:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError("limit harus berupa angka")
+        if limit < 1:
+            raise ValueError("limit minimal 1")
+        if not stream:
+            limit = min(limit, max_limit)
+
+    sort = args.get("sort") or "username"
+    if sort not in SORTS:
+        raise ValueError(f"sort harus salah satu dari {', '.join(SORTS)}")
+    order = args.get("order") or "asc"
+    if order not in ORDERS:
+        raise ValueError(f"order harus salah satu dari {', '.join(ORDERS)}")
+    status = args.get("status") or None
+    if status is not None and status not in STATUSES:
+        raise ValueError(f"status harus salah satu dari {', '.join(STATUSES)}")
+
+    dates = {}
+    for key in ("expiry_from", "expiry_to"):
+        value = args.get(key) or None
+        if value is not None and not DATE_PATTERN.match(value):
+            raise ValueError(f"{key} harus berformat YYYY-MM-DD")
+        dates[key] = value
+
+    return {
+        "limit": limit,
+        "after": args.get("after") or None,
+        "sort": sort,
+        "descending": order == "desc",
+        "status": status,
+        "prefix": args.get("prefix") or None,
+        "expiry_from": dates["expiry_from"],
+        "expiry_to": dates["expiry_to"],
+    }
+
+
+def _page_args(query, now=None):
+    """Query -> argumen store.page; status diubah jadi rentang expiry"""
+    expiry_from, expiry_to = query["expiry_from"], query["expiry_to"]
+    if query["status"]:
+        now = now or datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        tomorrow = (now + timedelta(days=1)).strftime("%Y-%m-%d")
+        # Sama dengan _get_account_status: aktif selama sekarang < tanggal expiry (00:00)
+        if query["status"] == "active":
+            expiry_from = max(expiry_from or tomorrow, tomorrow)
+        else:
+            expiry_to = min(expiry_to or today, today)
+    return {
+        "after": query["after"],
+        "sort": query["sort"],
+        "descending": query["descending"],
+        "prefix": query["prefix"],
+        "expiry_from": expiry_from,
+        "expiry_to": expiry_to,
+    }
+
+
+def list_page(store, query, to_accounts):
+    """Response list satu halaman; next_cursor None = halaman terakhir"""
+    if query is None:
+        query = parse_list_query({})
+    records, cursor = store.page(limit=query["limit"], **_page_args(query))
+    accounts = to_accounts(records)
+    return {
+        "status": "success",
+        "data": accounts,
+        "count": len(accounts),
+        "total": store.count(),
+        "next_cursor": cursor,
+    }
+
+
+def iter_accounts(store, query, to_accounts):
+    """Generator akun per halaman STREAM_PAGE_SIZE, lock store tidak dipegang di antara halaman"""
+    if query is None:
+        query = parse_list_query({}, stream=True)
+    args = _page_args(query)
+    remaining = query["limit"]
+    while remaining is None or remaining > 0:
+        size = STREAM_PAGE_SIZE if remaining is None else min(remaining, STREAM_PAGE_SIZE)
+        records, cursor = store.page(limit=size, **args)
+        for account in to_accounts(records):
+            yield account
+        if remaining is not None:
+            remaining -= len(records)
+        if cursor is None:
+            return
+        args["after"] = cursor
+
+
+def ndjson_lines(accounts):
+    """Satu baris JSON per akun untuk Response streaming"""
+    for account in accounts:
+        yield json.dumps(account) + "\n"
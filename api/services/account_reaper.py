@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Account Reaper untuk AlrelShop API Panel
+Menghapus akun berbayar yang expiry-nya sudah lewat (plus grace period) dari
+config Xray dan database, supaya tidak terus memakan memory/client matching Xray.
+
+- Kandidat diambil dari index expiry terurut milik account store
+  (count_expiring_before/expiring_before), tanpa membaca ulang file database
+  setiap tick; store hanya reload jika file-nya berubah
+- Semua akun yang dihapus dalam satu run lewat BatchService.run_many:
+  satu commit config Xray dan maksimal satu restart
+- Dry-run/report menampilkan akun yang akan dihapus tanpa mengubah apa pun
+- Dengan beberapa worker gunicorn, run diserialisasi lewat lock file berisi
+  waktu run terakhir, jadi hanya satu worker yang reap per interval
+"""
+
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+
+from services.file_lock import InterProcessLock
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROTOCOLS = ["vmess", "vless", "trojan", "shadowsocks"]
+DEFAULT_GRACE_DAYS = 1
+DEFAULT_INTERVAL = 3600
+DEFAULT_MAX_BATCH = 500
+DEFAULT_LOCK_PATH = "/etc/API-Panel/data/account-reaper.lock"
+
+
+class AccountReaper:
+    """Reap akun expired dari beberapa service dalam satu batch"""
+
+    def __init__(self, services, executor, protocols=None, grace_days=DEFAULT_GRACE_DAYS, interval=DEFAULT_INTERVAL,
+                 max_batch=DEFAULT_MAX_BATCH, dry_run=False, lock_path=None):
+        """executor(groups) -> hasil BatchService.run_many; groups = {service: [items]}"""
+        self.services = services
+        self.executor = executor
+        self.protocols = protocols or DEFAULT_PROTOCOLS
+        self.grace_days = grace_days
+        self.interval = interval
+        self.max_batch = max_batch
+        self.dry_run = dry_run
+        self._process_lock = InterProcessLock(lock_path) if lock_path else None
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopped = False
+        self._metrics = {
+            "runs": 0,
+            "skipped_runs": 0,
+            "removed": 0,
+            "failed": 0,
+            "last_run_at": None,
+            "last_candidates": 0,
+            "last_elapsed_ms": None,
+            "last_error": None,
+        }
+
+    def cutoff(self, now=None):
+        """Akun dengan expiry < cutoff sudah lewat grace period (expiry = tanggal akun tidak aktif lagi)"""
+        now = now or datetime.now()
+        return (now + timedelta(days=1) - timedelta(days=self.grace_days)).strftime("%Y-%m-%d")
+
+    def report(self, now=None):
+        """Kandidat reap per protocol: {protocol: [{username, expiry}]}, tanpa menghapus"""
+        cutoff = self.cutoff(now)
+        candidates = {}
+        for protocol in self.protocols:
+            store = getattr(self.services.get(protocol), "store", None)
+            # O(log n) dari index; protocol tanpa akun expired dilewati tanpa membuat list
+            if store is None or not store.count_expiring_before(cutoff):
+                continue
+            usernames = store.expiring_before(cutoff)[:self.max_batch]
+            candidates[protocol] = [{"username": username, "expiry": store.expiry(username)} for username in usernames]
+        return {
+            "cutoff": cutoff,
+            "grace_days": self.grace_days,
+            "total": sum(len(items) for items in candidates.values()),
+            "accounts": candidates,
+        }
+
+    def run(self, dry_run=None, now=None):
+        """Reap sekarang; dry_run=True hanya mengembalikan report"""
+        dry_run = self.dry_run if dry_run is None else dry_run
+        with self._lock:
+            started = time.monotonic()
+            report = self.report(now)
+            if dry_run or not report["total"]:
+                return dict(report, status="success", dry_run=dry_run, removed=0, failed=0)
+
+            groups = {
+                protocol: [{"username": item["username"]} for item in items]
+                for protocol, items in report["accounts"].items()
+            }
+            try:
+                result = self.executor(groups)
+            except Exception as e:
+                logger.error(f"Account reaper gagal: {e}")
+                self._metrics["last_error"] = str(e)
+                return dict(report, status="error", dry_run=False, message=str(e))
+
+            removed = sum(group.get("succeeded", 0) for group in result["results"].values())
+            failed = report["total"] - removed
+            elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+            self._metrics["runs"] += 1
+            self._metrics["removed"] += removed
+            self._metrics["failed"] += failed
+            self._metrics["last_run_at"] = time.time()
+            self._metrics["last_candidates"] = report["total"]
+            self._metrics["last_elapsed_ms"] = elapsed_ms
+            logger.info(f"Account reaper: {removed} akun expired dihapus, {failed} gagal (cutoff {report['cutoff']})")
+            return dict(
+                report,
+                status="success" if not failed else "partial",
+                dry_run=False,
+                removed=removed,
+                failed=failed,
+                results=result["results"],
+                xray_reload=result["xray_reload"],
+                elapsed_ms=elapsed_ms,
+            )
+
+    # --- Background ---
+
+    def start(self):
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped = False
+                self._worker = threading.Thread(target=self._run, name="account-reaper", daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+            try:
+                self._tick()
+            except Exception as e:
+                logger.error(f"Account reaper tick error: {e}")
+                self._metrics["last_error"] = str(e)
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(self.interval)
+
+    def _tick(self):
+        if self._process_lock is None:
+            self.run()
+            return
+        with self._process_lock:
+            try:
+                last_run = float(self._process_lock.read() or 0)
+            except ValueError:
+                last_run = 0.0
+            if time.time() - last_run < self.interval * 0.9:
+                # Worker lain baru saja reap
+                self._metrics["skipped_runs"] += 1
+                return
+            self.run()
+            self._process_lock.write(repr(time.time()))
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+        m.update({"enabled": self._worker is not None, "dry_run": self.dry_run, "grace_days": self.grace_days,
+                  "interval": self.interval})
+        return m
+
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def get_account_reaper(services=None, executor=None):
+    """Reaper bersama, dibuat sekali dari main_api dengan service dan executor batch"""
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None:
+            if services is None or executor is None:
+                raise RuntimeError("Account reaper belum diinisialisasi")
+            settings = get_section("account_reaper")
+            _reaper = AccountReaper(
+                services,
+                executor,
+                protocols=settings.get("protocols", DEFAULT_PROTOCOLS),
+                grace_days=settings.get("grace_days", DEFAULT_GRACE_DAYS),
+                interval=settings.get("interval", DEFAULT_INTERVAL),
+                max_batch=settings.get("max_batch", DEFAULT_MAX_BATCH),
+                dry_run=settings.get("dry_run", False),
+                lock_path=settings.get("lock_path", DEFAULT_LOCK_PATH),
+            )
+        return _reaper
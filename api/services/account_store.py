@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Account Store untuk AlrelShop API Panel
+Cache in-memory untuk database akun `### user ...` (.vmess.db, .ssh.db, dst).
+
+File dibaca sekali ke dict (key username) plus index expiry yang terurut.
+Penulisan langsung ke file (append atomik untuk akun baru, compaction lewat
+temp file + rename untuk delete/update). Cache otomatis di-reload jika file
+diubah proses lain (misal script m-vmess), dideteksi dari inode/mtime/size.
+Writer dari beberapa worker gunicorn diserialisasi lewat flock (services/file_lock.py).
+
+Engine alternatif: SQLite WAL (services/sqlite_store.py), pilih lewat
+"database": {"engine": "sqlite"} di api_config.json.
+"""
+
+import bisect
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+import logging
+from datetime import datetime, timedelta
+
+from services.file_lock import InterProcessLock, lock_path_for
+from services.request_timing import traced
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+RECORD_PREFIX = "### "
+DEFAULT_SQLITE_PATH = "/etc/API-Panel/data/accounts.sqlite3"
+
+
+class FlatFileAccountStore:
+    """Repository akun berbasis file `### ...` dengan index username dan expiry"""
+
+    def __init__(self, path, expiry_index=1):
+        # Index field dihitung dari record tanpa "###", jadi record[0] = username
+        self.path = path
+        self.expiry_index = expiry_index
+        self._lock = threading.RLock()
+        self._file_lock = InterProcessLock(lock_path_for(path))
+        self._records = {}
+        self._expiry_index = []
+        self._username_index = []
+        self._extra_lines = []
+        self._signature = None
+        self._batch_depth = 0
+        self._batch_appends = []
+        self._batch_compact = False
+        self._listeners = []
+
+    # --- Loading & invalidation ---
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _ensure_fresh(self):
+        if self._batch_depth:
+            # Perubahan batch belum di-flush, jangan ditimpa reload
+            return
+        signature = self._file_signature()
+        if signature != self._signature:
+            self._load(signature)
+
+    def _load(self, signature):
+        records = {}
+        extra_lines = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.startswith(RECORD_PREFIX):
+                        record = line.split()[1:]
+                        if record and record[0] not in records:
+                            records[record[0]] = record
+                    elif line.strip():
+                        extra_lines.append(line if line.endswith("\n") else line + "\n")
+        except FileNotFoundError:
+            pass
+
+        self._records = records
+        self._extra_lines = extra_lines
+        self._expiry_index = sorted(
+            (self._expiry_of(record), username) for username, record in records.items()
+        )
+        self._username_index = sorted(records)
+        self._signature = signature
+        logger.debug(f"Loaded {len(records)} accounts from {self.path}")
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """Lock thread + flock, lalu reload: perubahan worker lain tidak tertimpa"""
+        with self._lock, self._file_lock:
+            self._ensure_fresh()
+            yield
+
+    def signature(self):
+        """Signature file (inode, mtime, size) yang terakhir disinkronkan"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._signature
+
+    def _expiry_of(self, record):
+        return record[self.expiry_index] if len(record) > self.expiry_index else ""
+
+    def _index_add(self, username, record):
+        bisect.insort(self._expiry_index, (self._expiry_of(record), username))
+        bisect.insort(self._username_index, username)
+
+    def _index_remove(self, username, record):
+        entry = (self._expiry_of(record), username)
+        pos = bisect.bisect_left(self._expiry_index, entry)
+        if pos < len(self._expiry_index) and self._expiry_index[pos] == entry:
+            del self._expiry_index[pos]
+        pos = bisect.bisect_left(self._username_index, username)
+        if pos < len(self._username_index) and self._username_index[pos] == username:
+            del self._username_index[pos]
+
+    # --- Reads ---
+
+    def get(self, username):
+        """Record akun (list field, record[0] = username) atau None"""
+        with self._lock:
+            self._ensure_fresh()
+            record = self._records.get(username)
+            return list(record) if record else None
+
+    def exists(self, username):
+        with self._lock:
+            self._ensure_fresh()
+            return username in self._records
+
+    def expiry(self, username):
+        with self._lock:
+            self._ensure_fresh()
+            record = self._records.get(username)
+            if record is None:
+                return None
+            return self._expiry_of(record) or None
+
+    def all(self):
+        """Semua record sesuai urutan di file"""
+        with self._lock:
+            self._ensure_fresh()
+            return [list(record) for record in self._records.values()]
+
+    def count(self):
+        with self._lock:
+            self._ensure_fresh()
+            return len(self._records)
+
+    def count_expiring_before(self, expiry):
+        """Jumlah akun dengan expiry < tanggal, O(log n) dari index terurut"""
+        with self._lock:
+            self._ensure_fresh()
+            # Expiry kosong ("") selalu di depan index, tidak dihitung
+            empty = bisect.bisect_left(self._expiry_index, ("\x00",))
+            return bisect.bisect_left(self._expiry_index, (expiry, "")) - empty
+
+    def expiring_before(self, expiry):
+        """Username dengan expiry < tanggal (format YYYY-MM-DD), dari index terurut"""
+        with self._lock:
+            self._ensure_fresh()
+            pos = bisect.bisect_left(self._expiry_index, (expiry, ""))
+            return [username for exp, username in self._expiry_index[:pos] if exp]
+
+    def _expiry_range(self, expiry_from, expiry_to):
+        """Posisi [lo, hi) di index expiry untuk filter tanggal inklusif (bisect)"""
+        index = self._expiry_index
+        lo, hi = 0, len(index)
+        if expiry_from is not None or expiry_to is not None:
+            # Akun tanpa expiry tidak ikut filter tanggal
+            lo = bisect.bisect_left(index, (expiry_from or "\x00", ""))
+        if expiry_to is not None:
+            hi = bisect.bisect_left(index, (expiry_to + "\x00", ""))
+        return lo, hi
+
+    def page(self, limit=100, after=None, sort="username", descending=False, prefix=None,
+             expiry_from=None, expiry_to=None):
+        """Satu halaman record dari index terurut: (records, cursor halaman berikutnya atau None)
+
+        sort "username" memakai index username, sort "expiry" memakai index expiry.
+        sort "username" + filter tanggal: range dipilih dari index expiry lalu hanya
+        subset itu yang diurutkan per username.
+        expiry_from/expiry_to inklusif (YYYY-MM-DD); cursor = nilai dari halaman sebelumnya.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            if sort == "expiry":
+                index = self._expiry_index
+                lo, hi = self._expiry_range(expiry_from, expiry_to)
+                if after is not None:
+                    key = tuple(decode_cursor(after, sort))
+                    if descending:
+                        hi = min(hi, bisect.bisect_left(index, key))
+                    else:
+                        lo = max(lo, bisect.bisect_right(index, key))
+            else:
+                if expiry_from is not None or expiry_to is not None:
+                    start, stop = self._expiry_range(expiry_from, expiry_to)
+                    index = sorted(username for _, username in self._expiry_index[start:stop]
+                                   if not prefix or username.startswith(prefix))
+                    lo, hi = 0, len(index)
+                else:
+                    index = self._username_index
+                    lo, hi = 0, len(index)
+                    if prefix:
+                        lo = bisect.bisect_left(index, prefix)
+                        hi = bisect.bisect_left(index, prefix + "\U0010ffff")
+                if after is not None:
+                    if descending:
+                        hi = min(hi, bisect.bisect_left(index, after))
+                    else:
+                        lo = max(lo, bisect.bisect_right(index, after))
+
+            positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+            records = []
+            for pos in positions:
+                username = index[pos][1] if sort == "expiry" else index[pos]
+                if sort == "expiry" and prefix and not username.startswith(prefix):
+                    continue
+                if len(records) == limit:
+                    return records, encode_cursor(records[-1], sort, self.expiry_index)
+                records.append(list(self._records[username]))
+            return records, None
+
+    # --- Writes ---
+
+    def add(self, record):
+        """Tambah akun; jika username sudah ada, entry lama diganti"""
+        record = [str(field) for field in record]
+        username = record[0]
+        with self._writing():
+            if username in self._records:
+                self._index_remove(username, self._records.pop(username))
+                self._records[username] = record
+                self._index_add(username, record)
+                self._write_compact()
+                return
+
+            self._records[username] = record
+            self._index_add(username, record)
+            self._write_append(RECORD_PREFIX + " ".join(record) + "\n")
+
+    def remove(self, username):
+        with self._writing():
+            record = self._records.pop(username, None)
+            if record is None:
+                return False
+            self._index_remove(username, record)
+            self._write_compact()
+            return True
+
+    def update(self, username, index, value):
+        """Update satu field record (index tanpa "###")"""
+        with self._writing():
+            record = self._records.get(username)
+            if record is None or index >= len(record):
+                return False
+            self._index_remove(username, record)
+            record[index] = str(value)
+            self._index_add(username, record)
+            self._write_compact()
+            return True
+
+    def set_expiry(self, username, expiry):
+        return self.update(username, self.expiry_index, expiry)
+
+    def subscribe(self, callback):
+        """Panggil callback() setiap kali API menulis perubahan ke file (dipakai status cache)"""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Account store listener error: {e}")
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Kumpulkan semua perubahan dan tulis ke file sekali di akhir blok"""
+        with self._writing():
+            self._batch_depth += 1
+            try:
+                yield self
+            except Exception:
+                if self._batch_depth == 1:
+                    # Batch dibatalkan: buang perubahan, paksa reload dari file di akses berikutnya
+                    self._batch_appends = []
+                    self._batch_compact = False
+                    self._signature = ()
+                raise
+            finally:
+                self._batch_depth -= 1
+            if not self._batch_depth:
+                self._flush_batch()
+
+    def _flush_batch(self):
+        appends, self._batch_appends = self._batch_appends, []
+        compact, self._batch_compact = self._batch_compact, False
+        if compact:
+            self._compact()
+        elif appends:
+            self._append("".join(appends))
+        if compact or appends:
+            self._notify()
+
+    def _write_append(self, line):
+        if self._batch_depth:
+            self._batch_appends.append(line)
+        else:
+            self._append(line)
+            self._notify()
+
+    def _write_compact(self):
+        if self._batch_depth:
+            self._batch_compact = True
+        else:
+            self._compact()
+            self._notify()
+
+    @traced("db_write")
+    def _append(self, line):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = line.encode()
+        previous = self._signature
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # Satu write() dengan O_APPEND supaya baris tidak terpotong writer lain
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+        signature = self._file_signature()
+        expected_size = (previous[2] if previous else 0) + len(data)
+        if signature and previous and signature[0] == previous[0] and signature[2] == expected_size:
+            self._signature = signature
+        elif signature and previous is None and signature[2] == len(data):
+            self._signature = signature
+        else:
+            # Ada writer lain di antara load dan append, reload saat akses berikutnya
+            self._signature = None
+
+    @traced("db_write")
+    def _compact(self):
+        """Tulis ulang file dari memory lewat temp file + fsync + rename"""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.writelines(self._extra_lines)
+                for record in self._records.values():
+                    f.write(RECORD_PREFIX + " ".join(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, tmp_path)
+            else:
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Rename baru tahan crash setelah entry direktori ikut di-fsync
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+        self._signature = self._file_signature()
+
+
+def encode_cursor(record, sort, expiry_index):
+    """Cursor pagination dari record terakhir di halaman"""
+    if sort == "expiry":
+        expiry = record[expiry_index] if len(record) > expiry_index else ""
+        # Tanggal tidak pernah berisi "/", jadi aman dipisah lagi di decode_cursor
+        return f"{expiry}/{record[0]}"
+    return record[0]
+
+
+def decode_cursor(cursor, sort):
+    """Kebalikan encode_cursor: username, atau [expiry, username] untuk sort expiry"""
+    if sort == "expiry":
+        if "/" not in cursor:
+            raise ValueError("Cursor tidak valid")
+        return cursor.split("/", 1)
+    return cursor
+
+
+def count_accounts(store, now=None):
+    """Total/active/expired dari index expiry store (tanpa list semua akun)"""
+    tomorrow = ((now or datetime.now()) + timedelta(days=1)).strftime("%Y-%m-%d")
+    total = store.count()
+    # Sama dengan _get_account_status: aktif selama sekarang < tanggal expiry (00:00)
+    expired = store.count_expiring_before(tomorrow)
+    return {"total": total, "active": total - expired, "expired": expired}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def protocol_from_path(path):
+    """Nama protocol dari path database, contoh /etc/vmess/.vmess.db -> vmess"""
+    return os.path.basename(path).lstrip(".").split(".")[0]
+
+
+def get_account_store(path, expiry_index=1):
+    """Store bersama per file database, engine dipilih dari database.engine di api_config.json"""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            settings = get_section("database")
+            if settings.get("engine", "flatfile") == "sqlite":
+                from services.sqlite_store import SQLiteAccountStore
+                store = SQLiteAccountStore(
+                    settings.get("sqlite_path", DEFAULT_SQLITE_PATH),
+                    protocol_from_path(path),
+                    path,
+                    expiry_index,
+                )
+            else:
+                store = FlatFileAccountStore(path, expiry_index)
+            _stores[path] = store
+        return store
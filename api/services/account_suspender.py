@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Account Suspender untuk AlrelShop API Panel
+Menonaktifkan client Xray sementara tanpa menghapus akunnya (dipakai quota
+enforcer dan IP limiter).
+
+- Semua user dalam satu panggilan diubah dalam satu transaksi config Xray:
+  id/password client diganti nilai acak. Config JSON biasa diedit lewat JSON,
+  config dengan marker `###` diedit per baris (baris marker tidak disentuh,
+  jadi script kyt yang menghapus berdasarkan marker tetap jalan)
+- Nilai asli + alasan (quota, ip_limit, ...) disimpan di state_path; user yang
+  sudah nonaktif karena alasan lain tidak diubah dua kali
+- Runtime Xray diubah lewat AlterInbound: suspend = hot-remove, resume =
+  hot-add client dengan id/password asli dari config. Restart hanya jika API
+  tidak tersedia atau inbound tidak punya tag
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+import logging
+
+from services.file_lock import InterProcessLock, lock_path_for
+from services.restart_scheduler import get_restart_scheduler
+from services.settings import get_section
+from services.xray_api import XrayAPIError, XrayHandlerClient
+from services.xray_config import get_xray_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = "/etc/API-Panel/data/suspended-users.json"
+DEFAULT_REASON = "quota"
+
+SECRET_FIELDS = ("id", "password")
+EMAIL_FIELD = re.compile(r'"email"\s*:\s*"([^"]+)"')
+SECRET_FIELD = re.compile(r'"(id|password)"(\s*:\s*)"([^"]*)"')
+
+
+class AccountSuspender:
+    """Suspend/resume client Xray dengan mengganti id/password, state di file JSON"""
+
+    def __init__(self, config_path="/etc/xray/config.json", client=None, state_path=DEFAULT_STATE_PATH):
+        self.xray_config = get_xray_config(config_path)
+        self.client = client or XrayHandlerClient()
+        self.state_path = state_path
+        self._state_lock = InterProcessLock(lock_path_for(state_path))
+        self._lock = threading.Lock()
+        self._metrics = {"suspended": 0, "resumed": 0, "hot_removed": 0, "hot_added": 0, "restart_fallbacks": 0}
+
+    # --- State ---
+
+    def _read_state(self):
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"users": {}}
+
+    def _write_state(self, state):
+        directory = os.path.dirname(self.state_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".suspended-", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def suspended(self, reason=None):
+        """{email: info} user yang sedang nonaktif (opsional hanya alasan tertentu)"""
+        with self._state_lock:
+            users = self._read_state().get("users", {})
+        if reason is None:
+            return users
+        return {email: info for email, info in users.items() if info.get("reason", DEFAULT_REASON) == reason}
+
+    # --- Edit config ---
+
+    def _rewrite_secrets(self, tx, targets, replace):
+        """Ganti id/password client milik email di targets; replace(email, field, value) -> nilai baru atau None"""
+        changed = {}
+        if tx.has_markers:
+            lines = tx.get_lines()
+            for i, line in enumerate(lines):
+                if line.lstrip().startswith("#"):
+                    continue
+                match = EMAIL_FIELD.search(line)
+                if not match or match.group(1) not in targets:
+                    continue
+                email = match.group(1)
+
+                def swap(m, email=email):
+                    new = replace(email, m.group(1), m.group(3))
+                    if new is None:
+                        return m.group(0)
+                    changed.setdefault(email, []).append([m.group(1), m.group(3), new])
+                    return f'"{m.group(1)}"{m.group(2)}"{new}"'
+
+                lines[i] = SECRET_FIELD.sub(swap, line)
+            if changed:
+                tx.set_lines(lines)
+            return changed
+
+        config = tx.config
+        if config is None:
+            return changed
+        for inbound in config.get("inbounds", []):
+            settings = inbound.get("settings")
+            clients = settings.get("clients") if isinstance(settings, dict) else None
+            for client in clients or []:
+                email = client.get("email") if isinstance(client, dict) else None
+                if email not in targets:
+                    continue
+                for field in SECRET_FIELDS:
+                    if field in client:
+                        new = replace(email, field, client[field])
+                        if new is not None:
+                            changed.setdefault(email, []).append([field, client[field], new])
+                            client[field] = new
+        return changed
+
+    # --- Suspend / resume ---
+
+    def suspend(self, users, reason):
+        """Nonaktifkan {email: info tambahan} dalam satu transaksi config; return {email: secrets} yang berubah"""
+        if not users:
+            return {}
+        tags = {email: self.xray_config.inbound_tags(email) for email in users}
+        with self._state_lock:
+            state = self._read_state()
+            entries = state.setdefault("users", {})
+            targets = {email for email in users if email not in entries}
+            if not targets:
+                return {}
+            with self.xray_config.transaction() as tx:
+                changed = self._rewrite_secrets(tx, targets, lambda email, field, value: str(uuid.uuid4()))
+            now = time.time()
+            for email, secrets in changed.items():
+                entries[email] = dict(
+                    users[email] or {},
+                    reason=reason,
+                    secrets=secrets,
+                    tags=[tag for tag in tags.get(email, []) if tag is not None],
+                    disabled_at=now,
+                )
+            if changed:
+                self._write_state(state)
+        for email in targets - set(changed):
+            logger.warning(f"Suspend ({reason}): client {email} tidak ditemukan di config Xray")
+
+        if changed:
+            self._apply_runtime({email: tags.get(email, []) for email in changed}, reason)
+            with self._lock:
+                self._metrics["suspended"] += len(changed)
+            logger.info(f"Suspend ({reason}): {len(changed)} user dinonaktifkan: {', '.join(sorted(changed))}")
+        return changed
+
+    def _apply_runtime(self, tags, reason):
+        """Hot-remove user dari Xray yang sedang berjalan; restart sekali jika API gagal"""
+        try:
+            if not self.client.available():
+                raise XrayAPIError("Xray API tidak tersedia")
+            untagged = False
+            for email, inbound_tags in tags.items():
+                for tag in inbound_tags:
+                    if tag is None:
+                        untagged = True
+                        continue
+                    self.client.remove_user(tag, email)
+                    with self._lock:
+                        self._metrics["hot_removed"] += 1
+            if untagged:
+                raise XrayAPIError("inbound tanpa tag (atau config tidak bisa di-parse) tidak bisa diubah lewat API")
+        except XrayAPIError as e:
+            logger.warning(f"Suspend ({reason}): hot-remove gagal, fallback restart: {e}")
+            with self._lock:
+                self._metrics["restart_fallbacks"] += 1
+            get_restart_scheduler().request_restart(reason=reason, wait=False)
+
+    def resume(self, emails, reason=None):
+        """Aktifkan lagi user (opsional hanya yang nonaktif karena alasan tsb); return list email"""
+        emails = set(emails)
+        with self._state_lock:
+            state = self._read_state()
+            entries = state.setdefault("users", {})
+            targets = {
+                email for email in emails
+                if email in entries and (reason is None or entries[email].get("reason", DEFAULT_REASON) == reason)
+            }
+            if not targets:
+                return []
+            originals = {
+                email: {(field, new): original for field, original, new in entries[email]["secrets"]}
+                for email in targets
+            }
+            with self.xray_config.transaction() as tx:
+                self._rewrite_secrets(tx, targets, lambda email, field, value: originals[email].get((field, value)))
+            for email in targets:
+                del entries[email]
+            self._write_state(state)
+
+        # Client dengan id/password asli dimuat lagi ke runtime
+        self._restore_runtime(targets, f"{reason}-resume" if reason else "resume")
+        with self._lock:
+            self._metrics["resumed"] += len(targets)
+        logger.info(f"Resume ({reason or 'manual'}): {len(targets)} user diaktifkan lagi: {', '.join(sorted(targets))}")
+        return sorted(targets)
+
+    def _restore_runtime(self, emails, reason):
+        """Hot-add lagi client asli (dibaca dari config yang sudah di-commit); restart sekali jika API gagal"""
+        try:
+            if not self.client.available():
+                raise XrayAPIError("Xray API tidak tersedia")
+            for email in sorted(emails):
+                clients = self.xray_config.clients(email)
+                if clients is None:
+                    raise XrayAPIError("config Xray tidak bisa di-parse")
+                for tag, protocol, client in clients:
+                    if tag is None:
+                        raise XrayAPIError(f"inbound {protocol} tanpa tag tidak bisa diubah lewat API")
+                    try:
+                        # Suspend lewat restart: runtime masih memuat client dengan credential acak
+                        self.client.remove_user(tag, email)
+                    except XrayAPIError:
+                        pass
+                    self.client.add_user(
+                        tag, protocol, email, client.get("id", client.get("password")),
+                        level=client.get("level", 0), cipher=client.get("method"), flow=client.get("flow", ""),
+                    )
+                    with self._lock:
+                        self._metrics["hot_added"] += 1
+        except XrayAPIError as e:
+            logger.warning(f"Resume ({reason}): hot-add gagal, fallback restart: {e}")
+            with self._lock:
+                self._metrics["restart_fallbacks"] += 1
+            get_restart_scheduler().request_restart(reason=reason, wait=False)
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+        m["state_path"] = self.state_path
+        return m
+
+
+_suspender = None
+_suspender_lock = threading.Lock()
+
+
+def get_account_suspender():
+    """Suspender bersama untuk quota enforcer dan IP limiter"""
+    global _suspender
+    with _suspender_lock:
+        if _suspender is None:
+            _suspender = AccountSuspender(
+                config_path=get_section("paths").get("config", "/etc/xray/config.json"),
+                state_path=get_section("account_suspender").get("state_path", DEFAULT_STATE_PATH),
+            )
+        return _suspender
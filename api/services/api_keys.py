@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+API Key Store untuk AlrelShop API Panel
+Banyak API key (mis. satu per reseller) dengan scope, expiry dan revoke live.
+
+- File key (security.api_keys.path) hanya menyimpan salt + sha256(salt + secret),
+  tidak pernah key plaintext. Key ditampilkan sekali saat dibuat
+- Format key: ak_<key_id>_<secret>. key_id dipakai sebagai index, secret
+  dicocokkan dengan hmac.compare_digest (constant-time)
+- Scope per key: protocols (["*"] atau daftar service) dan actions
+  (read, create, renew, delete, trial, admin; admin = semua)
+- File dimuat lewat config registry: key baru/revoke terpakai di semua worker
+  tanpa restart
+- Hasil verifikasi di-cache per proses di dalam index; file berubah = index baru,
+  jadi key yang di-revoke tidak pernah lolos dari cache lama
+- security.authentication.api_key lama tetap diterima sebagai key admin ("legacy")
+
+Secret adalah 32 byte acak, jadi satu putaran sha256 sudah cukup (tanpa PBKDF2)
+dan verifikasi tetap di bawah puluhan mikrodetik.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+import logging
+from datetime import datetime
+
+from services.config_registry import get_config_registry
+from services.file_lock import InterProcessLock, lock_path_for
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "/etc/API-Panel/data/api-keys.json"
+TOKEN_PREFIX = "ak_"
+ACTIONS = ("read", "create", "renew", "delete", "trial", "admin")
+CACHE_LIMIT = 4096
+
+# Segmen kedua path /api/<service>/<segmen> -> action
+PATH_ACTIONS = {
+    "create": "create",
+    "trial": "trial",
+    "renew": "renew",
+    "delete": "delete",
+    "list": "read",
+    "config": "read",
+    "usage": "read",
+    "info": "read",
+}
+
+
+def hash_secret(salt, secret):
+    return hashlib.sha256(salt + secret.encode()).digest()
+
+
+def request_scope(path, method):
+    """(protocol, action) yang dibutuhkan request; "*" = tidak terikat protocol"""
+    parts = path.strip("/").split("/")
+    if parts == ["metrics"]:
+        return "*", "read"
+    if len(parts) < 2 or parts[0] != "api":
+        return "*", "admin"
+    section = parts[1]
+    if section == "admin":
+        return "*", "admin"
+    if section in ("system", "status"):
+        return "*", "read" if method in ("GET", "HEAD") else "admin"
+    segment = parts[2] if len(parts) > 2 else ""
+    if segment.startswith("batch-"):
+        segment = segment[len("batch-"):]
+    action = PATH_ACTIONS.get(segment)
+    if action is None:
+        action = "read" if method in ("GET", "HEAD") else "admin"
+    return section, action
+
+
+class APIKeyIdentity:
+    """Key yang lolos verifikasi"""
+
+    __slots__ = ("id", "name", "protocols", "actions", "expires_at")
+
+    def __init__(self, key_id, name, protocols, actions, expires_at=None):
+        self.id = key_id
+        self.name = name
+        self.protocols = protocols
+        self.actions = actions
+        self.expires_at = expires_at
+
+    def allows(self, protocol, action):
+        if "admin" in self.actions:
+            return True
+        if action not in self.actions:
+            return False
+        return "*" in self.protocols or protocol in self.protocols
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "protocols": sorted(self.protocols), "actions": sorted(self.actions)}
+
+
+LEGACY_IDENTITY = APIKeyIdentity("legacy", "legacy", frozenset(["*"]), frozenset(["admin"]))
+
+
+class APIKeyIndex:
+    """Snapshot isi file key (immutable) + cache verifikasi milik snapshot ini"""
+
+    def __init__(self, data=None):
+        self.keys = {}
+        for record in (data or {}).get("keys", []):
+            try:
+                if record.get("revoked"):
+                    continue
+                expires_at = record.get("expires_at")
+                self.keys[record["id"]] = (
+                    bytes.fromhex(record["salt"]),
+                    bytes.fromhex(record["hash"]),
+                    APIKeyIdentity(
+                        record["id"],
+                        record.get("name", record["id"]),
+                        frozenset(record.get("protocols") or ["*"]),
+                        frozenset(record.get("actions") or ["read"]),
+                        datetime.fromisoformat(expires_at).timestamp() if expires_at else None,
+                    ),
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Record API key tidak valid dilewati: {e}")
+        self._cache = {}
+
+    def verify(self, token, legacy_key=None, now=None):
+        """APIKeyIdentity jika token valid dan belum expired, selain itu None"""
+        identity = self._cache.get(token)
+        if identity is None:
+            identity = self._verify(token)
+            if identity is not None:
+                if len(self._cache) >= CACHE_LIMIT:
+                    self._cache.clear()
+                self._cache[token] = identity
+        if identity is not None:
+            if identity.expires_at is not None and (now or time.time()) >= identity.expires_at:
+                return None
+            return identity
+        # Key lama dari api_config.json (bisa di-rotate kapan saja, jadi tidak di-cache)
+        if legacy_key and hmac.compare_digest(token.encode(), legacy_key.encode()):
+            return LEGACY_IDENTITY
+        return None
+
+    def _verify(self, token):
+        if not token.startswith(TOKEN_PREFIX):
+            return None
+        key_id, _, secret = token[len(TOKEN_PREFIX):].partition("_")
+        entry = self.keys.get(key_id)
+        if entry is None or not secret:
+            return None
+        salt, digest, identity = entry
+        if not hmac.compare_digest(hash_secret(salt, secret), digest):
+            return None
+        return identity
+
+
+def parse_api_keys(text):
+    return APIKeyIndex(json.loads(text))
+
+
+class APIKeyStore:
+    """Kelola file key: buat, list, revoke. Verifikasi lewat index() dari registry"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = InterProcessLock(lock_path_for(path))
+        self._registry = get_config_registry()
+        self._registry.register("api_keys", [path], parse_api_keys, default=APIKeyIndex())
+
+    def index(self):
+        return self._registry.get("api_keys")
+
+    def verify(self, token, legacy_key=None):
+        return self.index().verify(token, legacy_key)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"keys": []}
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".api-keys-", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        # Worker ini langsung memakai isi baru, worker lain saat cek mtime berikutnya
+        self._registry.reload("api_keys")
+
+    def _public(self, record):
+        return {field: record.get(field) for field in
+                ("id", "name", "protocols", "actions", "created_at", "expires_at", "revoked", "revoked_at")}
+
+    def create(self, name, actions=None, protocols=None, expires_at=None):
+        """Buat key baru -> (info key, token plaintext); token hanya dikembalikan di sini"""
+        actions = list(actions or ["read"])
+        protocols = list(protocols or ["*"])
+        invalid = [action for action in actions if action not in ACTIONS]
+        if invalid:
+            raise ValueError(f"Action tidak dikenal: {', '.join(invalid)} (pilihan: {', '.join(ACTIONS)})")
+        if not name:
+            raise ValueError("Nama key harus diisi")
+
+        key_id = secrets.token_hex(4)
+        secret = secrets.token_urlsafe(32)
+        salt = secrets.token_bytes(16)
+        record = {
+            "id": key_id,
+            "name": name,
+            "salt": salt.hex(),
+            "hash": hash_secret(salt, secret).hex(),
+            "protocols": protocols,
+            "actions": actions,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "expires_at": expires_at.isoformat(timespec="seconds") if expires_at else None,
+            "revoked": False,
+        }
+        with self._lock:
+            data = self._read()
+            data.setdefault("keys", []).append(record)
+            self._write(data)
+        logger.info(f"API key {key_id} ({name}) dibuat: actions={actions} protocols={protocols}")
+        return self._public(record), f"{TOKEN_PREFIX}{key_id}_{secret}"
+
+    def revoke(self, key_id):
+        """Revoke key; False jika key tidak ada"""
+        with self._lock:
+            data = self._read()
+            for record in data.get("keys", []):
+                if record.get("id") == key_id:
+                    if not record.get("revoked"):
+                        record["revoked"] = True
+                        record["revoked_at"] = datetime.now().isoformat(timespec="seconds")
+                        self._write(data)
+                        logger.info(f"API key {key_id} di-revoke")
+                    return True
+        return False
+
+    def list(self):
+        return [self._public(record) for record in self._read().get("keys", [])]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_api_key_store():
+    """Key store bersama untuk proses ini"""
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is None:
+            settings = get_section("security", "api_keys")
+            _store = APIKeyStore(settings.get("path", DEFAULT_PATH))
+        return _store
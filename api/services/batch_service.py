@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Batch Service untuk AlrelShop API Panel
+Menjalankan create/delete/renew banyak akun sekaligus untuk satu service:
+- Semua perubahan config Xray masuk satu transaksi (satu kali tulis config.json)
+- Semua perubahan database akun di-flush sekali
+- Hot-add/remove Xray API dijalankan setelah commit, restart Xray maksimal sekali
+
+Hasil dikembalikan per item, item yang gagal tidak membatalkan item lain.
+"""
+
+import contextlib
+import threading
+import time
+import logging
+
+from services.restart_scheduler import XrayRestartError, check_restart, get_restart_scheduler
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ITEMS = 500
+
+ACTIONS = {
+    "create": "create_account",
+    "delete": "delete_account",
+    "renew": "renew_account",
+}
+
+_local = threading.local()
+
+
+def current_batch():
+    """ReloadBatch yang aktif di thread ini, atau None jika bukan request batch"""
+    return getattr(_local, "batch", None)
+
+
+class ReloadBatch:
+    """Menampung hot-add/remove dan permintaan restart Xray selama batch berjalan"""
+
+    def __init__(self, reason):
+        self.reason = reason
+        self.deferred = []
+        self.restart_needed = False
+
+    def defer(self, func):
+        """Jalankan func setelah config di-commit; func return False jika butuh restart"""
+        self.deferred.append(func)
+
+    def request_restart(self):
+        self.restart_needed = True
+
+    def finish(self):
+        """Jalankan hot-reload yang ditunda lalu restart sekali jika perlu"""
+        hot_applied = 0
+        for func in self.deferred:
+            try:
+                if func():
+                    hot_applied += 1
+                else:
+                    self.restart_needed = True
+            except Exception as e:
+                logger.warning(f"Deferred Xray hot-reload gagal: {e}")
+                self.restart_needed = True
+
+        restart = None
+        error = None
+        if self.restart_needed:
+            restart = get_restart_scheduler().request_restart(reason=self.reason)
+            try:
+                check_restart(restart)
+            except XrayRestartError as e:
+                error = str(e)
+                logger.error(f"{self.reason}: {e}")
+        return {
+            "hot_applied": hot_applied,
+            "restarted": self.restart_needed,
+            "restart": restart,
+            "error": error,
+        }
+
+
+class BatchService:
+    """Batch create/delete/renew di atas method single-item service yang sudah ada"""
+
+    def __init__(self, services):
+        self.services = services
+
+    def run(self, service_name, action, items, reload_batch=None):
+        """Jalankan action untuk semua item; reload_batch dari luar = restart diurus pemanggil"""
+        service = self.services.get(service_name)
+        if service is None:
+            return {"status": "error", "message": f"Service {service_name} tidak mendukung batch"}
+        if action not in ACTIONS:
+            return {"status": "error", "message": f"Action batch-{action} tidak dikenal"}
+        if not hasattr(service, ACTIONS[action]):
+            return {"status": "error", "message": f"Service {service_name} tidak mendukung batch-{action}"}
+        if not isinstance(items, list) or not items:
+            return {"status": "error", "message": "items harus berupa array yang tidak kosong"}
+
+        max_items = get_section("batch").get("max_items", DEFAULT_MAX_ITEMS)
+        if len(items) > max_items:
+            return {"status": "error", "message": f"Maksimal {max_items} item per batch"}
+
+        started = time.monotonic()
+        method = getattr(service, ACTIONS[action])
+        results = []
+        outer_reload = reload_batch is not None
+        if not outer_reload:
+            reload_batch = ReloadBatch(f"batch-{action}-{service_name}")
+        commit_error = None
+
+        previous = current_batch()
+        _local.batch = reload_batch
+        try:
+            with self._transaction(service):
+                seen = set()
+                for index, item in enumerate(items):
+                    results.append(self._run_item(method, index, item, seen))
+        except Exception as e:
+            commit_error = str(e)
+            logger.error(f"Error committing batch-{action} {service_name}: {e}")
+        finally:
+            _local.batch = previous
+
+        if commit_error:
+            # Perubahan tidak tersimpan utuh, item yang tadinya sukses ikut dilaporkan gagal
+            for result in results:
+                if result["status"] == "success":
+                    result["status"] = "error"
+                    result["message"] = f"Commit batch gagal: {commit_error}"
+        reload_info = None if outer_reload else reload_batch.finish()
+        if reload_info and reload_info["error"]:
+            # Config tersimpan tapi Xray tidak dimuat ulang: laporkan gagal seperti restart check=True dulu
+            for result in results:
+                if result["status"] == "success":
+                    result["status"] = "error"
+                    result["message"] = reload_info["error"]
+
+        succeeded = sum(1 for result in results if result["status"] == "success")
+        failed = len(results) - succeeded
+        if failed == 0:
+            status = "success"
+        elif succeeded == 0:
+            status = "error"
+        else:
+            status = "partial"
+
+        logger.info(f"batch-{action} {service_name}: {succeeded} sukses, {failed} gagal")
+        return {
+            "status": status,
+            "message": f"{succeeded} dari {len(results)} item berhasil",
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": failed,
+            "results": results,
+            "xray_reload": reload_info,
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        }
+
+    def run_many(self, action, groups, reason):
+        """Action yang sama untuk beberapa service: satu commit config Xray dan maksimal satu restart
+
+        groups: {service_name: [items]}
+        """
+        started = time.monotonic()
+        reload_batch = ReloadBatch(reason)
+        results = {}
+        commit_error = None
+        try:
+            with contextlib.ExitStack() as stack:
+                # Config Xray bersama dibuka sekali di luar, transaksi per service ikut (nested)
+                managers = {}
+                for name in groups:
+                    xray_config = getattr(self.services.get(name), "xray_config", None)
+                    if xray_config is not None:
+                        managers[id(xray_config)] = xray_config
+                for xray_config in managers.values():
+                    stack.enter_context(xray_config.transaction())
+                for name, items in groups.items():
+                    results[name] = self.run(name, action, items, reload_batch=reload_batch)
+        except Exception as e:
+            commit_error = str(e)
+            logger.error(f"Error committing {reason}: {e}")
+
+        if commit_error:
+            for result in results.values():
+                for item in result.get("results", []):
+                    if item["status"] == "success":
+                        item["status"] = "error"
+                        item["message"] = f"Commit batch gagal: {commit_error}"
+        # Gagal restart hanya dilaporkan di xray_reload: item sudah terhapus dari config, retry tidak menolong
+        return {
+            "results": results,
+            "xray_reload": reload_batch.finish(),
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        }
+
+    def _transaction(self, service):
+        """Gabungkan transaksi config Xray dan batch database milik service"""
+        stack = contextlib.ExitStack()
+        store = getattr(service, "store", None)
+        if store is not None:
+            stack.enter_context(store.batch())
+        provisioner = getattr(service, "provisioner", None)
+        if provisioner is not None:
+            # User sistem SSH: satu chpasswd untuk semua item
+            stack.enter_context(provisioner.batch())
+        xray_config = getattr(service, "xray_config", None)
+        if xray_config is not None:
+            # Dimasuki terakhir supaya config di-commit sebelum database di-flush
+            stack.enter_context(xray_config.transaction())
+        return stack
+
+    def _run_item(self, method, index, item, seen):
+        if isinstance(item, str):
+            item = {"username": item}
+        if not isinstance(item, dict):
+            return {"index": index, "username": None, "status": "error", "message": "Item harus berupa object"}
+
+        username = item.get("username")
+        if username and username in seen:
+            return {"index": index, "username": username, "status": "error", "message": "Username duplikat di dalam batch"}
+        if username:
+            seen.add(username)
+
+        try:
+            result = method(item)
+        except Exception as e:
+            logger.error(f"Error batch item {username}: {e}")
+            result = {"status": "error", "message": str(e)}
+
+        entry = {"index": index, "username": username, "status": result.get("status", "error"), "message": result.get("message")}
+        if result.get("data") is not None:
+            entry["data"] = result["data"]
+        return entry
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Client Templates untuk AlrelShop API Panel
+Template teks config client (`<proto>-<user>.txt`) dan notifikasi Telegram per
+protocol, dipakai lewat services.share_links (di-compile sekali).
+
+Field server ({domain}, {isp}, {city}, {ns}, {pub}) diisi saat load; field akun
+({username}, {uuid}, {password}, {quota_gb}, {ip_limit}, {bug}, {cipher},
+{duration_text}, {expiry_text}) dan link ({ws_tls}, {ws_nontls}, {grpc}) diisi
+per render.
+"""
+
+VMESS_CONFIG = """---------------------------------------------------
+# Format Vmess WS TLS
+---------------------------------------------------
+proxies:
+  - name: Vmess-{username}-WS TLS
+    server: {domain}
+    port: 443
+    type: vmess
+    uuid: {uuid}
+    alterId: 0
+    cipher: auto
+    tls: true
+    skip-cert-verify: true
+    servername: {bug}
+    network: ws
+    ws-opts:
+      path: /vmess
+      headers:
+        Host: {domain}
+    udp: true
+    
+---------------------------------------------------
+# Format Vmess WS Non TLS
+---------------------------------------------------
+proxies:
+  - name: Vmess-{username}-WS Non TLS
+    server: {bug}
+    port: 80
+    type: vmess
+    uuid: {uuid}
+    alterId: 0
+    cipher: auto
+    tls: false
+    skip-cert-verify: true
+    servername: {domain}
+    network: ws
+    ws-opts:
+      path: /vmess
+      headers:
+        Host: {domain}
+    udp: true
+    
+---------------------------------------------------
+# Format Vmess gRPC
+---------------------------------------------------
+proxies:
+  - name: Vmess-{username}-gRPC (SNI)
+    server: {domain}
+    port: 443
+    type: vmess
+    uuid: {uuid}
+    alterId: 0
+    cipher: auto
+    tls: true
+    skip-cert-verify: true
+    servername: {domain}
+    network: grpc
+    grpc-opts:
+      grpc-service-name: vmess-grpc
+    udp: true
+
+◇━━━━━━━━━━━━━━━━━◇
+   Vmess Account 
+◇━━━━━━━━━━━━━━━━━◇
+Remarks          : {username}
+Domain           : {domain}
+User Quota       : {quota_gb} GB
+User Ip          : {ip_limit} IP
+Port TLS         : 400-900
+Port none TLS    : 80, 8080, 8081-9999
+id               : {uuid}
+Xray Dns         : {ns}
+Pubkey           : {pub}
+alterId          : 0
+Security         : auto
+Network          : ws
+Path             : /vmess
+Dynamic          : https://{bug}/vmess
+ServiceName      : vmess-grpc
+Location         : {city}
+---------------------------------------------------
+ Link Akun Vmess                   
+---------------------------------------------------
+Link TLS         : 
+{ws_tls}
+---------------------------------------------------
+Link none TLS    : 
+{ws_nontls}
+---------------------------------------------------
+Link GRPC        : 
+{grpc}
+---------------------------------------------------
+Aktif Selama     : {duration_text}
+Berakhir Pada    : {expiry_text}
+---------------------------------------------------"""
+
+VMESS_TELEGRAM = """<code>---------------------------------------------------</code>
+<code>      XRAY/VMESS</code>
+<code>---------------------------------------------------</code>
+<code>Remarks : {username}
+Iplimit : {ip_limit}
+Domain : {domain}
+Host XrayDNS: {ns}
+Pub Key: {pub}
+Limit Quota : {quota_gb} GB
+Port TLS   : 400-900
+Port NTLS : 80, 8080, 8081-9999
+id  : {uuid}
+alterId : 0
+Security : auto
+network : ws or grpc
+Path : /vmess
+Dynamic : https://{bug}/vmess
+Name  : vmess-grpc</code>
+<code>---------------------------------------------------</code>
+<code> VMESS WS TLS</code>
+<code>---------------------------------------------------</code>
+<code>{ws_tls}</code>
+<code>---------------------------------------------------</code>
+<code>VMESS WS NO TLS</code>
+<code>---------------------------------------------------</code>
+<code>{ws_nontls}</code>
+<code>---------------------------------------------------</code>
+<code> VMESS gRPC</code>
+<code>---------------------------------------------------</code>
+<code>{grpc}</code>
+<code>---------------------------------------------------</code>
+Format OpenClash : https://{domain}:81/vmess-{username}.txt
+<code>---------------------------------------------------</code>
+Aktif Selama   : {duration_text}
+<code>---------------------------------------------------</code>"""
+
+VLESS_CONFIG = """---------------------------------------------------
+# Format Vless WS TLS
+---------------------------------------------------
+proxies:
+  - name: Vless-{username}-WS TLS
+    server: {domain}
+    port: 443
+    type: vless
+    uuid: {uuid}
+    alterId: 0
+    cipher: auto
+    tls: true
+    skip-cert-verify: true
+    servername: {domain}
+    network: ws
+    ws-opts:
+      path: /vless
+      headers:
+        Host: {domain}
+    udp: true
+    
+---------------------------------------------------
+# Format Vless gRPC (SNI)
+---------------------------------------------------
+- name: Vless-{username}-gRPC (SNI)
+  server: {domain}
+  port: 443
+  type: vless
+  uuid: {uuid}
+  cipher: auto
+  tls: true
+  skip-cert-verify: true
+  servername: {domain}
+  network: grpc
+  grpc-opts:
+  grpc-mode: gun
+    grpc-service-name: vless-grpc
+
+◇━━━━━━━━━━━━━━━━━◇
+   Vless Account    
+◇━━━━━━━━━━━━━━━━━◇
+Remarks          : {username} 
+Domain           : {domain}
+User Quota       : {quota_gb} GB
+User Ip          : {ip_limit} IP
+port TLS         : 400-900
+Port DNS         : 443
+Port NTLS        : 80, 8080, 8081-9999
+User ID          : {uuid}
+Xray Dns.        : {ns}
+Pubkey.          : {pub}
+Encryption       : none
+Path TLS         : /vless 
+ServiceName      : vless-grpc
+Location         : {city}
+===================
+Link Akun Vless 
+===================
+Link TLS      : 
+{ws_tls}
+===================
+Link GRPC     : 
+{grpc}
+===================
+Aktif Selama     : {duration_text}
+Berakhir Pada    : {expiry_text}
+==================="""
+
+VLESS_TELEGRAM = """<code>---------------------------------------------------</code>
+<code>      XRAY/VLESS</code>
+<code>---------------------------------------------------</code>
+<code>Remarks : {username}
+Iplimit : {ip_limit}
+Domain : {domain}
+Host XrayDNS: {ns}
+Pub Key: {pub}
+Limit Quota : {quota_gb} GB
+Port TLS   : 400-900
+Port NTLS : 80, 8080, 8081-9999
+id  : {uuid}
+alterId : 0
+Security : auto
+network : ws or grpc
+Path : /vless
+Dynamic : https://bug.com/vless
+Name  : vless-grpc</code>
+<code>---------------------------------------------------</code>
+<code> VLESS WS TLS</code>
+<code>---------------------------------------------------</code>
+<code>{ws_tls}</code>
+<code>---------------------------------------------------</code>
+<code>VLESS WS NO TLS</code>
+<code>---------------------------------------------------</code>
+<code>{ws_nontls}</code>
+<code>---------------------------------------------------</code>
+<code> VLESS gRPC</code>
+<code>---------------------------------------------------</code>
+<code>{grpc}</code>
+<code>---------------------------------------------------</code>
+Format OpenClash : https://{domain}:81/vless-{username}.txt
+<code>---------------------------------------------------</code>
+Aktif Selama   : {duration_text}
+<code>---------------------------------------------------</code>"""
+
+TROJAN_CONFIG = """◇━━━━━━━━━━━━━━━━━◇
+   Trojan Account    
+◇━━━━━━━━━━━━━━━━━◇
+Remarks          : {username} 
+Domain           : {domain}
+User Quota       : {quota_gb} GB
+User Ip          : {ip_limit} IP
+Port TLS         : 400-900
+Port DNS         : 443
+Port NTLS        : 80, 8080, 8081-9999
+Password         : {password}
+Xray Dns.        : {ns}
+Pubkey.          : {pub}
+Path TLS         : /trojan-ws 
+ServiceName      : trojan-grpc
+Location         : {city}
+===================
+Link Akun Trojan 
+===================
+Link WS TLS      : 
+{ws_tls}
+===================
+Link GRPC        : 
+{grpc}
+===================
+Aktif Selama     : {duration_text}
+Berakhir Pada    : {expiry_text}
+==================="""
+
+TROJAN_TELEGRAM = """<code>---------------------------------------------------</code>
+<code>      XRAY/TROJAN</code>
+<code>---------------------------------------------------</code>
+<code>Remarks : {username}
+Iplimit : {ip_limit}
+Domain : {domain}
+Host XrayDNS: {ns}
+Pub Key: {pub}
+Limit Quota : {quota_gb} GB
+Port TLS   : 400-900
+Port NTLS : 80, 8080, 8081-9999
+Password : {password}
+network : ws or grpc
+Path : /trojan-ws
+Dynamic : https://bug.com/trojan-ws
+Name  : trojan-grpc</code>
+<code>---------------------------------------------------</code>
+<code> TROJAN WS TLS</code>
+<code>---------------------------------------------------</code>
+<code>{ws_tls}</code>
+<code>---------------------------------------------------</code>
+<code> TROJAN gRPC</code>
+<code>---------------------------------------------------</code>
+<code>{grpc}</code>
+<code>---------------------------------------------------</code>
+Format OpenClash : https://{domain}:81/trojan-{username}.txt
+<code>---------------------------------------------------</code>
+Aktif Selama   : {duration_text}
+<code>---------------------------------------------------</code>"""
+
+SHADOWSOCKS_CONFIG = """◇━━━━━━━━━━━━━━━━━◇
+Shadowsocks Account        
+◇━━━━━━━━━━━━━━━━━◇
+Remarks          : {username}
+Domain           : {domain}
+User Quota       : {quota_gb} GB
+Port TLS         : 400-900
+Password         : {password}
+Cipers           : {cipher}
+Network          : ws/grpc
+Path             : /ss-ws
+ServiceName      : ss-grpc
+Location         : {city}
+◇━━━━━━━━━━━━━━━━━◇
+Link WS TLS : 
+{ws_tls}
+◇━━━━━━━━━━━━━━━━━◇
+Link WS None TLS: 
+{ws_nontls}
+◇━━━━━━━━━━━━━━━━━◇
+Link GRPC: 
+{grpc}
+◇━━━━━━━━━━━━━━━━━◇
+Aktif Selama     : {duration_text}
+Berakhir Pada    : {expiry_text}
+◇━━━━━━━━━━━━━━━━━◇"""
+
+SHADOWSOCKS_TELEGRAM = """<code>---------------------------------------------------</code>
+<code>      XRAY/SHADOWSOCKS</code>
+<code>---------------------------------------------------</code>
+<code>Remarks : {username}
+Domain : {domain}
+Host XrayDNS: {ns}
+Pub Key: {pub}
+Limit Quota : {quota_gb} GB
+Port TLS   : 400-900
+Port NTLS : 80, 8080, 8081-9999
+Password : {password}
+Cipher : {cipher}
+network : ws or grpc
+Path : /ss-ws
+Dynamic : https://bug.com/ss-ws
+Name  : ss-grpc</code>
+<code>---------------------------------------------------</code>
+<code> SHADOWSOCKS WS TLS</code>
+<code>---------------------------------------------------</code>
+<code>{ws_tls}</code>
+<code>---------------------------------------------------</code>
+<code>SHADOWSOCKS WS NO TLS</code>
+<code>---------------------------------------------------</code>
+<code>{ws_nontls}</code>
+<code>---------------------------------------------------</code>
+<code> SHADOWSOCKS gRPC</code>
+<code>---------------------------------------------------</code>
+<code>{grpc}</code>
+<code>---------------------------------------------------</code>
+Format Shadowsocks WS : https://{domain}:81/sodosokws-{username}.txt
+<code>---------------------------------------------------</code>
+Aktif Selama   : {duration_text}
+<code>---------------------------------------------------</code>"""
+
+SSH_CONFIG = """◇━━━━━━━━━━━━━━━━━◇
+Format SSH OVPN Account
+◇━━━━━━━━━━━━━━━━━◇
+Username         : {username}
+Password         : {password}
+◇━━━━━━━━━━━━━━━━━◇
+IP Limit         : {ip_limit}
+Host             : {domain}
+Port OpenSSH     : 443, 80, 22
+Port Dropbear    : 443, 109
+Port SSH UDP     : 1-65535
+Port SSH WS      : 80, 8080, 8081-9999
+Port SSH SSL WS  : 443
+Port SSL/TLS     : 400-900
+Port OVPN WS SSL : 443
+Port OVPN SSL    : 443
+Port OVPN TCP    : 1194
+Port OVPN UDP    : 2200
+BadVPN UDP       : 7100, 7300, 7300
+Location         : {city}
+ISP              : {isp}
+Host Slowdns     : {ns}
+Pub Key          : {pub}
+◇━━━━━━━━━━━━━━━━━◇
+Aktif Selama     : {duration_text}
+Berakhir Pada    : {expiry_text}
+===============================
+Payload WSS: GET wss://bug.com/ HTTP/1.1[crlf]Host: {domain}[crlf]Upgrade: websocket[crlf][crlf] 
+===============================
+OVPN Download : https://{domain}:81/
+==============================="""
+
+SSH_TELEGRAM = """<code>---------------------------------------------------</code>
+<code>SSH OVPN Account</code>
+<code>---------------------------------------------------</code>
+<code>Username : {username}</code>
+<code>Password : {password}</code>
+<code>Limit IP : {ip_limit}</code>
+<code>Host : {domain}</code>
+<code>Port OpenSSH : 443, 80, 22</code>
+<code>Port Dropbear : 443, 109</code>
+<code>Port SSH WS : 80, 8080, 8081-9999</code>
+<code>Port SSH UDP : 1-65535</code>
+<code>Port SSH SSL WS : 443</code>
+<code>Port SSL/TLS : 400-900</code>
+<code>Port OVPN WS SSL : 443</code>
+<code>Port OVPN SSL : 443</code>
+<code>Port OVPN TCP : 443, 1194</code>
+<code>Port OVPN UDP : 2200</code>
+<code>BadVPN UDP : 7100, 7300, 7300</code>
+<code>Host Slowdns : {ns}</code>
+<code>Pub Key : {pub}</code>
+<code>---------------------------------------------------</code>
+<code>Port 80 : {domain}:80@{username}:{password}</code>
+<code>Port 443 : {domain}:443@{username}:{password}</code>
+<code>Udp Custom : {domain}:1-65535@{username}:{password}</code>
+<code>---------------------------------------------------</code>
+<code>Payload WSS :</code>
+<code>GET wss://bug.com/ HTTP/1.1[crlf]Host: {domain}[crlf]Upgrade: websocket[crlf][crlf]</code>
+<code>---------------------------------------------------</code>
+<code>PAYLOAD TLS :</code>
+<code>GET wss://[host]/ HTTP/1.1[crlf]Host: [host][crlf]Connection: Upgrade[crlf]User-Agent: [ua][crlf]Upgrade: websocket[crlf][crlf]</code>
+<code>---------------------------------------------------</code>
+OVPN Download : https://{domain}:81/
+<code>---------------------------------------------------</code>
+<code>Save Link Account :</code>https://{domain}:81/ssh-{username}.txt
+<code>---------------------------------------------------</code>
+Aktif Selama : {duration_text}
+<code>---------------------------------------------------</code>"""
+
+TEMPLATES = {
+    "vmess": {"config": VMESS_CONFIG, "telegram": VMESS_TELEGRAM},
+    "vless": {"config": VLESS_CONFIG, "telegram": VLESS_TELEGRAM},
+    "trojan": {"config": TROJAN_CONFIG, "telegram": TROJAN_TELEGRAM},
+    "shadowsocks": {"config": SHADOWSOCKS_CONFIG, "telegram": SHADOWSOCKS_TELEGRAM},
+    "ssh": {"config": SSH_CONFIG, "telegram": SSH_TELEGRAM},
+}
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Config Registry untuk AlrelShop API Panel
+File config yang dibaca di jalur request (api_config.json, /etc/bot/.bot.db)
+disimpan di memory sebagai object hasil parse, bukan dibaca ulang setiap kali.
+
+- Paling sering sekali per CHECK_INTERVAL detik inode/mtime/size file di-stat;
+  parse ulang hanya jika berubah (mis. API key di-rotate, bot Telegram diganti)
+- Hasil parse baru menggantikan yang lama dalam satu assignment: request yang
+  sedang jalan tetap memakai object lama sampai selesai, request berikutnya
+  memakai yang baru
+- Parse gagal (file setengah ditulis, JSON rusak) = nilai lama tetap dipakai dan
+  file dicoba lagi di cek berikutnya
+- reload() memaksa cek sekarang, dipakai endpoint /api/admin/reload-config dan
+  setelah generate-api-key
+"""
+
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 1.0
+BOT_DB_PATH = "/etc/bot/.bot.db"
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class ConfigSource:
+    """Satu config: kandidat path (yang pertama ada dipakai) + parser text -> object"""
+
+    def __init__(self, name, paths, parser, default=None):
+        self.name = name
+        self.paths = list(paths)
+        self.parser = parser
+        self.default = default
+        self.value = default
+        self.path = None
+        self.signature = None
+        self.checked_at = None
+        self.version = 0
+        self.loads = 0
+        self.errors = 0
+        self.last_error = None
+        self.loaded_at = None
+
+
+class ConfigRegistry:
+    """Cache config dengan revalidasi stat dan swap atomik"""
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._sources = {}
+
+    def register(self, name, paths, parser, default=None):
+        with self._lock:
+            self._sources[name] = ConfigSource(name, paths, parser, default)
+
+    def get(self, name):
+        """Object config terakhir yang valid; jangan diubah (dipakai bersama antar request)"""
+        source = self._sources[name]
+        checked_at = source.checked_at
+        if checked_at is None or time.monotonic() - checked_at >= self.check_interval:
+            with self._lock:
+                self._revalidate(source)
+        return source.value
+
+    def reload(self, name=None):
+        """Cek ulang sekarang (semua source atau satu); return nama source yang berubah"""
+        with self._lock:
+            sources = [self._sources[name]] if name else list(self._sources.values())
+            return [source.name for source in sources if self._revalidate(source, force=True)]
+
+    def _revalidate(self, source, force=False):
+        now = time.monotonic()
+        if not force and source.checked_at is not None and now - source.checked_at < self.check_interval:
+            return False
+        source.checked_at = now
+        signature = tuple(_signature(path) for path in source.paths)
+        if signature == source.signature:
+            return False
+
+        path = next((p for p, sig in zip(source.paths, signature) if sig is not None), None)
+        if path is None:
+            value = source.default
+        else:
+            try:
+                with open(path, "r") as f:
+                    value = source.parser(f.read())
+            except Exception as e:
+                # Signature tidak disimpan supaya file dicoba lagi di cek berikutnya
+                source.errors += 1
+                source.last_error = str(e)
+                logger.error(f"Gagal memuat config {source.name} dari {path}: {e}")
+                return False
+
+        source.signature = signature
+        source.path = path
+        source.loads += 1
+        source.loaded_at = time.time()
+        source.last_error = None
+        if value == source.value and source.version:
+            return False
+        source.value = value
+        source.version += 1
+        if source.version == 1:
+            # Load pertama, bukan perubahan
+            return False
+        logger.info(f"Config {source.name} dimuat ulang dari {path or '(default)'}")
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    "path": source.path,
+                    "version": source.version,
+                    "loads": source.loads,
+                    "errors": source.errors,
+                    "last_error": source.last_error,
+                    "loaded_at": source.loaded_at,
+                }
+                for name, source in self._sources.items()
+            }
+
+
+def parse_bot_db(text):
+    """Baris `#bot# <token> <chat_id>` pertama di /etc/bot/.bot.db -> {key, chat_id}"""
+    for line in text.splitlines():
+        if line.startswith("#bot# "):
+            parts = line.strip().split()
+            if len(parts) >= 3:
+                return {"key": parts[1], "chat_id": parts[2]}
+    return None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_config_registry():
+    """Registry bersama: "api_config" (api_config.json) dan "bot" (.bot.db)"""
+    global _registry
+    if _registry is not None:
+        # Jalur cepat: dipanggil di setiap request (auth, get_section)
+        return _registry
+    with _registry_lock:
+        if _registry is None:
+            # Import di sini: settings sendiri membaca lewat registry
+            from services.settings import CONFIG_PATH, LOCAL_CONFIG_PATH, parse_api_config
+            _registry = ConfigRegistry()
+            _registry.register("api_config", [CONFIG_PATH, LOCAL_CONFIG_PATH], parse_api_config, default={})
+            _registry.register("bot", [BOT_DB_PATH], parse_bot_db)
+        return _registry
+
+
+def get_bot_config():
+    """{key, chat_id} bot Telegram, atau None jika belum dikonfigurasi"""
+    return get_config_registry().get("bot")
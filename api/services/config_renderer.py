@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Config Renderer untuk AlrelShop API Panel
+Config client (`<proto>-<user>.txt`) dibuat saat diminta dari record akun, bukan
+ditulis ke /var/www/html di setiap create.
+
+- Hasil render disimpan di LRU cache; key berisi record akun + parameter render,
+  jadi renew/ubah akun otomatis menghasilkan entry baru
+- Setiap hasil punya ETag (hash isi) untuk If-None-Match / 304
+- Export file statis tetap tersedia (config_render.static_export), ditulis di
+  thread background lewat temp file + rename, tidak di jalur request
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+from services.host_info import get_host_info
+from services.request_timing import span, traced
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+def remaining_text(expiry, now=None):
+    """Sisa masa aktif dari tanggal expiry record, contoh: 29 Hari"""
+    try:
+        days = (datetime.strptime(expiry, "%Y-%m-%d") - (now or datetime.now())).days + 1
+    except (TypeError, ValueError):
+        return "-"
+    return f"{max(days, 0)} Hari"
+
+
+def format_expiry(expiry):
+    """YYYY-MM-DD -> "17 Oct 2026" seperti di file config lama"""
+    try:
+        return datetime.strptime(expiry, "%Y-%m-%d").strftime("%d %b %Y")
+    except (TypeError, ValueError):
+        return expiry or "-"
+
+
+class ConfigRenderer:
+    """LRU cache hasil render + writer background untuk export file statis"""
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, static_export=True):
+        self.cache_size = cache_size
+        self.static_export = static_export
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()
+        self._writing = 0
+        self._worker = None
+        self._stopped = False
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "render_time_total": 0.0,
+            "exported": 0,
+            "export_failures": 0,
+        }
+
+    # --- Render ---
+
+    def render(self, key, render_func):
+        """(text, etag) dari cache, atau render_func() jika belum ada; key harus hashable"""
+        # "Aktif Selama" dihitung dari tanggal hari ini, jadi cache berlaku per hari;
+        # versi host info ikut di key supaya ganti domain/info server tidak memakai render lama
+        key = (key, time.strftime("%Y-%m-%d"), get_host_info().current_version())
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self._metrics["hits"] += 1
+                return entry
+
+        started = time.perf_counter()
+        with span("config_render"):
+            text = render_func()
+        etag = hashlib.sha1(text.encode()).hexdigest()[:20]
+        entry = (text, etag)
+        with self._lock:
+            self._metrics["misses"] += 1
+            self._metrics["render_time_total"] += time.perf_counter() - started
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    # --- Export file statis ---
+
+    @traced("config_export")
+    def export(self, path, render_func):
+        """Jadwalkan tulis file statis; render_func() -> text, atau None jika akun sudah tidak ada"""
+        if not self.static_export:
+            return False
+        with self._cond:
+            self._ensure_worker()
+            # Export berulang untuk path yang sama digabung, cukup tulis versi terakhir
+            self._pending[path] = render_func
+            self._pending.move_to_end(path)
+            self._cond.notify_all()
+        return True
+
+    def flush(self, timeout=None):
+        """Tunggu semua export selesai (dipakai saat shutdown/test)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._writing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._stopped = False
+            self._worker = threading.Thread(target=self._run, name="config-export", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                path, render_func = self._pending.popitem(last=False)
+                self._writing += 1
+            try:
+                self._write(path, render_func)
+            finally:
+                with self._cond:
+                    self._writing -= 1
+                    self._cond.notify_all()
+
+    def _write(self, path, render_func):
+        try:
+            text = render_func()
+            if text is None:
+                return
+            directory = os.path.dirname(path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(text)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            with self._lock:
+                self._metrics["exported"] += 1
+        except Exception as e:
+            logger.error(f"Gagal export config {path}: {e}")
+            with self._lock:
+                self._metrics["export_failures"] += 1
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+            size = len(self._cache)
+        with self._cond:
+            pending = len(self._pending) + self._writing
+        lookups = m["hits"] + m["misses"]
+        return {
+            "cache_size": size,
+            "cache_limit": self.cache_size,
+            "hits": m["hits"],
+            "misses": m["misses"],
+            "hit_rate": round(m["hits"] / lookups, 3) if lookups else 0.0,
+            "avg_render_ms": round(m["render_time_total"] / m["misses"] * 1000, 3) if m["misses"] else 0.0,
+            "static_export": self.static_export,
+            "export_pending": pending,
+            "exported": m["exported"],
+            "export_failures": m["export_failures"],
+        }
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_config_renderer():
+    """Renderer bersama untuk semua service"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            settings = get_section("config_render")
+            _renderer = ConfigRenderer(
+                cache_size=settings.get("cache_size", DEFAULT_CACHE_SIZE),
+                static_export=settings.get("static_export", True),
+            )
+        return _renderer
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Expiry Scheduler untuk AlrelShop API Panel
+Menghapus akun trial tepat saat deadline-nya lewat, menggantikan
+`echo "userdel ..." | at now + N minutes` (yang juga tidak pernah dipakai untuk
+trial VMess/VLess/Shadowsocks/Trojan).
+
+- Deadline disimpan di min-heap di memory dan di journal JSONL di disk
+  (append-only, compaction sesekali), jadi jadwal tetap ada setelah restart
+- Sweep mengambil semua job yang jatuh tempo lalu menghapusnya lewat
+  BatchService.run_many: satu commit config Xray + maksimal satu reload
+- Dengan beberapa worker gunicorn hanya satu proses yang menjalankan sweep
+  (leader lewat flock); worker lain cukup menambah job ke journal
+- Metrics lag: selisih deadline dan waktu akun benar-benar terhapus
+"""
+
+import fcntl
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+import logging
+
+from services.file_lock import InterProcessLock
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "/etc/API-Panel/data/expiry-schedule.jsonl"
+DEFAULT_MAX_BATCH = 200
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_RETRY_DELAY = 60
+DEFAULT_MAX_ATTEMPTS = 3
+COMPACT_MIN_DONE = 500
+
+
+class ExpiryScheduler:
+    """Min-heap deadline (service, username) yang persisten, dieksekusi per sweep"""
+
+    def __init__(self, path=DEFAULT_PATH, max_batch=DEFAULT_MAX_BATCH, poll_interval=DEFAULT_POLL_INTERVAL,
+                 retry_delay=DEFAULT_RETRY_DELAY, max_attempts=DEFAULT_MAX_ATTEMPTS, trial_cleanup=True):
+        self.path = path
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.trial_cleanup = trial_cleanup
+
+        self._cond = threading.Condition()
+        self._journal_lock = InterProcessLock(path + ".lock")
+        self._leader_path = path + ".leader"
+        self._leader_fd = None
+        self._heap = []
+        self._jobs = {}
+        self._offset = 0
+        self._inode = None
+        self._done_since_compact = 0
+        self._executor = None
+        self._listeners = []
+        self._worker = None
+        self._stopped = False
+
+        self._metrics = {
+            "scheduled": 0,
+            "removed": 0,
+            "failed": 0,
+            "sweeps": 0,
+            "lag_total": 0.0,
+            "lag_max": 0.0,
+            "last_lag": None,
+            "last_sweep_at": None,
+            "last_error": None,
+        }
+
+    # --- Public API ---
+
+    def schedule(self, service, username, deadline, source="account", **extra):
+        """Jadwalkan penghapusan akun pada epoch `deadline` (bisa dipanggil dari proses mana pun)"""
+        if source == "trial" and not self.trial_cleanup:
+            return None
+        job = dict(extra, service=service, username=username, deadline=float(deadline), source=source, attempts=0)
+        self._journal_append([{"op": "add", "job": job}])
+        with self._cond:
+            self._metrics["scheduled"] += 1
+            if self._leader_fd is not None:
+                self._push(job)
+                self._cond.notify_all()
+        return job
+
+    def cancel(self, service, username):
+        """Batalkan jadwal (misal akun dihapus manual)"""
+        with self._cond:
+            if self._leader_fd is not None:
+                self._read_journal()
+            known = self._jobs.pop((service, username), None) is not None
+            # Leader tahu semua job; delete dari sweep sendiri tidak perlu ditulis lagi
+            if self._leader_fd is not None and not known:
+                return
+        self._journal_append([{"op": "done", "service": service, "username": username}])
+
+    def start(self, executor):
+        """executor(groups) -> {service: [result item]}; groups = {service: [items]}"""
+        with self._cond:
+            self._executor = executor
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped = False
+                self._worker = threading.Thread(target=self._run, name="expiry-scheduler", daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def subscribe(self, callback):
+        """callback(removed_jobs) dipanggil setelah sweep berhasil menghapus akun"""
+        self._listeners.append(callback)
+
+    def pending(self):
+        with self._cond:
+            return sorted(self._jobs.values(), key=lambda job: job["deadline"])
+
+    def stats(self):
+        with self._cond:
+            m = dict(self._metrics)
+            pending = len(self._jobs)
+            next_deadline = min((job["deadline"] for job in self._jobs.values()), default=None)
+            leader = self._leader_fd is not None
+        removed = m["removed"]
+        return {
+            "leader": leader,
+            "pending": pending,
+            "next_deadline": next_deadline,
+            "scheduled": m["scheduled"],
+            "removed": removed,
+            "failed": m["failed"],
+            "sweeps": m["sweeps"],
+            "avg_lag_ms": round(m["lag_total"] / removed * 1000, 1) if removed else 0.0,
+            "max_lag_ms": round(m["lag_max"] * 1000, 1),
+            "last_lag_ms": round(m["last_lag"] * 1000, 1) if m["last_lag"] is not None else None,
+            "last_sweep_at": m["last_sweep_at"],
+            "last_error": m["last_error"],
+        }
+
+    # --- Heap ---
+
+    def _push(self, job):
+        key = (job["service"], job["username"])
+        self._jobs[key] = job
+        heapq.heappush(self._heap, (job["deadline"], key))
+
+    def _pop_due(self, now):
+        """Ambil job jatuh tempo (maks max_batch); entry heap yang sudah dibatalkan/diganti dilewati"""
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.max_batch:
+            deadline, key = heapq.heappop(self._heap)
+            job = self._jobs.get(key)
+            if job is not None and job["deadline"] == deadline:
+                del self._jobs[key]
+                due.append(job)
+        return due
+
+    def _next_deadline(self):
+        while self._heap:
+            deadline, key = self._heap[0]
+            job = self._jobs.get(key)
+            if job is not None and job["deadline"] == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    # --- Worker ---
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    self._release_leader()
+                    return
+                if self._leader_fd is None and not self._try_become_leader():
+                    # Proses lain yang menjalankan sweep; coba lagi nanti (leader bisa mati)
+                    self._cond.wait(self.poll_interval)
+                    continue
+
+                self._read_journal()
+                now = time.time()
+                due = self._pop_due(now)
+                if not due:
+                    next_deadline = self._next_deadline()
+                    wait = self.poll_interval if next_deadline is None else min(next_deadline - now, self.poll_interval)
+                    self._cond.wait(max(wait, 0.01))
+                    continue
+                executor = self._executor
+
+            self._sweep(executor, due)
+
+    def _sweep(self, executor, due):
+        groups = {}
+        for job in due:
+            item = {"username": job["username"]}
+            if job.get("protocol"):
+                item["service"] = job["protocol"]
+            groups.setdefault(job["service"], []).append(item)
+
+        error = None
+        try:
+            results = executor(groups)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Expiry sweep gagal: {e}")
+            results = {}
+
+        finished_at = time.time()
+        removed, retry, dropped = [], [], []
+        for job in due:
+            items = results.get(job["service"], [])
+            item = next((r for r in items if r.get("username") == job["username"]), None)
+            if item is not None and item.get("status") == "success":
+                removed.append(job)
+                continue
+            job["attempts"] += 1
+            job["last_error"] = (item or {}).get("message") or error or "tidak ada hasil"
+            if job["attempts"] >= self.max_attempts:
+                dropped.append(job)
+            else:
+                job["deadline"] = finished_at + self.retry_delay
+                retry.append(job)
+
+        entries = [{"op": "done", "service": job["service"], "username": job["username"]} for job in removed + dropped]
+        entries += [{"op": "add", "job": job} for job in retry]
+        self._journal_append(entries)
+
+        with self._cond:
+            for job in retry:
+                self._push(job)
+            lags = [finished_at - job["deadline"] for job in removed]
+            self._metrics["sweeps"] += 1
+            self._metrics["removed"] += len(removed)
+            self._metrics["failed"] += len(dropped)
+            self._metrics["lag_total"] += sum(lags)
+            if lags:
+                self._metrics["lag_max"] = max([self._metrics["lag_max"]] + lags)
+                self._metrics["last_lag"] = lags[-1]
+            self._metrics["last_sweep_at"] = finished_at
+            if error:
+                self._metrics["last_error"] = error
+            self._done_since_compact += len(removed) + len(dropped)
+            if self._done_since_compact >= COMPACT_MIN_DONE and self._done_since_compact > len(self._jobs):
+                self._compact()
+
+        for job in dropped:
+            logger.error(f"Expiry {job['service']} {job['username']} gagal {job['attempts']}x, dibatalkan: {job['last_error']}")
+        if removed:
+            logger.info(f"Expiry sweep: {len(removed)} akun dihapus, {len(retry)} dijadwal ulang")
+            for callback in self._listeners:
+                try:
+                    callback(removed)
+                except Exception as e:
+                    logger.warning(f"Expiry listener error: {e}")
+
+    # --- Leader election ---
+
+    def _try_become_leader(self):
+        try:
+            os.makedirs(os.path.dirname(self._leader_path) or ".", exist_ok=True)
+            fd = os.open(self._leader_path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            logger.error(f"Expiry scheduler tidak bisa membuka {self._leader_path}: {e}")
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        # Leader baru: bangun ulang heap dari journal
+        self._heap = []
+        self._jobs = {}
+        self._offset = 0
+        self._inode = None
+        self._read_journal()
+        logger.info(f"Expiry scheduler aktif, {len(self._jobs)} jadwal dipulihkan dari {self.path}")
+        return True
+
+    def _release_leader(self):
+        if self._leader_fd is not None:
+            try:
+                fcntl.flock(self._leader_fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._leader_fd)
+                self._leader_fd = None
+
+    # --- Journal ---
+
+    def _journal_append(self, entries):
+        if not entries:
+            return
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode()
+        try:
+            with self._journal_lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, data)
+                finally:
+                    os.close(fd)
+        except OSError as e:
+            logger.error(f"Gagal menulis journal expiry {self.path}: {e}")
+
+    def _read_journal(self):
+        """Baca entry baru sejak offset terakhir (termasuk job dari worker lain)"""
+        try:
+            with self._journal_lock, open(self.path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    self._offset = 0
+                    self._inode = inode
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("op") == "add":
+                self._push(entry["job"])
+            elif entry.get("op") == "done":
+                self._jobs.pop((entry.get("service"), entry.get("username")), None)
+
+    def _compact(self):
+        """Tulis ulang journal hanya berisi job yang masih pending"""
+        directory = os.path.dirname(self.path) or "."
+        try:
+            with self._journal_lock:
+                self._read_journal()
+                fd, tmp_path = tempfile.mkstemp(prefix=".expiry-", dir=directory)
+                with os.fdopen(fd, "w") as f:
+                    for job in self._jobs.values():
+                        f.write(json.dumps({"op": "add", "job": job}) + "\n")
+                    size = f.tell()
+                os.replace(tmp_path, self.path)
+                self._inode = os.stat(self.path).st_ino
+                self._offset = size
+            self._done_since_compact = 0
+        except OSError as e:
+            logger.error(f"Gagal compaction journal expiry: {e}")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_expiry_scheduler():
+    """Scheduler bersama untuk semua service class"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            settings = get_section("expiry_scheduler")
+            _scheduler = ExpiryScheduler(
+                path=settings.get("path", DEFAULT_PATH),
+                max_batch=settings.get("max_batch", DEFAULT_MAX_BATCH),
+                poll_interval=settings.get("poll_interval", DEFAULT_POLL_INTERVAL),
+                retry_delay=settings.get("retry_delay", DEFAULT_RETRY_DELAY),
+                max_attempts=settings.get("max_attempts", DEFAULT_MAX_ATTEMPTS),
+                trial_cleanup=get_section("services", "trial").get("auto_cleanup", True),
+            )
+        return _scheduler
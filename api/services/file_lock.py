@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+File Lock untuk AlrelShop API Panel
+Lock antar proses (fcntl.flock) untuk state bersama di disk: config.json Xray,
+file database akun, restart Xray. Dibutuhkan saat API jalan dengan beberapa
+worker gunicorn, karena lock thread biasa hanya berlaku di dalam satu proses.
+
+Lock bersifat reentrant di dalam satu thread, jadi transaksi/batch yang
+bersarang tidak deadlock. Lock file disimpan di samping file yang dijaga,
+contoh /etc/xray/config.json -> /etc/xray/.config.json.lock
+"""
+
+import fcntl
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def lock_path_for(path):
+    """Path lock file sidecar untuk file yang dijaga"""
+    directory, name = os.path.split(path)
+    if not name.startswith("."):
+        name = "." + name
+    return os.path.join(directory, name + ".lock")
+
+
+class InterProcessLock:
+    """flock eksklusif + RLock; aman dipakai dari banyak thread dan banyak proses"""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        """blocking=False: return False jika lock sedang dipegang proses/thread lain"""
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    self._thread_lock.release()
+                    return False
+                except Exception:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+            except Exception:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._thread_lock.release()
+
+    def read(self):
+        """Baca isi lock file (hanya saat lock dipegang)"""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        return os.read(self._fd, 4096).decode(errors="replace")
+
+    def write(self, text):
+        """Tulis isi lock file (hanya saat lock dipegang), dipakai sebagai stempel kecil antar proses"""
+        os.ftruncate(self._fd, 0)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, text.encode())
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Host Info untuk AlrelShop API Panel
+Metadata server (domain, ISP, kota, NS SlowDNS, pubkey) dari file instalasi,
+dipakai bersama semua service untuk link, config client dan notifikasi.
+
+Isi file disimpan di memory; paling sering sekali per `host_info.check_interval`
+detik inode/mtime/size file di-stat, dan hanya file yang berubah dibaca ulang.
+Ganti domain (mis. `echo baru > /etc/xray/domain`) langsung terpakai tanpa
+restart panel. `version` naik setiap ada nilai yang berubah, jadi cache turunan
+(share link, config render) tahu kapan harus dibuat ulang.
+"""
+
+import os
+import threading
+import time
+import logging
+
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECK_INTERVAL = 2.0
+
+# field: (path, default)
+HOST_FILES = {
+    "domain": ("/etc/xray/domain", "localhost"),
+    "isp": ("/etc/xray/isp", "Unknown"),
+    "city": ("/etc/xray/city", "Unknown"),
+    "ns": ("/root/nsdomain", "Unknown"),
+    "pub": ("/etc/slowdns/server.pub", "Unknown"),
+}
+
+SERVER_INFO_FIELDS = ("isp", "city", "ns", "pub")
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+class HostInfo:
+    """Cache metadata host dengan revalidasi stat per interval"""
+
+    def __init__(self, files=None, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.files = dict(files or HOST_FILES)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signatures = {}
+        self._values = {}
+        self._checked_at = None
+        self.version = 0
+        self._metrics = {"checks": 0, "reloads": 0}
+
+    def _read(self, path, default):
+        try:
+            with open(path, "r") as f:
+                return f.read().strip() or default
+        except OSError:
+            return default
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        self._metrics["checks"] += 1
+        changed = []
+        for field, (path, default) in self.files.items():
+            signature = _signature(path)
+            if field in self._values and signature == self._signatures.get(field):
+                continue
+            value = self._read(path, default)
+            self._signatures[field] = signature
+            if self._values.get(field) != value:
+                if field in self._values:
+                    changed.append(field)
+                self._values[field] = value
+        if changed or not self.version:
+            self.version += 1
+            if changed:
+                self._metrics["reloads"] += 1
+                logger.info(f"Host info berubah: {', '.join(changed)}")
+
+    def snapshot(self):
+        """(version, {domain, isp, city, ns, pub}) dalam satu kali cek"""
+        with self._lock:
+            self._ensure_fresh()
+            return self.version, dict(self._values)
+
+    def get(self, field):
+        with self._lock:
+            self._ensure_fresh()
+            return self._values[field]
+
+    @property
+    def domain(self):
+        return self.get("domain")
+
+    def server_info(self):
+        """{isp, city, ns, pub} seperti _get_server_info lama"""
+        values = self.snapshot()[1]
+        return {field: values[field] for field in SERVER_INFO_FIELDS}
+
+    def current_version(self):
+        with self._lock:
+            self._ensure_fresh()
+            return self.version
+
+    def invalidate(self):
+        """Paksa stat ulang di akses berikutnya"""
+        with self._lock:
+            self._checked_at = None
+
+    def stats(self):
+        with self._lock:
+            self._ensure_fresh()
+            m = dict(self._metrics)
+            m.update({"version": self.version, "domain": self._values.get("domain"),
+                      "check_interval": self.check_interval})
+        return m
+
+
+_host_info = None
+_host_info_lock = threading.Lock()
+
+
+def get_host_info():
+    """Provider host info bersama untuk semua service"""
+    global _host_info
+    with _host_info_lock:
+        if _host_info is None:
+            settings = get_section("host_info")
+            _host_info = HostInfo(check_interval=settings.get("check_interval", DEFAULT_CHECK_INTERVAL))
+        return _host_info
@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+IP Limiter untuk AlrelShop API Panel
+Menegakkan limit IP per akun (/etc/kyt/limit/<proto>/ip/<user>) dari access log
+Xray, tanpa cron yang membaca ulang seluruh log.
+
+- Log dibaca incremental (pread dari offset terakhir, maksimal max_read_bytes per
+  tick, jadi biaya CPU per tick terbatas walau log sedang ramai). Offset disimpan
+  di offset_path supaya restart API tidak membaca ulang log; rotasi (inode baru)
+  dan truncate (copytruncate) dideteksi, sisa file lama dibaca sampai habis dulu
+- Per email: dict IP -> waktu terakhir terlihat, urut dari yang paling lama
+  (sliding window `window` detik). Memory terbatas: maksimal max_ips_per_user IP
+  per email dan max_users email
+- Hanya email yang muncul di tick ini yang dicek terhadap limit; semua pelanggar
+  satu tick dinonaktifkan sekaligus lewat account suspender (satu transaksi
+  config) selama lock_seconds, lalu diaktifkan lagi otomatis
+- Dengan beberapa worker gunicorn hanya satu worker yang membaca log (flock
+  non-blocking yang dipegang selama proses hidup); worker lain mencoba lagi
+  setiap interval
+
+Xray harus menulis access log dengan email, contoh
+`2026/10/17 19:45:01 1.2.3.4:51234 accepted tcp:example.com:443 [vmess-ws >> direct] email: budi`
+(log.access di config Xray + "email" di setiap client).
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import logging
+
+from services.file_lock import InterProcessLock
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_PATH = "/var/log/xray/access.log"
+DEFAULT_OFFSET_PATH = "/etc/API-Panel/data/ip-limit-offset.json"
+DEFAULT_LOCK_PATH = "/etc/API-Panel/data/ip-limit.lock"
+DEFAULT_LIMIT_DIRS = {
+    "vmess": "/etc/kyt/limit/vmess/ip",
+    "vless": "/etc/kyt/limit/vless/ip",
+    "trojan": "/etc/kyt/limit/trojan/ip",
+    "shadowsocks": "/etc/kyt/limit/shadowsocks/ip",
+}
+DEFAULT_INTERVAL = 1.0
+DEFAULT_WINDOW = 120
+DEFAULT_LOCK_SECONDS = 900
+DEFAULT_TABLE_REFRESH = 300
+DEFAULT_MAX_READ_BYTES = 4 * 1024 * 1024
+DEFAULT_MAX_IPS_PER_USER = 64
+DEFAULT_MAX_USERS = 100000
+DEFAULT_SAVE_INTERVAL = 10
+DEFAULT_IGNORE_IPS = ["127.0.0.1", "::1"]
+MAX_PARTIAL_LINE = 64 * 1024
+REASON = "ip_limit"
+
+
+def parse_access_line(line):
+    """(email, ip) dari satu baris access log Xray (bytes), None jika bukan koneksi accepted ber-email"""
+    pos = line.rfind(b" email: ")
+    if pos < 0:
+        return None
+    parts = line.split(b" ", 5)
+    if len(parts) < 5:
+        return None
+    # Xray baru menulis "from <src>", versi lama langsung "<src>"
+    if parts[2] == b"from":
+        src, status = parts[3], parts[4]
+    else:
+        src, status = parts[2], parts[3]
+    if status != b"accepted":
+        return None
+    if src[:4] in (b"tcp:", b"udp:"):
+        src = src[4:]
+    if src[:1] == b"[":
+        ip = src[1:src.find(b"]")]
+    else:
+        ip = src.rpartition(b":")[0] or src
+    email = line[pos + 8:].strip()
+    if not email or not ip:
+        return None
+    return email, ip
+
+
+class AccessLogTailer:
+    """Baca baris baru access log sejak offset terakhir, sadar rotasi dan truncate"""
+
+    def __init__(self, path=DEFAULT_LOG_PATH, offset_path=None, start_at_end=True, max_read_bytes=DEFAULT_MAX_READ_BYTES):
+        self.path = path
+        self.offset_path = offset_path
+        self.start_at_end = start_at_end
+        self.max_read_bytes = max_read_bytes
+        self._fd = None
+        self._inode = None
+        self._offset = 0
+        self._partial = b""
+        self._metrics = {"bytes": 0, "lines": 0, "rotations": 0, "truncations": 0, "dropped_partial": 0}
+
+    def _load_offset(self):
+        if not self.offset_path:
+            return None
+        try:
+            with open(self.offset_path, "r") as f:
+                saved = json.load(f)
+            return saved.get("inode"), int(saved.get("offset", 0))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Offset access log {self.offset_path} diabaikan: {e}")
+            return None
+
+    def save_offset(self):
+        """Simpan posisi awal baris yang belum lengkap (temp + rename)"""
+        if not self.offset_path or self._inode is None:
+            return
+        directory = os.path.dirname(self.offset_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".ip-limit-", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"inode": self._inode, "offset": self._offset - len(self._partial)}, f)
+            os.replace(tmp_path, self.offset_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _open(self, initial):
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        st = os.fstat(fd)
+        offset = 0
+        if initial:
+            saved = self._load_offset()
+            if saved is not None and saved[0] == st.st_ino and saved[1] <= st.st_size:
+                offset = saved[1]
+            elif saved is None and self.start_at_end:
+                # Pertama kali: log lama tidak dihitung ulang
+                offset = st.st_size
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd, self._inode, self._offset, self._partial = fd, st.st_ino, offset, b""
+        return True
+
+    def read_lines(self):
+        """Baris lengkap (bytes) sejak panggilan terakhir, maksimal max_read_bytes"""
+        if self._fd is None and not self._open(initial=True):
+            return []
+        if os.fstat(self._fd).st_size < self._offset:
+            # copytruncate: file yang sama dikosongkan
+            self._offset, self._partial = 0, b""
+            self._metrics["truncations"] += 1
+        chunk = os.pread(self._fd, self.max_read_bytes, self._offset)
+        if not chunk:
+            # Sisa file lama sudah habis, cek apakah path sudah menunjuk file baru
+            try:
+                inode = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                return []
+            if inode == self._inode or not self._open(initial=False):
+                return []
+            self._metrics["rotations"] += 1
+            chunk = os.pread(self._fd, self.max_read_bytes, self._offset)
+            if not chunk:
+                return []
+        self._offset += len(chunk)
+        self._metrics["bytes"] += len(chunk)
+        data = self._partial + chunk if self._partial else chunk
+        end = data.rfind(b"\n") + 1
+        self._partial = data[end:]
+        if len(self._partial) > MAX_PARTIAL_LINE:
+            self._partial = b""
+            self._metrics["dropped_partial"] += 1
+        lines = data[:end].splitlines()
+        self._metrics["lines"] += len(lines)
+        return lines
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def stats(self):
+        m = dict(self._metrics)
+        m.update({"path": self.path, "offset": self._offset, "inode": self._inode})
+        return m
+
+
+class IPLimiter:
+    """Sliding window IP per email dari access log + suspend akun yang melewati limit IP"""
+
+    def __init__(self, services, suspender, tailer, limit_dirs=None, window=DEFAULT_WINDOW,
+                 lock_seconds=DEFAULT_LOCK_SECONDS, interval=DEFAULT_INTERVAL, table_refresh=DEFAULT_TABLE_REFRESH,
+                 max_ips_per_user=DEFAULT_MAX_IPS_PER_USER, max_users=DEFAULT_MAX_USERS, ignore_ips=None,
+                 save_interval=DEFAULT_SAVE_INTERVAL, lock_path=None, dry_run=False):
+        self.services = services
+        self.suspender = suspender
+        self.tailer = tailer
+        self.limit_dirs = limit_dirs or DEFAULT_LIMIT_DIRS
+        self.window = window
+        self.lock_seconds = lock_seconds
+        self.interval = interval
+        self.table_refresh = table_refresh
+        self.max_ips_per_user = max_ips_per_user
+        self.max_users = max_users
+        self.ignore_ips = {ip.encode() for ip in (DEFAULT_IGNORE_IPS if ignore_ips is None else ignore_ips)}
+        self.save_interval = save_interval
+        self.dry_run = dry_run
+        self._leader_lock = InterProcessLock(lock_path) if lock_path else None
+        self._leader = lock_path is None
+
+        self._lock = threading.RLock()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopped = False
+        # email (bytes) -> {ip (bytes): waktu terakhir}, urut dari yang paling lama terlihat
+        self._windows = {}
+        # email (bytes) -> limit IP
+        self._limits = {}
+        self._table_signature = None
+        self._table_built_at = 0.0
+        self._saved_at = 0.0
+        self._next_resume_at = 0.0
+        self._metrics = {
+            "ticks": 0,
+            "table_builds": 0,
+            "suspended": 0,
+            "resumed": 0,
+            "violations": 0,
+            "dropped_users": 0,
+            "last_tick_lines": 0,
+            "last_tick_ms": None,
+            "max_tick_ms": 0.0,
+            "last_error": None,
+        }
+
+    # --- Tabel limit ---
+
+    def _stores(self):
+        for protocol in self.limit_dirs:
+            service = self.services.get(protocol)
+            store = getattr(service, "store", None)
+            if store is not None:
+                yield protocol, service, store
+
+    def refresh_table(self, force=False):
+        """Bangun ulang tabel limit jika database akun berubah; return True jika dibangun ulang"""
+        with self._lock:
+            signature = tuple((protocol, store.signature()) for protocol, _, store in self._stores())
+            expired = time.monotonic() - self._table_built_at >= self.table_refresh
+            if not force and not expired and signature == self._table_signature:
+                return False
+            limits = {}
+            for protocol, service, store in self._stores():
+                directory = getattr(service, "limit_ip_path", None) or self.limit_dirs[protocol]
+                for record in store.all():
+                    username = record[0]
+                    try:
+                        with open(os.path.join(directory, username), "r") as f:
+                            limit = int(f.read().strip() or 0)
+                    except (OSError, ValueError):
+                        continue
+                    if limit <= 0:
+                        continue
+                    key = username.encode()
+                    # Username sama di beberapa protocol: email Xray sama, pakai limit terkecil
+                    limits[key] = min(limit, limits.get(key, limit))
+            self._limits = limits
+            self._table_signature = signature
+            self._table_built_at = time.monotonic()
+            self._metrics["table_builds"] += 1
+            return True
+
+    # --- Sliding window ---
+
+    def feed(self, lines, now):
+        """Catat (email, ip) dari baris log; return set email yang muncul"""
+        windows = self._windows
+        ignore = self.ignore_ips
+        max_ips = self.max_ips_per_user
+        touched = set()
+        for line in lines:
+            parsed = parse_access_line(line)
+            if parsed is None:
+                continue
+            email, ip = parsed
+            if ip in ignore:
+                continue
+            ips = windows.get(email)
+            if ips is None:
+                if len(windows) >= self.max_users:
+                    self._purge(now)
+                    if len(windows) >= self.max_users:
+                        self._metrics["dropped_users"] += 1
+                        continue
+                ips = windows[email] = {}
+            elif ip in ips:
+                # Pindah ke belakang: urutan dict = urutan terakhir terlihat
+                del ips[ip]
+            elif len(ips) >= max_ips:
+                del ips[next(iter(ips))]
+            ips[ip] = now
+            touched.add(email)
+        return touched
+
+    def _expire(self, ips, cutoff):
+        while ips:
+            ip = next(iter(ips))
+            if ips[ip] >= cutoff:
+                break
+            del ips[ip]
+
+    def _purge(self, now):
+        """Buang IP di luar window dan email yang sudah tidak punya IP"""
+        cutoff = now - self.window
+        for email in list(self._windows):
+            ips = self._windows[email]
+            self._expire(ips, cutoff)
+            if not ips:
+                del self._windows[email]
+
+    def violators(self, emails, now):
+        """{email: [ip, ...]} email yang jumlah IP dalam window melebihi limit"""
+        cutoff = now - self.window
+        found = {}
+        for email in emails:
+            limit = self._limits.get(email)
+            ips = self._windows.get(email)
+            if not limit or not ips or len(ips) <= limit:
+                continue
+            self._expire(ips, cutoff)
+            if len(ips) > limit:
+                found[email] = list(ips)
+        return found
+
+    # --- Tick ---
+
+    def run(self, now=None):
+        """Satu tick: baca log baru, suspend pelanggar, aktifkan lagi yang masa lock-nya habis"""
+        with self._lock:
+            started = time.monotonic()
+            now = now or started
+            self.refresh_table()
+            lines = self.tailer.read_lines()
+            touched = self.feed(lines, now)
+            found = self.violators(touched, now)
+
+            suspended = {}
+            if found:
+                self._metrics["violations"] += len(found)
+                wall = time.time()
+                users = {
+                    email.decode(errors="replace"): {
+                        "ips": [ip.decode(errors="replace") for ip in ips],
+                        "limit": self._limits[email],
+                        "until": wall + self.lock_seconds,
+                    }
+                    for email, ips in found.items()
+                }
+                if self.dry_run:
+                    names = sorted(users)
+                    logger.warning(f"IP limit (dry-run): {len(names)} user melewati limit IP: {', '.join(names[:20])}")
+                else:
+                    suspended = self.suspender.suspend(users, REASON)
+                    self._metrics["suspended"] += len(suspended)
+                    if suspended:
+                        self._next_resume_at = min(self._next_resume_at, wall + self.lock_seconds)
+                for email in found:
+                    self._windows.pop(email, None)
+            resumed = self._resume_expired()
+
+            if started - self._saved_at >= self.save_interval:
+                self._purge(now)
+                self.tailer.save_offset()
+                self._saved_at = started
+            elapsed_ms = round((time.monotonic() - started) * 1000, 2)
+            self._metrics["ticks"] += 1
+            self._metrics["last_tick_lines"] = len(lines)
+            self._metrics["last_tick_ms"] = elapsed_ms
+            self._metrics["max_tick_ms"] = max(self._metrics["max_tick_ms"], elapsed_ms)
+            self._metrics["last_error"] = None
+            return {
+                "lines": len(lines),
+                "violators": sorted(email.decode(errors="replace") for email in found),
+                "suspended": sorted(suspended),
+                "resumed": resumed,
+                "elapsed_ms": elapsed_ms,
+            }
+
+    def _resume_expired(self):
+        now = time.time()
+        # State suspender hanya dibaca jika ada lock yang mungkin sudah habis
+        if now < self._next_resume_at:
+            return []
+        locked = self.suspender.suspended(REASON)
+        expired = [email for email, info in locked.items() if info.get("until", 0) <= now]
+        remaining = [info.get("until", 0) for email, info in locked.items() if info.get("until", 0) > now]
+        self._next_resume_at = min(remaining) if remaining else float("inf")
+        if not expired:
+            return []
+        resumed = self.suspender.resume(expired, reason=REASON)
+        self._metrics["resumed"] += len(resumed)
+        return resumed
+
+    def unlock(self, email):
+        """Aktifkan lagi user sebelum masa lock habis; return list email yang diaktifkan"""
+        return self.suspender.resume([email], reason=REASON)
+
+    def report(self, now=None):
+        """IP dalam window per email yang punya limit (diurut dari yang paling dekat/lewat limit)"""
+        with self._lock:
+            now = now or time.monotonic()
+            cutoff = now - self.window
+            users = []
+            for email, ips in self._windows.items():
+                limit = self._limits.get(email)
+                if not limit:
+                    continue
+                active = [ip.decode(errors="replace") for ip, seen in ips.items() if seen >= cutoff]
+                users.append({"username": email.decode(errors="replace"), "limit": limit, "ips": active})
+        users.sort(key=lambda user: len(user["ips"]) - user["limit"], reverse=True)
+        return {"window": self.window, "users": users, "locked": self.suspender.suspended(REASON)}
+
+    # --- Background ---
+
+    def start(self):
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped = False
+                self._worker = threading.Thread(target=self._run, name="ip-limiter", daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    if self._stopped:
+                        return
+                try:
+                    if not self._leader:
+                        self._leader = self._leader_lock.acquire(blocking=False)
+                    if self._leader:
+                        self.run()
+                except Exception as e:
+                    logger.error(f"IP limiter tick error: {e}")
+                    self._metrics["last_error"] = str(e)
+                with self._cond:
+                    if not self._stopped:
+                        self._cond.wait(self.interval)
+        finally:
+            if self._leader and self._leader_lock is not None:
+                self.tailer.save_offset()
+                self._leader_lock.release()
+                self._leader = False
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+            m.update({
+                "users_tracked": len(self._windows),
+                "ips_tracked": sum(len(ips) for ips in self._windows.values()),
+                "limited_users": len(self._limits),
+            })
+        m.update({"enabled": self._worker is not None, "leader": self._leader, "dry_run": self.dry_run,
+                  "window": self.window, "lock_seconds": self.lock_seconds, "log": self.tailer.stats()})
+        return m
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_ip_limiter(services=None, suspender=None):
+    """IP limiter bersama, dibuat sekali dari main_api dengan service dan account suspender"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            if services is None or suspender is None:
+                raise RuntimeError("IP limiter belum diinisialisasi")
+            settings = get_section("ip_limiter")
+            tailer = AccessLogTailer(
+                path=settings.get("log_path", DEFAULT_LOG_PATH),
+                offset_path=settings.get("offset_path", DEFAULT_OFFSET_PATH),
+                start_at_end=settings.get("start_at_end", True),
+                max_read_bytes=settings.get("max_read_bytes", DEFAULT_MAX_READ_BYTES),
+            )
+            _limiter = IPLimiter(
+                services,
+                suspender,
+                tailer,
+                limit_dirs=settings.get("limit_dirs", DEFAULT_LIMIT_DIRS),
+                window=settings.get("window", DEFAULT_WINDOW),
+                lock_seconds=settings.get("lock_seconds", DEFAULT_LOCK_SECONDS),
+                interval=settings.get("interval", DEFAULT_INTERVAL),
+                table_refresh=settings.get("table_refresh", DEFAULT_TABLE_REFRESH),
+                max_ips_per_user=settings.get("max_ips_per_user", DEFAULT_MAX_IPS_PER_USER),
+                max_users=settings.get("max_users", DEFAULT_MAX_USERS),
+                ignore_ips=settings.get("ignore_ips", DEFAULT_IGNORE_IPS),
+                save_interval=settings.get("save_interval", DEFAULT_SAVE_INTERVAL),
+                lock_path=settings.get("lock_path", DEFAULT_LOCK_PATH),
+                dry_run=settings.get("dry_run", False),
+            )
+        return _limiter
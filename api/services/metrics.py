@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Metrics untuk AlrelShop API Panel
+Counter dan histogram format Prometheus untuk endpoint /metrics.
+
+- Setiap proses (worker gunicorn) mencatat di memory, lalu paling sering sekali
+  per flush_interval detik menulis snapshot ke file miliknya sendiri
+  (<directory>/metrics-<pid>-<start>.json, tulis temp + rename). Tidak ada file
+  yang ditulis dua proses, jadi tidak perlu lock antar proses
+- /metrics menjumlahkan file semua worker + isi memory worker yang menjawab.
+  File worker yang sudah mati tetap dihitung supaya counter tidak turun;
+  direktori dikosongkan saat gunicorn start (on_starting)
+- Gauge (ukuran .db, jumlah akun) tidak disimpan, dihitung saat scrape lewat
+  callback dari register_gauge()
+- run_command() = subprocess.run + jumlah/durasi per command (useradd, systemctl, ...),
+  sekaligus span cmd_<command> untuk Server-Timing
+"""
+
+import atexit
+import json
+import math
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import logging
+
+from services.request_timing import span
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = "/etc/API-Panel/data/metrics"
+DEFAULT_FLUSH_INTERVAL = 5.0
+FILE_PREFIX = "metrics-"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# nama: (type, help)
+METRICS = {
+    "api_requests_total": ("counter", "Jumlah request HTTP per endpoint, method dan status"),
+    "api_request_duration_seconds": ("histogram", "Latency request HTTP per endpoint"),
+    "api_subprocess_total": ("counter", "Jumlah proses yang di-fork per command dan hasil"),
+    "api_subprocess_duration_seconds": ("histogram", "Durasi proses per command"),
+    "api_config_read_bytes_total": ("counter", "Byte config Xray yang dibaca dari disk"),
+    "api_config_read_duration_seconds": ("histogram", "Durasi baca config Xray"),
+    "api_config_write_bytes_total": ("counter", "Byte config Xray yang ditulis ke disk"),
+    "api_config_write_duration_seconds": ("histogram", "Durasi tulis config Xray (termasuk fsync)"),
+    "api_xray_restarts_total": ("counter", "Jumlah restart Xray per hasil (ok, error, shared)"),
+    "api_xray_restart_duration_seconds": ("histogram", "Durasi restart Xray"),
+    "api_traffic_snapshots_total": ("counter", "Jumlah snapshot counter trafik Xray ke ledger per alasan"),
+    "api_db_file_bytes": ("gauge", "Ukuran file database akun per protocol"),
+    "api_accounts": ("gauge", "Jumlah akun per protocol dan state"),
+}
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Counter + histogram per proses dengan snapshot ke file per pid"""
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._pid = None
+        self._file = None
+        self._flushed_at = 0.0
+        self._dirty = False
+
+    # --- Pencatatan ---
+
+    def _check_pid(self):
+        # Setelah fork, isi milik proses induk tidak ikut dihitung dua kali
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._file = os.path.join(self.directory, f"{FILE_PREFIX}{pid}-{int(time.time() * 1000)}.json")
+            self._counters = {}
+            self._histograms = {}
+            self._flushed_at = time.monotonic()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._check_pid()
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._dirty = True
+        self._maybe_flush()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._check_pid()
+            entry = self._histograms.get(key)
+            if entry is None:
+                # [count per bucket..., +Inf, sum]
+                entry = self._histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    entry[i] += 1
+            entry[-2] += 1
+            entry[-1] += seconds
+            self._dirty = True
+        self._maybe_flush()
+
+    def timer(self, name, **labels):
+        return _Timer(self, name, labels)
+
+    def register_gauge(self, name, callback):
+        """callback() -> list (labels dict, value), dipanggil saat render"""
+        self._gauges[name] = callback
+
+    # --- Snapshot per proses ---
+
+    def _maybe_flush(self):
+        if self._dirty and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def _snapshot(self):
+        return {
+            "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+            "histograms": [[name, labels, list(entry)] for (name, labels), entry in self._histograms.items()],
+        }
+
+    def flush(self):
+        """Tulis isi memory proses ini ke filenya sendiri"""
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            data = self._snapshot()
+            path = self._file
+            self._dirty = False
+            self._flushed_at = time.monotonic()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".metrics-", dir=self.directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f, separators=(",", ":"))
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            logger.error(f"Gagal menulis metrics {path}: {e}")
+
+    def _collect(self):
+        """Jumlah semua file worker + memory proses ini"""
+        counters, histograms = {}, {}
+
+        def merge(data):
+            for name, labels, value in data.get("counters", []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, entry in data.get("histograms", []):
+                if len(entry) != len(LATENCY_BUCKETS) + 2:
+                    # File dari versi dengan bucket lain
+                    continue
+                key = (name, tuple(tuple(pair) for pair in labels))
+                total = histograms.get(key)
+                if total is None:
+                    histograms[key] = list(entry)
+                else:
+                    histograms[key] = [a + b for a, b in zip(total, entry)]
+
+        with self._lock:
+            self._check_pid()
+            own_file = self._file
+            own = self._snapshot()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        for filename in names:
+            path = os.path.join(self.directory, filename)
+            if not filename.startswith(FILE_PREFIX) or path == own_file:
+                continue
+            try:
+                with open(path, "r") as f:
+                    merge(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"File metrics {path} dilewati: {e}")
+        merge(own)
+        return counters, histograms
+
+    # --- Output ---
+
+    def render(self):
+        """Teks exposition format Prometheus (text/plain; version=0.0.4)"""
+        counters, histograms = self._collect()
+        samples = {}
+        for (name, labels), value in sorted(counters.items()):
+            samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), entry in sorted(histograms.items()):
+            lines = samples.setdefault(name, [])
+            bounds = list(LATENCY_BUCKETS) + [math.inf]
+            for bound, count in zip(bounds, entry):
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(entry[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {entry[-2]}")
+        for name, callback in list(self._gauges.items()):
+            try:
+                samples[name] = [f"{name}{_format_labels(_labels(labels))} {_format_value(value)}"
+                                 for labels, value in callback()]
+            except Exception as e:
+                logger.error(f"Gagal menghitung gauge {name}: {e}")
+
+        output = []
+        for name in sorted(samples):
+            metric_type, help_text = METRICS.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(samples[name])
+        return "\n".join(output) + "\n"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "file": self._file,
+                "series": len(self._counters) + len(self._histograms),
+                "flush_interval": self.flush_interval,
+            }
+
+
+class _Timer:
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def reset_directory(directory):
+    """Hapus file metrics lama (dipanggil sekali saat server start, sebelum worker dibuat)"""
+    try:
+        for filename in os.listdir(directory):
+            if filename.startswith(FILE_PREFIX):
+                os.remove(os.path.join(directory, filename))
+    except FileNotFoundError:
+        pass
+
+
+def run_command(cmd, **kwargs):
+    """subprocess.run yang tercatat di api_subprocess_total / api_subprocess_duration_seconds"""
+    metrics = get_metrics()
+    command = os.path.basename(cmd[0])
+    started = time.perf_counter()
+    result = "error"
+    try:
+        with span(f"cmd_{command}"):
+            completed = subprocess.run(cmd, **kwargs)
+        result = "ok" if completed.returncode == 0 else "error"
+        return completed
+    finally:
+        metrics.inc("api_subprocess_total", command=command, result=result)
+        metrics.observe("api_subprocess_duration_seconds", time.perf_counter() - started, command=command)
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Registry metrics bersama untuk proses ini"""
+    global _metrics
+    if _metrics is not None:
+        return _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            settings = get_section("metrics")
+            _metrics = MetricsRegistry(
+                directory=settings.get("directory", DEFAULT_DIRECTORY),
+                flush_interval=settings.get("flush_interval", DEFAULT_FLUSH_INTERVAL),
+            )
+            atexit.register(_metrics.flush)
+        return _metrics
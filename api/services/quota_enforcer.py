@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Quota Enforcer untuk AlrelShop API Panel
+Menonaktifkan akun Xray yang trafiknya melewati kuota (/etc/vmess/<user>,
+/etc/vless/<user>, /etc/trojan/<user>, /etc/shadowsocks/<user>, isi = byte).
+
+- Setiap tick: satu call QueryStats ("user>>>") untuk counter uplink/downlink
+  semua user, lalu dibandingkan dengan tabel kuota di memory. Tidak ada proses
+  yang di-fork dan tidak ada file kuota yang dibaca per tick
+- Tabel kuota dibangun ulang hanya jika database akun berubah (signature store)
+  atau setiap table_refresh detik (menangkap file kuota yang ditulis ulang)
+- Semua user over-quota dinonaktifkan sekaligus lewat account suspender (satu
+  transaksi config Xray, id/password diganti nilai acak, hot-remove lewat API)
+- User diaktifkan lagi otomatis hanya jika kuotanya dinaikkan atau dihapus;
+  reset pemakaian lewat POST /api/admin/quota/enable (reset_usage)
+- Dengan beberapa worker gunicorn, tick diserialisasi lewat lock file berisi waktu
+  tick terakhir (sama seperti account reaper)
+
+Xray harus mengaktifkan statsUserUplink/statsUserDownlink di policy dan
+StatsService di api.services. Counter Xray kembali 0 setiap restart, jadi
+enforcer background hanya jalan jika traffic_ledger aktif (pemakaian = total di
+ledger + counter yang belum di-snapshot).
+"""
+
+import os
+import threading
+import time
+import logging
+
+from services.account_suspender import get_account_suspender
+from services.file_lock import InterProcessLock
+from services.settings import get_section
+from services.traffic_ledger import get_traffic_ledger
+from services.xray_api import XrayAPIError, XrayStatsClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUOTA_DIRS = {
+    "vmess": "/etc/vmess",
+    "vless": "/etc/vless",
+    "trojan": "/etc/trojan",
+    "shadowsocks": "/etc/shadowsocks",
+}
+DEFAULT_INTERVAL = 30
+DEFAULT_TABLE_REFRESH = 300
+DEFAULT_LOCK_PATH = "/etc/API-Panel/data/quota-enforcer.lock"
+REASON = "quota"
+
+
+class QuotaEnforcer:
+    """Bandingkan counter trafik Xray dengan kuota akun, nonaktifkan yang lewat kuota"""
+
+    def __init__(self, services, suspender, client=None, ledger=None, quota_dirs=None, interval=DEFAULT_INTERVAL,
+                 table_refresh=DEFAULT_TABLE_REFRESH, lock_path=None, dry_run=False):
+        self.services = services
+        self.suspender = suspender
+        self.client = client or XrayStatsClient()
+        self.ledger = ledger
+        self.quota_dirs = quota_dirs or DEFAULT_QUOTA_DIRS
+        self.interval = interval
+        self.table_refresh = table_refresh
+        self.dry_run = dry_run
+        self._process_lock = InterProcessLock(lock_path) if lock_path else None
+
+        self._lock = threading.RLock()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopped = False
+        # email -> [quota byte, [protocol, ...]]
+        self._quotas = {}
+        self._table_signature = None
+        self._table_built_at = 0.0
+        self._metrics = {
+            "runs": 0,
+            "skipped_runs": 0,
+            "table_builds": 0,
+            "disabled": 0,
+            "reenabled": 0,
+            "last_run_at": None,
+            "last_users": 0,
+            "last_query_ms": None,
+            "last_elapsed_ms": None,
+            "last_error": None,
+        }
+
+    # --- Tabel kuota ---
+
+    def _stores(self):
+        for protocol in self.quota_dirs:
+            store = getattr(self.services.get(protocol), "store", None)
+            if store is not None:
+                yield protocol, store
+
+    def _stores_signature(self):
+        signature = []
+        for protocol, store in self._stores():
+            get_signature = getattr(store, "signature", None)
+            signature.append((protocol, get_signature() if get_signature else None))
+        return tuple(signature)
+
+    def _read_quota(self, protocol, username):
+        try:
+            with open(os.path.join(self.quota_dirs[protocol], username), "r") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def refresh_table(self, force=False):
+        """Bangun ulang tabel kuota jika database akun berubah; return True jika dibangun ulang"""
+        with self._lock:
+            signature = self._stores_signature()
+            expired = time.monotonic() - self._table_built_at >= self.table_refresh
+            if not force and not expired and signature == self._table_signature:
+                return False
+            quotas = {}
+            for protocol, store in self._stores():
+                for record in store.all():
+                    username = record[0]
+                    quota = self._read_quota(protocol, username)
+                    if quota <= 0:
+                        continue
+                    entry = quotas.get(username)
+                    if entry is None:
+                        quotas[username] = [quota, [protocol]]
+                    else:
+                        # Username sama di beberapa protocol: counter Xray per email digabung, pakai kuota terkecil
+                        entry[0] = min(entry[0], quota)
+                        entry[1].append(protocol)
+            self._quotas = quotas
+            self._table_signature = signature
+            self._table_built_at = time.monotonic()
+            self._metrics["table_builds"] += 1
+            return True
+
+    def quota(self, email):
+        """Kuota byte user (0 = tanpa batas)"""
+        with self._lock:
+            self.refresh_table()
+            entry = self._quotas.get(email)
+            return entry[0] if entry else 0
+
+    # --- Nonaktif / aktif ---
+
+    def disabled(self):
+        """{email: info} user yang sedang dinonaktifkan karena kuota"""
+        return self.suspender.suspended(REASON)
+
+    def disable(self, over_quota):
+        """Nonaktifkan user {email: byte terpakai} dalam satu transaksi config"""
+        changed = self.suspender.suspend(
+            {email: {"used": used, "quota": self.quota(email)} for email, used in over_quota.items()}, REASON
+        )
+        if changed:
+            with self._lock:
+                self._metrics["disabled"] += len(changed)
+        return changed
+
+    def enable(self, emails, reset_usage=False):
+        """Aktifkan lagi user yang dinonaktifkan karena kuota; return list email yang diaktifkan"""
+        targets = self.suspender.resume(emails, reason=REASON)
+        if not targets:
+            return []
+        if reset_usage and self.ledger is not None:
+            self.ledger.reset_quota(targets)
+        if reset_usage and self.client.available():
+            for email in targets:
+                try:
+                    self.client.reset_user(email)
+                except XrayAPIError as e:
+                    logger.warning(f"Quota: reset counter {email} gagal: {e}")
+        with self._lock:
+            self._metrics["reenabled"] += len(targets)
+        return targets
+
+    # --- Tick ---
+
+    def _traffic(self):
+        """{email: [uplink, downlink]} counter Xray saat ini + pemakaian yang sudah tercatat di ledger"""
+        traffic = self.client.user_traffic()
+        if self.ledger is not None:
+            for email, (uplink, downlink) in self.ledger.quota_usage().items():
+                entry = traffic.setdefault(email, [0, 0])
+                entry[0] += uplink
+                entry[1] += downlink
+        return traffic
+
+    def run(self, dry_run=None):
+        """Satu putaran: baca counter, nonaktifkan yang lewat kuota, aktifkan yang kuotanya dinaikkan/dihapus"""
+        dry_run = self.dry_run if dry_run is None else dry_run
+        with self._lock:
+            started = time.monotonic()
+            self.refresh_table()
+            traffic = self._traffic()
+            query_ms = round((time.monotonic() - started) * 1000, 1)
+            disabled = self.disabled()
+
+            over_quota, restore = {}, []
+            for email, (uplink, downlink) in traffic.items():
+                entry = self._quotas.get(email)
+                if entry is not None and uplink + downlink >= entry[0] and email not in disabled:
+                    over_quota[email] = uplink + downlink
+            for email, info in disabled.items():
+                entry = self._quotas.get(email)
+                # Kuota dihapus/dinaikkan atau akun sudah dihapus. Pemakaian yang turun tidak dihitung:
+                # counter Xray juga kembali 0 setiap restart
+                if entry is None or entry[0] > info.get("quota", 0):
+                    restore.append(email)
+
+            report = {
+                "users": len(self._quotas),
+                "counters": len(traffic),
+                "over_quota": over_quota,
+                "restore": restore,
+                "query_ms": query_ms,
+            }
+            if dry_run:
+                return dict(report, status="success", dry_run=True)
+
+            newly_disabled = self.disable(over_quota)
+            enabled = self.enable(restore) if restore else []
+            elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+            self._metrics["runs"] += 1
+            self._metrics["last_run_at"] = time.time()
+            self._metrics["last_users"] = len(self._quotas)
+            self._metrics["last_query_ms"] = query_ms
+            self._metrics["last_elapsed_ms"] = elapsed_ms
+            self._metrics["last_error"] = None
+            return dict(report, status="success", dry_run=False, disabled=sorted(newly_disabled),
+                        enabled=enabled, elapsed_ms=elapsed_ms)
+
+    def usage(self, email):
+        """Pemakaian saat ini satu user dari counter Xray"""
+        traffic = self._traffic().get(email, [0, 0])
+        quota = self.quota(email)
+        return {
+            "username": email,
+            "uplink": traffic[0],
+            "downlink": traffic[1],
+            "used": traffic[0] + traffic[1],
+            "quota": quota,
+            "disabled": email in self.disabled(),
+        }
+
+    # --- Background ---
+
+    def start(self):
+        """Jalankan enforcer di background; return False jika traffic ledger tidak aktif"""
+        if self.ledger is None:
+            logger.error("Quota enforcer tidak dijalankan: traffic_ledger harus aktif "
+                         "(counter Xray kembali 0 setiap restart)")
+            return False
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped = False
+                self._worker = threading.Thread(target=self._run, name="quota-enforcer", daemon=True)
+                self._worker.start()
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+            try:
+                self._tick()
+            except Exception as e:
+                logger.error(f"Quota enforcer tick error: {e}")
+                self._metrics["last_error"] = str(e)
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(self.interval)
+
+    def _tick(self):
+        if self._process_lock is None:
+            self.run()
+            return
+        with self._process_lock:
+            try:
+                last_run = float(self._process_lock.read() or 0)
+            except ValueError:
+                last_run = 0.0
+            if time.time() - last_run < self.interval * 0.9:
+                # Worker lain baru saja cek
+                self._metrics["skipped_runs"] += 1
+                return
+            self.run()
+            self._process_lock.write(repr(time.time()))
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+            users = len(self._quotas)
+        m.update({"enabled": self._worker is not None, "dry_run": self.dry_run, "interval": self.interval,
+                  "quota_users": users, "ledger": self.ledger is not None})
+        return m
+
+
+_enforcer = None
+_enforcer_lock = threading.Lock()
+
+
+def get_quota_enforcer(services=None):
+    """Enforcer bersama, dibuat sekali dari main_api dengan service yang punya account store"""
+    global _enforcer
+    with _enforcer_lock:
+        if _enforcer is None:
+            if services is None:
+                raise RuntimeError("Quota enforcer belum diinisialisasi")
+            settings = get_section("quota_enforcer")
+            _enforcer = QuotaEnforcer(
+                services,
+                get_account_suspender(),
+                ledger=get_traffic_ledger(),
+                quota_dirs=settings.get("quota_dirs", DEFAULT_QUOTA_DIRS),
+                interval=settings.get("interval", DEFAULT_INTERVAL),
+                table_refresh=settings.get("table_refresh", DEFAULT_TABLE_REFRESH),
+                lock_path=settings.get("lock_path", DEFAULT_LOCK_PATH),
+                dry_run=settings.get("dry_run", False),
+            )
+        return _enforcer
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter untuk AlrelShop API Panel
+Token bucket per API key (atau per IP client jika tanpa key/key salah) yang
+menerapkan security.rate_limit di api_config.json.
+
+- Dua kelas bucket: "read" (GET) dan "mutation" (create/renew/delete/trial,
+  lebih mahal karena menulis config Xray dan database)
+- State bucket ada di file kecil yang di-mmap (security.rate_limit.state_path),
+  jadi semua worker gunicorn berbagi kuota yang sama
+- File berisi tabel hash slot tetap; satu cek = hash identitas, lock byte-range
+  beberapa slot (fcntl.lockf), hitung refill, tulis balik. Biaya beberapa mikrodetik
+- Slot yang sudah penuh kembali (idle lebih lama dari waktu refill) boleh dipakai
+  identitas lain, jadi tabel tidak perlu dibersihkan
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import logging
+
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = "/etc/API-Panel/data/rate-limit.bin"
+DEFAULT_SLOTS = 4096
+PROBE = 8
+
+# key hash (u64, 0 = kosong), tokens, waktu update terakhir
+SLOT = struct.Struct("<Qdd")
+
+
+class RateLimitResult:
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after")
+
+    def __init__(self, allowed, limit, remaining, reset_after, retry_after):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+
+    def headers(self):
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class RateLimiter:
+    """Token bucket bersama antar proses lewat file mmap"""
+
+    def __init__(self, buckets, path=DEFAULT_STATE_PATH, slots=DEFAULT_SLOTS):
+        """buckets: {nama: (requests_per_minute, burst_size)}"""
+        self.buckets = {
+            name: (per_minute / 60.0, float(max(burst, 1)), per_minute)
+            for name, (per_minute, burst) in buckets.items()
+        }
+        self.path = path
+        self.slots = max(slots, PROBE)
+        self._lock = threading.Lock()
+        self._fd = None
+        self._map = None
+        self._pid = None
+        self._metrics = {"checks": 0, "limited": 0, "evictions": 0}
+
+    def _open(self):
+        # mmap dibuka per proses (setelah fork gunicorn)
+        if self._map is not None and self._pid == os.getpid():
+            return
+        size = self.slots * SLOT.size
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def close(self):
+        """Tutup mmap dan fd file state (limiter lama saat section diganti)"""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._pid = None
+
+    def _slot_index(self, key_hash):
+        # Probe tidak melewati akhir tabel, jadi satu range lock cukup
+        return key_hash % (self.slots - PROBE + 1)
+
+    def hit(self, bucket, identity, cost=1.0, now=None):
+        """Ambil token dari bucket identitas -> RateLimitResult"""
+        rate, capacity, per_minute = self.buckets[bucket]
+        key_hash = int.from_bytes(hashlib.blake2b(f"{bucket}:{identity}".encode(), digest_size=8).digest(), "little") or 1
+        start = self._slot_index(key_hash)
+        offset = start * SLOT.size
+        length = PROBE * SLOT.size
+        full_after = capacity / rate
+
+        with self._lock:
+            self._open()
+            now = now or time.time()
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset)
+            try:
+                slot, tokens = None, capacity
+                oldest, oldest_at = None, None
+                for i in range(start, start + PROBE):
+                    stored_hash, stored_tokens, updated = SLOT.unpack_from(self._map, i * SLOT.size)
+                    if stored_hash == key_hash:
+                        slot = i
+                        tokens = min(capacity, stored_tokens + max(0.0, now - updated) * rate)
+                        break
+                    if slot is None and (stored_hash == 0 or now - updated >= full_after):
+                        # Slot kosong / bucket lain yang sudah penuh lagi
+                        slot = i
+                    if oldest_at is None or updated < oldest_at:
+                        oldest, oldest_at = i, updated
+                if slot is None:
+                    slot = oldest
+                    self._metrics["evictions"] += 1
+
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                SLOT.pack_into(self._map, slot * SLOT.size, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset)
+            self._metrics["checks"] += 1
+            if not allowed:
+                self._metrics["limited"] += 1
+
+        return RateLimitResult(
+            allowed,
+            per_minute,
+            int(tokens),
+            (capacity - tokens) / rate,
+            0.0 if allowed else (cost - tokens) / rate,
+        )
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+        m.update({
+            "buckets": {name: {"requests_per_minute": per_minute, "burst_size": capacity}
+                        for name, (_, capacity, per_minute) in self.buckets.items()},
+            "slots": self.slots,
+            "state_path": self.path,
+        })
+        return m
+
+
+_limiter = None
+_limiter_settings = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Limiter bersama dari security.rate_limit; None jika rate limit dimatikan
+
+    Isi section berubah = limiter dibuat ulang dengan batas baru; isi bucket tetap
+    karena tersimpan di file state.
+    """
+    global _limiter, _limiter_settings
+    settings = get_section("security", "rate_limit")
+    if not settings.get("enabled", False):
+        return None
+    if _limiter is not None and settings is _limiter_settings:
+        return _limiter
+    with _limiter_lock:
+        if _limiter is None or settings != _limiter_settings:
+            per_minute = settings.get("requests_per_minute", 100)
+            burst = settings.get("burst_size", 20)
+            previous = _limiter
+            _limiter = RateLimiter(
+                {
+                    "read": (per_minute, burst),
+                    "mutation": (settings.get("mutation_requests_per_minute", max(1, per_minute // 3)),
+                                 settings.get("mutation_burst_size", max(1, burst // 2))),
+                },
+                path=settings.get("state_path", DEFAULT_STATE_PATH),
+                slots=settings.get("slots", DEFAULT_SLOTS),
+            )
+            if previous is not None:
+                previous.close()
+        _limiter_settings = settings
+        return _limiter
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Request Timing untuk AlrelShop API Panel
+Durasi per fase request (auth, tulis config Xray, file limit, database, render
+config, Telegram, restart Xray, proses useradd/systemctl, ...).
+
+- main_api memulai trace di awal request; span("nama") di service dan modul
+  bersama mencatat durasi fasenya. Di luar request (thread background,
+  script CLI) span tidak melakukan apa-apa
+- Ringkasan dikirim di header Server-Timing (terlihat di DevTools browser),
+  contoh: `auth;dur=0.4, config_write;dur=3.1, db_write;dur=0.8, total;dur=9.6`
+- Request lebih lama dari request_timing.slow_request_ms dicatat sebagai satu
+  record JSON (logger api_panel.slow_requests, opsional file JSONL sendiri)
+  berisi semua span
+- Span bersarang dicatat dengan depth; fase dengan nama sama dijumlahkan di
+  header (desc="xN" jika lebih dari sekali)
+"""
+
+import json
+import threading
+import time
+import logging
+from datetime import datetime
+from functools import wraps
+
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("api_panel.slow_requests")
+
+DEFAULT_SLOW_REQUEST_MS = 1000
+MAX_SPANS = 200
+
+_local = threading.local()
+
+
+class RequestTrace:
+    """Span satu request; hanya dipakai thread yang menjalankan request itu"""
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.depth = 0
+        self.spans = []
+        self.dropped = 0
+        self.phases = {}
+
+    def add(self, name, started, duration, depth):
+        total = self.phases.get(name)
+        if total is None:
+            self.phases[name] = [duration, 1]
+        else:
+            total[0] += duration
+            total[1] += 1
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((name, started - self.started, duration, depth))
+        else:
+            # Batch besar: ringkasan per fase tetap lengkap, detail span dibatasi
+            self.dropped += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total=None):
+        parts = []
+        for name, (duration, count) in self.phases.items():
+            part = f"{name};dur={duration * 1000:.2f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        parts.append(f"total;dur={(total if total is not None else self.elapsed()) * 1000:.2f}")
+        return ", ".join(parts)
+
+    def to_record(self, total=None, **extra):
+        total = total if total is not None else self.elapsed()
+        record = {
+            "event": "slow_request",
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "method": self.method,
+            "path": self.path,
+            "duration_ms": round(total * 1000, 2),
+        }
+        record.update(extra)
+        record["phases"] = {
+            name: {"ms": round(duration * 1000, 2), "count": count}
+            for name, (duration, count) in self.phases.items()
+        }
+        record["spans"] = [
+            {"name": name, "start_ms": round(offset * 1000, 2), "ms": round(duration * 1000, 2), "depth": depth}
+            for name, offset, duration, depth in self.spans
+        ]
+        if self.dropped:
+            record["spans_dropped"] = self.dropped
+        return record
+
+
+class _Span:
+    __slots__ = ("name", "trace", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = getattr(_local, "trace", None)
+        if self.trace is not None:
+            self.trace.depth += 1
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        trace = self.trace
+        if trace is not None:
+            duration = time.perf_counter() - self.started
+            trace.depth -= 1
+            trace.add(self.name, self.started, duration, trace.depth)
+        return False
+
+
+def span(name):
+    """Context manager durasi satu fase; no-op jika thread ini tidak sedang melayani request"""
+    return _Span(name)
+
+
+def traced(name):
+    """Decorator: seluruh pemanggilan fungsi dicatat sebagai span `name`"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_trace(method, path):
+    trace = RequestTrace(method, path)
+    _local.trace = trace
+    return trace
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+def end_trace():
+    """Lepas trace dari thread ini; return trace tsb (atau None)"""
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace
+
+
+class SlowRequestLog:
+    """Tulis record JSON request lambat ke logger (dan file JSONL jika diset)"""
+
+    def __init__(self, threshold_ms=DEFAULT_SLOW_REQUEST_MS, path=None):
+        self.threshold = threshold_ms / 1000.0
+        self.path = path
+        self._lock = threading.Lock()
+        self._metrics = {"slow_requests": 0, "max_ms": 0.0}
+
+    def check(self, trace, total, **extra):
+        """Catat jika total (detik) >= threshold; return record atau None"""
+        if self.threshold <= 0 or total < self.threshold:
+            return None
+        record = trace.to_record(total, **extra)
+        line = json.dumps(record, separators=(",", ":"))
+        slow_logger.warning(line)
+        with self._lock:
+            self._metrics["slow_requests"] += 1
+            self._metrics["max_ms"] = max(self._metrics["max_ms"], record["duration_ms"])
+            if self.path:
+                try:
+                    with open(self.path, "a") as f:
+                        f.write(line + "\n")
+                except OSError as e:
+                    logger.error(f"Gagal menulis slow request log {self.path}: {e}")
+        return record
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+        m.update({"threshold_ms": round(self.threshold * 1000), "path": self.path})
+        return m
+
+
+_slow_log = None
+_slow_log_settings = None
+_slow_log_lock = threading.Lock()
+
+
+def get_slow_request_log():
+    """Slow request log dari section request_timing; dibuat ulang jika section berubah"""
+    global _slow_log, _slow_log_settings
+    settings = get_section("request_timing")
+    if _slow_log is not None and settings is _slow_log_settings:
+        return _slow_log
+    with _slow_log_lock:
+        if _slow_log is None or settings != _slow_log_settings:
+            _slow_log = SlowRequestLog(
+                threshold_ms=settings.get("slow_request_ms", DEFAULT_SLOW_REQUEST_MS),
+                path=settings.get("slow_log_path"),
+            )
+        _slow_log_settings = settings
+        return _slow_log
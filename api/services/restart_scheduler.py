@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Xray Restart Scheduler untuk AlrelShop API Panel
+Menggabungkan (coalesce) permintaan restart Xray dari semua service dalam satu
+debounce window, sehingga burst 50 create hanya menghasilkan 1 restart.
+
+Dengan beberapa worker gunicorn, restart juga dikoordinasi lewat lock file:
+restart diserialisasi, dan worker yang semua perubahannya sudah tercakup
+restart dari worker lain tidak ikut restart lagi.
+"""
+
+import threading
+import time
+import logging
+
+from services.file_lock import InterProcessLock
+from services.metrics import get_metrics, run_command
+from services.request_timing import traced
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_MS = 500
+DEFAULT_WAIT_TIMEOUT = 30
+DEFAULT_LOCK_PATH = "/etc/API-Panel/data/xray-restart.lock"
+
+
+class XrayRestartError(Exception):
+    """Restart Xray gagal atau belum selesai dalam wait_timeout"""
+
+
+def _systemctl_restart():
+    run_command(['systemctl', 'restart', 'xray'], check=True)
+
+
+def check_restart(result):
+    """Raise XrayRestartError jika hasil request_restart(wait=True) bukan restart yang selesai"""
+    status = result.get("status")
+    if status == "failed":
+        raise XrayRestartError(f"Restart Xray gagal: {result.get('error')}")
+    if status == "pending":
+        raise XrayRestartError(f"Restart Xray belum selesai setelah {result.get('waited_ms')}ms")
+    return result
+
+
+class XrayRestartScheduler:
+    """Debounced restart: maksimal satu reload per window, semua request menunggu reload yang mencakup perubahannya"""
+
+    def __init__(self, window_ms=DEFAULT_WINDOW_MS, restart_func=None, wait_timeout=DEFAULT_WAIT_TIMEOUT, lock_path=None):
+        self.window = window_ms / 1000.0
+        self.restart_func = restart_func or _systemctl_restart
+        self.wait_timeout = wait_timeout
+        self._process_lock = InterProcessLock(lock_path) if lock_path else None
+
+        self._cond = threading.Condition()
+        self._worker = None
+        self._completed_gen = 0
+        self._running_gen = None
+        self._pending_gen = None
+        self._pending_requests = []
+        self._pending_since = None
+        self._deadline = 0.0
+        self._last_start = 0.0
+        self._results = {}
+        self._before_restart = []
+
+        self._metrics = {
+            "requests": 0,
+            "served": 0,
+            "reloads": 0,
+            "shared_reloads": 0,
+            "failures": 0,
+            "queue_delay_total": 0.0,
+            "queue_delay_max": 0.0,
+            "restart_duration_total": 0.0,
+            "last_reload_at": None,
+            "last_error": None,
+        }
+
+    @traced("xray_restart")
+    def request_restart(self, reason=None, wait=True):
+        """Jadwalkan restart; jika wait=True, blok sampai reload yang mencakup perubahan ini selesai"""
+        requested_at = time.monotonic()
+        with self._cond:
+            self._ensure_worker()
+            if self._pending_gen is None:
+                # Jika restart sedang berjalan, perubahan ini harus ikut reload berikutnya
+                base = self._running_gen if self._running_gen is not None else self._completed_gen
+                self._pending_gen = base + 1
+                self._deadline = max(requested_at + self.window, self._last_start + self.window)
+                self._cond.notify_all()
+            generation = self._pending_gen
+            if self._pending_since is None:
+                self._pending_since = time.time()
+            self._pending_requests.append(requested_at)
+            self._metrics["requests"] += 1
+            if reason:
+                logger.debug(f"Xray restart requested ({reason}), generation {generation}")
+
+            if not wait:
+                return {"generation": generation, "status": "scheduled"}
+
+            end = requested_at + self.wait_timeout
+            while self._completed_gen < generation:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return {"generation": generation, "status": "pending", "waited_ms": round(self.wait_timeout * 1000, 1)}
+                self._cond.wait(remaining)
+
+            result = dict(self._results.get(generation, {"status": "completed"}))
+            result["generation"] = generation
+            result["waited_ms"] = round((time.monotonic() - requested_at) * 1000, 1)
+            return result
+
+    def before_restart(self, callback):
+        """Panggil callback() tepat sebelum Xray benar-benar di-restart (misal snapshot counter trafik)"""
+        self._before_restart.append(callback)
+
+    def _call_before_restart(self):
+        for callback in self._before_restart:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Hook sebelum restart Xray gagal: {e}")
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="xray-restart-scheduler", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending_gen is None:
+                    self._cond.wait()
+                while True:
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                generation = self._pending_gen
+                requests = self._pending_requests
+                pending_since = self._pending_since
+                self._pending_gen = None
+                self._pending_requests = []
+                self._pending_since = None
+                self._running_gen = generation
+                started = time.monotonic()
+                self._last_start = started
+
+            error = None
+            shared = False
+            try:
+                shared = self._restart(pending_since)
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Error restarting Xray: {e}")
+            duration = time.monotonic() - started
+            metrics = get_metrics()
+            metrics.inc("api_xray_restarts_total", result="error" if error else "shared" if shared else "ok")
+            if not shared:
+                metrics.observe("api_xray_restart_duration_seconds", duration)
+
+            with self._cond:
+                delays = [started - t for t in requests]
+                if shared:
+                    self._metrics["shared_reloads"] += 1
+                else:
+                    self._metrics["reloads"] += 1
+                    self._metrics["restart_duration_total"] += duration
+                self._metrics["served"] += len(requests)
+                self._metrics["queue_delay_total"] += sum(delays)
+                self._metrics["queue_delay_max"] = max([self._metrics["queue_delay_max"]] + delays)
+                self._metrics["last_reload_at"] = time.time()
+                if error:
+                    self._metrics["failures"] += 1
+                    self._metrics["last_error"] = error
+                elif shared:
+                    logger.info(f"Xray restart generation {generation} sudah tercakup restart dari worker lain")
+                else:
+                    logger.info(f"Xray restarted (generation {generation}, {len(requests)} request(s) coalesced, {duration:.2f}s)")
+
+                self._results[generation] = {
+                    "status": "failed" if error else "completed",
+                    "coalesced": len(requests),
+                    "shared": shared,
+                    "restart_ms": round(duration * 1000, 1),
+                    "error": error,
+                }
+                self._results.pop(generation - 16, None)
+                self._completed_gen = generation
+                self._running_gen = None
+                self._cond.notify_all()
+
+    def _restart(self, pending_since):
+        """Restart Xray; return True jika dilewati karena worker lain sudah restart setelah request ini"""
+        if self._process_lock is None:
+            self._call_before_restart()
+            self.restart_func()
+            return False
+
+        with self._process_lock:
+            try:
+                last_start = float(self._process_lock.read() or 0)
+            except ValueError:
+                last_start = 0.0
+            if pending_since is not None and last_start >= pending_since:
+                # Restart worker lain dimulai setelah perubahan kita di-commit, jadi sudah ikut terbaca
+                return True
+            self._process_lock.write(repr(time.time()))
+            self._call_before_restart()
+            self.restart_func()
+            return False
+
+    def stats(self):
+        """Metrics: jumlah reload yang dihemat dan tambahan latency akibat debounce"""
+        with self._cond:
+            m = dict(self._metrics)
+        requests = m.pop("requests")
+        reloads = m.pop("reloads")
+        queue_total = m.pop("queue_delay_total")
+        restart_total = m.pop("restart_duration_total")
+        served = m.pop("served")
+        return {
+            "window_ms": round(self.window * 1000),
+            "requests": requests,
+            "reloads": reloads,
+            "shared_reloads": m["shared_reloads"],
+            "reloads_saved": max(requests - reloads, 0),
+            "failures": m["failures"],
+            "avg_added_latency_ms": round(queue_total / served * 1000, 1) if served else 0.0,
+            "max_added_latency_ms": round(m["queue_delay_max"] * 1000, 1),
+            "avg_restart_ms": round(restart_total / reloads * 1000, 1) if reloads else 0.0,
+            "last_reload_at": m["last_reload_at"],
+            "last_error": m["last_error"],
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_restart_scheduler():
+    """Scheduler bersama untuk semua service class"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            settings = get_section("xray_restart")
+            _scheduler = XrayRestartScheduler(
+                window_ms=settings.get("debounce_ms", DEFAULT_WINDOW_MS),
+                wait_timeout=settings.get("wait_timeout", DEFAULT_WAIT_TIMEOUT),
+                lock_path=settings.get("lock_path", DEFAULT_LOCK_PATH),
+            )
+        return _scheduler
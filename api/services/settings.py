@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Settings Helper untuk AlrelShop API Panel
+Membaca section dari api_config.json untuk dipakai oleh service modules.
+File di-cache di services.config_registry, bukan dibaca ulang di setiap panggilan.
+"""
+
+import json
+import os
+
+from services.config_registry import get_config_registry
+
+CONFIG_PATH = '/etc/API-Panel/config/api_config.json'
+LOCAL_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'config', 'api_config.json')
+
+
+def parse_api_config(text):
+    return json.loads(text)
+
+
+def load_api_config():
+    """api_config.json (production path dulu, lalu local) dari config registry;
+    dibaca ulang otomatis jika file berubah, hasilnya jangan diubah"""
+    return get_config_registry().get("api_config")
+
+
+def get_section(*keys, default=None):
+    """Get nested section, contoh: get_section('xray_api') atau get_section('services', 'trial')"""
+    node = load_api_config()
+    for key in keys:
+        if not isinstance(node, dict) or key not in node:
+            return {} if default is None else default
+        node = node[key]
+    return node
@@ -4,65 +4,54 @@ Shadowsocks Service Module untuk AlrelShop API Panel
 Mengintegrasikan fungsi-fungsi dari script m-ssws
 """
 
-import subprocess
 import json
 import os
 import re
 import uuid
-import base64
+import time
 from datetime import datetime, timedelta
 import logging
 
+from services.account_query import iter_accounts, list_page
+from services.account_store import count_accounts, get_account_store
+from services.expiry_scheduler import get_expiry_scheduler
+from services.batch_service import current_batch
+from services.config_registry import get_bot_config
+from services.config_renderer import format_expiry, get_config_renderer, remaining_text
+from services.host_info import get_host_info
+from services.request_timing import span
+from services.restart_scheduler import check_restart, get_restart_scheduler
+from services.share_links import get_share_links
+from services.xray_api import XrayHandlerClient, XrayAPIError
+from services.xray_config import get_xray_config
+from services.xray_marker_editor import MarkerEditor
+from services.telegram_notifier import get_telegram_notifier
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_CIPHER = "aes-128-gcm"
+# variant -> prefix file statis di web_path
+CONFIG_VARIANTS = {
+    "ws": "sodosokws",
+    "openclash": "oc-sodosokws",
+    "grpc": "sodosokgrpc",
+}
+
 class ShadowsocksService:
     def __init__(self):
-        self.domain = self._get_domain()
+        self.xray_api = XrayHandlerClient()
         self.config_path = "/etc/xray/config.json"
         self.ss_db_path = "/etc/shadowsocks/.shadowsocks.db"
         self.limit_ip_path = "/etc/kyt/limit/shadowsocks/ip"
         self.web_path = "/var/www/html"
         
-    def _get_domain(self):
-        """Get domain dari config"""
-        try:
-            with open("/etc/xray/domain", "r") as f:
-                return f.read().strip()
-        except:
-            return "localhost"
-    
-    def _get_server_info(self):
-        """Get server information"""
-        try:
-            with open("/etc/xray/isp", "r") as f:
-                isp = f.read().strip()
-        except:
-            isp = "Unknown"
-            
-        try:
-            with open("/etc/xray/city", "r") as f:
-                city = f.read().strip()
-        except:
-            city = "Unknown"
-            
-        try:
-            with open("/root/nsdomain", "r") as f:
-                ns = f.read().strip()
-        except:
-            ns = "Unknown"
-            
-        try:
-            with open("/etc/slowdns/server.pub", "r") as f:
-                pub = f.read().strip()
-        except:
-            pub = "Unknown"
-            
-        return {
-            "isp": isp,
-            "city": city,
-            "ns": ns,
-            "pub": pub
-        }
+        self.store = get_account_store(self.ss_db_path)
+        self.xray_config = get_xray_config(self.config_path)
+        
+    @property
+    def domain(self):
+        """Domain server saat ini (ikut berubah jika /etc/xray/domain diganti)"""
+        return get_host_info().domain
     
     def create_account(self, data):
         """Create Shadowsocks account baru"""
@@ -70,7 +59,7 @@ class ShadowsocksService:
             username = data.get('username')
             days = data.get('days', 30)
             quota_gb = data.get('quota_gb', 0)
-            cipher = data.get('cipher', 'aes-128-gcm')
+            cipher = data.get('cipher', DEFAULT_CIPHER)
             
             if not username:
                 return {"status": "error", "message": "Username harus diisi"}
@@ -89,24 +78,29 @@ class ShadowsocksService:
             # Add to Xray config
             self._add_to_xray_config(username, password, cipher, expiry_str)
             
-            # Setup quota
-            if quota_gb > 0:
-                quota_bytes = quota_gb * 1024 * 1024 * 1024
-                os.makedirs("/etc/shadowsocks", exist_ok=True)
-                with open(f"/etc/shadowsocks/{username}", "w") as f:
-                    f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup quota
+                if quota_gb > 0:
+                    quota_bytes = quota_gb * 1024 * 1024 * 1024
+                    os.makedirs("/etc/shadowsocks", exist_ok=True)
+                    with open(f"/etc/shadowsocks/{username}", "w") as f:
+                        f.write(str(quota_bytes))
             
             # Add to database
             self._add_to_db(username, expiry_str, password)
             
-            # Create config file
-            self._create_config_file(username, password, cipher, quota_gb, days)
+            # Semua link akun sekali jalan; file config dan notifikasi memakai hasil cache yang sama
+            links = get_share_links().links("shadowsocks", username, password, cipher=cipher)
+            
+            # Config file statis (background)
+            self._export_config_file(username, cipher)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, password, cipher, quota_gb, days)
             
-            # Restart Xray
-            subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+            # Hot-add user lewat Xray API, restart hanya jika gagal
+            if not self._hot_add_user(username, password, cipher):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -117,7 +111,8 @@ class ShadowsocksService:
                     "cipher": cipher,
                     "expiry": expiry_str,
                     "quota_gb": quota_gb,
-                    "config_url": f"https://{self.domain}:81/sodosokws-{username}.txt"
+                    "config_url": f"https://{self.domain}:81/sodosokws-{username}.txt",
+                    "links": links
                 }
             }
             
@@ -131,7 +126,7 @@ class ShadowsocksService:
             minutes = data.get('minutes', 60)
             username = f"WV-{uuid.uuid4().hex[:3].upper()}"
             password = str(uuid.uuid4())
-            cipher = "aes-128-gcm"
+            cipher = DEFAULT_CIPHER
             quota_gb = 5
             
             # Calculate expiry
@@ -141,23 +136,31 @@ class ShadowsocksService:
             # Add to Xray config
             self._add_to_xray_config(username, password, cipher, expiry_str)
             
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/shadowsocks", exist_ok=True)
-            with open(f"/etc/shadowsocks/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup quota
+                quota_bytes = quota_gb * 1024 * 1024 * 1024
+                os.makedirs("/etc/shadowsocks", exist_ok=True)
+                with open(f"/etc/shadowsocks/{username}", "w") as f:
+                    f.write(str(quota_bytes))
             
             # Add to database
             self._add_to_db(username, expiry_str, password)
             
-            # Create config file
-            self._create_config_file(username, password, cipher, quota_gb, minutes, is_trial=True)
+            # Semua link akun sekali jalan; file config dan notifikasi memakai hasil cache yang sama
+            links = get_share_links().links("shadowsocks", username, password, cipher=cipher)
+            
+            # Config file statis (background)
+            self._export_config_file(username, cipher)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, password, cipher, quota_gb, minutes, is_trial=True)
             
-            # Restart Xray
-            subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+            # Schedule deletion (expiry scheduler, tetap ada setelah restart)
+            get_expiry_scheduler().schedule("shadowsocks", username, time.time() + int(minutes) * 60, source="trial")
+            
+            # Hot-add user lewat Xray API, restart hanya jika gagal
+            if not self._hot_add_user(username, password, cipher):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -168,7 +171,8 @@ class ShadowsocksService:
                     "cipher": cipher,
                     "expiry_minutes": minutes,
                     "quota_gb": quota_gb,
-                    "config_url": f"https://{self.domain}:81/sodosokws-{username}.txt"
+                    "config_url": f"https://{self.domain}:81/sodosokws-{username}.txt",
+                    "links": links
                 }
             }
             
@@ -176,38 +180,36 @@ class ShadowsocksService:
             logger.error(f"Error creating trial Shadowsocks account: {e}")
             return {"status": "error", "message": str(e)}
     
-    def list_accounts(self):
-        """List semua Shadowsocks accounts"""
+    def list_accounts(self, query=None):
+        """List Shadowsocks accounts per halaman (cursor, filter, sort; lihat services/account_query.py)"""
         try:
-            accounts = []
-            
-            if os.path.exists(self.ss_db_path):
-                with open(self.ss_db_path, "r") as f:
-                    for line in f:
-                        if line.startswith("### "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                username = parts[1]
-                                expiry = parts[2]
-                                password = parts[3]
-                                
-                                accounts.append({
-                                    "username": username,
-                                    "expiry": expiry,
-                                    "password": password,
-                                    "status": self._get_account_status(username, expiry)
-                                })
-            
-            return {
-                "status": "success",
-                "data": accounts,
-                "total": len(accounts)
-            }
+            return list_page(self.store, query, self._to_accounts)
             
         except Exception as e:
             logger.error(f"Error listing Shadowsocks accounts: {e}")
             return {"status": "error", "message": str(e)}
     
+    def iter_accounts(self, query=None):
+        """Generator semua akun yang cocok dengan query (untuk streaming NDJSON)"""
+        return iter_accounts(self.store, query, self._to_accounts)
+    
+    def _to_accounts(self, records):
+        """Record database -> dict akun untuk response list"""
+        accounts = []
+        for record in records:
+            if len(record) >= 3:
+                username = record[0]
+                expiry = record[1]
+                password = record[2]
+                
+                accounts.append({
+                    "username": username,
+                    "expiry": expiry,
+                    "password": password,
+                    "status": self._get_account_status(username, expiry)
+                })
+        return accounts
+    
     def delete_account(self, data):
         """Delete Shadowsocks account"""
         try:
@@ -217,18 +219,20 @@ class ShadowsocksService:
                 return {"status": "error", "message": "Username harus diisi"}
             
             # Remove from Xray config
-            self._remove_from_xray_config(username)
+            inbound_tags = self._remove_from_xray_config(username)
             
             # Remove from database
             self._remove_from_db(username)
+            get_expiry_scheduler().cancel("shadowsocks", username)
             
             # Remove files
             for path in [f"/etc/shadowsocks/{username}", f"{self.web_path}/sodosokws-{username}.txt", f"{self.web_path}/oc-sodosokws-{username}.txt", f"{self.web_path}/sodosokgrpc-{username}.txt"]:
                 if os.path.exists(path):
                     os.remove(path)
             
-            # Restart Xray
-            subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+            # Hot-remove user lewat Xray API, restart hanya jika gagal
+            if not self._hot_remove_user(inbound_tags, username):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -259,7 +263,7 @@ class ShadowsocksService:
             self._update_db(username, expiry_str)
             
             # Restart Xray
-            subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+            self._restart_xray()
             
             return {
                 "status": "success",
@@ -278,13 +282,13 @@ class ShadowsocksService:
     def get_info(self):
         """Get Shadowsocks service info"""
         try:
-            total_accounts = len(self.list_accounts().get('data', []))
-            active_accounts = len([acc for acc in self.list_accounts().get('data', []) if acc.get('status') == 'active'])
+            counts = count_accounts(self.store)
             
             return {
                 "status": "running",
-                "total_accounts": total_accounts,
-                "active_accounts": active_accounts,
+                "total_accounts": counts["total"],
+                "active_accounts": counts["active"],
+                "expired_accounts": counts["expired"],
                 "domain": self.domain
             }
         except Exception as e:
@@ -292,72 +296,71 @@ class ShadowsocksService:
     
     def _user_exists(self, username):
         """Check if user exists in Xray config"""
-        try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, "r") as f:
-                    content = f.read()
-                    return f'"email": "{username}"' in content
-            return False
-        except:
-            return False
+        return self.xray_config.has_client(username)
     
     def _add_to_xray_config(self, username, password, cipher, expiry_str):
-        """Add user to Xray config using sed like original script"""
+        """Add user to Xray config lewat marker #ssws/#ssgrpc seperti script asli"""
         try:
-            # Use sed command like original script for shadowsocks WS
-            ss_ws_entry = f'#!! {username} {expiry_str}\n}},{{"password": "{password}","method": "{cipher}","email": "{username}"}}'
-            subprocess.run([
-                'sed', '-i', f'/#ssws$/a\\{ss_ws_entry}',
-                self.config_path
-            ], check=True)
-            
-            # Use sed command like original script for shadowsocks gRPC  
-            ss_grpc_entry = f'#&! {username} {expiry_str}\n}},{{"password": "{password}","method": "{cipher}","email": "{username}"}}'
-            subprocess.run([
-                'sed', '-i', f'/#ssgrpc$/a\\{ss_grpc_entry}',
-                self.config_path
-            ], check=True)
+            entry = f'}},{{"password": "{password}","method": "{cipher}","email": "{username}"'
+            with self.xray_config.transaction() as tx:
+                editor = MarkerEditor(tx.get_text())
+                
+                # shadowsocks WS entry
+                editor.append_after('#ssws', [f'#!! {username} {expiry_str}', entry])
+                
+                # shadowsocks gRPC entry
+                editor.append_after('#ssgrpc', [f'#&! {username} {expiry_str}', entry])
+                
+                if editor.changes:
+                    tx.set_text(editor.text())
+                else:
+                    logger.warning(f"Marker #ssws/#ssgrpc tidak ditemukan di {self.config_path}")
                 
         except Exception as e:
             logger.error(f"Error adding to Xray config: {e}")
             raise
     
     def _remove_from_xray_config(self, username):
-        """Remove user from Xray config using sed like original script"""
+        """Remove user from Xray config (blok marker sampai baris },{); return tag inbound yang berubah"""
         try:
             # Get expiry for the user
             expiry = self._get_user_expiry(username)
-            if expiry:
+            if not expiry:
+                return []
+            with self.xray_config.transaction() as tx:
+                # Catat inbound yang memuat user ini untuk hot-remove
+                inbound_tags = self.xray_config.inbound_tags(username, "shadowsocks")
+                editor = MarkerEditor(tx.get_text())
+                
                 # Remove shadowsocks WS entry
-                subprocess.run([
-                    'sed', '-i', f'/^#!! {username} {expiry}/,/^}},{{/d',
-                    self.config_path
-                ], check=True)
+                editor.delete_block(f'#!! {username} {expiry}')
                 
                 # Remove shadowsocks gRPC entry
-                subprocess.run([
-                    'sed', '-i', f'/^#&! {username} {expiry}/,/^}},{{/d',
-                    self.config_path
-                ], check=True)
+                editor.delete_block(f'#&! {username} {expiry}')
+                
+                if not editor.changes:
+                    return []
+                tx.set_text(editor.text())
+            return inbound_tags
                 
         except Exception as e:
             logger.error(f"Error removing from Xray config: {e}")
             raise
     
     def _update_xray_config(self, username, new_expiry):
-        """Update user expiry in Xray config using sed like original script"""
+        """Update user expiry di baris marker Xray config"""
         try:
-            # Update shadowsocks WS entry
-            subprocess.run([
-                'sed', '-i', f'/^#!! {username}/c\\#!! {username} {new_expiry}',
-                self.config_path
-            ], check=True)
-            
-            # Update shadowsocks gRPC entry  
-            subprocess.run([
-                'sed', '-i', f'/^#&! {username}/c\\#&! {username} {new_expiry}',
-                self.config_path
-            ], check=True)
+            with self.xray_config.transaction() as tx:
+                editor = MarkerEditor(tx.get_text())
+                
+                # Update shadowsocks WS entry (spasi setelah username supaya user lain tidak ikut terganti)
+                editor.change_line(f'#!! {username} ', f'#!! {username} {new_expiry}')
+                
+                # Update shadowsocks gRPC entry
+                editor.change_line(f'#&! {username} ', f'#&! {username} {new_expiry}')
+                
+                if editor.changes:
+                    tx.set_text(editor.text())
                 
         except Exception as e:
             logger.error(f"Error updating Xray config: {e}")
@@ -366,56 +369,21 @@ class ShadowsocksService:
     def _get_user_expiry(self, username):
         """Get user expiry from database"""
         try:
-            if os.path.exists(self.ss_db_path):
-                with open(self.ss_db_path, "r") as f:
-                    for line in f:
-                        if line.startswith(f"### {username} "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                return parts[2]
-            return None
+            return self.store.expiry(username)
         except:
             return None
     
     def _add_to_db(self, username, expiry, password):
-        """Add user to database"""
-        os.makedirs("/etc/shadowsocks", exist_ok=True)
-        
-        # Remove existing entry if any
-        self._remove_from_db(username)
-        
-        # Add new entry
-        with open(self.ss_db_path, "a") as f:
-            f.write(f"### {username} {expiry} {password}\n")
+        """Add user to database (entry lama otomatis diganti)"""
+        self.store.add([username, expiry, password])
     
     def _remove_from_db(self, username):
         """Remove user from database"""
-        if os.path.exists(self.ss_db_path):
-            lines = []
-            with open(self.ss_db_path, "r") as f:
-                for line in f:
-                    if not line.startswith(f"### {username} "):
-                        lines.append(line)
-            
-            with open(self.ss_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.remove(username)
     
     def _update_db(self, username, new_expiry):
         """Update user expiry in database"""
-        if os.path.exists(self.ss_db_path):
-            lines = []
-            with open(self.ss_db_path, "r") as f:
-                for line in f:
-                    if line.startswith(f"### {username} "):
-                        parts = line.strip().split()
-                        if len(parts) >= 3:
-                            parts[2] = new_expiry
-                            lines.append(" ".join(parts) + "\n")
-                    else:
-                        lines.append(line)
-            
-            with open(self.ss_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.set_expiry(username, new_expiry)
     
     def _get_account_status(self, username, expiry):
         """Get account status (active/expired)"""
@@ -428,59 +396,54 @@ class ShadowsocksService:
         except:
             return 'unknown'
     
-    def _create_config_file(self, username, password, cipher, quota_gb, duration, is_trial=False):
-        """Create Shadowsocks config file"""
-        server_info = self._get_server_info()
-        
-        # Generate Shadowsocks links
-        ss_base64 = base64.b64encode(f"{cipher}:{password}".encode()).decode()
-        
-        ss_ws_tls = f"ss://{ss_base64}@{self.domain}:443?path=/ss-ws&security=tls&encryption=none&type=ws#{username}"
-        ss_ws_nontls = f"ss://{ss_base64}@{self.domain}:80?path=/ss-ws&security=none&encryption=none&type=ws#{username}"
-        ss_grpc = f"ss://{ss_base64}@{self.domain}:443?mode=gun&security=tls&encryption=none&type=grpc&serviceName=ss-grpc&sni={self.domain}#{username}"
-        
-        duration_text = f"{duration} Menit" if is_trial else f"{duration} Hari"
-        
-        config_content = f"""◇━━━━━━━━━━━━━━━━━◇
-Shadowsocks Account        
-◇━━━━━━━━━━━━━━━━━◇
-Remarks          : {username}
-Domain           : {self.domain}
-User Quota       : {quota_gb} GB
-Port TLS         : 400-900
-Password         : {password}
-Cipers           : {cipher}
-Network          : ws/grpc
-Path             : /ss-ws
-ServiceName      : ss-grpc
-Location         : {server_info['city']}
-◇━━━━━━━━━━━━━━━━━◇
-Link WS TLS : 
-{ss_ws_tls}
-◇━━━━━━━━━━━━━━━━━◇
-Link WS None TLS: 
-{ss_ws_nontls}
-◇━━━━━━━━━━━━━━━━━◇
-Link GRPC: 
-{ss_grpc}
-◇━━━━━━━━━━━━━━━━━◇
-Aktif Selama     : {duration_text}
-Dibuat Pada      : {datetime.now().strftime('%d %b %Y')}
-Berakhir Pada    : {expiry_date.strftime('%d %b %Y')}
-◇━━━━━━━━━━━━━━━━━◇"""
-        
-        os.makedirs(self.web_path, exist_ok=True)
-        with open(f"{self.web_path}/sodosokws-{username}.txt", "w") as f:
-            f.write(config_content)
-        
-        # Create OpenClash config
-        self._create_openclash_config(username, password, cipher)
-        
-        # Create gRPC config
-        self._create_grpc_config(username, password, cipher)
+    def render_config(self, username, options=None):
+        """Config client dari record akun: (text, etag), atau None jika akun/variant tidak ada
+
+        options: {"variant": "ws" | "openclash" | "grpc", "cipher": cipher link (default aes-128-gcm)}
+        """
+        options = options or {}
+        variant = options.get('variant') or "ws"
+        record = self.store.get(username)
+        if record is None or len(record) < 3 or variant not in CONFIG_VARIANTS:
+            return None
+        cipher = options.get('cipher') or DEFAULT_CIPHER
+        key = ("shadowsocks", tuple(record), variant, cipher)
+        if variant == "openclash":
+            return get_config_renderer().render(key, lambda: self._render_openclash_config(record, cipher))
+        if variant == "grpc":
+            return get_config_renderer().render(key, lambda: self._render_grpc_config(record, cipher))
+        return get_config_renderer().render(key, lambda: self._render_config(record, cipher))
+    
+    def _export_config_file(self, username, cipher):
+        """File statis sodosokws-/oc-sodosokws-/sodosokgrpc-<user>.txt untuk link :81, ditulis di background"""
+        for variant, prefix in CONFIG_VARIANTS.items():
+            def render(variant=variant):
+                rendered = self.render_config(username, {"variant": variant, "cipher": cipher})
+                return rendered[0] if rendered else None
+            get_config_renderer().export(f"{self.web_path}/{prefix}-{username}.txt", render)
     
-    def _create_openclash_config(self, username, password, cipher):
-        """Create OpenClash config file"""
+    def _quota_gb(self, username):
+        """Quota dari /etc/shadowsocks/<user> (bytes), record database tidak menyimpan quota"""
+        try:
+            with open(f"/etc/shadowsocks/{username}", "r") as f:
+                return int(f.read().strip() or 0) // (1024 * 1024 * 1024)
+        except (OSError, ValueError):
+            return 0
+    
+    def _render_config(self, record, cipher):
+        """Render config Shadowsocks dari record [username, expiry, password]"""
+        username, expiry, password = record[:3]
+        quota_gb = self._quota_gb(username)
+        share_links = get_share_links()
+        links = share_links.links("shadowsocks", username, password, cipher=cipher)
+        return share_links.render(
+            "shadowsocks", "config", username=username, password=password, cipher=cipher, quota_gb=quota_gb,
+            duration_text=remaining_text(expiry), expiry_text=format_expiry(expiry), **links
+        )
+    
+    def _render_openclash_config(self, record, cipher):
+        """Isi file OpenClash (JSON client) dari record [username, expiry, password]"""
+        password = record[2]
         config = {
             "dns": {
                 "servers": ["8.8.8.8", "8.8.4.4"]
@@ -556,11 +519,11 @@ Berakhir Pada    : {expiry_date.strftime('%d %b %Y')}
             "stats": {}
         }
         
-        with open(f"{self.web_path}/oc-sodosokws-{username}.txt", "w") as f:
-            json.dump(config, f, indent=2)
+        return json.dumps(config, indent=2)
     
-    def _create_grpc_config(self, username, password, cipher):
-        """Create gRPC config file"""
+    def _render_grpc_config(self, record, cipher):
+        """Isi file gRPC (JSON client) dari record [username, expiry, password]"""
+        password = record[2]
         config = {
             "dns": {
                 "servers": ["8.8.8.8", "8.8.4.4"]
@@ -636,87 +599,78 @@ Berakhir Pada    : {expiry_date.strftime('%d %b %Y')}
             "stats": {}
         }
         
-        with open(f"{self.web_path}/sodosokgrpc-{username}.txt", "w") as f:
-            json.dump(config, f, indent=2)
+        return json.dumps(config, indent=2)
     
     def _send_telegram_notification(self, username, password, cipher, quota_gb, duration, is_trial=False):
         """Send notification to Telegram bot"""
         try:
             # Get bot config
-            bot_config = self._get_bot_config()
+            bot_config = get_bot_config()
             if not bot_config:
                 return
             
-            server_info = self._get_server_info()
             duration_text = f"{duration} Menit" if is_trial else f"{duration} Hari"
             
-            # Generate Shadowsocks links
-            ss_base64 = base64.b64encode(f"{cipher}:{password}".encode()).decode()
-            ss_ws_tls = f"ss://{ss_base64}@{self.domain}:443?path=/ss-ws&security=tls&encryption=none&type=ws#{username}"
-            ss_ws_nontls = f"ss://{ss_base64}@{self.domain}:80?path=/ss-ws&security=none&encryption=none&type=ws#{username}"
-            ss_grpc = f"ss://{ss_base64}@{self.domain}:443?mode=gun&security=tls&encryption=none&type=grpc&serviceName=ss-grpc&sni={self.domain}#{username}"
-            
-            message = f"""<code>---------------------------------------------------</code>
-<code>      XRAY/SHADOWSOCKS</code>
-<code>---------------------------------------------------</code>
-<code>Remarks : {username}
-Domain : {self.domain}
-Host XrayDNS: {server_info['ns']}
-Pub Key: {server_info['pub']}
-Limit Quota : {quota_gb} GB
-Port TLS   : 400-900
-Port NTLS : 80, 8080, 8081-9999
-Password : {password}
-Cipher : {cipher}
-network : ws or grpc
-Path : /ss-ws
-Dynamic : https://bug.com/ss-ws
-Name  : ss-grpc</code>
-<code>---------------------------------------------------</code>
-<code> SHADOWSOCKS WS TLS</code>
-<code>---------------------------------------------------</code>
-<code>{ss_ws_tls}</code>
-<code>---------------------------------------------------</code>
-<code>SHADOWSOCKS WS NO TLS</code>
-<code>---------------------------------------------------</code>
-<code>{ss_ws_nontls}</code>
-<code>---------------------------------------------------</code>
-<code> SHADOWSOCKS gRPC</code>
-<code>---------------------------------------------------</code>
-<code>{ss_grpc}</code>
-<code>---------------------------------------------------</code>
-Format Shadowsocks WS : https://{self.domain}:81/sodosokws-{username}.txt
-<code>---------------------------------------------------</code>
-Aktif Selama   : {duration_text}
-<code>---------------------------------------------------</code>"""
-            
-            # Send to Telegram
-            url = f"https://api.telegram.org/bot{bot_config['key']}/sendMessage"
-            data = {
-                'chat_id': bot_config['chat_id'],
-                'text': message,
-                'parse_mode': 'html',
-                'disable_web_page_preview': True
-            }
+            # Link sama dengan yang dipakai response create dan file config (cache)
+            share_links = get_share_links()
+            links = share_links.links("shadowsocks", username, password, cipher=cipher)
+            message = share_links.render(
+                "shadowsocks", "telegram", username=username, password=password, cipher=cipher, quota_gb=quota_gb,
+                duration_text=duration_text, **links
+            )
             
-            subprocess.run(['curl', '-s', '--max-time', '10', '-d', json.dumps(data), url], check=True)
+            # Send to Telegram (diantrikan, dikirim di background)
+            get_telegram_notifier().send(bot_config['key'], bot_config['chat_id'], message)
             
         except Exception as e:
             logger.error(f"Error sending Telegram notification: {e}")
     
-    def _get_bot_config(self):
-        """Get Telegram bot configuration"""
+    def _hot_add_user(self, username, password, cipher):
+        """Add user ke Xray yang sedang berjalan (semua inbound yang memuatnya), return False jika perlu restart"""
+        batch = current_batch()
+        if batch is not None:
+            # Request batch: jalankan setelah config batch di-commit
+            batch.defer(lambda: self._hot_add_user(username, password, cipher))
+            return True
+        if not self.xray_api.available():
+            return False
+        # Tag dibaca dari config yang sudah di-commit (config kyt: inbound WS dan gRPC)
+        inbound_tags = self.xray_config.inbound_tags(username, "shadowsocks")
+        if not inbound_tags or None in inbound_tags:
+            return False
+        try:
+            for tag in inbound_tags:
+                self.xray_api.add_user(tag, "shadowsocks", username, password, cipher=cipher)
+            return True
+        except XrayAPIError as e:
+            logger.warning(f"Hot-add Shadowsocks user {username} gagal, fallback restart: {e}")
+            return False
+    
+    def _hot_remove_user(self, inbound_tags, username):
+        """Remove user dari Xray yang sedang berjalan, return False jika perlu restart"""
+        batch = current_batch()
+        if batch is not None:
+            batch.defer(lambda: self._hot_remove_user(inbound_tags, username))
+            return True
+        if not inbound_tags:
+            # User tidak ada di inbound manapun, runtime Xray tidak berubah
+            return True
+        if None in inbound_tags or not self.xray_api.available():
+            return False
         try:
-            if os.path.exists("/etc/bot/.bot.db"):
-                with open("/etc/bot/.bot.db", "r") as f:
-                    for line in f:
-                        if line.startswith("#bot# "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                return {
-                                    'key': parts[1],
-                                    'chat_id': parts[2]
-                                }
-            return None
-        except:
-            return None
+            for tag in inbound_tags:
+                self.xray_api.remove_user(tag, username)
+            return True
+        except XrayAPIError as e:
+            logger.warning(f"Hot-remove Shadowsocks user {username} gagal, fallback restart: {e}")
+            return False
+    
+    def _restart_xray(self):
+        """Restart Xray lewat scheduler bersama (debounced/coalesced); raise XrayRestartError jika gagal"""
+        batch = current_batch()
+        if batch is not None:
+            # Request batch: restart sekali setelah semua item selesai
+            batch.request_restart()
+            return True
+        check_restart(get_restart_scheduler().request_restart(reason="shadowsocks"))
+        return True
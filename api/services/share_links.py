@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Share Links untuk AlrelShop API Panel
+Link akun (vmess://, vless://, trojan://, ss://) dan template teks config/Telegram
+di-compile sekali per protocol, dengan domain dan info server (ISP, kota, NS,
+pubkey) dari services.host_info sudah terisi saat load. Per akun tinggal mengisi
+field akun.
+
+- links() menghasilkan semua varian link satu akun sekaligus dan disimpan di LRU
+  kecil, jadi response create, export file config dan notifikasi Telegram
+  memakai hasil yang sama
+- Link VMess: JSON di-serialize sekali jadi template, per akun hanya field
+  ps/id/host yang diisi lalu di-base64
+- Domain/info server berubah (host_info.version naik) = template di-compile ulang
+"""
+
+import base64
+import json
+import threading
+import logging
+from collections import OrderedDict
+from string import Formatter
+
+from services.client_templates import TEMPLATES
+from services.host_info import SERVER_INFO_FIELDS, get_host_info
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 1024
+
+# Varian VMess: (nama, port, tls, network, path); host "bug" diisi per akun
+VMESS_VARIANTS = [
+    ("ws_tls", 443, True, "ws", "/vmess"),
+    ("ws_nontls", 80, False, "ws", "/vmess"),
+    ("grpc", 443, True, "grpc", "vmess-grpc"),
+]
+
+LINK_TEMPLATES = {
+    "vless": [
+        ("ws_tls", "vless://{secret}@{domain}:443?path=/vless&security=tls&encryption=none&host={domain}&type=ws&serviceName=vless-ws&sni={domain}#{username}"),
+        ("ws_nontls", "vless://{secret}@{domain}:80?path=/vless&encryption=none&type=ws#{username}"),
+        ("grpc", "vless://{secret}@{domain}:443?mode=gun&security=tls&encryption=none&type=grpc&serviceName=vless-grpc&sni={domain}#{username}"),
+    ],
+    "trojan": [
+        ("ws_tls", "trojan://{secret}@{domain}:443?path=/trojan-ws&security=tls&type=ws&sni={domain}#{username}"),
+        ("grpc", "trojan://{secret}@{domain}:443?mode=gun&security=tls&type=grpc&serviceName=trojan-grpc&sni={domain}#{username}"),
+    ],
+    "shadowsocks": [
+        ("ws_tls", "ss://{secret}@{domain}:443?path=/ss-ws&security=tls&encryption=none&type=ws#{username}"),
+        ("ws_nontls", "ss://{secret}@{domain}:80?path=/ss-ws&security=none&encryption=none&type=ws#{username}"),
+        ("grpc", "ss://{secret}@{domain}:443?mode=gun&security=tls&encryption=none&type=grpc&serviceName=ss-grpc&sni={domain}#{username}"),
+    ],
+}
+
+
+def ss_userinfo(cipher, password):
+    """Bagian userinfo link ss:// = base64(cipher:password)"""
+    return base64.b64encode(f"{cipher}:{password}".encode()).decode()
+
+
+class CompiledTemplate:
+    """Template "{field}" yang di-parse sekali; bind() mengisi field tetap lebih awal"""
+
+    def __init__(self, text):
+        self._parts = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if literal:
+                self._append(literal, None)
+            if field is not None:
+                if spec or conversion or not field.isidentifier():
+                    raise ValueError(f"Field template tidak didukung: {field!r}")
+                self._append(None, field)
+        self._compile()
+
+    def _append(self, literal, field):
+        if field is None and self._parts and self._parts[-1][1] is None:
+            self._parts[-1] = (self._parts[-1][0] + literal, None)
+        else:
+            self._parts.append((literal, field))
+
+    def _compile(self):
+        # Sisa field dirender dengan str.format_map (C), literal di-escape ulang
+        self._format = "".join(
+            literal.replace("{", "{{").replace("}", "}}") if field is None else "{" + field + "}"
+            for literal, field in self._parts
+        )
+        self.fields = frozenset(field for _, field in self._parts if field is not None)
+
+    def bind(self, **values):
+        """Template baru dengan field di values sudah diisi"""
+        bound = CompiledTemplate.__new__(CompiledTemplate)
+        bound._parts = []
+        for literal, field in self._parts:
+            if field is not None and field in values:
+                bound._append(str(values[field]), None)
+            else:
+                bound._append(literal, field)
+        bound._compile()
+        return bound
+
+    def render(self, values):
+        return self._format.format_map(values)
+
+
+def _vmess_template(port, tls, network, path, host):
+    """Template JSON link VMess; field ps/id (dan host untuk WS) berisi string JSON"""
+    config = {
+        "v": "2",
+        "ps": "@@ps@@",
+        "add": host,
+        "port": port,
+        "id": "@@id@@",
+        "aid": "0",
+        "net": network,
+        "type": "none",
+        "host": host,
+        "tls": "tls" if tls else "none",
+    }
+    config["path"] = path
+    if network == "grpc":
+        config["sni"] = host
+    text = json.dumps(config).replace("{", "{{").replace("}", "}}")
+    for field in ("ps", "id", "host"):
+        text = text.replace(f'"@@{field}@@"', "{" + field + "}")
+    return CompiledTemplate(text)
+
+
+class ShareLinks:
+    """Link dan template teks semua protocol untuk satu domain"""
+
+    def __init__(self, domain=None, server_info=None, cache_size=DEFAULT_CACHE_SIZE, host_version=None):
+        """domain/server_info default dari host info saat ini"""
+        host = get_host_info()
+        self.domain = domain if domain is not None else host.domain
+        self.server_info = dict(server_info) if server_info is not None else host.server_info()
+        self.host_version = host_version
+        self.cache_size = cache_size
+        bound = dict(self.server_info, domain=self.domain)
+
+        self._vmess = []
+        for variant, port, tls, network, path in VMESS_VARIANTS:
+            # WS memakai host bug dari user, gRPC selalu ke domain server
+            host = "@@host@@" if network == "ws" else self.domain
+            self._vmess.append((variant, _vmess_template(port, tls, network, path, host)))
+        self._links = {
+            protocol: [(variant, CompiledTemplate(text).bind(domain=self.domain)) for variant, text in variants]
+            for protocol, variants in LINK_TEMPLATES.items()
+        }
+        self._texts = {
+            protocol: {kind: CompiledTemplate(text).bind(**bound) for kind, text in kinds.items()}
+            for protocol, kinds in TEMPLATES.items()
+        }
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._metrics = {"hits": 0, "misses": 0}
+
+    def links(self, protocol, username, secret, bug=None, cipher=None):
+        """Semua varian link akun: {"ws_tls": ..., "ws_nontls": ..., "grpc": ...}
+
+        secret: uuid (vmess/vless) atau password (trojan/shadowsocks);
+        bug: host WS VMess; cipher: wajib untuk shadowsocks
+        """
+        key = (protocol, username, secret, bug, cipher)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._metrics["hits"] += 1
+                return dict(cached)
+
+        if protocol == "vmess":
+            values = {"ps": json.dumps(username), "id": json.dumps(secret), "host": json.dumps(bug)}
+            links = {
+                variant: "vmess://" + base64.b64encode(template.render(values).encode()).decode()
+                for variant, template in self._vmess
+            }
+        elif protocol in self._links:
+            if protocol == "shadowsocks":
+                secret = ss_userinfo(cipher, secret)
+            values = {"username": username, "secret": secret}
+            links = {variant: template.render(values) for variant, template in self._links[protocol]}
+        else:
+            raise ValueError(f"Protocol tidak punya share link: {protocol}")
+
+        with self._lock:
+            self._metrics["misses"] += 1
+            self._cache[key] = links
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(links)
+
+    def render(self, protocol, kind, **values):
+        """Render template teks ("config" / "telegram") protocol dengan field akun"""
+        return self._texts[protocol][kind].render(values)
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+            size = len(self._cache)
+        lookups = m["hits"] + m["misses"]
+        return {
+            "domain": self.domain,
+            "cache_size": size,
+            "cache_limit": self.cache_size,
+            "hits": m["hits"],
+            "misses": m["misses"],
+            "hit_rate": round(m["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+_share_links = None
+_share_links_lock = threading.Lock()
+
+
+def get_share_links():
+    """ShareLinks bersama; compile ulang jika domain/info server berubah"""
+    global _share_links
+    version, values = get_host_info().snapshot()
+    with _share_links_lock:
+        if _share_links is None or _share_links.host_version != version:
+            server_info = {field: values[field] for field in SERVER_INFO_FIELDS}
+            _share_links = ShareLinks(values["domain"], server_info, host_version=version)
+        return _share_links
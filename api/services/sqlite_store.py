@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+SQLite Account Store untuk AlrelShop API Panel
+Storage engine akun berbasis SQLite (WAL) dengan index username/expiry/protocol
+dan transaksi, sebagai pengganti read-modify-write file `### user ...`.
+
+File legacy (.vmess.db, .ssh.db, dst) tetap disinkronkan dua arah supaya menu
+shell lama tetap jalan:
+- Setiap perubahan lewat API langsung di-mirror ke file legacy.
+- Jika file legacy diubah dari luar (script m-vmess dll), isinya di-import ulang.
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import logging
+
+from services.account_store import FlatFileAccountStore, decode_cursor, encode_cursor
+from services.request_timing import traced
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    protocol TEXT NOT NULL,
+    username TEXT NOT NULL,
+    expiry TEXT NOT NULL DEFAULT '',
+    fields TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (protocol, username)
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_expiry ON accounts (protocol, expiry, username);
+CREATE INDEX IF NOT EXISTS idx_accounts_seq ON accounts (protocol, seq);
+CREATE TABLE IF NOT EXISTS legacy_sync (
+    protocol TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    signature TEXT
+);
+"""
+
+
+class SQLiteAccountStore:
+    """Repository akun satu protocol di database SQLite bersama, dengan mirror ke file legacy"""
+
+    def __init__(self, db_path, protocol, legacy_path=None, expiry_index=1):
+        self.db_path = db_path
+        self.protocol = protocol
+        self.expiry_index = expiry_index
+        self.legacy = FlatFileAccountStore(legacy_path, expiry_index) if legacy_path else None
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._listeners = []
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        if self.legacy is not None:
+            conn.execute(
+                "INSERT OR IGNORE INTO legacy_sync (protocol, path, signature) VALUES (?, ?, NULL)",
+                (protocol, legacy_path),
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Sync dengan file legacy ---
+
+    def _sync_from_legacy(self, conn):
+        """Import file legacy jika berubah sejak sinkronisasi terakhir (harus di dalam transaksi)"""
+        if self.legacy is None:
+            return
+        signature = json.dumps(self.legacy.signature())
+        row = conn.execute("SELECT signature FROM legacy_sync WHERE protocol = ?", (self.protocol,)).fetchone()
+        if row and row[0] == signature:
+            return
+
+        records = self.legacy.all()
+        conn.execute("DELETE FROM accounts WHERE protocol = ?", (self.protocol,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO accounts (protocol, username, expiry, fields, seq) VALUES (?, ?, ?, ?, ?)",
+            [(self.protocol, r[0], self._expiry_of(r), " ".join(r), seq) for seq, r in enumerate(records)],
+        )
+        conn.execute("UPDATE legacy_sync SET signature = ? WHERE protocol = ?", (signature, self.protocol))
+        logger.info(f"Imported {len(records)} {self.protocol} accounts from {self.legacy.path}")
+
+    def _mark_synced(self, conn):
+        if self.legacy is not None:
+            conn.execute(
+                "UPDATE legacy_sync SET signature = ? WHERE protocol = ?",
+                (json.dumps(self.legacy.signature()), self.protocol),
+            )
+
+    def _legacy_changed(self, conn):
+        if self.legacy is None:
+            return False
+        row = conn.execute("SELECT signature FROM legacy_sync WHERE protocol = ?", (self.protocol,)).fetchone()
+        return not row or row[0] != json.dumps(self.legacy.signature())
+
+    def _read(self, query, params=()):
+        with self._lock:
+            conn = self._conn()
+            if not self._batch_depth and self._legacy_changed(conn):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._sync_from_legacy(conn)
+                    rows = conn.execute(query, params).fetchall()
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                return rows
+            return conn.execute(query, params).fetchall()
+
+    @traced("db_write")
+    def _write(self, apply_db, apply_legacy):
+        """Satu transaksi SQLite + mirror ke file legacy"""
+        with self._lock:
+            conn = self._conn()
+            if self._batch_depth:
+                # Di dalam batch(): transaksi dan flush file legacy diurus batch
+                result = apply_db(conn)
+                if result and self.legacy is not None:
+                    apply_legacy(self.legacy)
+                return result
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync_from_legacy(conn)
+                result = apply_db(conn)
+                if result and self.legacy is not None:
+                    apply_legacy(self.legacy)
+                    self._mark_synced(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if result:
+                self._notify()
+            return result
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Satu transaksi SQLite + satu flush file legacy untuk banyak perubahan"""
+        with self._lock:
+            if self._batch_depth:
+                self._batch_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._batch_depth -= 1
+                return
+
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync_from_legacy(conn)
+                self._batch_depth = 1
+                try:
+                    if self.legacy is not None:
+                        with self.legacy.batch():
+                            yield self
+                    else:
+                        yield self
+                finally:
+                    self._batch_depth = 0
+                self._mark_synced(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._notify()
+
+    def subscribe(self, callback):
+        """Panggil callback() setiap kali API menulis perubahan (dipakai status cache)"""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Account store listener error: {e}")
+
+    def _expiry_of(self, record):
+        return record[self.expiry_index] if len(record) > self.expiry_index else ""
+
+    # --- Reads ---
+
+    def get(self, username):
+        rows = self._read(
+            "SELECT fields FROM accounts WHERE protocol = ? AND username = ?", (self.protocol, username)
+        )
+        return rows[0][0].split(" ") if rows else None
+
+    def exists(self, username):
+        return self.get(username) is not None
+
+    def expiry(self, username):
+        rows = self._read(
+            "SELECT expiry FROM accounts WHERE protocol = ? AND username = ?", (self.protocol, username)
+        )
+        if not rows:
+            return None
+        return rows[0][0] or None
+
+    def all(self):
+        rows = self._read("SELECT fields FROM accounts WHERE protocol = ? ORDER BY seq", (self.protocol,))
+        return [row[0].split(" ") for row in rows]
+
+    def count(self):
+        return self._read("SELECT COUNT(*) FROM accounts WHERE protocol = ?", (self.protocol,))[0][0]
+
+    def count_expiring_before(self, expiry):
+        return self._read(
+            "SELECT COUNT(*) FROM accounts WHERE protocol = ? AND expiry != '' AND expiry < ?",
+            (self.protocol, expiry),
+        )[0][0]
+
+    def expiring_before(self, expiry):
+        rows = self._read(
+            "SELECT username FROM accounts WHERE protocol = ? AND expiry != '' AND expiry < ? ORDER BY expiry, username",
+            (self.protocol, expiry),
+        )
+        return [row[0] for row in rows]
+
+    def page(self, limit=100, after=None, sort="username", descending=False, prefix=None,
+             expiry_from=None, expiry_to=None):
+        """Sama dengan FlatFileAccountStore.page, memakai primary key / idx_accounts_expiry"""
+        where = ["protocol = ?"]
+        params = [self.protocol]
+        if prefix:
+            where.append("username >= ? AND username < ?")
+            params += [prefix, prefix + "\U0010ffff"]
+        if expiry_from is not None or expiry_to is not None:
+            where.append("expiry != ''")
+        if expiry_from is not None:
+            where.append("expiry >= ?")
+            params.append(expiry_from)
+        if expiry_to is not None:
+            where.append("expiry <= ?")
+            params.append(expiry_to)
+
+        op = "<" if descending else ">"
+        direction = "DESC" if descending else "ASC"
+        if sort == "expiry":
+            if after is not None:
+                where.append(f"(expiry, username) {op} (?, ?)")
+                params += decode_cursor(after, sort)
+            order = f"expiry {direction}, username {direction}"
+        else:
+            if after is not None:
+                where.append(f"username {op} ?")
+                params.append(after)
+            order = f"username {direction}"
+
+        rows = self._read(
+            f"SELECT fields FROM accounts WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?",
+            params + [limit + 1],
+        )
+        records = [row[0].split(" ") for row in rows[:limit]]
+        cursor = encode_cursor(records[-1], sort, self.expiry_index) if len(rows) > limit else None
+        return records, cursor
+
+    # --- Writes ---
+
+    def add(self, record):
+        record = [str(field) for field in record]
+
+        def apply_db(conn):
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM accounts WHERE protocol = ?", (self.protocol,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO accounts (protocol, username, expiry, fields, seq) VALUES (?, ?, ?, ?, ?)",
+                (self.protocol, record[0], self._expiry_of(record), " ".join(record), seq),
+            )
+            return True
+
+        self._write(apply_db, lambda legacy: legacy.add(record))
+
+    def remove(self, username):
+        def apply_db(conn):
+            cur = conn.execute("DELETE FROM accounts WHERE protocol = ? AND username = ?", (self.protocol, username))
+            return cur.rowcount > 0
+
+        return self._write(apply_db, lambda legacy: legacy.remove(username))
+
+    def update(self, username, index, value):
+        value = str(value)
+
+        def apply_db(conn):
+            row = conn.execute(
+                "SELECT fields FROM accounts WHERE protocol = ? AND username = ?", (self.protocol, username)
+            ).fetchone()
+            if row is None:
+                return False
+            record = row[0].split(" ")
+            if index >= len(record):
+                return False
+            record[index] = value
+            conn.execute(
+                "UPDATE accounts SET fields = ?, expiry = ? WHERE protocol = ? AND username = ?",
+                (" ".join(record), self._expiry_of(record), self.protocol, username),
+            )
+            return True
+
+        return self._write(apply_db, lambda legacy: legacy.update(username, index, value))
+
+    def set_expiry(self, username, expiry):
+        return self.update(username, self.expiry_index, expiry)
+
+    # --- Import / export manual ---
+
+    def import_legacy(self):
+        """Paksa import ulang file legacy ke SQLite"""
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE legacy_sync SET signature = NULL WHERE protocol = ?", (self.protocol,))
+                self._sync_from_legacy(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def export_legacy(self, path=None):
+        """Tulis ulang file legacy (atau path lain) dari isi SQLite"""
+        target = FlatFileAccountStore(path, self.expiry_index) if path else self.legacy
+        records = self.all()
+        usernames = {r[0] for r in records}
+        with self._lock, target.batch():
+            # Satu kali tulis file legacy untuk semua perubahan
+            for username in [r[0] for r in target.all()]:
+                if username not in usernames:
+                    target.remove(username)
+            for record in records:
+                if target.get(record[0]) != record:
+                    target.add(record)
+        return len(records)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+SSH Provisioner untuk AlrelShop API Panel
+Membuat, memperpanjang dan menghapus user sistem SSH tanpa shell pipeline.
+
+- useradd/usermod/userdel dijalankan langsung (tanpa shell=True). useradd
+  sengaja tetap satu proses per user: `newusers` tidak bisa men-set expiry,
+  jadi butuh chage per user lagi dan tidak menghemat fork
+- Password semua user di satu transaksi di-set lewat SATU `chpasswd` (stdin),
+  menggantikan `echo ... | passwd` yang rusak (list + shell=True)
+- File limit IP (/etc/kyt/limit/ssh/ip/<user>) dan quota (/etc/ssh/<user>)
+  ditulis ke temp file dan baru di-rename saat transaksi commit
+- Jika transaksi gagal (termasuk chpasswd), user yang baru dibuat di
+  transaksi itu dihapus lagi dan file staging dibuang
+- Username/password dengan ':', baris baru atau NUL ditolak: stdin chpasswd
+  berformat "user:password" per baris, jadi karakter itu bisa menyisipkan
+  password untuk user lain (termasuk root)
+
+Dry-run: dengan "ssh_provisioner": {"dry_run": true, "root": "/tmp/fixture"}
+tidak ada perintah yang dijalankan. useradd/usermod/userdel/chpasswd ditiru di
+<root>/etc/passwd + <root>/etc/shadow dan semua file ditulis di bawah root,
+jadi alurnya bisa dites tanpa menyentuh sistem.
+"""
+
+import contextlib
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import logging
+from collections import deque
+from datetime import date, datetime
+
+from services.metrics import run_command
+from services.request_timing import span, traced
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+LIMIT_IP_DIR = "/etc/kyt/limit/ssh/ip"
+QUOTA_DIR = "/etc/ssh"
+DEFAULT_SHELL = "/bin/false"
+FORBIDDEN_CHARS = (":", "\n", "\r", "\0")
+
+
+class SSHProvisionError(Exception):
+    """Perintah provisioning user sistem gagal"""
+
+
+def invalid_credential(username, password=None):
+    """Pesan error jika username/password tidak aman untuk stdin chpasswd, None jika aman"""
+    for label, value in (("Username", username), ("Password", password)):
+        if value is not None and any(char in str(value) for char in FORBIDDEN_CHARS):
+            return f"{label} tidak boleh mengandung ':', baris baru atau NUL"
+    return None
+
+
+class SSHProvisioner:
+    """Backend provisioning user SSH dengan transaksi: satu chpasswd + staging file per batch"""
+
+    def __init__(self, root="/", dry_run=False, limit_ip_dir=LIMIT_IP_DIR, quota_dir=QUOTA_DIR):
+        self.root = root
+        self.dry_run = dry_run
+        self.limit_ip_dir = limit_ip_dir
+        self.quota_dir = quota_dir
+        # Riwayat perintah terakhir (untuk dry-run/debug)
+        self.commands = deque(maxlen=200)
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._passwords = {}
+        self._created = []
+        self._staged = []
+        self._fixture = _FixtureUserDB(root) if dry_run else None
+
+    def path(self, path):
+        """Path absolut di bawah root (root "/" = path asli)"""
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def limit_ip_file(self, username):
+        return self.path(f"{self.limit_ip_dir}/{username}")
+
+    def quota_file(self, username):
+        return self.path(f"{self.quota_dir}/{username}")
+
+    # --- Operasi user ---
+
+    def create_user(self, username, password, expiry, ip_limit=None, quota_bytes=None, shell=DEFAULT_SHELL):
+        """useradd sekarang; password, limit IP dan quota saat commit"""
+        self._check_credential(username, password)
+        with self.batch():
+            self._run(["useradd", "-e", expiry, "-s", shell, "-M", username])
+            self._created.append(username)
+            self._passwords[username] = password
+            if ip_limit is not None:
+                self._stage_write(self.limit_ip_file(username), str(ip_limit))
+            if quota_bytes is not None:
+                self._stage_write(self.quota_file(username), str(quota_bytes))
+
+    def renew_user(self, username, expiry, password=None, ip_limit=None, quota_bytes=None):
+        self._check_credential(username, password)
+        with self.batch():
+            self._run(["usermod", "-e", expiry, username])
+            if password:
+                self._passwords[username] = password
+            if ip_limit is not None:
+                self._stage_write(self.limit_ip_file(username), str(ip_limit))
+            if quota_bytes is not None:
+                self._stage_write(self.quota_file(username), str(quota_bytes))
+
+    def delete_user(self, username):
+        """userdel sekarang; file limit IP dan quota dihapus saat commit"""
+        with self.batch():
+            self._run(["userdel", "--force", username])
+            self._passwords.pop(username, None)
+            if username in self._created:
+                self._created.remove(username)
+            self._staged.append(("remove", self.limit_ip_file(username), None))
+            self._staged.append(("remove", self.quota_file(username), None))
+
+    def _check_credential(self, username, password):
+        message = invalid_credential(username, password)
+        if message:
+            raise SSHProvisionError(message)
+
+    # --- Transaksi ---
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Semua operasi di dalam blok di-commit sekali: satu chpasswd + rename file staging"""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            except Exception:
+                if self._batch_depth == 1:
+                    self._rollback()
+                raise
+            finally:
+                self._batch_depth -= 1
+            if not self._batch_depth:
+                self._commit()
+
+    def _commit(self):
+        passwords, self._passwords = self._passwords, {}
+        created, self._created = self._created, []
+        staged, self._staged = self._staged, []
+        if passwords:
+            try:
+                self._run(["chpasswd"], "".join(f"{user}:{pw}\n" for user, pw in passwords.items()))
+            except Exception:
+                self._remove_created(created)
+                self._discard(staged)
+                raise
+
+        with span("limit_files"):
+            for action, path, tmp_path in staged:
+                try:
+                    if action == "write":
+                        os.replace(tmp_path, path)
+                    elif os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logger.error(f"Error applying {path}: {e}")
+
+    def _rollback(self):
+        self._passwords = {}
+        created, self._created = self._created, []
+        staged, self._staged = self._staged, []
+        self._remove_created(created)
+        self._discard(staged)
+
+    def _remove_created(self, created):
+        """User baru tanpa password tidak berguna, hapus supaya bisa dibuat ulang"""
+        for username in created:
+            try:
+                self._run(["userdel", "--force", username])
+            except Exception as e:
+                logger.error(f"Rollback userdel {username} gagal: {e}")
+
+    def _discard(self, staged):
+        for action, path, tmp_path in staged:
+            if action == "write" and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @traced("limit_files")
+    def _stage_write(self, path, content):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        self._staged.append(("write", path, tmp_path))
+
+    # --- Eksekusi perintah ---
+
+    def _run(self, cmd, stdin=None):
+        self.commands.append(cmd[0] if cmd[0] == "chpasswd" else " ".join(cmd))
+        if self.dry_run:
+            self._fixture.apply(cmd, stdin)
+            return
+        result = run_command(cmd, input=stdin, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SSHProvisionError(f"{cmd[0]} gagal ({result.returncode}): {result.stderr.strip()}")
+
+
+class _FixtureUserDB:
+    """Tiruan useradd/usermod/userdel/chpasswd di <root>/etc/passwd dan <root>/etc/shadow"""
+
+    def __init__(self, root):
+        self.passwd_path = os.path.join(root, "etc/passwd")
+        self.shadow_path = os.path.join(root, "etc/shadow")
+        os.makedirs(os.path.dirname(self.passwd_path), exist_ok=True)
+        for path in (self.passwd_path, self.shadow_path):
+            if not os.path.exists(path):
+                open(path, "a").close()
+
+    def _read(self, path):
+        with open(path, "r") as f:
+            return [line.rstrip("\n").split(":") for line in f if line.strip()]
+
+    def _write(self, path, rows):
+        directory = os.path.dirname(path)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+        with os.fdopen(fd, "w") as f:
+            f.writelines(":".join(row) + "\n" for row in rows)
+        os.replace(tmp_path, path)
+
+    def apply(self, cmd, stdin=None):
+        passwd = self._read(self.passwd_path)
+        shadow = self._read(self.shadow_path)
+        names = {row[0] for row in passwd}
+        program, args = cmd[0], cmd[1:]
+        username = args[-1] if args else None
+
+        if program == "useradd":
+            if username in names:
+                raise SSHProvisionError(f"useradd gagal (9): user '{username}' already exists")
+            opts = dict(zip(args[:-1:2], args[1:-1:2]))
+            uid = max([int(row[2]) for row in passwd if len(row) > 2 and row[2].isdigit()] + [999]) + 1
+            passwd.append([username, "x", str(uid), str(uid), "", f"/home/{username}", opts.get("-s", DEFAULT_SHELL)])
+            shadow.append([username, "!", str(_days(time.time())), "0", "99999", "7", "", _expire_days(opts.get("-e")), ""])
+        elif program == "usermod":
+            if username not in names:
+                raise SSHProvisionError(f"usermod gagal (6): user '{username}' does not exist")
+            for row in shadow:
+                if row[0] == username:
+                    row[7] = _expire_days(args[1])
+        elif program == "userdel":
+            if username not in names:
+                raise SSHProvisionError(f"userdel gagal (6): user '{username}' does not exist")
+            passwd = [row for row in passwd if row[0] != username]
+            shadow = [row for row in shadow if row[0] != username]
+        elif program == "chpasswd":
+            updates = dict(line.split(":", 1) for line in stdin.splitlines() if ":" in line)
+            missing = [user for user in updates if user not in names]
+            if missing:
+                raise SSHProvisionError(f"chpasswd gagal (1): unknown user {', '.join(missing)}")
+            for row in shadow:
+                if row[0] in updates:
+                    row[1] = "$6$dryrun$" + hashlib.sha256(updates[row[0]].encode()).hexdigest()[:22]
+        else:
+            raise SSHProvisionError(f"Perintah {program} tidak didukung di dry-run")
+
+        self._write(self.passwd_path, passwd)
+        self._write(self.shadow_path, shadow)
+
+
+def _days(timestamp):
+    return int(timestamp // 86400)
+
+
+def _expire_days(expiry):
+    """Tanggal YYYY-MM-DD ke jumlah hari sejak epoch (format field expire di shadow)"""
+    if not expiry:
+        return ""
+    return str((datetime.strptime(expiry, "%Y-%m-%d").date() - date(1970, 1, 1)).days)
+
+
+_provisioner = None
+_provisioner_lock = threading.Lock()
+
+
+def get_ssh_provisioner():
+    """Provisioner bersama, mode dry-run/root dari section ssh_provisioner"""
+    global _provisioner
+    with _provisioner_lock:
+        if _provisioner is None:
+            settings = get_section("ssh_provisioner")
+            _provisioner = SSHProvisioner(
+                root=settings.get("root", "/"),
+                dry_run=settings.get("dry_run", False),
+            )
+        return _provisioner
@@ -4,63 +4,39 @@ SSH Service Module untuk AlrelShop API Panel
 Mengintegrasikan fungsi-fungsi dari script m-sshws dan addssh
 """
 
-import subprocess
-import json
 import os
-import re
 import uuid
+import time
 from datetime import datetime, timedelta
 import logging
 
+from services.account_query import iter_accounts, list_page
+from services.account_store import count_accounts, get_account_store
+from services.config_registry import get_bot_config
+from services.config_renderer import format_expiry, get_config_renderer, remaining_text
+from services.expiry_scheduler import get_expiry_scheduler
+from services.host_info import get_host_info
+from services.share_links import get_share_links
+from services.ssh_provisioner import get_ssh_provisioner, invalid_credential
+from services.system_accounts import get_system_accounts
+from services.telegram_notifier import get_telegram_notifier
+
 logger = logging.getLogger(__name__)
 
 class SSHService:
     def __init__(self):
-        self.domain = self._get_domain()
         self.ssh_db_path = "/etc/ssh/.ssh.db"
         self.limit_ip_path = "/etc/kyt/limit/ssh/ip"
         self.web_path = "/var/www/html"
         
-    def _get_domain(self):
-        """Get domain dari config"""
-        try:
-            with open("/etc/xray/domain", "r") as f:
-                return f.read().strip()
-        except:
-            return "localhost"
-    
-    def _get_server_info(self):
-        """Get server information"""
-        try:
-            with open("/etc/xray/isp", "r") as f:
-                isp = f.read().strip()
-        except:
-            isp = "Unknown"
-            
-        try:
-            with open("/etc/xray/city", "r") as f:
-                city = f.read().strip()
-        except:
-            city = "Unknown"
-            
-        try:
-            with open("/root/nsdomain", "r") as f:
-                ns = f.read().strip()
-        except:
-            ns = "Unknown"
-            
-        try:
-            with open("/etc/slowdns/server.pub", "r") as f:
-                pub = f.read().strip()
-        except:
-            pub = "Unknown"
-            
-        return {
-            "isp": isp,
-            "city": city,
-            "ns": ns,
-            "pub": pub
-        }
+        self.store = get_account_store(self.ssh_db_path, expiry_index=3)
+        self.provisioner = get_ssh_provisioner()
+        self.system_accounts = get_system_accounts(self.provisioner.root)
+        
+    @property
+    def domain(self):
+        """Domain server saat ini (ikut berubah jika /etc/xray/domain diganti)"""
+        return get_host_info().domain
     
     def create_account(self, data):
         """Create SSH account baru"""
@@ -74,6 +50,11 @@ class SSHService:
             if not username or not password:
                 return {"status": "error", "message": "Username dan password harus diisi"}
             
+            # Ditolak sebelum sampai ke chpasswd (format baris user:password)
+            message = invalid_credential(username, password)
+            if message:
+                return {"status": "error", "message": message}
+            
             # Check if user exists
             if self._user_exists(username):
                 return {"status": "error", "message": "Username sudah ada"}
@@ -82,28 +63,18 @@ class SSHService:
             expiry_date = datetime.now() + timedelta(days=days)
             expiry_str = expiry_date.strftime("%Y-%m-%d")
             
-            # Create system user
-            subprocess.run(['useradd', '-e', expiry_str, '-s', '/bin/false', '-M', username], check=True)
-            subprocess.run(['echo', f'{password}\n{password}', '|', 'passwd', username], shell=True, check=True)
-            
-            # Setup IP limit
-            if ip_limit > 0:
-                os.makedirs(self.limit_ip_path, exist_ok=True)
-                with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                    f.write(str(ip_limit))
-            
-            # Setup quota
-            if quota_gb > 0:
-                quota_bytes = quota_gb * 1024 * 1024 * 1024
-                os.makedirs("/etc/ssh", exist_ok=True)
-                with open(f"/etc/ssh/{username}", "w") as f:
-                    f.write(str(quota_bytes))
+            # Create system user + IP limit + quota (satu transaksi provisioner)
+            self.provisioner.create_user(
+                username, password, expiry_str,
+                ip_limit=ip_limit if ip_limit > 0 else None,
+                quota_bytes=quota_gb * 1024 * 1024 * 1024 if quota_gb > 0 else None
+            )
             
             # Add to database
             self._add_to_db(username, password, ip_limit, expiry_str)
             
-            # Create config file
-            self._create_config_file(username, password, ip_limit, days)
+            # Config file statis (background)
+            self._export_config_file(username)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, password, ip_limit, days)
@@ -138,32 +109,24 @@ class SSHService:
             expiry_date = datetime.now() + timedelta(minutes=minutes)
             expiry_str = expiry_date.strftime("%Y-%m-%d")
             
-            # Create system user
-            subprocess.run(['useradd', '-e', expiry_str, '-s', '/bin/false', '-M', username], check=True)
-            subprocess.run(['echo', f'{password}\n{password}', '|', 'passwd', username], shell=True, check=True)
-            
-            # Setup IP limit
-            os.makedirs(self.limit_ip_path, exist_ok=True)
-            with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                f.write(str(ip_limit))
-            
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/ssh", exist_ok=True)
-            with open(f"/etc/ssh/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            # Create system user + IP limit + quota (satu transaksi provisioner)
+            self.provisioner.create_user(
+                username, password, expiry_str,
+                ip_limit=ip_limit,
+                quota_bytes=quota_gb * 1024 * 1024 * 1024
+            )
             
             # Add to database
             self._add_to_db(username, password, ip_limit, expiry_str)
             
-            # Create config file
-            self._create_config_file(username, password, ip_limit, minutes, is_trial=True)
+            # Config file statis (background)
+            self._export_config_file(username)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, password, ip_limit, minutes, is_trial=True)
             
-            # Schedule deletion
-            subprocess.run(['echo', f'userdel -f "{username}"', '|', 'at', 'now', '+', str(minutes), 'minutes'], shell=True)
+            # Schedule deletion (expiry scheduler, tetap ada setelah restart)
+            get_expiry_scheduler().schedule("ssh", username, time.time() + int(minutes) * 60, source="trial")
             
             return {
                 "status": "success",
@@ -182,40 +145,40 @@ class SSHService:
             logger.error(f"Error creating trial SSH account: {e}")
             return {"status": "error", "message": str(e)}
     
-    def list_accounts(self):
-        """List semua SSH accounts"""
+    def list_accounts(self, query=None):
+        """List SSH accounts per halaman (cursor, filter, sort; lihat services/account_query.py)"""
         try:
-            accounts = []
-            
-            if os.path.exists(self.ssh_db_path):
-                with open(self.ssh_db_path, "r") as f:
-                    for line in f:
-                        if line.startswith("### "):
-                            parts = line.strip().split()
-                            if len(parts) >= 4:
-                                username = parts[1]
-                                password = parts[2]
-                                ip_limit = parts[3]
-                                expiry = parts[4] if len(parts) > 4 else "Unknown"
-                                
-                                accounts.append({
-                                    "username": username,
-                                    "password": password,
-                                    "ip_limit": ip_limit,
-                                    "expiry": expiry,
-                                    "status": self._get_user_status(username)
-                                })
-            
-            return {
-                "status": "success",
-                "data": accounts,
-                "total": len(accounts)
-            }
+            return list_page(self.store, query, self._to_accounts)
             
         except Exception as e:
             logger.error(f"Error listing SSH accounts: {e}")
             return {"status": "error", "message": str(e)}
     
+    def iter_accounts(self, query=None):
+        """Generator semua akun yang cocok dengan query (untuk streaming NDJSON)"""
+        return iter_accounts(self.store, query, self._to_accounts)
+    
+    def _to_accounts(self, records):
+        """Record database -> dict akun untuk response list"""
+        accounts = []
+        # Satu kali baca /etc/passwd + /etc/shadow untuk satu halaman
+        statuses = self.system_accounts.statuses([record[0] for record in records])
+        for record in records:
+            if len(record) >= 3:
+                username = record[0]
+                password = record[1]
+                ip_limit = record[2]
+                expiry = record[3] if len(record) > 3 else "Unknown"
+                
+                accounts.append({
+                    "username": username,
+                    "password": password,
+                    "ip_limit": ip_limit,
+                    "expiry": expiry,
+                    "status": statuses.get(username, 'unknown')
+                })
+        return accounts
+    
     def delete_account(self, data):
         """Delete SSH account"""
         try:
@@ -224,16 +187,17 @@ class SSHService:
             if not username:
                 return {"status": "error", "message": "Username harus diisi"}
             
-            # Delete system user
-            subprocess.run(['userdel', '--force', username], check=True)
+            # Delete system user + file IP limit & quota
+            self.provisioner.delete_user(username)
             
             # Remove from database
             self._remove_from_db(username)
+            get_expiry_scheduler().cancel("ssh", username)
             
-            # Remove files
-            for path in [f"/etc/ssh/{username}", f"{self.limit_ip_path}/{username}", f"{self.web_path}/ssh-{username}.txt"]:
-                if os.path.exists(path):
-                    os.remove(path)
+            # Remove config file
+            config_file = f"{self.web_path}/ssh-{username}.txt"
+            if os.path.exists(config_file):
+                os.remove(config_file)
             
             return {
                 "status": "success",
@@ -256,29 +220,22 @@ class SSHService:
             if not username:
                 return {"status": "error", "message": "Username harus diisi"}
             
+            # Ditolak sebelum sampai ke chpasswd (format baris user:password)
+            message = invalid_credential(username, new_password)
+            if message:
+                return {"status": "error", "message": message}
+            
             # Calculate new expiry
             expiry_date = datetime.now() + timedelta(days=days)
             expiry_str = expiry_date.strftime("%Y-%m-%d")
             
-            # Update user expiry
-            subprocess.run(['usermod', '-e', expiry_str, username], check=True)
-            
-            # Update password if provided
-            if new_password:
-                subprocess.run(['echo', f'{new_password}\n{new_password}', '|', 'passwd', username], shell=True, check=True)
-            
-            # Update IP limit if provided
-            if new_ip_limit is not None:
-                os.makedirs(self.limit_ip_path, exist_ok=True)
-                with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                    f.write(str(new_ip_limit))
-            
-            # Update quota if provided
-            if new_quota_gb is not None:
-                quota_bytes = new_quota_gb * 1024 * 1024 * 1024
-                os.makedirs("/etc/ssh", exist_ok=True)
-                with open(f"/etc/ssh/{username}", "w") as f:
-                    f.write(str(quota_bytes))
+            # Update expiry, dan password/IP limit/quota jika diisi
+            self.provisioner.renew_user(
+                username, expiry_str,
+                password=new_password,
+                ip_limit=new_ip_limit,
+                quota_bytes=new_quota_gb * 1024 * 1024 * 1024 if new_quota_gb is not None else None
+            )
             
             # Update database
             self._update_db(username, expiry_str)
@@ -300,13 +257,13 @@ class SSHService:
     def get_info(self):
         """Get SSH service info"""
         try:
-            total_accounts = len(self.list_accounts().get('data', []))
-            active_accounts = len([acc for acc in self.list_accounts().get('data', []) if acc.get('status') == 'active'])
+            counts = count_accounts(self.store)
             
             return {
                 "status": "running",
-                "total_accounts": total_accounts,
-                "active_accounts": active_accounts,
+                "total_accounts": counts["total"],
+                "active_accounts": counts["active"],
+                "expired_accounts": counts["expired"],
                 "domain": self.domain
             }
         except Exception as e:
@@ -315,184 +272,63 @@ class SSHService:
     def _user_exists(self, username):
         """Check if user exists"""
         try:
-            result = subprocess.run(['id', username], capture_output=True)
-            return result.returncode == 0
-        except:
+            return self.system_accounts.exists(username)
+        except OSError as e:
+            logger.error(f"Error reading system accounts for {username}: {e}")
             return False
     
     def _add_to_db(self, username, password, ip_limit, expiry):
-        """Add user to database"""
-        os.makedirs("/etc/ssh", exist_ok=True)
-        
-        # Remove existing entry if any
-        self._remove_from_db(username)
-        
-        # Add new entry
-        with open(self.ssh_db_path, "a") as f:
-            f.write(f"### {username} {password} {ip_limit} {expiry}\n")
+        """Add user to database (entry lama otomatis diganti)"""
+        self.store.add([username, password, ip_limit, expiry])
     
     def _remove_from_db(self, username):
         """Remove user from database"""
-        if os.path.exists(self.ssh_db_path):
-            lines = []
-            with open(self.ssh_db_path, "r") as f:
-                for line in f:
-                    if not line.startswith(f"### {username} "):
-                        lines.append(line)
-            
-            with open(self.ssh_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.remove(username)
     
     def _update_db(self, username, new_expiry):
         """Update user expiry in database"""
-        if os.path.exists(self.ssh_db_path):
-            lines = []
-            with open(self.ssh_db_path, "r") as f:
-                for line in f:
-                    if line.startswith(f"### {username} "):
-                        parts = line.strip().split()
-                        if len(parts) >= 4:
-                            parts[4] = new_expiry
-                            lines.append(" ".join(parts) + "\n")
-                    else:
-                        lines.append(line)
-            
-            with open(self.ssh_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.set_expiry(username, new_expiry)
     
-    def _get_user_status(self, username):
-        """Get user status (active/expired/locked)"""
-        try:
-            result = subprocess.run(['passwd', '-S', username], capture_output=True, text=True)
-            if result.returncode == 0:
-                status_line = result.stdout.strip()
-                if 'L' in status_line:
-                    return 'locked'
-                elif 'P' in status_line:
-                    return 'active'
-                else:
-                    return 'expired'
-            return 'unknown'
-        except:
-            return 'unknown'
+    def render_config(self, username, options=None):
+        """Config client dari record akun: (text, etag), atau None jika akun tidak ada"""
+        record = self.store.get(username)
+        if record is None or len(record) < 3:
+            return None
+        key = ("ssh", tuple(record))
+        return get_config_renderer().render(key, lambda: self._render_config(record))
     
-    def _create_config_file(self, username, password, ip_limit, duration, is_trial=False):
-        """Create SSH config file"""
-        server_info = self._get_server_info()
-        
-        config_content = f"""◇━━━━━━━━━━━━━━━━━◇
-Format SSH OVPN Account
-◇━━━━━━━━━━━━━━━━━◇
-Username         : {username}
-Password         : {password}
-◇━━━━━━━━━━━━━━━━━◇
-IP Limit         : {ip_limit}
-Host             : {self.domain}
-Port OpenSSH     : 443, 80, 22
-Port Dropbear    : 443, 109
-Port SSH UDP     : 1-65535
-Port SSH WS      : 80, 8080, 8081-9999
-Port SSH SSL WS  : 443
-Port SSL/TLS     : 400-900
-Port OVPN WS SSL : 443
-Port OVPN SSL    : 443
-Port OVPN TCP    : 1194
-Port OVPN UDP    : 2200
-BadVPN UDP       : 7100, 7300, 7300
-Location         : {server_info['city']}
-ISP              : {server_info['isp']}
-Host Slowdns     : {server_info['ns']}
-Pub Key          : {server_info['pub']}
-◇━━━━━━━━━━━━━━━━━◇
-Aktif Selama     : {duration} {'Menit' if is_trial else 'Hari'}
-Dibuat Pada      : {datetime.now().strftime('%d %b %Y')}
-Berakhir Pada    : {datetime.now().strftime('%d %b %Y')}
-===============================
-Payload WSS: GET wss://bug.com/ HTTP/1.1[crlf]Host: {self.domain}[crlf]Upgrade: websocket[crlf][crlf] 
-===============================
-OVPN Download : https://{self.domain}:81/
-==============================="""
-        
-        os.makedirs(self.web_path, exist_ok=True)
-        with open(f"{self.web_path}/ssh-{username}.txt", "w") as f:
-            f.write(config_content)
+    def _export_config_file(self, username):
+        """File statis ssh-<user>.txt untuk link :81, ditulis di background"""
+        def render():
+            rendered = self.render_config(username)
+            return rendered[0] if rendered else None
+        get_config_renderer().export(f"{self.web_path}/ssh-{username}.txt", render)
+    
+    def _render_config(self, record):
+        """Render config SSH dari record [username, password, ip_limit, expiry]"""
+        username, password, ip_limit = record[:3]
+        expiry = record[3] if len(record) > 3 else ""
+        return get_share_links().render(
+            "ssh", "config", username=username, password=password, ip_limit=ip_limit,
+            duration_text=remaining_text(expiry), expiry_text=format_expiry(expiry)
+        )
     
     def _send_telegram_notification(self, username, password, ip_limit, duration, is_trial=False):
         """Send notification to Telegram bot"""
         try:
             # Get bot config
-            bot_config = self._get_bot_config()
+            bot_config = get_bot_config()
             if not bot_config:
                 return
             
-            server_info = self._get_server_info()
             duration_text = f"{duration} Menit" if is_trial else f"{duration} Hari"
+            message = get_share_links().render(
+                "ssh", "telegram", username=username, password=password, ip_limit=ip_limit,
+                duration_text=duration_text
+            )
             
-            message = f"""<code>---------------------------------------------------</code>
-<code>SSH OVPN Account</code>
-<code>---------------------------------------------------</code>
-<code>Username : {username}</code>
-<code>Password : {password}</code>
-<code>Limit IP : {ip_limit}</code>
-<code>Host : {self.domain}</code>
-<code>Port OpenSSH : 443, 80, 22</code>
-<code>Port Dropbear : 443, 109</code>
-<code>Port SSH WS : 80, 8080, 8081-9999</code>
-<code>Port SSH UDP : 1-65535</code>
-<code>Port SSH SSL WS : 443</code>
-<code>Port SSL/TLS : 400-900</code>
-<code>Port OVPN WS SSL : 443</code>
-<code>Port OVPN SSL : 443</code>
-<code>Port OVPN TCP : 443, 1194</code>
-<code>Port OVPN UDP : 2200</code>
-<code>BadVPN UDP : 7100, 7300, 7300</code>
-<code>Host Slowdns : {server_info['ns']}</code>
-<code>Pub Key : {server_info['pub']}</code>
-<code>---------------------------------------------------</code>
-<code>Port 80 : {self.domain}:80@{username}:{password}</code>
-<code>Port 443 : {self.domain}:443@{username}:{password}</code>
-<code>Udp Custom : {self.domain}:1-65535@{username}:{password}</code>
-<code>---------------------------------------------------</code>
-<code>Payload WSS :</code>
-<code>GET wss://bug.com/ HTTP/1.1[crlf]Host: {self.domain}[crlf]Upgrade: websocket[crlf][crlf]</code>
-<code>---------------------------------------------------</code>
-<code>PAYLOAD TLS :</code>
-<code>GET wss://[host]/ HTTP/1.1[crlf]Host: [host][crlf]Connection: Upgrade[crlf]User-Agent: [ua][crlf]Upgrade: websocket[crlf][crlf]</code>
-<code>---------------------------------------------------</code>
-OVPN Download : https://{self.domain}:81/
-<code>---------------------------------------------------</code>
-<code>Save Link Account :</code>https://{self.domain}:81/ssh-{username}.txt
-<code>---------------------------------------------------</code>
-Aktif Selama : {duration_text}
-<code>---------------------------------------------------</code>"""
-            
-            # Send to Telegram
-            url = f"https://api.telegram.org/bot{bot_config['key']}/sendMessage"
-            data = {
-                'chat_id': bot_config['chat_id'],
-                'text': message,
-                'parse_mode': 'html',
-                'disable_web_page_preview': True
-            }
-            
-            subprocess.run(['curl', '-s', '--max-time', '10', '-d', json.dumps(data), url], check=True)
+            # Send to Telegram (diantrikan, dikirim di background)
+            get_telegram_notifier().send(bot_config['key'], bot_config['chat_id'], message)
             
         except Exception as e:
             logger.error(f"Error sending Telegram notification: {e}")
-    
-    def _get_bot_config(self):
-        """Get Telegram bot configuration"""
-        try:
-            if os.path.exists("/etc/bot/.bot.db"):
-                with open("/etc/bot/.bot.db", "r") as f:
-                    for line in f:
-                        if line.startswith("#bot# "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                return {
-                                    'key': parts[1],
-                                    'chat_id': parts[2]
-                                }
-            return None
-        except:
-            return None
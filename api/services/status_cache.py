@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Status Cache untuk AlrelShop API Panel
+Ringkasan get_info() semua service disimpan di memory, sehingga /api/status
+(up/down) dan /api/admin/status (jumlah akun, domain) dijawab tanpa membaca
+database atau menjalankan proses apa pun.
+
+- Service dengan account store di-refresh segera setelah create/delete/renew
+  (store memanggil listener setelah menulis)
+- Refresher background menghitung ulang semua service tiap `ttl` detik, untuk
+  menangkap perubahan dari luar API (script m-*, worker gunicorn lain)
+- Setiap snapshot membawa `updated_at` dan `stale_after`
+"""
+
+import threading
+import time
+import logging
+from datetime import datetime
+
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 30
+DEFAULT_DEBOUNCE_MS = 200
+
+
+class ServiceStatusCache:
+    """Snapshot get_info() per service dengan refresh background + invalidasi saat ada perubahan"""
+
+    def __init__(self, services, ttl=DEFAULT_TTL, debounce_ms=DEFAULT_DEBOUNCE_MS):
+        self.services = services
+        self.ttl = ttl
+        self.debounce = debounce_ms / 1000.0
+        self._cond = threading.Condition()
+        self._snapshots = {}
+        self._dirty = set()
+        self._worker = None
+        self._stopped = False
+        self._metrics = {"refreshes": 0, "refresh_ms_total": 0.0, "invalidations": 0}
+
+        for name, service in services.items():
+            store = getattr(service, "store", None)
+            if store is not None and hasattr(store, "subscribe"):
+                store.subscribe(lambda name=name: self.invalidate(name))
+
+    def invalidate(self, name):
+        """Tandai service berubah; refresher menghitung ulang setelah debounce singkat"""
+        with self._cond:
+            self._dirty.add(name)
+            self._metrics["invalidations"] += 1
+            self._cond.notify_all()
+
+    def get(self):
+        """Snapshot semua service (dari memory, refresh sinkron hanya saat pertama kali)"""
+        with self._cond:
+            missing = [name for name in self.services if name not in self._snapshots]
+            self._ensure_worker()
+        for name in missing:
+            self._refresh(name)
+
+        with self._cond:
+            services = {name: dict(self._snapshots[name]["info"]) for name in self.services}
+            updated_at = min(self._snapshots[name]["updated_at"] for name in self.services)
+        return {
+            "services": services,
+            "updated_at": datetime.fromtimestamp(updated_at).isoformat(),
+            "stale_after": datetime.fromtimestamp(updated_at + self.ttl).isoformat(),
+            "age_ms": round((time.time() - updated_at) * 1000, 1),
+        }
+
+    def stats(self):
+        with self._cond:
+            m = dict(self._metrics)
+        refreshes = m.pop("refreshes")
+        refresh_total = m.pop("refresh_ms_total")
+        return {
+            "ttl": self.ttl,
+            "refreshes": refreshes,
+            "avg_refresh_ms": round(refresh_total / refreshes, 2) if refreshes else 0.0,
+            "invalidations": m["invalidations"],
+        }
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _refresh(self, name):
+        started = time.perf_counter()
+        try:
+            info = self.services[name].get_info()
+        except Exception as e:
+            logger.error(f"Error getting info for {name}: {e}")
+            info = {"status": "error", "message": str(e)}
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._cond:
+            self._snapshots[name] = {"info": info, "updated_at": time.time()}
+            self._metrics["refreshes"] += 1
+            self._metrics["refresh_ms_total"] += elapsed
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="status-cache-refresher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.time()
+                expired = [
+                    name for name, snap in self._snapshots.items()
+                    if now - snap["updated_at"] >= self.ttl
+                ]
+                if not self._dirty and not expired:
+                    oldest = min((snap["updated_at"] for snap in self._snapshots.values()), default=now)
+                    self._cond.wait(max(oldest + self.ttl - now, 0.05))
+                    if self._stopped:
+                        return
+                    continue
+                if self._dirty:
+                    # Gabungkan burst perubahan (misal batch create) jadi satu refresh
+                    self._cond.wait(self.debounce)
+                if self._stopped:
+                    return
+                names = self._dirty.union(expired)
+                self._dirty = set()
+
+            for name in names:
+                if name in self.services:
+                    self._refresh(name)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_status_cache(services=None):
+    """Cache bersama; services wajib diisi saat pemanggilan pertama"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            settings = get_section("status_cache")
+            _cache = ServiceStatusCache(
+                services,
+                ttl=settings.get("ttl", DEFAULT_TTL),
+                debounce_ms=settings.get("debounce_ms", DEFAULT_DEBOUNCE_MS),
+            )
+        return _cache
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+System Account Reader untuk AlrelShop API Panel
+Status akun SSH (ada/tidak, locked/active/expired) langsung dari /etc/passwd dan
+/etc/shadow, menggantikan `id <user>` dan `passwd -S <user>` per akun.
+
+Kedua file di-parse sekali lalu disimpan di memory; parse ulang hanya jika
+inode/mtime/size salah satu file berubah (useradd, passwd, chage, dst).
+"""
+
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+class SystemAccountReader:
+    """Cache /etc/passwd + /etc/shadow dengan status akun untuk semua user sekaligus"""
+
+    def __init__(self, root="/"):
+        self.passwd_path = os.path.join(root, "etc/passwd")
+        self.shadow_path = os.path.join(root, "etc/shadow")
+        self._lock = threading.Lock()
+        self._signature = None
+        self._users = set()
+        self._shadow = {}
+
+    def _ensure_fresh(self):
+        signature = (_signature(self.passwd_path), _signature(self.shadow_path))
+        if signature != self._signature:
+            self._load(signature)
+
+    def _load(self, signature):
+        users = set()
+        shadow = {}
+        try:
+            with open(self.passwd_path, "r") as f:
+                for line in f:
+                    name = line.split(":", 1)[0]
+                    if name and not name.startswith("#"):
+                        users.add(name)
+        except FileNotFoundError:
+            pass
+
+        try:
+            with open(self.shadow_path, "r") as f:
+                for line in f:
+                    fields = line.rstrip("\n").split(":")
+                    if len(fields) >= 2 and fields[0]:
+                        # (password hash, tanggal expire akun dalam hari sejak epoch atau None)
+                        expire = fields[7] if len(fields) > 7 else ""
+                        shadow[fields[0]] = (fields[1], int(expire) if expire.lstrip("-").isdigit() else None)
+        except FileNotFoundError:
+            pass
+        except PermissionError as e:
+            logger.warning(f"Tidak bisa membaca {self.shadow_path}: {e}")
+
+        self._users = users
+        self._shadow = shadow
+        self._signature = signature
+        logger.debug(f"Loaded {len(users)} system users from {self.passwd_path}")
+
+    def _status_of(self, username, today):
+        if username not in self._users:
+            return "unknown"
+        entry = self._shadow.get(username)
+        if entry is None:
+            return "unknown"
+        password, expire = entry
+        # Sama dengan passwd -S: "!"/"*" = L (locked), kosong = NP, selain itu P
+        if password.startswith("!") or password.startswith("*"):
+            return "locked"
+        if not password:
+            return "expired"
+        if expire is not None and 0 <= expire <= today:
+            # useradd -e: akun tidak bisa login mulai tanggal expire
+            return "expired"
+        return "active"
+
+    # --- Public API ---
+
+    def exists(self, username):
+        with self._lock:
+            self._ensure_fresh()
+            return username in self._users
+
+    def status(self, username):
+        """locked / active / expired / unknown untuk satu user"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._status_of(username, int(time.time() // SECONDS_PER_DAY))
+
+    def statuses(self, usernames=None):
+        """Status banyak user dalam satu pass: {username: status}"""
+        with self._lock:
+            self._ensure_fresh()
+            today = int(time.time() // SECONDS_PER_DAY)
+            names = self._users if usernames is None else usernames
+            return {name: self._status_of(name, today) for name in names}
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_system_accounts(root="/"):
+    """Reader bersama per root filesystem"""
+    with _readers_lock:
+        reader = _readers.get(root)
+        if reader is None:
+            reader = SystemAccountReader(root)
+            _readers[root] = reader
+        return reader
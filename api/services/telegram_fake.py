@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Fake Telegram Bot API untuk AlrelShop API Panel
+Meniru endpoint sendMessage secara lokal supaya TelegramNotifier bisa dites
+tanpa bot sungguhan (termasuk 429 dan error 5xx).
+
+Contoh:
+    server = FakeTelegramServer().start()
+    notifier = TelegramNotifier(api_base=server.url, spool_dir=None, batch_window_ms=0)
+    notifier.send("123:abc", "42", "halo")
+    notifier.flush(timeout=5)
+    assert server.messages[0]["text"] == "halo"
+    server.stop()
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTelegramServer:
+    """HTTP server di thread terpisah yang mencatat semua sendMessage"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.bind = (host, port)
+        self.url = None
+        self.messages = []
+        self.requests = 0
+        self.connections = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def fail_next(self, status, retry_after=None, count=1):
+        """Balas `count` request berikutnya dengan status error (mis. 429 + retry_after)"""
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, payload = fake._handle(self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(self.bind, Handler)
+        self._server.daemon_threads = True
+        host, port = self._server.server_address[:2]
+        self.url = f"http://{host}:{port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handle(self, path, body):
+        with self._lock:
+            self.requests += 1
+            if not path.endswith("/sendMessage") or "/bot" not in path:
+                return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+            if self._failures:
+                status, retry_after = self._failures.pop(0)
+                payload = {"ok": False, "error_code": status, "description": f"Fake error {status}"}
+                if retry_after is not None:
+                    payload["parameters"] = {"retry_after": retry_after}
+                return status, payload
+            try:
+                message = json.loads(body)
+            except ValueError:
+                return 400, {"ok": False, "error_code": 400, "description": "Bad Request: invalid JSON"}
+            message["token"] = path.split("/bot", 1)[1].split("/", 1)[0]
+            self.messages.append(message)
+            return 200, {"ok": True, "result": {"message_id": len(self.messages)}}
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Telegram Notifier untuk AlrelShop API Panel
+Pengiriman notifikasi Telegram di background, supaya response create akun
+tidak lagi menunggu `curl --max-time 10` ke api.telegram.org.
+
+- Queue terbatas, diproses satu worker thread
+- Satu koneksi HTTPS keep-alive (http.client), reconnect otomatis
+- Retry dengan exponential backoff, menghormati 429 retry_after
+- Pesan ke chat yang sama digabung jadi satu sendMessage (maks 4096 karakter)
+- Spool file per proses: pesan yang belum terkirim tetap ada setelah restart
+"""
+
+import http.client
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from collections import deque
+from urllib.parse import urlsplit
+
+from services.request_timing import traced
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_BASE = "https://api.telegram.org"
+DEFAULT_SPOOL_DIR = "/etc/API-Panel/data/telegram-spool"
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BATCH_WINDOW_MS = 500
+DEFAULT_TIMEOUT = 10
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_BACKOFF = 60
+MESSAGE_SEPARATOR = "\n\n"
+
+
+class TelegramNotifier:
+    """Dispatcher notifikasi Telegram dengan queue, batching per chat dan spool file"""
+
+    def __init__(self, api_base=DEFAULT_API_BASE, spool_dir=DEFAULT_SPOOL_DIR, queue_size=DEFAULT_QUEUE_SIZE,
+                 max_retries=DEFAULT_MAX_RETRIES, batch_window_ms=DEFAULT_BATCH_WINDOW_MS, timeout=DEFAULT_TIMEOUT):
+        parts = urlsplit(api_base)
+        self.scheme = parts.scheme or "https"
+        self.host = parts.netloc
+        self.base_path = parts.path.rstrip("/")
+        self.spool_dir = spool_dir
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.batch_window = batch_window_ms / 1000.0
+        self.timeout = timeout
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._worker = None
+        self._inflight = False
+        self._stopped = False
+        self._conn = None
+        self._spool_lock = threading.Lock()
+        self._spool_path = None
+
+        self._metrics = {
+            "enqueued": 0,
+            "sent_messages": 0,
+            "sent_requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "dropped": 0,
+            "last_error": None,
+        }
+
+        self._recover_spool()
+
+    # --- Public API ---
+
+    @traced("telegram")
+    def send(self, token, chat_id, text, parse_mode="html", disable_web_page_preview=True):
+        """Masukkan pesan ke queue (non-blocking). Return False jika queue penuh."""
+        message = {
+            "id": uuid.uuid4().hex,
+            "token": token,
+            "chat_id": str(chat_id),
+            "text": text,
+            "parse_mode": parse_mode,
+            "disable_web_page_preview": disable_web_page_preview,
+            "queued_at": time.time(),
+        }
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                self._metrics["dropped"] += 1
+                logger.error(f"Telegram queue penuh ({self.queue_size}), pesan ke {chat_id} dibuang")
+                return False
+            self._spool_write({"op": "add", "message": message})
+            self._queue.append(message)
+            self._metrics["enqueued"] += 1
+            self._ensure_worker()
+            self._cond.notify_all()
+        return True
+
+    def flush(self, timeout=None):
+        """Tunggu sampai queue kosong (dipakai saat shutdown/test)"""
+        end = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            while self._queue or self._inflight:
+                remaining = end - time.monotonic() if end else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._close_connection()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._metrics)
+            stats["queued"] = len(self._queue)
+        return stats
+
+    # --- Worker ---
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # Tunggu sebentar supaya pesan beruntun ke chat yang sama bisa digabung
+                deadline = self._queue[0]["queued_at"] + self.batch_window
+                while not self._stopped and time.time() < deadline:
+                    self._cond.wait(deadline - time.time())
+                if self._stopped:
+                    return
+                group = self._take_group()
+                self._inflight = True
+
+            try:
+                self._deliver(group)
+            finally:
+                with self._cond:
+                    self._inflight = False
+                    self._spool_ack([message["id"] for message in group], compact=not self._queue)
+                    self._cond.notify_all()
+
+    def _take_group(self):
+        """Ambil pesan pertama + pesan lain ke chat yang sama selama muat dalam satu sendMessage"""
+        first = self._queue.popleft()
+        key = (first["token"], first["chat_id"], first["parse_mode"])
+        group = [first]
+        length = len(first["text"])
+        remaining = deque()
+        while self._queue:
+            message = self._queue.popleft()
+            extra = len(MESSAGE_SEPARATOR) + len(message["text"])
+            if (message["token"], message["chat_id"], message["parse_mode"]) == key and length + extra <= MAX_MESSAGE_LENGTH:
+                group.append(message)
+                length += extra
+            else:
+                remaining.append(message)
+        self._queue = remaining
+        return group
+
+    def _deliver(self, group):
+        first = group[0]
+        payload = {
+            "chat_id": first["chat_id"],
+            "text": MESSAGE_SEPARATOR.join(message["text"] for message in group),
+            "parse_mode": first["parse_mode"],
+            "disable_web_page_preview": first["disable_web_page_preview"],
+        }
+        path = f"{self.base_path}/bot{first['token']}/sendMessage"
+        body = json.dumps(payload).encode()
+
+        attempt = 0
+        while True:
+            try:
+                status, response = self._post(path, body)
+            except Exception as e:
+                status, response = None, {"description": str(e)}
+                self._close_connection()
+
+            if status == 200:
+                with self._cond:
+                    self._metrics["sent_requests"] += 1
+                    self._metrics["sent_messages"] += len(group)
+                return True
+
+            if status == 429:
+                retry_after = response.get("parameters", {}).get("retry_after", 1)
+                with self._cond:
+                    self._metrics["rate_limited"] += 1
+                logger.warning(f"Telegram rate limit, retry setelah {retry_after}s")
+                if self._sleep(retry_after):
+                    return False
+                continue
+
+            error = f"HTTP {status}: {response.get('description')}" if status else response.get("description")
+            with self._cond:
+                self._metrics["last_error"] = error
+            if status is not None and 400 <= status < 500:
+                # Request salah (token/chat_id), retry tidak akan membantu
+                logger.error(f"Telegram menolak pesan ke {first['chat_id']}: {error}")
+                self._count_dropped(group)
+                return False
+
+            attempt += 1
+            if attempt > self.max_retries:
+                logger.error(f"Gagal kirim Telegram ke {first['chat_id']} setelah {self.max_retries} retry: {error}")
+                self._count_dropped(group)
+                return False
+            with self._cond:
+                self._metrics["retries"] += 1
+            if self._sleep(min(2 ** (attempt - 1), MAX_BACKOFF)):
+                return False
+
+    def _count_dropped(self, group):
+        with self._cond:
+            self._metrics["dropped"] += len(group)
+
+    def _sleep(self, seconds):
+        """Sleep yang bisa dibangunkan stop(); return True jika notifier dihentikan"""
+        end = time.monotonic() + seconds
+        with self._cond:
+            while not self._stopped:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    # --- HTTP keep-alive ---
+
+    def _get_connection(self):
+        if self._conn is None:
+            if self.scheme == "https":
+                self._conn = http.client.HTTPSConnection(self.host, timeout=self.timeout)
+            else:
+                self._conn = http.client.HTTPConnection(self.host, timeout=self.timeout)
+        return self._conn
+
+    def _close_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _post(self, path, body):
+        conn = self._get_connection()
+        conn.request("POST", path, body=body, headers={
+            "Content-Type": "application/json",
+            "Connection": "keep-alive",
+        })
+        response = conn.getresponse()
+        data = response.read()
+        if response.getheader("Connection", "").lower() == "close":
+            self._close_connection()
+        try:
+            parsed = json.loads(data) if data else {}
+        except ValueError:
+            parsed = {"description": data[:200].decode(errors="replace")}
+        return response.status, parsed
+
+    # --- Spool file ---
+
+    def _recover_spool(self):
+        """Ambil alih spool milik proses yang sudah mati lalu masukkan lagi ke queue"""
+        if not self.spool_dir:
+            return
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Spool Telegram dinonaktifkan: {e}")
+            self.spool_dir = None
+            return
+
+        self._spool_path = os.path.join(self.spool_dir, f"spool-{os.getpid()}.jsonl")
+        recovered = []
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not name.startswith("spool-") or not name.endswith(".jsonl"):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            pid = name[len("spool-"):-len(".jsonl")]
+            if path != self._spool_path and pid.isdigit() and _pid_alive(int(pid)):
+                continue
+            claimed = f"{path}.claim-{os.getpid()}"
+            try:
+                # rename atomik: hanya satu worker yang berhasil mengambil spool ini
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            recovered.extend(_read_spool(claimed))
+            os.remove(claimed)
+
+        if recovered:
+            logger.info(f"Recovered {len(recovered)} pending Telegram notification(s) from spool")
+            with self._cond:
+                for message in recovered[-self.queue_size:]:
+                    self._spool_write({"op": "add", "message": message})
+                    self._queue.append(message)
+                self._ensure_worker()
+                self._cond.notify_all()
+
+    def _spool_write(self, entry):
+        if not self._spool_path:
+            return
+        try:
+            with self._spool_lock, open(self._spool_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            logger.warning(f"Gagal menulis spool Telegram: {e}")
+
+    def _spool_ack(self, ids, compact=False):
+        if not self._spool_path:
+            return
+        try:
+            with self._spool_lock:
+                if compact:
+                    # Queue kosong, semua pesan di spool sudah selesai
+                    open(self._spool_path, "w").close()
+                else:
+                    with open(self._spool_path, "a") as f:
+                        f.writelines(json.dumps({"op": "ack", "id": message_id}) + "\n" for message_id in ids)
+        except OSError as e:
+            logger.warning(f"Gagal menulis spool Telegram: {e}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _read_spool(path):
+    pending = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("op") == "add":
+                    pending[entry["message"]["id"]] = entry["message"]
+                elif entry.get("op") == "ack":
+                    pending.pop(entry.get("id"), None)
+    except OSError:
+        pass
+    return list(pending.values())
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_telegram_notifier():
+    """Notifier bersama untuk semua service class"""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            settings = get_section("telegram")
+            _notifier = TelegramNotifier(
+                api_base=settings.get("api_base", DEFAULT_API_BASE),
+                spool_dir=settings.get("spool_dir", DEFAULT_SPOOL_DIR),
+                queue_size=settings.get("queue_size", DEFAULT_QUEUE_SIZE),
+                max_retries=settings.get("max_retries", DEFAULT_MAX_RETRIES),
+                batch_window_ms=settings.get("batch_window_ms", DEFAULT_BATCH_WINDOW_MS),
+                timeout=settings.get("timeout", DEFAULT_TIMEOUT),
+            )
+        return _notifier
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Traffic Ledger untuk AlrelShop API Panel
+Total trafik per user yang tetap ada walau counter Xray kembali 0 setiap restart.
+
+- snapshot(): satu QueryStats dengan reset=true (Xray mengembalikan nilai counter
+  sekaligus menolkannya), delta yang tidak nol ditambahkan sebagai satu baris
+  JSON ke file ledger (append-only). Dipanggil berkala dan oleh restart scheduler
+  tepat sebelum Xray di-restart, jadi trafik tidak hilang saat reload
+- Setiap worker menyimpan total di memory dan hanya membaca baris baru dari file
+  (mulai offset terakhir); file yang sudah di-compact (inode berubah) dibaca ulang
+- Compaction: jika file melebihi compact_after baris, isinya diganti satu baris
+  snapshot berisi total semua user (temp file + rename)
+- Per user: lifetime, pemakaian kuota (sejak reset terakhir), per hari
+  (retention_days) dan per bulan (retention_months)
+
+Format baris:
+    {"t": 1792266344.9, "d": {"budi": [uplink, downlink]}}   delta
+    {"t": ..., "reset": ["budi"]}                              reset pemakaian kuota
+    {"t": ..., "snapshot": {"budi": {...}}}                     hasil compaction
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+
+from services.file_lock import InterProcessLock, lock_path_for
+from services.metrics import get_metrics
+from services.request_timing import span
+from services.settings import get_section
+from services.xray_api import XrayAPIError, XrayStatsClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "/etc/API-Panel/data/traffic-ledger.jsonl"
+DEFAULT_LOCK_PATH = "/etc/API-Panel/data/traffic-ledger.lock"
+DEFAULT_INTERVAL = 60
+DEFAULT_COMPACT_AFTER = 2000
+DEFAULT_RETENTION_DAYS = 62
+DEFAULT_RETENTION_MONTHS = 24
+
+
+def _new_entry():
+    return {"total": [0, 0], "quota": [0, 0], "days": {}, "months": {}}
+
+
+def _add(pair, uplink, downlink):
+    pair[0] += uplink
+    pair[1] += downlink
+
+
+def _usage(pair):
+    return {"uplink": pair[0], "downlink": pair[1], "total": pair[0] + pair[1]}
+
+
+class TrafficLedger:
+    """Akumulasi counter trafik Xray di file append-only + total di memory"""
+
+    def __init__(self, path=DEFAULT_PATH, client=None, interval=DEFAULT_INTERVAL, compact_after=DEFAULT_COMPACT_AFTER,
+                 retention_days=DEFAULT_RETENTION_DAYS, retention_months=DEFAULT_RETENTION_MONTHS, lock_path=None):
+        self.path = path
+        self.client = client or XrayStatsClient()
+        self.interval = interval
+        self.compact_after = compact_after
+        self.retention_days = retention_days
+        self.retention_months = retention_months
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._file_lock = InterProcessLock(lock_path_for(path))
+        self._process_lock = InterProcessLock(lock_path) if lock_path else None
+
+        self._users = {}
+        self._inode = None
+        self._offset = 0
+        self._lines = 0
+        self._updated_at = None
+        # Delta yang sudah di-reset di Xray tapi gagal ditulis, dicoba lagi snapshot berikutnya
+        self._pending = {}
+
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopped = False
+        self._metrics = {
+            "snapshots": 0,
+            "skipped_snapshots": 0,
+            "compactions": 0,
+            "last_snapshot_at": None,
+            "last_snapshot_users": 0,
+            "last_snapshot_ms": None,
+            "last_error": None,
+        }
+
+    # --- Baca file ---
+
+    def _apply(self, record):
+        t = record.get("t", 0)
+        if "snapshot" in record:
+            self._users = {
+                email: {
+                    "total": list(entry.get("total", [0, 0])),
+                    "quota": list(entry.get("quota", [0, 0])),
+                    "days": {key: list(pair) for key, pair in entry.get("days", {}).items()},
+                    "months": {key: list(pair) for key, pair in entry.get("months", {}).items()},
+                }
+                for email, entry in record["snapshot"].items()
+            }
+        for email in record.get("reset", []):
+            entry = self._users.get(email)
+            if entry is not None:
+                entry["quota"] = [0, 0]
+        deltas = record.get("d")
+        if deltas:
+            moment = datetime.fromtimestamp(t)
+            day, month = moment.strftime("%Y-%m-%d"), moment.strftime("%Y-%m")
+            for email, (uplink, downlink) in deltas.items():
+                entry = self._users.get(email)
+                if entry is None:
+                    entry = self._users[email] = _new_entry()
+                _add(entry["total"], uplink, downlink)
+                _add(entry["quota"], uplink, downlink)
+                days, months = entry["days"], entry["months"]
+                if day not in days:
+                    days[day] = [0, 0]
+                    self._prune(days, self.retention_days)
+                if month not in months:
+                    months[month] = [0, 0]
+                    self._prune(months, self.retention_months)
+                _add(days[day], uplink, downlink)
+                _add(months[month], uplink, downlink)
+        self._updated_at = max(self._updated_at or 0, t) or None
+
+    @staticmethod
+    def _prune(buckets, keep):
+        # Key tanggal terurut secara string, cukup buang yang paling lama
+        if len(buckets) > keep:
+            for key in sorted(buckets)[:len(buckets) - keep]:
+                del buckets[key]
+
+    def _read_from(self, f, offset):
+        f.seek(offset)
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"Baris ledger rusak dilewati di {self.path}")
+                continue
+            if "snapshot" in record:
+                self._lines = 0
+            self._lines += 1
+            self._apply(record)
+        return offset + end
+
+    def _ensure_fresh(self):
+        """Baca baris yang ditambahkan worker lain; baca ulang penuh jika file diganti (compaction)"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._inode is not None:
+                self._users, self._inode, self._offset, self._lines = {}, None, 0, 0
+            return
+        if st.st_ino == self._inode and st.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            # fstat: file bisa saja diganti di antara stat() dan open()
+            st = os.fstat(f.fileno())
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self._users, self._offset, self._lines, self._updated_at = {}, 0, 0, None
+            self._offset = self._read_from(f, self._offset)
+            self._inode = st.st_ino
+
+    # --- Tulis file ---
+
+    def _append(self, record):
+        with self._lock, self._file_lock:
+            self._ensure_fresh()
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, (json.dumps(record, separators=(",", ":")) + "\n").encode())
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._ensure_fresh()
+            if self._lines > self.compact_after:
+                self._compact()
+
+    def _compact(self):
+        """Ganti isi file dengan satu baris snapshot (dipanggil dengan flock dipegang)"""
+        record = {"t": self._updated_at or time.time(), "snapshot": self._users}
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".ledger-", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        st = os.stat(self.path)
+        self._inode, self._offset, self._lines = st.st_ino, st.st_size, 1
+        self._metrics["compactions"] += 1
+
+    # --- Snapshot ---
+
+    def snapshot(self, reason=None):
+        """Pindahkan counter Xray ke ledger (baca + reset); return jumlah user dengan delta"""
+        started = time.monotonic()
+        # Lock terpisah: call gRPC tidak menahan pembaca total di memory
+        with self._snapshot_lock:
+            try:
+                with span("traffic_snapshot"):
+                    traffic = self.client.user_traffic(reset=True)
+            except XrayAPIError as e:
+                self._metrics["last_error"] = str(e)
+                logger.warning(f"Snapshot trafik gagal ({reason or 'interval'}): {e}")
+                return 0
+            deltas = self._pending
+            for email, (uplink, downlink) in traffic.items():
+                if uplink or downlink:
+                    _add(deltas.setdefault(email, [0, 0]), uplink, downlink)
+            if deltas:
+                try:
+                    self._append({"t": round(time.time(), 3), "d": deltas})
+                    self._pending = {}
+                except OSError as e:
+                    self._pending = deltas
+                    self._metrics["last_error"] = str(e)
+                    logger.error(f"Gagal menulis ledger {self.path}: {e}")
+                    return 0
+            self._metrics["snapshots"] += 1
+            self._metrics["last_snapshot_at"] = time.time()
+            self._metrics["last_snapshot_users"] = len(deltas)
+            self._metrics["last_snapshot_ms"] = round((time.monotonic() - started) * 1000, 1)
+        get_metrics().inc("api_traffic_snapshots_total", reason=reason or "interval")
+        return len(deltas)
+
+    def reset_quota(self, emails):
+        """Nolkan pemakaian kuota user (lifetime dan per periode tetap)"""
+        emails = [email for email in emails if email]
+        if emails:
+            self._append({"t": round(time.time(), 3), "reset": emails})
+
+    # --- Reads (dari memory) ---
+
+    def quota_usage(self):
+        """{email: [uplink, downlink]} pemakaian sejak reset kuota terakhir, semua user"""
+        with self._lock:
+            self._ensure_fresh()
+            return {email: list(entry["quota"]) for email, entry in self._users.items()}
+
+    def usage(self, email, now=None):
+        """Total lifetime + per periode satu user, atau None jika belum ada trafik tercatat"""
+        with self._lock:
+            self._ensure_fresh()
+            entry = self._users.get(email)
+            if entry is None:
+                return None
+            days = dict(entry["days"])
+            months = dict(entry["months"])
+            totals = [list(entry["total"]), list(entry["quota"])]
+            updated_at = self._updated_at
+
+        now = now or datetime.now()
+        today = now.strftime("%Y-%m-%d")
+
+        def since(days_back):
+            start = (now - timedelta(days=days_back - 1)).strftime("%Y-%m-%d")
+            pair = [0, 0]
+            for day, (uplink, downlink) in days.items():
+                if start <= day <= today:
+                    _add(pair, uplink, downlink)
+            return _usage(pair)
+
+        return {
+            "username": email,
+            "lifetime": _usage(totals[0]),
+            "quota_usage": _usage(totals[1]),
+            "periods": {
+                "today": _usage(days.get(today, [0, 0])),
+                "last_7_days": since(7),
+                "last_30_days": since(30),
+                "this_month": _usage(months.get(now.strftime("%Y-%m"), [0, 0])),
+            },
+            "daily": {day: _usage(pair) for day, pair in sorted(days.items())},
+            "monthly": {month: _usage(pair) for month, pair in sorted(months.items())},
+            "updated_at": datetime.fromtimestamp(updated_at).isoformat(timespec="seconds") if updated_at else None,
+        }
+
+    # --- Background ---
+
+    def start(self):
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped = False
+                self._worker = threading.Thread(target=self._run, name="traffic-ledger", daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+            try:
+                self._tick()
+            except Exception as e:
+                logger.error(f"Traffic ledger tick error: {e}")
+                self._metrics["last_error"] = str(e)
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(self.interval)
+
+    def _tick(self):
+        if self._process_lock is None:
+            self.snapshot()
+            return
+        with self._process_lock:
+            try:
+                last_run = float(self._process_lock.read() or 0)
+            except ValueError:
+                last_run = 0.0
+            if time.time() - last_run < self.interval * 0.9:
+                # Worker lain baru saja snapshot
+                self._metrics["skipped_snapshots"] += 1
+                return
+            self.snapshot()
+            self._process_lock.write(repr(time.time()))
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+            m.update({"users": len(self._users), "lines": self._lines, "pending_users": len(self._pending)})
+        m.update({"enabled": self._worker is not None, "interval": self.interval, "path": self.path})
+        return m
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_traffic_ledger():
+    """Ledger bersama; None jika traffic_ledger dimatikan"""
+    global _ledger
+    settings = get_section("traffic_ledger")
+    if not settings.get("enabled", False):
+        return None
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = TrafficLedger(
+                path=settings.get("path", DEFAULT_PATH),
+                interval=settings.get("interval", DEFAULT_INTERVAL),
+                compact_after=settings.get("compact_after", DEFAULT_COMPACT_AFTER),
+                retention_days=settings.get("retention_days", DEFAULT_RETENTION_DAYS),
+                retention_months=settings.get("retention_months", DEFAULT_RETENTION_MONTHS),
+                lock_path=settings.get("lock_path", DEFAULT_LOCK_PATH),
+            )
+        return _ledger
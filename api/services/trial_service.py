@@ -4,62 +4,32 @@ Trial Service Module untuk AlrelShop API Panel
 Mengintegrasikan fungsi-fungsi dari script m-trial
 """
 
-import subprocess
-import json
 import os
-import re
 import uuid
+import time
 from datetime import datetime, timedelta
 import logging
 
+from services.batch_service import current_batch
+from services.expiry_scheduler import get_expiry_scheduler
+from services.host_info import get_host_info
+from services.request_timing import span
+from services.restart_scheduler import check_restart, get_restart_scheduler
+from services.xray_config import get_xray_config
+from services.ssh_provisioner import get_ssh_provisioner
+
 logger = logging.getLogger(__name__)
 
 class TrialService:
     def __init__(self):
-        self.domain = self._get_domain()
         self.trial_db_path = "/etc/trial/.trial.db"
         self.web_path = "/var/www/html"
+        self.xray_config = get_xray_config("/etc/xray/config.json")
         
-    def _get_domain(self):
-        """Get domain dari config"""
-        try:
-            with open("/etc/xray/domain", "r") as f:
-                return f.read().strip()
-        except:
-            return "localhost"
-    
-    def _get_server_info(self):
-        """Get server information"""
-        try:
-            with open("/etc/xray/isp", "r") as f:
-                isp = f.read().strip()
-        except:
-            isp = "Unknown"
-            
-        try:
-            with open("/etc/xray/city", "r") as f:
-                city = f.read().strip()
-        except:
-            city = "Unknown"
-            
-        try:
-            with open("/root/nsdomain", "r") as f:
-                ns = f.read().strip()
-        except:
-            ns = "Unknown"
-            
-        try:
-            with open("/etc/slowdns/server.pub", "r") as f:
-                pub = f.read().strip()
-        except:
-            pub = "Unknown"
-            
-        return {
-            "isp": isp,
-            "city": city,
-            "ns": ns,
-            "pub": pub
-        }
+    @property
+    def domain(self):
+        """Domain server saat ini (ikut berubah jika /etc/xray/domain diganti)"""
+        return get_host_info().domain
     
     def create_trial(self, data):
         """Create trial account untuk semua service"""
@@ -97,8 +67,13 @@ class TrialService:
                 trojan_result = self._create_trial_trojan(minutes)
                 results['trojan'] = trojan_result
             
-            # Add to trial database
+            # Add to trial database + jadwal hapus otomatis
             self._add_to_trial_db(service, minutes, results)
+            self._schedule_expiry(minutes, results)
+            
+            # Reload Xray sekali untuk semua trial Xray yang baru dibuat
+            if service != 'ssh':
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -124,13 +99,15 @@ class TrialService:
             
             # Delete from trial database
             self._remove_from_trial_db(username, service)
+            get_expiry_scheduler().cancel("trial", username)
             
             # Delete from respective service
             if service == 'ssh':
-                subprocess.run(['userdel', '--force', username], check=True)
+                get_ssh_provisioner().delete_user(username)
             elif service in ['vmess', 'vless', 'shadowsocks', 'trojan']:
                 # Remove from Xray config
                 self._remove_from_xray_config(username, service)
+                self._restart_xray()
             
             # Remove config files
             config_file = f"{self.web_path}/{service}-{username}.txt"
@@ -146,6 +123,10 @@ class TrialService:
             logger.error(f"Error deleting trial account: {e}")
             return {"status": "error", "message": str(e)}
     
+    def delete_account(self, data):
+        """Alias delete_trial supaya bisa dipakai BatchService/expiry scheduler"""
+        return self.delete_trial(data)
+    
     def list_trials(self):
         """List semua trial accounts"""
         try:
@@ -183,8 +164,9 @@ class TrialService:
     def get_info(self):
         """Get trial service info"""
         try:
-            total_trials = len(self.list_trials().get('data', []))
-            active_trials = len([trial for trial in self.list_trials().get('data', []) if trial.get('status') == 'active'])
+            trials = self.list_trials().get('data', [])
+            total_trials = len(trials)
+            active_trials = len([trial for trial in trials if trial.get('status') == 'active'])
             
             return {
                 "status": "running",
@@ -207,27 +189,16 @@ class TrialService:
             expiry_date = datetime.now() + timedelta(minutes=minutes)
             expiry_str = expiry_date.strftime("%Y-%m-%d")
             
-            subprocess.run(['useradd', '-e', expiry_str, '-s', '/bin/false', '-M', username], check=True)
-            subprocess.run(['echo', f'{password}\n{password}', '|', 'passwd', username], shell=True, check=True)
-            
-            # Setup IP limit
-            limit_path = "/etc/kyt/limit/ssh/ip"
-            os.makedirs(limit_path, exist_ok=True)
-            with open(f"{limit_path}/{username}", "w") as f:
-                f.write(str(ip_limit))
-            
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/ssh", exist_ok=True)
-            with open(f"/etc/ssh/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            # System user + IP limit + quota (satu transaksi provisioner)
+            get_ssh_provisioner().create_user(
+                username, password, expiry_str,
+                ip_limit=ip_limit,
+                quota_bytes=quota_gb * 1024 * 1024 * 1024
+            )
             
             # Create config file
             self._create_ssh_config(username, password, ip_limit, minutes)
             
-            # Schedule deletion
-            subprocess.run(['echo', f'userdel -f "{username}"', '|', 'at', 'now', '+', str(minutes), 'minutes'], shell=True)
-            
             return {
                 "username": username,
                 "password": password,
@@ -252,17 +223,18 @@ class TrialService:
             # Add to Xray config
             self._add_to_xray_config(username, user_uuid, 'vmess')
             
-            # Setup IP limit
-            limit_path = "/etc/kyt/limit/vmess/ip"
-            os.makedirs(limit_path, exist_ok=True)
-            with open(f"{limit_path}/{username}", "w") as f:
-                f.write(str(ip_limit))
-            
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/vmess", exist_ok=True)
-            with open(f"/etc/vmess/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup IP limit
+                limit_path = "/etc/kyt/limit/vmess/ip"
+                os.makedirs(limit_path, exist_ok=True)
+                with open(f"{limit_path}/{username}", "w") as f:
+                    f.write(str(ip_limit))
+                
+                # Setup quota
+                quota_bytes = quota_gb * 1024 * 1024 * 1024
+                os.makedirs("/etc/vmess", exist_ok=True)
+                with open(f"/etc/vmess/{username}", "w") as f:
+                    f.write(str(quota_bytes))
             
             # Create config file
             self._create_vmess_config(username, user_uuid, quota_gb, ip_limit, minutes, bug)
@@ -290,17 +262,18 @@ class TrialService:
             # Add to Xray config
             self._add_to_xray_config(username, user_uuid, 'vless')
             
-            # Setup IP limit
-            limit_path = "/etc/kyt/limit/vless/ip"
-            os.makedirs(limit_path, exist_ok=True)
-            with open(f"{limit_path}/{username}", "w") as f:
-                f.write(str(ip_limit))
-            
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/vless", exist_ok=True)
-            with open(f"/etc/vless/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup IP limit
+                limit_path = "/etc/kyt/limit/vless/ip"
+                os.makedirs(limit_path, exist_ok=True)
+                with open(f"{limit_path}/{username}", "w") as f:
+                    f.write(str(ip_limit))
+                
+                # Setup quota
+                quota_bytes = quota_gb * 1024 * 1024 * 1024
+                os.makedirs("/etc/vless", exist_ok=True)
+                with open(f"/etc/vless/{username}", "w") as f:
+                    f.write(str(quota_bytes))
             
             # Create config file
             self._create_vless_config(username, user_uuid, quota_gb, ip_limit, minutes)
@@ -328,11 +301,12 @@ class TrialService:
             # Add to Xray config
             self._add_to_xray_config(username, password, 'shadowsocks')
             
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/shadowsocks", exist_ok=True)
-            with open(f"/etc/shadowsocks/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup quota
+                quota_bytes = quota_gb * 1024 * 1024 * 1024
+                os.makedirs("/etc/shadowsocks", exist_ok=True)
+                with open(f"/etc/shadowsocks/{username}", "w") as f:
+                    f.write(str(quota_bytes))
             
             # Create config file
             self._create_shadowsocks_config(username, password, cipher, quota_gb, minutes)
@@ -360,17 +334,18 @@ class TrialService:
             # Add to Xray config
             self._add_to_xray_config(username, password, 'trojan')
             
-            # Setup IP limit
-            limit_path = "/etc/kyt/limit/trojan/ip"
-            os.makedirs(limit_path, exist_ok=True)
-            with open(f"{limit_path}/{username}", "w") as f:
-                f.write(str(ip_limit))
-            
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/trojan", exist_ok=True)
-            with open(f"/etc/trojan/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup IP limit
+                limit_path = "/etc/kyt/limit/trojan/ip"
+                os.makedirs(limit_path, exist_ok=True)
+                with open(f"{limit_path}/{username}", "w") as f:
+                    f.write(str(ip_limit))
+                
+                # Setup quota
+                quota_bytes = quota_gb * 1024 * 1024 * 1024
+                os.makedirs("/etc/trojan", exist_ok=True)
+                with open(f"/etc/trojan/{username}", "w") as f:
+                    f.write(str(quota_bytes))
             
             # Create config file
             self._create_trojan_config(username, password, quota_gb, ip_limit, minutes)
@@ -390,12 +365,6 @@ class TrialService:
     def _add_to_xray_config(self, username, credential, protocol):
         """Add user to Xray config"""
         try:
-            config_path = "/etc/xray/config.json"
-            
-            # Read current config
-            with open(config_path, "r") as f:
-                config = json.load(f)
-            
             # Add user based on protocol
             if protocol == 'vmess':
                 user = {
@@ -421,18 +390,8 @@ class TrialService:
                 }
             
             # Find protocol section and add user
-            for inbound in config.get("inbounds", []):
-                if inbound.get("protocol") == protocol:
-                    if "settings" not in inbound:
-                        inbound["settings"] = {}
-                    if "clients" not in inbound["settings"]:
-                        inbound["settings"]["clients"] = []
-                    inbound["settings"]["clients"].append(user)
-                    break
-            
-            # Write updated config
-            with open(config_path, "w") as f:
-                json.dump(config, f, indent=2)
+            with self.xray_config.transaction() as tx:
+                tx.add_client(protocol, user)
                 
         except Exception as e:
             logger.error(f"Error adding to Xray config: {e}")
@@ -441,38 +400,42 @@ class TrialService:
     def _remove_from_xray_config(self, username, protocol):
         """Remove user from Xray config"""
         try:
-            config_path = "/etc/xray/config.json"
-            
-            # Read current config
-            with open(config_path, "r") as f:
-                config = json.load(f)
-            
             # Remove from protocol section
-            for inbound in config.get("inbounds", []):
-                if inbound.get("protocol") == protocol:
-                    if "settings" in inbound and "clients" in inbound["settings"]:
-                        inbound["settings"]["clients"] = [
-                            client for client in inbound["settings"]["clients"]
-                            if client.get("email") != username
-                        ]
-                    break
-            
-            # Write updated config
-            with open(config_path, "w") as f:
-                json.dump(config, f, indent=2)
+            with self.xray_config.transaction() as tx:
+                tx.remove_client(username, protocol)
                 
         except Exception as e:
             logger.error(f"Error removing from Xray config: {e}")
             raise
     
+    def _restart_xray(self):
+        """Restart Xray lewat scheduler bersama (debounced/coalesced); raise XrayRestartError jika gagal"""
+        batch = current_batch()
+        if batch is not None:
+            batch.request_restart()
+            return
+        check_restart(get_restart_scheduler().request_restart(reason="trial"))
+    
+    def _schedule_expiry(self, minutes, results):
+        """Hapus trial otomatis setelah `minutes` lewat expiry scheduler"""
+        deadline = time.time() + int(minutes) * 60
+        scheduler = get_expiry_scheduler()
+        for protocol, result in results.items():
+            username = result.get('username') if isinstance(result, dict) else None
+            if username:
+                scheduler.schedule("trial", username, deadline, source="trial", protocol=protocol)
+    
     def _add_to_trial_db(self, service, minutes, results):
         """Add trial to database"""
         os.makedirs("/etc/trial", exist_ok=True)
         
         created_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
+        # Satu baris per protocol (service=all membuat sampai 5 akun trial)
         with open(self.trial_db_path, "a") as f:
-            f.write(f"### {service} {results.get('username', 'unknown')} {minutes} {created_time}\n")
+            for protocol, result in results.items():
+                if isinstance(result, dict) and result.get('username'):
+                    f.write(f"### {protocol} {result['username']} {minutes} {created_time}\n")
     
     def _remove_from_trial_db(self, username, service):
         """Remove trial from database"""
@@ -501,7 +464,7 @@ class TrialService:
     
     def _create_ssh_config(self, username, password, ip_limit, minutes):
         """Create SSH config file"""
-        server_info = self._get_server_info()
+        server_info = get_host_info().server_info()
         
         config_content = f"""◇━━━━━━━━━━━━━━━━━◇
 Format SSH OVPN Account
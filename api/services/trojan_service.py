@@ -5,19 +5,32 @@ Mengintegrasikan fungsi-fungsi dari script m-trojan
 """
 
 import subprocess
-import json
 import os
-import re
 import uuid
 import time
 from datetime import datetime, timedelta
 import logging
 
+from services.account_query import iter_accounts, list_page
+from services.account_store import count_accounts, get_account_store
+from services.expiry_scheduler import get_expiry_scheduler
+from services.batch_service import current_batch
+from services.config_registry import get_bot_config
+from services.config_renderer import format_expiry, get_config_renderer, remaining_text
+from services.host_info import get_host_info
+from services.request_timing import span
+from services.restart_scheduler import XrayRestartError, check_restart, get_restart_scheduler
+from services.share_links import get_share_links
+from services.xray_api import XrayHandlerClient, XrayAPIError
+from services.xray_config import get_xray_config, XrayConfigParseError
+from services.xray_marker_editor import MarkerEditor
+from services.telegram_notifier import get_telegram_notifier
+
 logger = logging.getLogger(__name__)
 
 class TrojanService:
     def __init__(self):
-        self.domain = self._get_domain()
+        self.xray_api = XrayHandlerClient()
         
         # Platform-aware paths
         import platform
@@ -35,46 +48,13 @@ class TrojanService:
             self.limit_ip_path = "/etc/kyt/limit/trojan/ip"
             self.web_path = "/var/www/html"
         
-    def _get_domain(self):
-        """Get domain dari config"""
-        try:
-            with open("/etc/xray/domain", "r") as f:
-                return f.read().strip()
-        except:
-            return "localhost"
-    
-    def _get_server_info(self):
-        """Get server information"""
-        try:
-            with open("/etc/xray/isp", "r") as f:
-                isp = f.read().strip()
-        except:
-            isp = "Unknown"
-            
-        try:
-            with open("/etc/xray/city", "r") as f:
-                city = f.read().strip()
-        except:
-            city = "Unknown"
-            
-        try:
-            with open("/root/nsdomain", "r") as f:
-                ns = f.read().strip()
-        except:
-            ns = "Unknown"
-            
-        try:
-            with open("/etc/slowdns/server.pub", "r") as f:
-                pub = f.read().strip()
-        except:
-            pub = "Unknown"
-            
-        return {
-            "isp": isp,
-            "city": city,
-            "ns": ns,
-            "pub": pub
-        }
+        self.store = get_account_store(self.trojan_db_path)
+        self.xray_config = get_xray_config(self.config_path)
+        
+    @property
+    def domain(self):
+        """Domain server saat ini (ikut berubah jika /etc/xray/domain diganti)"""
+        return get_host_info().domain
     
     def create_account(self, data):
         """Create Trojan account baru"""
@@ -101,30 +81,35 @@ class TrojanService:
             # Add to Xray config
             self._add_to_xray_config(username, password, expiry_str)
             
-            # Setup IP limit
-            if ip_limit > 0:
-                os.makedirs(self.limit_ip_path, exist_ok=True)
-                with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                    f.write(str(ip_limit))
-            
-            # Setup quota
-            if quota_gb > 0:
-                quota_bytes = quota_gb * 1024 * 1024 * 1024
-                os.makedirs("/etc/trojan", exist_ok=True)
-                with open(f"/etc/trojan/{username}", "w") as f:
-                    f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup IP limit
+                if ip_limit > 0:
+                    os.makedirs(self.limit_ip_path, exist_ok=True)
+                    with open(f"{self.limit_ip_path}/{username}", "w") as f:
+                        f.write(str(ip_limit))
+                
+                # Setup quota
+                if quota_gb > 0:
+                    quota_bytes = quota_gb * 1024 * 1024 * 1024
+                    os.makedirs("/etc/trojan", exist_ok=True)
+                    with open(f"/etc/trojan/{username}", "w") as f:
+                        f.write(str(quota_bytes))
             
             # Add to database
             self._add_to_db(username, expiry_str, password, quota_gb, ip_limit)
             
-            # Create config file
-            self._create_config_file(username, password, quota_gb, ip_limit, days)
+            # Semua link akun sekali jalan; file config dan notifikasi memakai hasil cache yang sama
+            links = get_share_links().links("trojan", username, password)
+            
+            # Config file statis (background)
+            self._export_config_file(username)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, password, quota_gb, ip_limit, days)
             
-            # Restart Xray (skip on Windows for testing)
-            self._restart_xray()
+            # Hot-add user lewat Xray API, restart hanya jika inbound berubah
+            if not self._hot_add_user(username, password):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -135,7 +120,8 @@ class TrojanService:
                     "expiry": expiry_str,
                     "quota_gb": quota_gb,
                     "ip_limit": ip_limit,
-                    "config_url": f"https://{self.domain}:81/trojan-{username}.txt"
+                    "config_url": f"https://{self.domain}:81/trojan-{username}.txt",
+                    "links": links
                 }
             }
             
@@ -159,28 +145,36 @@ class TrojanService:
             # Add to Xray config
             self._add_to_xray_config(username, password, expiry_str)
             
-            # Setup IP limit
-            os.makedirs(self.limit_ip_path, exist_ok=True)
-            with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                f.write(str(ip_limit))
-            
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/trojan", exist_ok=True)
-            with open(f"/etc/trojan/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup IP limit
+                os.makedirs(self.limit_ip_path, exist_ok=True)
+                with open(f"{self.limit_ip_path}/{username}", "w") as f:
+                    f.write(str(ip_limit))
+                
+                # Setup quota
+                quota_bytes = quota_gb * 1024 * 1024 * 1024
+                os.makedirs("/etc/trojan", exist_ok=True)
+                with open(f"/etc/trojan/{username}", "w") as f:
+                    f.write(str(quota_bytes))
             
             # Add to database
             self._add_to_db(username, expiry_str, password, quota_gb, ip_limit)
             
-            # Create config file
-            self._create_config_file(username, password, quota_gb, ip_limit, minutes, is_trial=True)
+            # Semua link akun sekali jalan; file config dan notifikasi memakai hasil cache yang sama
+            links = get_share_links().links("trojan", username, password)
+            
+            # Config file statis (background)
+            self._export_config_file(username)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, password, quota_gb, ip_limit, minutes, is_trial=True)
             
-            # Restart Xray (skip on Windows for testing)
-            self._restart_xray()
+            # Schedule deletion (expiry scheduler, tetap ada setelah restart)
+            get_expiry_scheduler().schedule("trojan", username, time.time() + int(minutes) * 60, source="trial")
+            
+            # Hot-add user lewat Xray API, restart hanya jika inbound berubah
+            if not self._hot_add_user(username, password):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -191,7 +185,8 @@ class TrojanService:
                     "expiry_minutes": minutes,
                     "quota_gb": quota_gb,
                     "ip_limit": ip_limit,
-                    "config_url": f"https://{self.domain}:81/trojan-{username}.txt"
+                    "config_url": f"https://{self.domain}:81/trojan-{username}.txt",
+                    "links": links
                 }
             }
             
@@ -199,42 +194,40 @@ class TrojanService:
             logger.error(f"Error creating trial Trojan account: {e}")
             return {"status": "error", "message": str(e)}
     
-    def list_accounts(self):
-        """List semua Trojan accounts"""
+    def list_accounts(self, query=None):
+        """List Trojan accounts per halaman (cursor, filter, sort; lihat services/account_query.py)"""
         try:
-            accounts = []
-            
-            if os.path.exists(self.trojan_db_path):
-                with open(self.trojan_db_path, "r") as f:
-                    for line in f:
-                        if line.startswith("### "):
-                            parts = line.strip().split()
-                            if len(parts) >= 5:
-                                username = parts[1]
-                                expiry = parts[2]
-                                password = parts[3]
-                                quota_gb = parts[4]
-                                ip_limit = parts[5] if len(parts) > 5 else "0"
-                                
-                                accounts.append({
-                                    "username": username,
-                                    "expiry": expiry,
-                                    "password": password,
-                                    "quota_gb": quota_gb,
-                                    "ip_limit": ip_limit,
-                                    "status": self._get_account_status(username, expiry)
-                                })
-            
-            return {
-                "status": "success",
-                "data": accounts,
-                "total": len(accounts)
-            }
+            return list_page(self.store, query, self._to_accounts)
             
         except Exception as e:
             logger.error(f"Error listing Trojan accounts: {e}")
             return {"status": "error", "message": str(e)}
     
+    def iter_accounts(self, query=None):
+        """Generator semua akun yang cocok dengan query (untuk streaming NDJSON)"""
+        return iter_accounts(self.store, query, self._to_accounts)
+    
+    def _to_accounts(self, records):
+        """Record database -> dict akun untuk response list"""
+        accounts = []
+        for record in records:
+            if len(record) >= 4:
+                username = record[0]
+                expiry = record[1]
+                password = record[2]
+                quota_gb = record[3]
+                ip_limit = record[4] if len(record) > 4 else "0"
+                
+                accounts.append({
+                    "username": username,
+                    "expiry": expiry,
+                    "password": password,
+                    "quota_gb": quota_gb,
+                    "ip_limit": ip_limit,
+                    "status": self._get_account_status(username, expiry)
+                })
+        return accounts
+    
     def delete_account(self, data):
         """Delete Trojan account"""
         try:
@@ -244,18 +237,20 @@ class TrojanService:
                 return {"status": "error", "message": "Username harus diisi"}
             
             # Remove from Xray config
-            self._remove_from_xray_config(username)
+            inbound_tags = self._remove_from_xray_config(username)
             
             # Remove from database
             self._remove_from_db(username)
+            get_expiry_scheduler().cancel("trojan", username)
             
             # Remove files
             for path in [f"/etc/trojan/{username}", f"{self.limit_ip_path}/{username}", f"{self.web_path}/trojan-{username}.txt"]:
                 if os.path.exists(path):
                     os.remove(path)
             
-            # Restart Xray (skip on Windows for testing)
-            self._restart_xray()
+            # Hot-remove user lewat Xray API, restart hanya jika API gagal
+            if not self._hot_remove_user(inbound_tags, username):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -284,24 +279,24 @@ class TrojanService:
             # Update Xray config
             self._update_xray_config(username, expiry_str)
             
-            # Update IP limit if provided
-            if new_ip_limit is not None:
-                os.makedirs(self.limit_ip_path, exist_ok=True)
-                with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                    f.write(str(new_ip_limit))
-            
-            # Update quota if provided
-            if new_quota_gb is not None:
-                quota_bytes = new_quota_gb * 1024 * 1024 * 1024
-                os.makedirs("/etc/trojan", exist_ok=True)
-                with open(f"/etc/trojan/{username}", "w") as f:
-                    f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Update IP limit if provided
+                if new_ip_limit is not None:
+                    os.makedirs(self.limit_ip_path, exist_ok=True)
+                    with open(f"{self.limit_ip_path}/{username}", "w") as f:
+                        f.write(str(new_ip_limit))
+                
+                # Update quota if provided
+                if new_quota_gb is not None:
+                    quota_bytes = new_quota_gb * 1024 * 1024 * 1024
+                    os.makedirs("/etc/trojan", exist_ok=True)
+                    with open(f"/etc/trojan/{username}", "w") as f:
+                        f.write(str(quota_bytes))
             
             # Update database
             self._update_db(username, expiry_str)
             
-            # Restart Xray (skip on Windows for testing)
-            self._restart_xray()
+            # Expiry hanya disimpan di database, runtime Xray tidak perlu reload
             
             return {
                 "status": "success",
@@ -320,13 +315,13 @@ class TrojanService:
     def get_info(self):
         """Get Trojan service info"""
         try:
-            total_accounts = len(self.list_accounts().get('data', []))
-            active_accounts = len([acc for acc in self.list_accounts().get('data', []) if acc.get('status') == 'active'])
+            counts = count_accounts(self.store)
             
             return {
                 "status": "running",
-                "total_accounts": total_accounts,
-                "active_accounts": active_accounts,
+                "total_accounts": counts["total"],
+                "active_accounts": counts["active"],
+                "expired_accounts": counts["expired"],
                 "domain": self.domain
             }
         except Exception as e:
@@ -334,132 +329,110 @@ class TrojanService:
     
     def _user_exists(self, username):
         """Check if user exists in Xray config"""
-        try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, "r") as f:
-                    content = f.read()
-                    return f'"email": "{username}"' in content
-            return False
-        except:
-            return False
+        return self.xray_config.has_client(username)
     
     def _add_to_xray_config(self, username, password, expiry_str):
         """Add user to Xray config - properly formatted for Xray"""
         try:
-            if not os.path.exists(self.config_path):
-                # Create a minimal valid Xray config if it doesn't exist
-                basic_config = {
-                    "inbounds": [
-                        {
-                            "port": 443,
-                            "protocol": "trojan",
-                            "settings": {
-                                "clients": []
-                            }
-                        }
-                    ],
-                    "outbounds": [
-                        {
-                            "protocol": "freedom"
-                        }
-                    ]
-                }
-                os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-                with open(self.config_path, "w") as f:
-                    json.dump(basic_config, f, indent=2)
-                logger.info(f"Created basic Xray config at {self.config_path}")
-                return
-            
-            # Read current config as JSON
-            try:
-                with open(self.config_path, "r") as f:
-                    config = json.load(f)
-                
-                # Find trojan inbound and add client
-                trojan_added = False
-                for inbound in config.get("inbounds", []):
-                    if inbound.get("protocol") == "trojan":
-                        if "settings" not in inbound:
-                            inbound["settings"] = {"clients": []}
-                        if "clients" not in inbound["settings"]:
-                            inbound["settings"]["clients"] = []
-                        
-                        # Add new client
-                        client = {
-                            "password": password,
-                            "email": username,
-                            "level": 0,
-                            "flow": ""
-                        }
-                        inbound["settings"]["clients"].append(client)
-                        trojan_added = True
-                        logger.info(f"Added Trojan client {username} to existing inbound")
-                        break
-                
-                # If no trojan inbound found, create one
-                if not trojan_added:
-                    trojan_inbound = {
-                        "port": 443,
-                        "protocol": "trojan",
-                        "settings": {
-                            "clients": [
-                                {
-                                    "password": password,
-                                    "email": username,
-                                    "level": 0,
-                                    "flow": ""
+            with self.xray_config.transaction() as tx:
+                if not tx.exists:
+                    # Create a minimal valid Xray config if it doesn't exist
+                    basic_config = {
+                        "inbounds": [
+                            {
+                                "port": 443,
+                                "protocol": "trojan",
+                                "settings": {
+                                    "clients": []
                                 }
-                            ]
-                        },
-                        "streamSettings": {
-                            "network": "tcp",
-                            "security": "tls",
-                            "tlsSettings": {
-                                "serverName": self.domain,
-                                "certificates": []
                             }
-                        }
+                        ],
+                        "outbounds": [
+                            {
+                                "protocol": "freedom"
+                            }
+                        ]
                     }
-                    config["inbounds"].append(trojan_inbound)
-                    logger.info(f"Created new Trojan inbound for client {username}")
-                
-                # Write back to file with proper JSON formatting
-                with open(self.config_path, "w") as f:
-                    json.dump(config, f, indent=2, ensure_ascii=False)
-                
-                logger.info(f"Successfully added Trojan user {username} to config")
+                    tx.replace(basic_config)
+                    logger.info(f"Created basic Xray config at {self.config_path}")
+                    return
                 
-            except json.JSONDecodeError as e:
-                logger.error(f"Invalid JSON in config file: {e}")
-                # Create backup and recreate config
-                import shutil
-                backup_path = f"{self.config_path}.backup.{int(time.time())}"
-                shutil.copy2(self.config_path, backup_path)
-                logger.info(f"Backed up invalid config to {backup_path}")
+                if tx.has_markers:
+                    # Config kyt: sisipkan lewat marker #trojanws/#trojangrpc seperti script asli
+                    entry = f'}},{{"password": "{password}","email": "{username}"'
+                    editor = MarkerEditor(tx.get_text())
+                    editor.append_after('#trojanws', [f'#! {username} {expiry_str}', entry])
+                    editor.append_after('#trojangrpc', [f'#! {username} {expiry_str}', entry])
+                    if editor.changes:
+                        tx.set_text(editor.text())
+                    else:
+                        logger.warning(f"Marker #trojanws/#trojangrpc tidak ditemukan di {self.config_path}")
+                    return
                 
-                # Create new basic config
-                basic_config = {
-                    "inbounds": [
-                        {
+                try:
+                    client = {
+                        "password": password,
+                        "email": username,
+                        "level": 0,
+                        "flow": ""
+                    }
+                    
+                    # Find trojan inbound and add client
+                    trojan_added, _ = tx.add_client("trojan", client)
+                    if trojan_added:
+                        logger.info(f"Added Trojan client {username} to existing inbound")
+                    else:
+                        # If no trojan inbound found, create one
+                        trojan_inbound = {
                             "port": 443,
                             "protocol": "trojan",
                             "settings": {
-                                "clients": [
-                                    {
-                                        "password": password,
-                                        "email": username,
-                                        "level": 0,
-                                        "flow": ""
-                                    }
-                                ]
+                                "clients": [client]
+                            },
+                            "streamSettings": {
+                                "network": "tcp",
+                                "security": "tls",
+                                "tlsSettings": {
+                                    "serverName": self.domain,
+                                    "certificates": []
+                                }
                             }
                         }
-                    ],
-                    "outbounds": [{"protocol": "freedom"}]
-                }
-                with open(self.config_path, "w") as f:
-                    json.dump(basic_config, f, indent=2)
-                logger.info("Created new valid Xray config")
+                        tx.add_inbound(trojan_inbound)
+                        logger.info(f"Created new Trojan inbound for client {username}")
+                    
+                    logger.info(f"Successfully added Trojan user {username} to config")
+                    
+                except XrayConfigParseError as e:
+                    logger.error(f"Invalid JSON in config file: {e}")
+                    # Create backup and recreate config
+                    import shutil
+                    backup_path = f"{self.config_path}.backup.{int(time.time())}"
+                    shutil.copy2(self.config_path, backup_path)
+                    logger.info(f"Backed up invalid config to {backup_path}")
+                    
+                    # Create new basic config
+                    basic_config = {
+                        "inbounds": [
+                            {
+                                "port": 443,
+                                "protocol": "trojan",
+                                "settings": {
+                                    "clients": [
+                                        {
+                                            "password": password,
+                                            "email": username,
+                                            "level": 0,
+                                            "flow": ""
+                                        }
+                                    ]
+                                }
+                            }
+                        ],
+                        "outbounds": [{"protocol": "freedom"}]
+                    }
+                    tx.replace(basic_config)
+                    logger.info("Created new valid Xray config")
                 
         except Exception as e:
             logger.error(f"Error adding to Xray config: {e}")
@@ -468,50 +441,60 @@ class TrojanService:
     def _remove_from_xray_config(self, username):
         """Remove user from Xray config using proper JSON manipulation"""
         try:
-            if not os.path.exists(self.config_path):
-                return
-            
-            # Read current config as JSON
-            with open(self.config_path, "r") as f:
-                config = json.load(f)
-            
-            # Remove client from all trojan inbounds
-            removed = False
-            for inbound in config.get("inbounds", []):
-                if inbound.get("protocol") == "trojan":
-                    clients = inbound.get("settings", {}).get("clients", [])
-                    original_count = len(clients)
-                    # Remove clients with matching email/username
-                    inbound["settings"]["clients"] = [
-                        client for client in clients 
-                        if client.get("email") != username
-                    ]
-                    new_count = len(inbound["settings"]["clients"])
-                    if new_count < original_count:
-                        removed = True
-                        logger.info(f"Removed Trojan client {username} from inbound")
-            
-            if removed:
-                # Write back to file
-                with open(self.config_path, "w") as f:
-                    json.dump(config, f, indent=2, ensure_ascii=False)
-                logger.info(f"Successfully removed Trojan user {username} from config")
-            else:
-                logger.warning(f"Trojan user {username} not found in config")
+            with self.xray_config.transaction() as tx:
+                if not tx.exists:
+                    return []
                 
-        except json.JSONDecodeError as e:
+                if tx.has_markers:
+                    return self._remove_marker_entries(tx, username)
+                
+                # Remove client from all trojan inbounds
+                inbound_tags = tx.remove_client(username, "trojan")
+                if inbound_tags:
+                    logger.info(f"Successfully removed Trojan user {username} from config")
+                else:
+                    logger.warning(f"Trojan user {username} not found in config")
+                
+                return inbound_tags
+                
+        except XrayConfigParseError as e:
             logger.error(f"Invalid JSON in config file: {e}")
+            return [None]
         except Exception as e:
             logger.error(f"Error removing from Xray config: {e}")
             raise
     
+    def _remove_marker_entries(self, tx, username):
+        """Hapus blok marker #! user expiry (WS dan gRPC) sampai baris },{"""
+        expiry = self._get_user_expiry(username)
+        if not expiry:
+            return []
+        
+        # Catat inbound yang memuat user ini untuk hot-remove
+        inbound_tags = self.xray_config.inbound_tags(username, "trojan")
+        editor = MarkerEditor(tx.get_text())
+        if not editor.delete_block(f'#! {username} {expiry}'):
+            logger.warning(f"Trojan user {username} not found in config")
+            return []
+        tx.set_text(editor.text())
+        logger.info(f"Successfully removed Trojan user {username} from config")
+        return inbound_tags
+    
     def _update_xray_config(self, username, new_expiry):
-        """Update user expiry in Xray config - Note: Xray doesn't use expiry in config"""
+        """Update user expiry di baris marker #! (config JSON tidak menyimpan expiry)"""
         try:
-            # Note: Xray config doesn't store expiry dates, they're managed in database
-            # This method exists for compatibility but doesn't need to modify config
-            logger.info(f"Expiry update for {username} to {new_expiry} - managed in database only")
-            return True
+            with self.xray_config.transaction() as tx:
+                if not tx.exists or not tx.has_markers:
+                    # Expiry hanya dikelola di database
+                    logger.info(f"Expiry update for {username} to {new_expiry} - managed in database only")
+                    return True
+                
+                editor = MarkerEditor(tx.get_text())
+                
+                # Spasi setelah username supaya user lain tidak ikut terganti
+                if editor.change_line(f'#! {username} ', f'#! {username} {new_expiry}'):
+                    tx.set_text(editor.text())
+                return True
                 
         except Exception as e:
             logger.error(f"Error updating Xray config: {e}")
@@ -520,56 +503,21 @@ class TrojanService:
     def _get_user_expiry(self, username):
         """Get user expiry from database"""
         try:
-            if os.path.exists(self.trojan_db_path):
-                with open(self.trojan_db_path, "r") as f:
-                    for line in f:
-                        if line.startswith(f"### {username} "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                return parts[2]
-            return None
+            return self.store.expiry(username)
         except:
             return None
     
     def _add_to_db(self, username, expiry, password, quota_gb, ip_limit):
-        """Add user to database"""
-        os.makedirs("/etc/trojan", exist_ok=True)
-        
-        # Remove existing entry if any
-        self._remove_from_db(username)
-        
-        # Add new entry
-        with open(self.trojan_db_path, "a") as f:
-            f.write(f"### {username} {expiry} {password} {quota_gb} {ip_limit}\n")
+        """Add user to database (entry lama otomatis diganti)"""
+        self.store.add([username, expiry, password, quota_gb, ip_limit])
     
     def _remove_from_db(self, username):
         """Remove user from database"""
-        if os.path.exists(self.trojan_db_path):
-            lines = []
-            with open(self.trojan_db_path, "r") as f:
-                for line in f:
-                    if not line.startswith(f"### {username} "):
-                        lines.append(line)
-            
-            with open(self.trojan_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.remove(username)
     
     def _update_db(self, username, new_expiry):
         """Update user expiry in database"""
-        if os.path.exists(self.trojan_db_path):
-            lines = []
-            with open(self.trojan_db_path, "r") as f:
-                for line in f:
-                    if line.startswith(f"### {username} "):
-                        parts = line.strip().split()
-                        if len(parts) >= 3:
-                            parts[2] = new_expiry
-                            lines.append(" ".join(parts) + "\n")
-                    else:
-                        lines.append(line)
-            
-            with open(self.trojan_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.set_expiry(username, new_expiry)
     
     def _get_account_status(self, username, expiry):
         """Get account status (active/expired)"""
@@ -582,118 +530,105 @@ class TrojanService:
         except:
             return 'unknown'
     
-    def _create_config_file(self, username, password, quota_gb, ip_limit, duration, is_trial=False):
-        """Create Trojan config file"""
-        server_info = self._get_server_info()
-        
-        # Calculate expiry date
-        if is_trial:
-            expiry_date = datetime.now() + timedelta(minutes=duration)
-        else:
-            expiry_date = datetime.now() + timedelta(days=duration)
-        
-        # Generate Trojan links
-        trojan_ws_tls = f"trojan://{password}@{self.domain}:443?path=/trojan-ws&security=tls&type=ws&sni={self.domain}#{username}"
-        trojan_grpc = f"trojan://{password}@{self.domain}:443?mode=gun&security=tls&type=grpc&serviceName=trojan-grpc&sni={self.domain}#{username}"
-        
-        duration_text = f"{duration} Menit" if is_trial else f"{duration} Hari"
-        
-        config_content = f"""◇━━━━━━━━━━━━━━━━━◇
-   Trojan Account    
-◇━━━━━━━━━━━━━━━━━◇
-Remarks          : {username} 
-Domain           : {self.domain}
-User Quota       : {quota_gb} GB
-User Ip          : {ip_limit} IP
-Port TLS         : 400-900
-Port DNS         : 443
-Port NTLS        : 80, 8080, 8081-9999
-Password         : {password}
-Xray Dns.        : {server_info['ns']}
-Pubkey.          : {server_info['pub']}
-Path TLS         : /trojan-ws 
-ServiceName      : trojan-grpc
-Location         : {server_info['city']}
-===================
-Link Akun Trojan 
-===================
-Link WS TLS      : 
-{trojan_ws_tls}
-===================
-Link GRPC        : 
-{trojan_grpc}
-===================
-Aktif Selama     : {duration_text}
-Dibuat Pada      : {datetime.now().strftime('%d %b %Y')}
-Berakhir Pada    : {expiry_date.strftime('%d %b %Y')}
-==================="""
-        
-        os.makedirs(self.web_path, exist_ok=True)
-        with open(f"{self.web_path}/trojan-{username}.txt", "w") as f:
-            f.write(config_content)
+    def render_config(self, username, options=None):
+        """Config client dari record akun: (text, etag), atau None jika akun tidak ada"""
+        record = self.store.get(username)
+        if record is None or len(record) < 4:
+            return None
+        key = ("trojan", tuple(record))
+        return get_config_renderer().render(key, lambda: self._render_config(record))
+    
+    def _export_config_file(self, username):
+        """File statis trojan-<user>.txt untuk link :81, ditulis di background"""
+        def render():
+            rendered = self.render_config(username)
+            return rendered[0] if rendered else None
+        get_config_renderer().export(f"{self.web_path}/trojan-{username}.txt", render)
+    
+    def _render_config(self, record):
+        """Render config Trojan dari record [username, expiry, password, quota_gb, ip_limit]"""
+        username, expiry, password, quota_gb = record[:4]
+        ip_limit = record[4] if len(record) > 4 else "0"
+        share_links = get_share_links()
+        links = share_links.links("trojan", username, password)
+        return share_links.render(
+            "trojan", "config", username=username, password=password, quota_gb=quota_gb, ip_limit=ip_limit,
+            duration_text=remaining_text(expiry), expiry_text=format_expiry(expiry), **links
+        )
     
     def _send_telegram_notification(self, username, password, quota_gb, ip_limit, duration, is_trial=False):
         """Send notification to Telegram bot"""
         try:
             # Get bot config
-            bot_config = self._get_bot_config()
+            bot_config = get_bot_config()
             if not bot_config:
                 return
             
-            server_info = self._get_server_info()
             duration_text = f"{duration} Menit" if is_trial else f"{duration} Hari"
             
-            # Generate Trojan links
-            trojan_ws_tls = f"trojan://{password}@{self.domain}:443?path=/trojan-ws&security=tls&type=ws&sni={self.domain}#{username}"
-            trojan_grpc = f"trojan://{password}@{self.domain}:443?mode=gun&security=tls&type=grpc&serviceName=trojan-grpc&sni={self.domain}#{username}"
-            
-            message = f"""<code>---------------------------------------------------</code>
-<code>      XRAY/TROJAN</code>
-<code>---------------------------------------------------</code>
-<code>Remarks : {username}
-Iplimit : {ip_limit}
-Domain : {self.domain}
-Host XrayDNS: {server_info['ns']}
-Pub Key: {server_info['pub']}
-Limit Quota : {quota_gb} GB
-Port TLS   : 400-900
-Port NTLS : 80, 8080, 8081-9999
-Password : {password}
-network : ws or grpc
-Path : /trojan-ws
-Dynamic : https://bug.com/trojan-ws
-Name  : trojan-grpc</code>
-<code>---------------------------------------------------</code>
-<code> TROJAN WS TLS</code>
-<code>---------------------------------------------------</code>
-<code>{trojan_ws_tls}</code>
-<code>---------------------------------------------------</code>
-<code> TROJAN gRPC</code>
-<code>---------------------------------------------------</code>
-<code>{trojan_grpc}</code>
-<code>---------------------------------------------------</code>
-Format OpenClash : https://{self.domain}:81/trojan-{username}.txt
-<code>---------------------------------------------------</code>
-Aktif Selama   : {duration_text}
-<code>---------------------------------------------------</code>"""
-            
-            # Send to Telegram
-            url = f"https://api.telegram.org/bot{bot_config['key']}/sendMessage"
-            data = {
-                'chat_id': bot_config['chat_id'],
-                'text': message,
-                'parse_mode': 'html',
-                'disable_web_page_preview': True
-            }
+            # Link sama dengan yang dipakai response create dan file config (cache)
+            share_links = get_share_links()
+            links = share_links.links("trojan", username, password)
+            message = share_links.render(
+                "trojan", "telegram", username=username, password=password, quota_gb=quota_gb, ip_limit=ip_limit,
+                duration_text=duration_text, **links
+            )
             
-            subprocess.run(['curl', '-s', '--max-time', '10', '-d', json.dumps(data), url], check=True)
+            # Send to Telegram (diantrikan, dikirim di background)
+            get_telegram_notifier().send(bot_config['key'], bot_config['chat_id'], message)
             
         except Exception as e:
             logger.error(f"Error sending Telegram notification: {e}")
     
+    def _hot_add_user(self, username, password):
+        """Add user ke Xray yang sedang berjalan (semua inbound yang memuatnya), return False jika perlu restart"""
+        batch = current_batch()
+        if batch is not None:
+            # Request batch: jalankan setelah config batch di-commit
+            batch.defer(lambda: self._hot_add_user(username, password))
+            return True
+        if not self.xray_api.available():
+            return False
+        # Tag dibaca dari config yang sudah di-commit (config kyt: inbound WS dan gRPC)
+        inbound_tags = self.xray_config.inbound_tags(username, "trojan")
+        if not inbound_tags or None in inbound_tags:
+            return False
+        try:
+            for tag in inbound_tags:
+                self.xray_api.add_user(tag, "trojan", username, password)
+            return True
+        except XrayAPIError as e:
+            logger.warning(f"Hot-add Trojan user {username} gagal, fallback restart: {e}")
+            return False
+    
+    def _hot_remove_user(self, inbound_tags, username):
+        """Remove user dari Xray yang sedang berjalan, return False jika perlu restart"""
+        batch = current_batch()
+        if batch is not None:
+            batch.defer(lambda: self._hot_remove_user(inbound_tags, username))
+            return True
+        if not inbound_tags:
+            # User tidak ada di inbound manapun, runtime Xray tidak berubah
+            return True
+        if None in inbound_tags or not self.xray_api.available():
+            return False
+        try:
+            for tag in inbound_tags:
+                self.xray_api.remove_user(tag, username)
+            return True
+        except XrayAPIError as e:
+            logger.warning(f"Hot-remove Trojan user {username} gagal, fallback restart: {e}")
+            return False
+    
     def _restart_xray(self):
         """Restart Xray service - platform aware with real service management"""
         try:
+            batch = current_batch()
+            if batch is not None:
+                # Request batch: restart sekali setelah semua item selesai
+                batch.request_restart()
+                return True
+            
             import platform
             if platform.system() == "Windows":
                 # On Windows, try to restart xray service using Windows service commands
@@ -744,28 +679,13 @@ Aktif Selama   : {duration_text}
                     return True
                     
             else:
-                # On Linux, use systemctl
-                subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+                # On Linux, restart lewat scheduler bersama (debounced/coalesced)
+                check_restart(get_restart_scheduler().request_restart(reason="trojan"))
                 return True
                 
+        except XrayRestartError:
+            raise
         except Exception as e:
             logger.error(f"Error restarting Xray: {e}")
             # Even if restart fails, config changes were applied
             return True
-    
-    def _get_bot_config(self):
-        """Get Telegram bot configuration"""
-        try:
-            if os.path.exists("/etc/bot/.bot.db"):
-                with open("/etc/bot/.bot.db", "r") as f:
-                    for line in f:
-                        if line.startswith("#bot# "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                return {
-                                    'key': parts[1],
-                                    'chat_id': parts[2]
-                                }
-            return None
-        except:
-            return None
@@ -4,64 +4,45 @@ VLess Service Module untuk AlrelShop API Panel
 Mengintegrasikan fungsi-fungsi dari script m-vless
 """
 
-import subprocess
-import json
 import os
-import re
 import uuid
+import time
 from datetime import datetime, timedelta
 import logging
 
+from services.account_query import iter_accounts, list_page
+from services.account_store import count_accounts, get_account_store
+from services.expiry_scheduler import get_expiry_scheduler
+from services.batch_service import current_batch
+from services.config_registry import get_bot_config
+from services.config_renderer import format_expiry, get_config_renderer, remaining_text
+from services.host_info import get_host_info
+from services.request_timing import span
+from services.restart_scheduler import check_restart, get_restart_scheduler
+from services.share_links import get_share_links
+from services.xray_api import XrayHandlerClient, XrayAPIError
+from services.xray_config import get_xray_config
+from services.xray_marker_editor import MarkerEditor
+from services.telegram_notifier import get_telegram_notifier
+
 logger = logging.getLogger(__name__)
 
 class VLessService:
     def __init__(self):
-        self.domain = self._get_domain()
+        self.xray_api = XrayHandlerClient()
+        
         self.config_path = "/etc/xray/config.json"
         self.vless_db_path = "/etc/vless/.vless.db"
         self.limit_ip_path = "/etc/kyt/limit/vless/ip"
         self.web_path = "/var/www/html"
         
-    def _get_domain(self):
-        """Get domain dari config"""
-        try:
-            with open("/etc/xray/domain", "r") as f:
-                return f.read().strip()
-        except:
-            return "localhost"
-    
-    def _get_server_info(self):
-        """Get server information"""
-        try:
-            with open("/etc/xray/isp", "r") as f:
-                isp = f.read().strip()
-        except:
-            isp = "Unknown"
-            
-        try:
-            with open("/etc/xray/city", "r") as f:
-                city = f.read().strip()
-        except:
-            city = "Unknown"
-            
-        try:
-            with open("/root/nsdomain", "r") as f:
-                ns = f.read().strip()
-        except:
-            ns = "Unknown"
-            
-        try:
-            with open("/etc/slowdns/server.pub", "r") as f:
-                pub = f.read().strip()
-        except:
-            pub = "Unknown"
-            
-        return {
-            "isp": isp,
-            "city": city,
-            "ns": ns,
-            "pub": pub
-        }
+        self.store = get_account_store(self.vless_db_path)
+        self.xray_config = get_xray_config(self.config_path)
+        
+    @property
+    def domain(self):
+        """Domain server saat ini (ikut berubah jika /etc/xray/domain diganti)"""
+        return get_host_info().domain
     
     def create_account(self, data):
         """Create VLess account baru"""
@@ -88,30 +69,35 @@ class VLessService:
             # Add to Xray config
             self._add_to_xray_config(username, user_uuid, expiry_str)
             
-            # Setup IP limit
-            if ip_limit > 0:
-                os.makedirs(self.limit_ip_path, exist_ok=True)
-                with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                    f.write(str(ip_limit))
-            
-            # Setup quota
-            if quota_gb > 0:
-                quota_bytes = quota_gb * 1024 * 1024 * 1024
-                os.makedirs("/etc/vless", exist_ok=True)
-                with open(f"/etc/vless/{username}", "w") as f:
-                    f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup IP limit
+                if ip_limit > 0:
+                    os.makedirs(self.limit_ip_path, exist_ok=True)
+                    with open(f"{self.limit_ip_path}/{username}", "w") as f:
+                        f.write(str(ip_limit))
+                
+                # Setup quota
+                if quota_gb > 0:
+                    quota_bytes = quota_gb * 1024 * 1024 * 1024
+                    os.makedirs("/etc/vless", exist_ok=True)
+                    with open(f"/etc/vless/{username}", "w") as f:
+                        f.write(str(quota_bytes))
             
             # Add to database
             self._add_to_db(username, expiry_str, user_uuid, quota_gb, ip_limit)
             
-            # Create config file
-            self._create_config_file(username, user_uuid, quota_gb, ip_limit, days)
+            # Semua link akun sekali jalan; file config dan notifikasi memakai hasil cache yang sama
+            links = get_share_links().links("vless", username, user_uuid)
+            
+            # Config file statis (background)
+            self._export_config_file(username)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, user_uuid, quota_gb, ip_limit, days)
             
-            # Restart Xray
-            subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+            # Hot-add user lewat Xray API, restart hanya jika gagal
+            if not self._hot_add_user(username, user_uuid):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -122,7 +108,8 @@ class VLessService:
                     "expiry": expiry_str,
                     "quota_gb": quota_gb,
                     "ip_limit": ip_limit,
-                    "config_url": f"https://{self.domain}:81/vless-{username}.txt"
+                    "config_url": f"https://{self.domain}:81/vless-{username}.txt",
+                    "links": links
                 }
             }
             
@@ -146,28 +133,36 @@ class VLessService:
             # Add to Xray config
             self._add_to_xray_config(username, user_uuid, expiry_str)
             
-            # Setup IP limit
-            os.makedirs(self.limit_ip_path, exist_ok=True)
-            with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                f.write(str(ip_limit))
-            
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/vless", exist_ok=True)
-            with open(f"/etc/vless/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup IP limit
+                os.makedirs(self.limit_ip_path, exist_ok=True)
+                with open(f"{self.limit_ip_path}/{username}", "w") as f:
+                    f.write(str(ip_limit))
+                
+                # Setup quota
+                quota_bytes = quota_gb * 1024 * 1024 * 1024
+                os.makedirs("/etc/vless", exist_ok=True)
+                with open(f"/etc/vless/{username}", "w") as f:
+                    f.write(str(quota_bytes))
             
             # Add to database
             self._add_to_db(username, expiry_str, user_uuid, quota_gb, ip_limit)
             
-            # Create config file
-            self._create_config_file(username, user_uuid, quota_gb, ip_limit, minutes, is_trial=True)
+            # Semua link akun sekali jalan; file config dan notifikasi memakai hasil cache yang sama
+            links = get_share_links().links("vless", username, user_uuid)
+            
+            # Config file statis (background)
+            self._export_config_file(username)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, user_uuid, quota_gb, ip_limit, minutes, is_trial=True)
             
-            # Restart Xray
-            subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+            # Schedule deletion (expiry scheduler, tetap ada setelah restart)
+            get_expiry_scheduler().schedule("vless", username, time.time() + int(minutes) * 60, source="trial")
+            
+            # Hot-add user lewat Xray API, restart hanya jika gagal
+            if not self._hot_add_user(username, user_uuid):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -178,7 +173,8 @@ class VLessService:
                     "expiry_minutes": minutes,
                     "quota_gb": quota_gb,
                     "ip_limit": ip_limit,
-                    "config_url": f"https://{self.domain}:81/vless-{username}.txt"
+                    "config_url": f"https://{self.domain}:81/vless-{username}.txt",
+                    "links": links
                 }
             }
             
@@ -186,42 +182,40 @@ class VLessService:
             logger.error(f"Error creating trial VLess account: {e}")
             return {"status": "error", "message": str(e)}
     
-    def list_accounts(self):
-        """List semua VLess accounts"""
+    def list_accounts(self, query=None):
+        """List VLess accounts per halaman (cursor, filter, sort; lihat services/account_query.py)"""
         try:
-            accounts = []
-            
-            if os.path.exists(self.vless_db_path):
-                with open(self.vless_db_path, "r") as f:
-                    for line in f:
-                        if line.startswith("### "):
-                            parts = line.strip().split()
-                            if len(parts) >= 5:
-                                username = parts[1]
-                                expiry = parts[2]
-                                user_uuid = parts[3]
-                                quota_gb = parts[4]
-                                ip_limit = parts[5] if len(parts) > 5 else "0"
-                                
-                                accounts.append({
-                                    "username": username,
-                                    "expiry": expiry,
-                                    "uuid": user_uuid,
-                                    "quota_gb": quota_gb,
-                                    "ip_limit": ip_limit,
-                                    "status": self._get_account_status(username, expiry)
-                                })
-            
-            return {
-                "status": "success",
-                "data": accounts,
-                "total": len(accounts)
-            }
+            return list_page(self.store, query, self._to_accounts)
             
         except Exception as e:
             logger.error(f"Error listing VLess accounts: {e}")
             return {"status": "error", "message": str(e)}
     
+    def iter_accounts(self, query=None):
+        """Generator semua akun yang cocok dengan query (untuk streaming NDJSON)"""
+        return iter_accounts(self.store, query, self._to_accounts)
+    
+    def _to_accounts(self, records):
+        """Record database -> dict akun untuk response list"""
+        accounts = []
+        for record in records:
+            if len(record) >= 4:
+                username = record[0]
+                expiry = record[1]
+                user_uuid = record[2]
+                quota_gb = record[3]
+                ip_limit = record[4] if len(record) > 4 else "0"
+                
+                accounts.append({
+                    "username": username,
+                    "expiry": expiry,
+                    "uuid": user_uuid,
+                    "quota_gb": quota_gb,
+                    "ip_limit": ip_limit,
+                    "status": self._get_account_status(username, expiry)
+                })
+        return accounts
+    
     def delete_account(self, data):
         """Delete VLess account"""
         try:
@@ -231,18 +225,20 @@ class VLessService:
                 return {"status": "error", "message": "Username harus diisi"}
             
             # Remove from Xray config
-            self._remove_from_xray_config(username)
+            inbound_tags = self._remove_from_xray_config(username)
             
             # Remove from database
             self._remove_from_db(username)
+            get_expiry_scheduler().cancel("vless", username)
             
             # Remove files
             for path in [f"/etc/vless/{username}", f"{self.limit_ip_path}/{username}", f"{self.web_path}/vless-{username}.txt"]:
                 if os.path.exists(path):
                     os.remove(path)
             
-            # Restart Xray
-            subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+            # Hot-remove user lewat Xray API, restart hanya jika gagal
+            if not self._hot_remove_user(inbound_tags, username):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -271,24 +267,25 @@ class VLessService:
             # Update Xray config
             self._update_xray_config(username, expiry_str)
             
-            # Update IP limit if provided
-            if new_ip_limit is not None:
-                os.makedirs(self.limit_ip_path, exist_ok=True)
-                with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                    f.write(str(new_ip_limit))
-            
-            # Update quota if provided
-            if new_quota_gb is not None:
-                quota_bytes = new_quota_gb * 1024 * 1024 * 1024
-                os.makedirs("/etc/vless", exist_ok=True)
-                with open(f"/etc/vless/{username}", "w") as f:
-                    f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Update IP limit if provided
+                if new_ip_limit is not None:
+                    os.makedirs(self.limit_ip_path, exist_ok=True)
+                    with open(f"{self.limit_ip_path}/{username}", "w") as f:
+                        f.write(str(new_ip_limit))
+                
+                # Update quota if provided
+                if new_quota_gb is not None:
+                    quota_bytes = new_quota_gb * 1024 * 1024 * 1024
+                    os.makedirs("/etc/vless", exist_ok=True)
+                    with open(f"/etc/vless/{username}", "w") as f:
+                        f.write(str(quota_bytes))
             
             # Update database
             self._update_db(username, expiry_str)
             
             # Restart Xray
-            subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+            self._restart_xray()
             
             return {
                 "status": "success",
@@ -307,13 +304,13 @@ class VLessService:
     def get_info(self):
         """Get VLess service info"""
         try:
-            total_accounts = len(self.list_accounts().get('data', []))
-            active_accounts = len([acc for acc in self.list_accounts().get('data', []) if acc.get('status') == 'active'])
+            counts = count_accounts(self.store)
             
             return {
                 "status": "running",
-                "total_accounts": total_accounts,
-                "active_accounts": active_accounts,
+                "total_accounts": counts["total"],
+                "active_accounts": counts["active"],
+                "expired_accounts": counts["expired"],
                 "domain": self.domain
             }
         except Exception as e:
@@ -321,72 +318,71 @@ class VLessService:
     
     def _user_exists(self, username):
         """Check if user exists in Xray config"""
-        try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, "r") as f:
-                    content = f.read()
-                    return f'"email": "{username}"' in content
-            return False
-        except:
-            return False
+        return self.xray_config.has_client(username)
     
     def _add_to_xray_config(self, username, user_uuid, expiry_str):
-        """Add user to Xray config using sed like original script"""
+        """Add user to Xray config lewat marker #vless/#vlessgrpc seperti script asli"""
         try:
-            # Use sed command like original script for vless WS
-            vless_ws_entry = f'#& {username} {expiry_str}\n}},{{"id": "{user_uuid}","email": "{username}"}}'
-            subprocess.run([
-                'sed', '-i', f'/#vless$/a\\{vless_ws_entry}',
-                self.config_path
-            ], check=True)
-            
-            # Use sed command like original script for vless gRPC  
-            vless_grpc_entry = f'#&& {username} {expiry_str}\n}},{{"id": "{user_uuid}","email": "{username}"}}'
-            subprocess.run([
-                'sed', '-i', f'/#vlessgrpc$/a\\{vless_grpc_entry}',
-                self.config_path
-            ], check=True)
+            entry = f'}},{{"id": "{user_uuid}","email": "{username}"'
+            with self.xray_config.transaction() as tx:
+                editor = MarkerEditor(tx.get_text())
+                
+                # vless WS entry
+                editor.append_after('#vless', [f'#& {username} {expiry_str}', entry])
+                
+                # vless gRPC entry
+                editor.append_after('#vlessgrpc', [f'#&& {username} {expiry_str}', entry])
+                
+                if editor.changes:
+                    tx.set_text(editor.text())
+                else:
+                    logger.warning(f"Marker #vless/#vlessgrpc tidak ditemukan di {self.config_path}")
                 
         except Exception as e:
             logger.error(f"Error adding to Xray config: {e}")
             raise
     
     def _remove_from_xray_config(self, username):
-        """Remove user from Xray config using sed like original script"""
+        """Remove user from Xray config (blok marker sampai baris },{); return tag inbound yang berubah"""
         try:
             # Get expiry for the user
             expiry = self._get_user_expiry(username)
-            if expiry:
+            if not expiry:
+                return []
+            with self.xray_config.transaction() as tx:
+                # Catat inbound yang memuat user ini untuk hot-remove
+                inbound_tags = self.xray_config.inbound_tags(username, "vless")
+                editor = MarkerEditor(tx.get_text())
+                
                 # Remove vless WS entry
-                subprocess.run([
-                    'sed', '-i', f'/^#& {username} {expiry}/,/^}},{{/d',
-                    self.config_path
-                ], check=True)
+                editor.delete_block(f'#& {username} {expiry}')
                 
                 # Remove vless gRPC entry
-                subprocess.run([
-                    'sed', '-i', f'/^#&& {username} {expiry}/,/^}},{{/d',
-                    self.config_path
-                ], check=True)
+                editor.delete_block(f'#&& {username} {expiry}')
+                
+                if not editor.changes:
+                    return []
+                tx.set_text(editor.text())
+            return inbound_tags
                 
         except Exception as e:
             logger.error(f"Error removing from Xray config: {e}")
             raise
     
     def _update_xray_config(self, username, new_expiry):
-        """Update user expiry in Xray config using sed like original script"""
+        """Update user expiry di baris marker Xray config"""
         try:
-            # Update vless WS entry
-            subprocess.run([
-                'sed', '-i', f'/^#& {username}/c\\#& {username} {new_expiry}',
-                self.config_path
-            ], check=True)
-            
-            # Update vless gRPC entry  
-            subprocess.run([
-                'sed', '-i', f'/^#&& {username}/c\\#&& {username} {new_expiry}',
-                self.config_path
-            ], check=True)
+            with self.xray_config.transaction() as tx:
+                editor = MarkerEditor(tx.get_text())
+                
+                # Update vless WS entry (spasi setelah username supaya user lain tidak ikut terganti)
+                editor.change_line(f'#& {username} ', f'#& {username} {new_expiry}')
+                
+                # Update vless gRPC entry
+                editor.change_line(f'#&& {username} ', f'#&& {username} {new_expiry}')
+                
+                if editor.changes:
+                    tx.set_text(editor.text())
                 
         except Exception as e:
             logger.error(f"Error updating Xray config: {e}")
@@ -395,56 +391,21 @@ class VLessService:
     def _get_user_expiry(self, username):
         """Get user expiry from database"""
         try:
-            if os.path.exists(self.vless_db_path):
-                with open(self.vless_db_path, "r") as f:
-                    for line in f:
-                        if line.startswith(f"### {username} "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                return parts[2]
-            return None
+            return self.store.expiry(username)
         except:
             return None
     
     def _add_to_db(self, username, expiry, user_uuid, quota_gb, ip_limit):
-        """Add user to database"""
-        os.makedirs("/etc/vless", exist_ok=True)
-        
-        # Remove existing entry if any
-        self._remove_from_db(username)
-        
-        # Add new entry
-        with open(self.vless_db_path, "a") as f:
-            f.write(f"### {username} {expiry} {user_uuid} {quota_gb} {ip_limit}\n")
+        """Add user to database (entry lama otomatis diganti)"""
+        self.store.add([username, expiry, user_uuid, quota_gb, ip_limit])
     
     def _remove_from_db(self, username):
         """Remove user from database"""
-        if os.path.exists(self.vless_db_path):
-            lines = []
-            with open(self.vless_db_path, "r") as f:
-                for line in f:
-                    if not line.startswith(f"### {username} "):
-                        lines.append(line)
-            
-            with open(self.vless_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.remove(username)
     
     def _update_db(self, username, new_expiry):
         """Update user expiry in database"""
-        if os.path.exists(self.vless_db_path):
-            lines = []
-            with open(self.vless_db_path, "r") as f:
-                for line in f:
-                    if line.startswith(f"### {username} "):
-                        parts = line.strip().split()
-                        if len(parts) >= 3:
-                            parts[2] = new_expiry
-                            lines.append(" ".join(parts) + "\n")
-                    else:
-                        lines.append(line)
-            
-            with open(self.vless_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.set_expiry(username, new_expiry)
     
     def _get_account_status(self, username, expiry):
         """Get account status (active/expired)"""
@@ -457,169 +418,102 @@ class VLessService:
         except:
             return 'unknown'
     
-    def _create_config_file(self, username, user_uuid, quota_gb, ip_limit, duration, is_trial=False):
-        """Create VLess config file"""
-        server_info = self._get_server_info()
-        
-        # Generate VLess links
-        vless_ws_tls = f"vless://{user_uuid}@{self.domain}:443?path=/vless&security=tls&encryption=none&host={self.domain}&type=ws&serviceName=vless-ws&sni={self.domain}#{username}"
-        vless_ws_nontls = f"vless://{user_uuid}@{self.domain}:80?path=/vless&encryption=none&type=ws#{username}"
-        vless_grpc = f"vless://{user_uuid}@{self.domain}:443?mode=gun&security=tls&encryption=none&type=grpc&serviceName=vless-grpc&sni={self.domain}#{username}"
-        
-        duration_text = f"{duration} Menit" if is_trial else f"{duration} Hari"
-        
-        config_content = f"""---------------------------------------------------
-# Format Vless WS TLS
----------------------------------------------------
-proxies:
-  - name: Vless-{username}-WS TLS
-    server: {self.domain}
-    port: 443
-    type: vless
-    uuid: {user_uuid}
-    alterId: 0
-    cipher: auto
-    tls: true
-    skip-cert-verify: true
-    servername: {self.domain}
-    network: ws
-    ws-opts:
-      path: /vless
-      headers:
-        Host: {self.domain}
-    udp: true
+    def render_config(self, username, options=None):
+        """Config client dari record akun: (text, etag), atau None jika akun tidak ada"""
+        record = self.store.get(username)
+        if record is None or len(record) < 4:
+            return None
+        key = ("vless", tuple(record))
+        return get_config_renderer().render(key, lambda: self._render_config(record))
     
----------------------------------------------------
-# Format Vless gRPC (SNI)
----------------------------------------------------
-- name: Vless-{username}-gRPC (SNI)
-  server: {self.domain}
-  port: 443
-  type: vless
-  uuid: {user_uuid}
-  cipher: auto
-  tls: true
-  skip-cert-verify: true
-  servername: {self.domain}
-  network: grpc
-  grpc-opts:
-  grpc-mode: gun
-    grpc-service-name: vless-grpc
-
-◇━━━━━━━━━━━━━━━━━◇
-   Vless Account    
-◇━━━━━━━━━━━━━━━━━◇
-Remarks          : {username} 
-Domain           : {self.domain}
-User Quota       : {quota_gb} GB
-User Ip          : {ip_limit} IP
-port TLS         : 400-900
-Port DNS         : 443
-Port NTLS        : 80, 8080, 8081-9999
-User ID          : {user_uuid}
-Xray Dns.        : {server_info['ns']}
-Pubkey.          : {server_info['pub']}
-Encryption       : none
-Path TLS         : /vless 
-ServiceName      : vless-grpc
-Location         : {server_info['city']}
-===================
-Link Akun Vless 
-===================
-Link TLS      : 
-{vless_ws_tls}
-===================
-Link GRPC     : 
-{vless_grpc}
-===================
-Aktif Selama     : {duration_text}
-Dibuat Pada      : {datetime.now().strftime('%d %b %Y')}
-Berakhir Pada    : {expiry_date.strftime('%d %b %Y')}
-==================="""
-        
-        os.makedirs(self.web_path, exist_ok=True)
-        with open(f"{self.web_path}/vless-{username}.txt", "w") as f:
-            f.write(config_content)
+    def _export_config_file(self, username):
+        """File statis vless-<user>.txt untuk link :81, ditulis di background"""
+        def render():
+            rendered = self.render_config(username)
+            return rendered[0] if rendered else None
+        get_config_renderer().export(f"{self.web_path}/vless-{username}.txt", render)
+    
+    def _render_config(self, record):
+        """Render config VLess dari record [username, expiry, uuid, quota_gb, ip_limit]"""
+        username, expiry, user_uuid, quota_gb = record[:4]
+        ip_limit = record[4] if len(record) > 4 else "0"
+        share_links = get_share_links()
+        links = share_links.links("vless", username, user_uuid)
+        return share_links.render(
+            "vless", "config", username=username, uuid=user_uuid, quota_gb=quota_gb, ip_limit=ip_limit,
+            duration_text=remaining_text(expiry), expiry_text=format_expiry(expiry), **links
+        )
     
     def _send_telegram_notification(self, username, user_uuid, quota_gb, ip_limit, duration, is_trial=False):
         """Send notification to Telegram bot"""
         try:
             # Get bot config
-            bot_config = self._get_bot_config()
+            bot_config = get_bot_config()
             if not bot_config:
                 return
             
-            server_info = self._get_server_info()
             duration_text = f"{duration} Menit" if is_trial else f"{duration} Hari"
             
-            # Generate VLess links
-            vless_ws_tls = f"vless://{user_uuid}@{self.domain}:443?path=/vless&security=tls&encryption=none&host={self.domain}&type=ws&serviceName=vless-ws&sni={self.domain}#{username}"
-            vless_ws_nontls = f"vless://{user_uuid}@{self.domain}:80?path=/vless&encryption=none&type=ws#{username}"
-            vless_grpc = f"vless://{user_uuid}@{self.domain}:443?mode=gun&security=tls&encryption=none&type=grpc&serviceName=vless-grpc&sni={self.domain}#{username}"
-            
-            message = f"""<code>---------------------------------------------------</code>
-<code>      XRAY/VLESS</code>
-<code>---------------------------------------------------</code>
-<code>Remarks : {username}
-Iplimit : {ip_limit}
-Domain : {self.domain}
-Host XrayDNS: {server_info['ns']}
-Pub Key: {server_info['pub']}
-Limit Quota : {quota_gb} GB
-Port TLS   : 400-900
-Port NTLS : 80, 8080, 8081-9999
-id  : {user_uuid}
-alterId : 0
-Security : auto
-network : ws or grpc
-Path : /vless
-Dynamic : https://bug.com/vless
-Name  : vless-grpc</code>
-<code>---------------------------------------------------</code>
-<code> VLESS WS TLS</code>
-<code>---------------------------------------------------</code>
-<code>{vless_ws_tls}</code>
-<code>---------------------------------------------------</code>
-<code>VLESS WS NO TLS</code>
-<code>---------------------------------------------------</code>
-<code>{vless_ws_nontls}</code>
-<code>---------------------------------------------------</code>
-<code> VLESS gRPC</code>
-<code>---------------------------------------------------</code>
-<code>{vless_grpc}</code>
-<code>---------------------------------------------------</code>
-Format OpenClash : https://{self.domain}:81/vless-{username}.txt
-<code>---------------------------------------------------</code>
-Aktif Selama   : {duration_text}
-<code>---------------------------------------------------</code>"""
-            
-            # Send to Telegram
-            url = f"https://api.telegram.org/bot{bot_config['key']}/sendMessage"
-            data = {
-                'chat_id': bot_config['chat_id'],
-                'text': message,
-                'parse_mode': 'html',
-                'disable_web_page_preview': True
-            }
+            # Link sama dengan yang dipakai response create dan file config (cache)
+            share_links = get_share_links()
+            links = share_links.links("vless", username, user_uuid)
+            message = share_links.render(
+                "vless", "telegram", username=username, uuid=user_uuid, quota_gb=quota_gb, ip_limit=ip_limit,
+                duration_text=duration_text, **links
+            )
             
-            subprocess.run(['curl', '-s', '--max-time', '10', '-d', json.dumps(data), url], check=True)
+            # Send to Telegram (diantrikan, dikirim di background)
+            get_telegram_notifier().send(bot_config['key'], bot_config['chat_id'], message)
             
         except Exception as e:
             logger.error(f"Error sending Telegram notification: {e}")
     
-    def _get_bot_config(self):
-        """Get Telegram bot configuration"""
+    def _hot_add_user(self, username, user_uuid):
+        """Add user ke Xray yang sedang berjalan (semua inbound yang memuatnya), return False jika perlu restart"""
+        batch = current_batch()
+        if batch is not None:
+            # Request batch: jalankan setelah config batch di-commit
+            batch.defer(lambda: self._hot_add_user(username, user_uuid))
+            return True
+        if not self.xray_api.available():
+            return False
+        # Tag dibaca dari config yang sudah di-commit (config kyt: inbound WS dan gRPC)
+        inbound_tags = self.xray_config.inbound_tags(username, "vless")
+        if not inbound_tags or None in inbound_tags:
+            return False
         try:
-            if os.path.exists("/etc/bot/.bot.db"):
-                with open("/etc/bot/.bot.db", "r") as f:
-                    for line in f:
-                        if line.startswith("#bot# "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                return {
-                                    'key': parts[1],
-                                    'chat_id': parts[2]
-                                }
-            return None
-        except:
-            return None
+            for tag in inbound_tags:
+                self.xray_api.add_user(tag, "vless", username, user_uuid)
+            return True
+        except XrayAPIError as e:
+            logger.warning(f"Hot-add VLess user {username} gagal, fallback restart: {e}")
+            return False
+    
+    def _hot_remove_user(self, inbound_tags, username):
+        """Remove user dari Xray yang sedang berjalan, return False jika perlu restart"""
+        batch = current_batch()
+        if batch is not None:
+            batch.defer(lambda: self._hot_remove_user(inbound_tags, username))
+            return True
+        if not inbound_tags:
+            # User tidak ada di inbound manapun, runtime Xray tidak berubah
+            return True
+        if None in inbound_tags or not self.xray_api.available():
+            return False
+        try:
+            for tag in inbound_tags:
+                self.xray_api.remove_user(tag, username)
+            return True
+        except XrayAPIError as e:
+            logger.warning(f"Hot-remove VLess user {username} gagal, fallback restart: {e}")
+            return False
+    
+    def _restart_xray(self):
+        """Restart Xray lewat scheduler bersama (debounced/coalesced); raise XrayRestartError jika gagal"""
+        batch = current_batch()
+        if batch is not None:
+            # Request batch: restart sekali setelah semua item selesai
+            batch.request_restart()
+            return True
+        check_restart(get_restart_scheduler().request_restart(reason="vless"))
+        return True
@@ -5,20 +5,35 @@ Mengintegrasikan fungsi-fungsi dari script m-vmess
 """
 
 import subprocess
-import json
 import os
 import re
 import uuid
-import base64
 import time
 from datetime import datetime, timedelta
 import logging
 
+from services.account_query import iter_accounts, list_page
+from services.account_store import count_accounts, get_account_store
+from services.expiry_scheduler import get_expiry_scheduler
+from services.batch_service import current_batch
+from services.config_registry import get_bot_config
+from services.config_renderer import format_expiry, get_config_renderer, remaining_text
+from services.host_info import get_host_info
+from services.request_timing import span
+from services.restart_scheduler import XrayRestartError, check_restart, get_restart_scheduler
+from services.share_links import get_share_links
+from services.xray_api import XrayHandlerClient, XrayAPIError
+from services.xray_config import get_xray_config, XrayConfigParseError
+from services.xray_marker_editor import MarkerEditor
+from services.telegram_notifier import get_telegram_notifier
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_BUG = "bug.com"
+
 class VMessService:
     def __init__(self):
-        self.domain = self._get_domain()
+        self.xray_api = XrayHandlerClient()
         
         # Platform-aware paths
         import platform
@@ -36,46 +51,13 @@ class VMessService:
             self.limit_ip_path = "/etc/kyt/limit/vmess/ip"
             self.web_path = "/var/www/html"
         
-    def _get_domain(self):
-        """Get domain dari config"""
-        try:
-            with open("/etc/xray/domain", "r") as f:
-                return f.read().strip()
-        except:
-            return "localhost"
-    
-    def _get_server_info(self):
-        """Get server information"""
-        try:
-            with open("/etc/xray/isp", "r") as f:
-                isp = f.read().strip()
-        except:
-            isp = "Unknown"
-            
-        try:
-            with open("/etc/xray/city", "r") as f:
-                city = f.read().strip()
-        except:
-            city = "Unknown"
-            
-        try:
-            with open("/root/nsdomain", "r") as f:
-                ns = f.read().strip()
-        except:
-            ns = "Unknown"
-            
-        try:
-            with open("/etc/slowdns/server.pub", "r") as f:
-                pub = f.read().strip()
-        except:
-            pub = "Unknown"
-            
-        return {
-            "isp": isp,
-            "city": city,
-            "ns": ns,
-            "pub": pub
-        }
+        self.store = get_account_store(self.vmess_db_path)
+        self.xray_config = get_xray_config(self.config_path)
+        
+    @property
+    def domain(self):
+        """Domain server saat ini (ikut berubah jika /etc/xray/domain diganti)"""
+        return get_host_info().domain
     
     def create_account(self, data):
         """Create VMess account baru"""
@@ -84,7 +66,7 @@ class VMessService:
             days = data.get('days', 30)
             quota_gb = data.get('quota_gb', 0)
             ip_limit = data.get('ip_limit', 1)
-            bug = data.get('bug', 'bug.com')
+            bug = data.get('bug', DEFAULT_BUG)
             
             if not username:
                 return {"status": "error", "message": "Username harus diisi"}
@@ -103,30 +85,35 @@ class VMessService:
             # Add to Xray config
             self._add_to_xray_config(username, user_uuid, expiry_str)
             
-            # Setup IP limit
-            if ip_limit > 0:
-                os.makedirs(self.limit_ip_path, exist_ok=True)
-                with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                    f.write(str(ip_limit))
-            
-            # Setup quota
-            if quota_gb > 0:
-                quota_bytes = quota_gb * 1024 * 1024 * 1024
-                os.makedirs("/etc/vmess", exist_ok=True)
-                with open(f"/etc/vmess/{username}", "w") as f:
-                    f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup IP limit
+                if ip_limit > 0:
+                    os.makedirs(self.limit_ip_path, exist_ok=True)
+                    with open(f"{self.limit_ip_path}/{username}", "w") as f:
+                        f.write(str(ip_limit))
+                
+                # Setup quota
+                if quota_gb > 0:
+                    quota_bytes = quota_gb * 1024 * 1024 * 1024
+                    os.makedirs("/etc/vmess", exist_ok=True)
+                    with open(f"/etc/vmess/{username}", "w") as f:
+                        f.write(str(quota_bytes))
             
             # Add to database
             self._add_to_db(username, expiry_str, user_uuid, quota_gb, ip_limit)
             
-            # Create config file
-            self._create_config_file(username, user_uuid, quota_gb, ip_limit, days, bug)
+            # Semua link akun sekali jalan; file config dan notifikasi memakai hasil cache yang sama
+            links = get_share_links().links("vmess", username, user_uuid, bug=bug)
+            
+            # Config file statis (background)
+            self._export_config_file(username, bug)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, user_uuid, quota_gb, ip_limit, days, bug)
             
-            # Restart Xray (real service management)
-            self._restart_xray()
+            # Hot-add user lewat Xray API, restart hanya jika inbound berubah
+            if not self._hot_add_user(username, user_uuid):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -137,7 +124,8 @@ class VMessService:
                     "expiry": expiry_str,
                     "quota_gb": quota_gb,
                     "ip_limit": ip_limit,
-                    "config_url": f"https://{self.domain}:81/vmess-{username}.txt"
+                    "config_url": f"https://{self.domain}:81/vmess-{username}.txt",
+                    "links": links
                 }
             }
             
@@ -153,7 +141,7 @@ class VMessService:
             user_uuid = str(uuid.uuid4())
             quota_gb = 1
             ip_limit = 3
-            bug = "bug.com"
+            bug = DEFAULT_BUG
             
             # Calculate expiry
             expiry_date = datetime.now() + timedelta(minutes=minutes)
@@ -162,28 +150,36 @@ class VMessService:
             # Add to Xray config
             self._add_to_xray_config(username, user_uuid, expiry_str)
             
-            # Setup IP limit
-            os.makedirs(self.limit_ip_path, exist_ok=True)
-            with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                f.write(str(ip_limit))
-            
-            # Setup quota
-            quota_bytes = quota_gb * 1024 * 1024 * 1024
-            os.makedirs("/etc/vmess", exist_ok=True)
-            with open(f"/etc/vmess/{username}", "w") as f:
-                f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Setup IP limit
+                os.makedirs(self.limit_ip_path, exist_ok=True)
+                with open(f"{self.limit_ip_path}/{username}", "w") as f:
+                    f.write(str(ip_limit))
+                
+                # Setup quota
+                quota_bytes = quota_gb * 1024 * 1024 * 1024
+                os.makedirs("/etc/vmess", exist_ok=True)
+                with open(f"/etc/vmess/{username}", "w") as f:
+                    f.write(str(quota_bytes))
             
             # Add to database
             self._add_to_db(username, expiry_str, user_uuid, quota_gb, ip_limit)
             
-            # Create config file
-            self._create_config_file(username, user_uuid, quota_gb, ip_limit, minutes, bug, is_trial=True)
+            # Semua link akun sekali jalan; file config dan notifikasi memakai hasil cache yang sama
+            links = get_share_links().links("vmess", username, user_uuid, bug=bug)
+            
+            # Config file statis (background)
+            self._export_config_file(username, bug)
             
             # Send to Telegram bot
             self._send_telegram_notification(username, user_uuid, quota_gb, ip_limit, minutes, bug, is_trial=True)
             
-            # Restart Xray (real service management)
-            self._restart_xray()
+            # Schedule deletion (expiry scheduler, tetap ada setelah restart)
+            get_expiry_scheduler().schedule("vmess", username, time.time() + int(minutes) * 60, source="trial")
+            
+            # Hot-add user lewat Xray API, restart hanya jika inbound berubah
+            if not self._hot_add_user(username, user_uuid):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -194,7 +190,8 @@ class VMessService:
                     "expiry_minutes": minutes,
                     "quota_gb": quota_gb,
                     "ip_limit": ip_limit,
-                    "config_url": f"https://{self.domain}:81/vmess-{username}.txt"
+                    "config_url": f"https://{self.domain}:81/vmess-{username}.txt",
+                    "links": links
                 }
             }
             
@@ -202,42 +199,40 @@ class VMessService:
             logger.error(f"Error creating trial VMess account: {e}")
             return {"status": "error", "message": str(e)}
     
-    def list_accounts(self):
-        """List semua VMess accounts"""
+    def list_accounts(self, query=None):
+        """List VMess accounts per halaman (cursor, filter, sort; lihat services/account_query.py)"""
         try:
-            accounts = []
-            
-            if os.path.exists(self.vmess_db_path):
-                with open(self.vmess_db_path, "r") as f:
-                    for line in f:
-                        if line.startswith("### "):
-                            parts = line.strip().split()
-                            if len(parts) >= 5:
-                                username = parts[1]
-                                expiry = parts[2]
-                                user_uuid = parts[3]
-                                quota_gb = parts[4]
-                                ip_limit = parts[5] if len(parts) > 5 else "0"
-                                
-                                accounts.append({
-                                    "username": username,
-                                    "expiry": expiry,
-                                    "uuid": user_uuid,
-                                    "quota_gb": quota_gb,
-                                    "ip_limit": ip_limit,
-                                    "status": self._get_account_status(username, expiry)
-                                })
-            
-            return {
-                "status": "success",
-                "data": accounts,
-                "total": len(accounts)
-            }
+            return list_page(self.store, query, self._to_accounts)
             
         except Exception as e:
             logger.error(f"Error listing VMess accounts: {e}")
             return {"status": "error", "message": str(e)}
     
+    def iter_accounts(self, query=None):
+        """Generator semua akun yang cocok dengan query (untuk streaming NDJSON)"""
+        return iter_accounts(self.store, query, self._to_accounts)
+    
+    def _to_accounts(self, records):
+        """Record database -> dict akun untuk response list"""
+        accounts = []
+        for record in records:
+            if len(record) >= 4:
+                username = record[0]
+                expiry = record[1]
+                user_uuid = record[2]
+                quota_gb = record[3]
+                ip_limit = record[4] if len(record) > 4 else "0"
+                
+                accounts.append({
+                    "username": username,
+                    "expiry": expiry,
+                    "uuid": user_uuid,
+                    "quota_gb": quota_gb,
+                    "ip_limit": ip_limit,
+                    "status": self._get_account_status(username, expiry)
+                })
+        return accounts
+    
     def delete_account(self, data):
         """Delete VMess account"""
         try:
@@ -247,18 +242,20 @@ class VMessService:
                 return {"status": "error", "message": "Username harus diisi"}
             
             # Remove from Xray config
-            self._remove_from_xray_config(username)
+            inbound_tags = self._remove_from_xray_config(username)
             
             # Remove from database
             self._remove_from_db(username)
+            get_expiry_scheduler().cancel("vmess", username)
             
             # Remove files
             for path in [f"/etc/vmess/{username}", f"{self.limit_ip_path}/{username}", f"{self.web_path}/vmess-{username}.txt"]:
                 if os.path.exists(path):
                     os.remove(path)
             
-            # Restart Xray (real service management)
-            self._restart_xray()
+            # Hot-remove user lewat Xray API, restart hanya jika API gagal
+            if not self._hot_remove_user(inbound_tags, username):
+                self._restart_xray()
             
             return {
                 "status": "success",
@@ -287,24 +284,24 @@ class VMessService:
             # Update Xray config
             self._update_xray_config(username, expiry_str)
             
-            # Update IP limit if provided
-            if new_ip_limit is not None:
-                os.makedirs(self.limit_ip_path, exist_ok=True)
-                with open(f"{self.limit_ip_path}/{username}", "w") as f:
-                    f.write(str(new_ip_limit))
-            
-            # Update quota if provided
-            if new_quota_gb is not None:
-                quota_bytes = new_quota_gb * 1024 * 1024 * 1024
-                os.makedirs("/etc/vmess", exist_ok=True)
-                with open(f"/etc/vmess/{username}", "w") as f:
-                    f.write(str(quota_bytes))
+            with span("limit_files"):
+                # Update IP limit if provided
+                if new_ip_limit is not None:
+                    os.makedirs(self.limit_ip_path, exist_ok=True)
+                    with open(f"{self.limit_ip_path}/{username}", "w") as f:
+                        f.write(str(new_ip_limit))
+                
+                # Update quota if provided
+                if new_quota_gb is not None:
+                    quota_bytes = new_quota_gb * 1024 * 1024 * 1024
+                    os.makedirs("/etc/vmess", exist_ok=True)
+                    with open(f"/etc/vmess/{username}", "w") as f:
+                        f.write(str(quota_bytes))
             
             # Update database
             self._update_db(username, expiry_str)
             
-            # Restart Xray (real service management)
-            self._restart_xray()
+            # Expiry hanya disimpan di database, runtime Xray tidak perlu reload
             
             return {
                 "status": "success",
@@ -323,13 +320,13 @@ class VMessService:
     def get_info(self):
         """Get VMess service info"""
         try:
-            total_accounts = len(self.list_accounts().get('data', []))
-            active_accounts = len([acc for acc in self.list_accounts().get('data', []) if acc.get('status') == 'active'])
+            counts = count_accounts(self.store)
             
             return {
                 "status": "running",
-                "total_accounts": total_accounts,
-                "active_accounts": active_accounts,
+                "total_accounts": counts["total"],
+                "active_accounts": counts["active"],
+                "expired_accounts": counts["expired"],
                 "domain": self.domain
             }
         except Exception as e:
@@ -337,181 +334,152 @@ class VMessService:
     
     def _user_exists(self, username):
         """Check if user exists in Xray config"""
-        try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, "r") as f:
-                    content = f.read()
-                    return f'"email": "{username}"' in content
-            return False
-        except:
-            return False
+        return self.xray_config.has_client(username)
     
     def _add_to_xray_config(self, username, user_uuid, expiry_str):
         """Add user to Xray config - properly formatted for Xray VMess"""
         try:
-            if not os.path.exists(self.config_path):
-                # Create a minimal valid Xray config if it doesn't exist
-                basic_config = {
-                    "inbounds": [
-                        {
-                            "port": 443,
-                            "protocol": "vmess",
-                            "settings": {
-                                "clients": []
-                            }
-                        }
-                    ],
-                    "outbounds": [
-                        {
-                            "protocol": "freedom"
-                        }
-                    ]
-                }
-                os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
-                with open(self.config_path, "w") as f:
-                    json.dump(basic_config, f, indent=2)
-                logger.info(f"Created basic Xray config at {self.config_path}")
-                return
-            
-            # Read current config as JSON
-            try:
-                with open(self.config_path, "r") as f:
-                    config = json.load(f)
-                
-                # Find vmess inbound and add client
-                vmess_added = False
-                for inbound in config.get("inbounds", []):
-                    if inbound.get("protocol") == "vmess":
-                        if "settings" not in inbound:
-                            inbound["settings"] = {"clients": []}
-                        if "clients" not in inbound["settings"]:
-                            inbound["settings"]["clients"] = []
-                        
-                        # Add new client
-                        client = {
-                            "id": user_uuid,
-                            "alterId": 0,
-                            "email": username,
-                            "level": 0
-                        }
-                        inbound["settings"]["clients"].append(client)
-                        vmess_added = True
-                        logger.info(f"Added VMess client {username} to existing inbound")
-                        break
-                
-                # If no vmess inbound found, create one
-                if not vmess_added:
-                    vmess_inbound = {
-                        "port": 443,
-                        "protocol": "vmess",
-                        "settings": {
-                            "clients": [
-                                {
-                                    "id": user_uuid,
-                                    "alterId": 0,
-                                    "email": username,
-                                    "level": 0
+            with self.xray_config.transaction() as tx:
+                if not tx.exists:
+                    # Create a minimal valid Xray config if it doesn't exist
+                    basic_config = {
+                        "inbounds": [
+                            {
+                                "port": 443,
+                                "protocol": "vmess",
+                                "settings": {
+                                    "clients": []
                                 }
-                            ]
-                        },
-                        "streamSettings": {
-                            "network": "ws",
-                            "wsSettings": {
-                                "path": "/vmess"
                             }
-                        }
+                        ],
+                        "outbounds": [
+                            {
+                                "protocol": "freedom"
+                            }
+                        ]
                     }
-                    config["inbounds"].append(vmess_inbound)
-                    logger.info(f"Created new VMess inbound for client {username}")
-                
-                # Write back to file with proper JSON formatting
-                with open(self.config_path, "w") as f:
-                    json.dump(config, f, indent=2, ensure_ascii=False)
+                    tx.replace(basic_config)
+                    logger.info(f"Created basic Xray config at {self.config_path}")
+                    return
                 
-                logger.info(f"Successfully added VMess user {username} to config")
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Invalid JSON in config file: {e}")
-                # Create backup and recreate config
-                import shutil
-                backup_path = f"{self.config_path}.backup.{int(time.time())}"
-                shutil.copy2(self.config_path, backup_path)
-                logger.info(f"Backed up invalid config to {backup_path}")
+                if tx.has_markers:
+                    # Config kyt: sisipkan lewat marker #vmess/#vmessgrpc seperti script asli
+                    entry = f'}},{{"id": "{user_uuid}","alterId": 0,"email": "{username}"'
+                    editor = MarkerEditor(tx.get_text())
+                    editor.append_after('#vmess', [f'### {username} {expiry_str}', entry])
+                    editor.append_after('#vmessgrpc', [f'## {username} {expiry_str}', entry])
+                    if editor.changes:
+                        tx.set_text(editor.text())
+                    else:
+                        logger.warning(f"Marker #vmess/#vmessgrpc tidak ditemukan di {self.config_path}")
+                    return
                 
-                # Create new basic config
-                basic_config = {
-                    "inbounds": [
-                        {
+                try:
+                    client = {
+                        "id": user_uuid,
+                        "alterId": 0,
+                        "email": username,
+                        "level": 0
+                    }
+                    
+                    # Find vmess inbound and add client
+                    vmess_added, _ = tx.add_client("vmess", client)
+                    if vmess_added:
+                        logger.info(f"Added VMess client {username} to existing inbound")
+                    else:
+                        # If no vmess inbound found, create one
+                        vmess_inbound = {
                             "port": 443,
                             "protocol": "vmess",
                             "settings": {
-                                "clients": [
-                                    {
-                                        "id": user_uuid,
-                                        "alterId": 0,
-                                        "email": username,
-                                        "level": 0
-                                    }
-                                ]
+                                "clients": [client]
+                            },
+                            "streamSettings": {
+                                "network": "ws",
+                                "wsSettings": {
+                                    "path": "/vmess"
+                                }
                             }
                         }
-                    ],
-                    "outbounds": [{"protocol": "freedom"}]
-                }
-                with open(self.config_path, "w") as f:
-                    json.dump(basic_config, f, indent=2)
-                logger.info("Created new valid Xray config")
+                        tx.add_inbound(vmess_inbound)
+                        logger.info(f"Created new VMess inbound for client {username}")
+                    
+                    logger.info(f"Successfully added VMess user {username} to config")
+                    
+                except XrayConfigParseError as e:
+                    logger.error(f"Invalid JSON in config file: {e}")
+                    # Create backup and recreate config
+                    import shutil
+                    backup_path = f"{self.config_path}.backup.{int(time.time())}"
+                    shutil.copy2(self.config_path, backup_path)
+                    logger.info(f"Backed up invalid config to {backup_path}")
+                    
+                    # Create new basic config
+                    basic_config = {
+                        "inbounds": [
+                            {
+                                "port": 443,
+                                "protocol": "vmess",
+                                "settings": {
+                                    "clients": [
+                                        {
+                                            "id": user_uuid,
+                                            "alterId": 0,
+                                            "email": username,
+                                            "level": 0
+                                        }
+                                    ]
+                                }
+                            }
+                        ],
+                        "outbounds": [{"protocol": "freedom"}]
+                    }
+                    tx.replace(basic_config)
+                    logger.info("Created new valid Xray config")
                 
         except Exception as e:
             logger.error(f"Error adding to Xray config: {e}")
             raise
     
     def _remove_from_xray_config(self, username):
-        """Remove user from Xray config using Python file manipulation"""
+        """Remove user from Xray config (blok marker, atau client JSON jika config tanpa marker)"""
         try:
-            if not os.path.exists(self.config_path):
-                return
-            
-            # Get expiry for the user
-            expiry = self._get_user_expiry(username)
-            if not expiry:
-                return
+            with self.xray_config.transaction() as tx:
+                if not tx.exists:
+                    return []
+                
+                if not tx.has_markers:
+                    inbound_tags = tx.remove_client(username, "vmess")
+                    if not inbound_tags:
+                        logger.warning(f"VMess user {username} not found in config")
+                    return inbound_tags
+                
+                # Get expiry for the user
+                expiry = self._get_user_expiry(username)
+                if not expiry:
+                    return []
+                
+                # Catat inbound yang memuat user ini untuk hot-remove
+                inbound_tags = self.xray_config.inbound_tags(username, "vmess")
+                
+                editor = MarkerEditor(tx.get_text())
+                
+                # Remove vmess WS entry
+                editor.delete_block(f'### {username} {expiry}')
+                
+                # Remove vmess gRPC entry
+                editor.delete_block(f'## {username} {expiry}')
+                
+                if not editor.changes:
+                    return []
+                tx.set_text(editor.text())
             
-            # Read current config
-            with open(self.config_path, "r") as f:
-                lines = f.readlines()
-            
-            # Remove vmess WS entry
-            new_lines = []
-            skip_until_end = False
-            for line in lines:
-                if line.strip() == f'### {username} {expiry}':
-                    skip_until_end = True
-                    continue
-                elif skip_until_end and line.strip().startswith('}}'):
-                    skip_until_end = False
-                    continue
-                elif not skip_until_end:
-                    new_lines.append(line)
-            
-            # Remove vmess gRPC entry
-            lines = new_lines
-            new_lines = []
-            skip_until_end = False
-            for line in lines:
-                if line.strip() == f'## {username} {expiry}':
-                    skip_until_end = True
-                    continue
-                elif skip_until_end and line.strip().startswith('}}'):
-                    skip_until_end = False
-                    continue
-                elif not skip_until_end:
-                    new_lines.append(line)
-            
-            # Write back to file
-            with open(self.config_path, "w") as f:
-                f.writelines(new_lines)
+            # Hot-remove hanya jika blok user benar-benar terhapus dari config
+            return inbound_tags
                 
+        except XrayConfigParseError as e:
+            logger.error(f"Invalid JSON in config file: {e}")
+            return [None]
         except Exception as e:
             logger.error(f"Error removing from Xray config: {e}")
             raise
@@ -519,28 +487,25 @@ class VMessService:
     def _update_xray_config(self, username, new_expiry):
         """Update user expiry in Xray config using Python file manipulation"""
         try:
-            if not os.path.exists(self.config_path):
-                return
-            
-            # Read current config
-            with open(self.config_path, "r") as f:
-                lines = f.readlines()
-            
-            # Update vmess WS entry
-            for i, line in enumerate(lines):
-                if line.strip().startswith(f'### {username} '):
-                    lines[i] = f'### {username} {new_expiry}\n'
-                    break
-            
-            # Update vmess gRPC entry  
-            for i, line in enumerate(lines):
-                if line.strip().startswith(f'## {username} '):
-                    lines[i] = f'## {username} {new_expiry}\n'
-                    break
-            
-            # Write back to file
-            with open(self.config_path, "w") as f:
-                f.writelines(lines)
+            with self.xray_config.transaction() as tx:
+                if not tx.exists:
+                    return
+                
+                lines = tx.get_lines()
+                
+                # Update vmess WS entry
+                for i, line in enumerate(lines):
+                    if line.strip().startswith(f'### {username} '):
+                        lines[i] = f'### {username} {new_expiry}\n'
+                        break
+                
+                # Update vmess gRPC entry  
+                for i, line in enumerate(lines):
+                    if line.strip().startswith(f'## {username} '):
+                        lines[i] = f'## {username} {new_expiry}\n'
+                        break
+                
+                tx.set_lines(lines)
                 
         except Exception as e:
             logger.error(f"Error updating Xray config: {e}")
@@ -549,56 +514,21 @@ class VMessService:
     def _get_user_expiry(self, username):
         """Get user expiry from database"""
         try:
-            if os.path.exists(self.vmess_db_path):
-                with open(self.vmess_db_path, "r") as f:
-                    for line in f:
-                        if line.startswith(f"### {username} "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                return parts[2]
-            return None
+            return self.store.expiry(username)
         except:
             return None
     
     def _add_to_db(self, username, expiry, user_uuid, quota_gb, ip_limit):
-        """Add user to database"""
-        os.makedirs("/etc/vmess", exist_ok=True)
-        
-        # Remove existing entry if any
-        self._remove_from_db(username)
-        
-        # Add new entry
-        with open(self.vmess_db_path, "a") as f:
-            f.write(f"### {username} {expiry} {user_uuid} {quota_gb} {ip_limit}\n")
+        """Add user to database (entry lama otomatis diganti)"""
+        self.store.add([username, expiry, user_uuid, quota_gb, ip_limit])
     
     def _remove_from_db(self, username):
         """Remove user from database"""
-        if os.path.exists(self.vmess_db_path):
-            lines = []
-            with open(self.vmess_db_path, "r") as f:
-                for line in f:
-                    if not line.startswith(f"### {username} "):
-                        lines.append(line)
-            
-            with open(self.vmess_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.remove(username)
     
     def _update_db(self, username, new_expiry):
         """Update user expiry in database"""
-        if os.path.exists(self.vmess_db_path):
-            lines = []
-            with open(self.vmess_db_path, "r") as f:
-                for line in f:
-                    if line.startswith(f"### {username} "):
-                        parts = line.strip().split()
-                        if len(parts) >= 3:
-                            parts[2] = new_expiry
-                            lines.append(" ".join(parts) + "\n")
-                    else:
-                        lines.append(line)
-            
-            with open(self.vmess_db_path, "w") as f:
-                f.writelines(lines)
+        self.store.set_expiry(username, new_expiry)
     
     def _get_account_status(self, username, expiry):
         """Get account status (active/expired)"""
@@ -611,212 +541,109 @@ class VMessService:
         except:
             return 'unknown'
     
-    def _create_config_file(self, username, user_uuid, quota_gb, ip_limit, duration, bug, is_trial=False):
-        """Create VMess config file"""
-        server_info = self._get_server_info()
-        
-        # Generate VMess links
-        vmess_ws_tls = self._generate_vmess_link(username, user_uuid, 443, True, "ws", "/vmess", bug)
-        vmess_ws_nontls = self._generate_vmess_link(username, user_uuid, 80, False, "ws", "/vmess", bug)
-        vmess_grpc = self._generate_vmess_link(username, user_uuid, 443, True, "grpc", "vmess-grpc", self.domain)
-        
-        duration_text = f"{duration} Menit" if is_trial else f"{duration} Hari"
-        
-        config_content = f"""---------------------------------------------------
-# Format Vmess WS TLS
----------------------------------------------------
-proxies:
-  - name: Vmess-{username}-WS TLS
-    server: {self.domain}
-    port: 443
-    type: vmess
-    uuid: {user_uuid}
-    alterId: 0
-    cipher: auto
-    tls: true
-    skip-cert-verify: true
-    servername: {bug}
-    network: ws
-    ws-opts:
-      path: /vmess
-      headers:
-        Host: {self.domain}
-    udp: true
-    
----------------------------------------------------
-# Format Vmess WS Non TLS
----------------------------------------------------
-proxies:
-  - name: Vmess-{username}-WS Non TLS
-    server: {bug}
-    port: 80
-    type: vmess
-    uuid: {user_uuid}
-    alterId: 0
-    cipher: auto
-    tls: false
-    skip-cert-verify: true
-    servername: {self.domain}
-    network: ws
-    ws-opts:
-      path: /vmess
-      headers:
-        Host: {self.domain}
-    udp: true
-    
----------------------------------------------------
-# Format Vmess gRPC
----------------------------------------------------
-proxies:
-  - name: Vmess-{username}-gRPC (SNI)
-    server: {self.domain}
-    port: 443
-    type: vmess
-    uuid: {user_uuid}
-    alterId: 0
-    cipher: auto
-    tls: true
-    skip-cert-verify: true
-    servername: {self.domain}
-    network: grpc
-    grpc-opts:
-      grpc-service-name: vmess-grpc
-    udp: true
+    def render_config(self, username, options=None):
+        """Config client dari record akun: (text, etag), atau None jika akun tidak ada
 
-◇━━━━━━━━━━━━━━━━━◇
-   Vmess Account 
-◇━━━━━━━━━━━━━━━━━◇
-Remarks          : {username}
-Domain           : {self.domain}
-User Quota       : {quota_gb} GB
-User Ip          : {ip_limit} IP
-Port TLS         : 400-900
-Port none TLS    : 80, 8080, 8081-9999
-id               : {user_uuid}
-Xray Dns         : {server_info['ns']}
-Pubkey           : {server_info['pub']}
-alterId          : 0
-Security         : auto
-Network          : ws
-Path             : /vmess
-Dynamic          : https://{bug}/vmess
-ServiceName      : vmess-grpc
-Location         : {server_info['city']}
----------------------------------------------------
- Link Akun Vmess                   
----------------------------------------------------
-Link TLS         : 
-{vmess_ws_tls}
----------------------------------------------------
-Link none TLS    : 
-{vmess_ws_nontls}
----------------------------------------------------
-Link GRPC        : 
-{vmess_grpc}
----------------------------------------------------
-Aktif Selama     : {duration_text}
-Dibuat Pada      : {datetime.now().strftime('%d %b %Y')}
-Berakhir Pada    : {expiry_date.strftime('%d %b %Y')}
----------------------------------------------------"""
-        
-        os.makedirs(self.web_path, exist_ok=True)
-        with open(f"{self.web_path}/vmess-{username}.txt", "w") as f:
-            f.write(config_content)
+        options: {"bug": host bug untuk link WS} (default bug.com, sama dengan create)
+        """
+        record = self.store.get(username)
+        if record is None or len(record) < 4:
+            return None
+        bug = (options or {}).get('bug') or DEFAULT_BUG
+        key = ("vmess", tuple(record), bug)
+        return get_config_renderer().render(key, lambda: self._render_config(record, bug))
     
-    def _generate_vmess_link(self, username, user_uuid, port, tls, network, path, host):
-        """Generate VMess link"""
-        vmess_config = {
-            "v": "2",
-            "ps": username,
-            "add": host,
-            "port": port,
-            "id": user_uuid,
-            "aid": "0",
-            "net": network,
-            "type": "none",
-            "host": host,
-            "tls": "tls" if tls else "none"
-        }
-        
-        if network == "ws":
-            vmess_config["path"] = path
-        elif network == "grpc":
-            vmess_config["path"] = path
-            vmess_config["sni"] = host
-        
-        vmess_json = json.dumps(vmess_config)
-        vmess_base64 = base64.b64encode(vmess_json.encode()).decode()
-        return f"vmess://{vmess_base64}"
+    def _export_config_file(self, username, bug=None):
+        """File statis vmess-<user>.txt untuk link :81, ditulis di background"""
+        def render():
+            rendered = self.render_config(username, {"bug": bug})
+            return rendered[0] if rendered else None
+        get_config_renderer().export(f"{self.web_path}/vmess-{username}.txt", render)
+    
+    def _render_config(self, record, bug):
+        """Render config VMess dari record [username, expiry, uuid, quota_gb, ip_limit]"""
+        username, expiry, user_uuid, quota_gb = record[:4]
+        ip_limit = record[4] if len(record) > 4 else "0"
+        share_links = get_share_links()
+        links = share_links.links("vmess", username, user_uuid, bug=bug)
+        return share_links.render(
+            "vmess", "config", username=username, uuid=user_uuid, quota_gb=quota_gb, ip_limit=ip_limit, bug=bug,
+            duration_text=remaining_text(expiry), expiry_text=format_expiry(expiry), **links
+        )
     
     def _send_telegram_notification(self, username, user_uuid, quota_gb, ip_limit, duration, bug, is_trial=False):
         """Send notification to Telegram bot"""
         try:
             # Get bot config
-            bot_config = self._get_bot_config()
+            bot_config = get_bot_config()
             if not bot_config:
                 return
             
-            server_info = self._get_server_info()
             duration_text = f"{duration} Menit" if is_trial else f"{duration} Hari"
             
-            # Generate VMess links
-            vmess_ws_tls = self._generate_vmess_link(username, user_uuid, 443, True, "ws", "/vmess", bug)
-            vmess_ws_nontls = self._generate_vmess_link(username, user_uuid, 80, False, "ws", "/vmess", bug)
-            vmess_grpc = self._generate_vmess_link(username, user_uuid, 443, True, "grpc", "vmess-grpc", self.domain)
-            
-            message = f"""<code>---------------------------------------------------</code>
-<code>      XRAY/VMESS</code>
-<code>---------------------------------------------------</code>
-<code>Remarks : {username}
-Iplimit : {ip_limit}
-Domain : {self.domain}
-Host XrayDNS: {server_info['ns']}
-Pub Key: {server_info['pub']}
-Limit Quota : {quota_gb} GB
-Port TLS   : 400-900
-Port NTLS : 80, 8080, 8081-9999
-id  : {user_uuid}
-alterId : 0
-Security : auto
-network : ws or grpc
-Path : /vmess
-Dynamic : https://{bug}/vmess
-Name  : vmess-grpc</code>
-<code>---------------------------------------------------</code>
-<code> VMESS WS TLS</code>
-<code>---------------------------------------------------</code>
-<code>{vmess_ws_tls}</code>
-<code>---------------------------------------------------</code>
-<code>VMESS WS NO TLS</code>
-<code>---------------------------------------------------</code>
-<code>{vmess_ws_nontls}</code>
-<code>---------------------------------------------------</code>
-<code> VMESS gRPC</code>
-<code>---------------------------------------------------</code>
-<code>{vmess_grpc}</code>
-<code>---------------------------------------------------</code>
-Format OpenClash : https://{self.domain}:81/vmess-{username}.txt
-<code>---------------------------------------------------</code>
-Aktif Selama   : {duration_text}
-<code>---------------------------------------------------</code>"""
-            
-            # Send to Telegram
-            url = f"https://api.telegram.org/bot{bot_config['key']}/sendMessage"
-            data = {
-                'chat_id': bot_config['chat_id'],
-                'text': message,
-                'parse_mode': 'html',
-                'disable_web_page_preview': True
-            }
+            # Link sama dengan yang dipakai response create dan file config (cache)
+            share_links = get_share_links()
+            links = share_links.links("vmess", username, user_uuid, bug=bug)
+            message = share_links.render(
+                "vmess", "telegram", username=username, uuid=user_uuid, quota_gb=quota_gb, ip_limit=ip_limit,
+                bug=bug, duration_text=duration_text, **links
+            )
             
-            subprocess.run(['curl', '-s', '--max-time', '10', '-d', json.dumps(data), url], check=True)
+            # Send to Telegram (diantrikan, dikirim di background)
+            get_telegram_notifier().send(bot_config['key'], bot_config['chat_id'], message)
             
         except Exception as e:
             logger.error(f"Error sending Telegram notification: {e}")
     
+    def _hot_add_user(self, username, user_uuid):
+        """Add user ke Xray yang sedang berjalan (semua inbound yang memuatnya), return False jika perlu restart"""
+        batch = current_batch()
+        if batch is not None:
+            # Request batch: jalankan setelah config batch di-commit
+            batch.defer(lambda: self._hot_add_user(username, user_uuid))
+            return True
+        if not self.xray_api.available():
+            return False
+        # Tag dibaca dari config yang sudah di-commit (config kyt: inbound WS dan gRPC)
+        inbound_tags = self.xray_config.inbound_tags(username, "vmess")
+        if not inbound_tags or None in inbound_tags:
+            return False
+        try:
+            for tag in inbound_tags:
+                self.xray_api.add_user(tag, "vmess", username, user_uuid)
+            return True
+        except XrayAPIError as e:
+            logger.warning(f"Hot-add VMess user {username} gagal, fallback restart: {e}")
+            return False
+    
+    def _hot_remove_user(self, inbound_tags, username):
+        """Remove user dari Xray yang sedang berjalan, return False jika perlu restart"""
+        batch = current_batch()
+        if batch is not None:
+            batch.defer(lambda: self._hot_remove_user(inbound_tags, username))
+            return True
+        if not inbound_tags:
+            # User tidak ada di inbound manapun, runtime Xray tidak berubah
+            return True
+        if None in inbound_tags or not self.xray_api.available():
+            return False
+        try:
+            for tag in inbound_tags:
+                self.xray_api.remove_user(tag, username)
+            return True
+        except XrayAPIError as e:
+            logger.warning(f"Hot-remove VMess user {username} gagal, fallback restart: {e}")
+            return False
+    
     def _restart_xray(self):
         """Restart Xray service - platform aware with real service management"""
         try:
+            batch = current_batch()
+            if batch is not None:
+                # Request batch: restart sekali setelah semua item selesai
+                batch.request_restart()
+                return True
+            
             import platform
             if platform.system() == "Windows":
                 # On Windows, try to restart xray service using Windows service commands
@@ -867,28 +694,13 @@ Aktif Selama   : {duration_text}
                     return True
                     
             else:
-                # On Linux, use systemctl
-                subprocess.run(['systemctl', 'restart', 'xray'], check=True)
+                # On Linux, restart lewat scheduler bersama (debounced/coalesced)
+                check_restart(get_restart_scheduler().request_restart(reason="vmess"))
                 return True
                 
+        except XrayRestartError:
+            raise
         except Exception as e:
             logger.error(f"Error restarting Xray: {e}")
             # Even if restart fails, config changes were applied
             return True
-
-    def _get_bot_config(self):
-        """Get Telegram bot configuration"""
-        try:
-            if os.path.exists("/etc/bot/.bot.db"):
-                with open("/etc/bot/.bot.db", "r") as f:
-                    for line in f:
-                        if line.startswith("#bot# "):
-                            parts = line.strip().split()
-                            if len(parts) >= 3:
-                                return {
-                                    'key': parts[1],
-                                    'chat_id': parts[2]
-                                }
-            return None
-        except:
-            return None
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Xray API Client untuk AlrelShop API Panel
+Menambah/menghapus user secara live lewat gRPC HandlerService (AlterInbound),
+sehingga Xray tidak perlu di-restart setiap kali ada akun baru. Counter trafik
+per user dibaca lewat StatsService (QueryStats).
+
+Pesan protobuf di-encode manual (tanpa generated stubs), cukup butuh grpcio.
+"""
+
+import logging
+
+try:
+    import grpc
+except ImportError:  # grpcio belum terinstall, fallback ke restart
+    grpc = None
+
+from services.request_timing import traced
+from services.settings import get_section
+
+logger = logging.getLogger(__name__)
+
+HANDLER_SERVICE = "xray.app.proxyman.command.HandlerService"
+STATS_SERVICE = "xray.app.stats.command.StatsService"
+USER_STATS_PREFIX = "user>>>"
+
+DEFAULT_ADDRESS = "127.0.0.1:10085"
+DEFAULT_TIMEOUT = 3
+
+ACCOUNT_TYPES = {
+    "vmess": "xray.proxy.vmess.Account",
+    "vless": "xray.proxy.vless.Account",
+    "trojan": "xray.proxy.trojan.Account",
+    "shadowsocks": "xray.proxy.shadowsocks.Account",
+}
+
+# xray.proxy.shadowsocks.CipherType
+SHADOWSOCKS_CIPHERS = {
+    "aes-128-gcm": 5,
+    "aes-256-gcm": 6,
+    "chacha20-poly1305": 7,
+    "chacha20-ietf-poly1305": 7,
+    "xchacha20-poly1305": 8,
+    "xchacha20-ietf-poly1305": 8,
+    "none": 9,
+    "plain": 9,
+}
+
+
+class XrayAPIError(Exception):
+    """Error saat memanggil Xray API"""
+
+
+# --- Protobuf wire format helpers ---
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def encode_bytes(field, data):
+    """Length-delimited field (string, bytes, embedded message)"""
+    if isinstance(data, str):
+        data = data.encode()
+    if not data:
+        return b""
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def encode_uint(field, value):
+    """Varint field (uint32/uint64/bool/enum)"""
+    if not value:
+        return b""
+    return _key(field, 0) + _varint(int(value))
+
+
+def typed_message(type_name, value):
+    """xray.common.serial.TypedMessage"""
+    return encode_bytes(1, type_name) + encode_bytes(2, value)
+
+
+def decode_message(data):
+    """Decode protobuf menjadi dict {field: [values]} (varint -> int, length-delimited -> bytes)"""
+    fields = {}
+    pos = 0
+    length = len(data)
+    while pos < length:
+        key, pos = _read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 2:
+            size, pos = _read_varint(data, pos)
+            value = bytes(data[pos:pos + size])
+            pos += size
+        elif wire_type == 1:
+            value = int.from_bytes(data[pos:pos + 8], "little")
+            pos += 8
+        elif wire_type == 5:
+            value = int.from_bytes(data[pos:pos + 4], "little")
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def first(fields, field, default=None):
+    values = fields.get(field)
+    return values[0] if values else default
+
+
+def account_message(protocol, credential, cipher=None, flow=""):
+    """Build TypedMessage account untuk protocol tertentu"""
+    if protocol not in ACCOUNT_TYPES:
+        raise XrayAPIError(f"Protocol {protocol} tidak didukung Xray API")
+
+    if protocol == "vmess":
+        account = encode_bytes(1, credential)
+    elif protocol == "vless":
+        account = encode_bytes(1, credential) + encode_bytes(2, flow) + encode_bytes(3, "none")
+    elif protocol == "trojan":
+        account = encode_bytes(1, credential)
+    else:
+        account = encode_bytes(1, credential) + encode_uint(2, SHADOWSOCKS_CIPHERS.get(cipher or "aes-128-gcm", 5))
+
+    return typed_message(ACCOUNT_TYPES[protocol], account)
+
+
+class XrayHandlerClient:
+    """Client gRPC untuk HandlerService Xray (AlterInbound add/remove user)"""
+
+    def __init__(self, address=None, timeout=None, enabled=None):
+        settings = get_section("xray_api")
+        self.address = address or settings.get("address", DEFAULT_ADDRESS)
+        self.timeout = timeout or settings.get("timeout", DEFAULT_TIMEOUT)
+        self.enabled = settings.get("enabled", True) if enabled is None else enabled
+        self._channel = None
+
+    def available(self):
+        """Cek apakah hot-reload lewat API bisa dipakai"""
+        return self.enabled and grpc is not None
+
+    def _get_channel(self):
+        if self._channel is None:
+            self._channel = grpc.insecure_channel(self.address)
+        return self._channel
+
+    @traced("xray_api")
+    def call(self, service, method, payload):
+        """Unary call dengan payload protobuf mentah (bytes in, bytes out)"""
+        if not self.available():
+            raise XrayAPIError("Xray API tidak tersedia (disabled atau grpcio belum terinstall)")
+        try:
+            stub = self._get_channel().unary_unary(f"/{service}/{method}")
+            return stub(payload, timeout=self.timeout)
+        except grpc.RpcError as e:
+            raise XrayAPIError(f"{method} gagal: {e.code().name} {e.details()}") from e
+
+    def add_user(self, tag, protocol, email, credential, level=0, cipher=None, flow=""):
+        """Tambah user ke inbound yang sedang berjalan"""
+        user = encode_uint(1, level) + encode_bytes(2, email) + encode_bytes(3, account_message(protocol, credential, cipher, flow))
+        operation = typed_message("xray.app.proxyman.command.AddUserOperation", encode_bytes(1, user))
+        self.call(HANDLER_SERVICE, "AlterInbound", encode_bytes(1, tag) + encode_bytes(2, operation))
+        logger.info(f"Hot-added {protocol} user {email} to inbound {tag}")
+
+    def remove_user(self, tag, email):
+        """Hapus user dari inbound yang sedang berjalan"""
+        operation = typed_message("xray.app.proxyman.command.RemoveUserOperation", encode_bytes(1, email))
+        self.call(HANDLER_SERVICE, "AlterInbound", encode_bytes(1, tag) + encode_bytes(2, operation))
+        logger.info(f"Hot-removed user {email} from inbound {tag}")
+
+    def close(self):
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
+
+
+def parse_user_traffic(stats):
+    """{nama stat: value} -> {email: [uplink, downlink]} dari stat user>>>email>>>traffic>>>link"""
+    traffic = {}
+    for name, value in stats.items():
+        parts = name.split(">>>")
+        if len(parts) != 4 or parts[0] != "user" or parts[2] != "traffic":
+            continue
+        entry = traffic.setdefault(parts[1], [0, 0])
+        if parts[3] == "uplink":
+            entry[0] = value
+        elif parts[3] == "downlink":
+            entry[1] = value
+    return traffic
+
+
+class XrayStatsClient(XrayHandlerClient):
+    """Client gRPC untuk StatsService Xray (butuh policy statsUserUplink/statsUserDownlink)"""
+
+    def query_stats(self, pattern=USER_STATS_PREFIX, reset=False):
+        """Semua counter yang namanya memuat pattern dalam satu call -> {nama: value}"""
+        # Field 1 (pattern) untuk Xray lama, field 3 (patterns) untuk versi baru
+        request = encode_bytes(1, pattern) + encode_uint(2, reset) + encode_bytes(3, pattern)
+        response = decode_message(self.call(STATS_SERVICE, "QueryStats", request))
+        stats = {}
+        for raw in response.get(1, []):
+            stat = decode_message(raw)
+            stats[first(stat, 1, b"").decode()] = _int64(first(stat, 2, 0))
+        return stats
+
+    def user_traffic(self, reset=False):
+        """{email: [uplink, downlink]} semua user"""
+        return parse_user_traffic(self.query_stats(USER_STATS_PREFIX, reset))
+
+    def reset_user(self, email):
+        """Nolkan counter uplink/downlink satu user"""
+        for link in ("uplink", "downlink"):
+            try:
+                self.call(STATS_SERVICE, "GetStats", encode_bytes(1, f"{USER_STATS_PREFIX}{email}>>>traffic>>>{link}") + encode_uint(2, True))
+            except XrayAPIError as e:
+                # Counter belum ada (user belum pernah terhubung)
+                logger.debug(f"Reset stat {email} {link}: {e}")
+
+
+def _int64(value):
+    # int64 negatif di-encode sebagai varint 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Xray Config Manager untuk AlrelShop API Panel
+Satu pintu untuk membaca dan menulis /etc/xray/config.json.
+
+Config di-parse sekali dan disimpan di memory bersama index email -> posisi
+client, sehingga cek user ada/tidak cukup O(1). File hanya di-parse ulang jika
+berubah di disk (inode/mtime/size). Semua writer diserialisasi lewat thread lock
++ flock (berlaku juga antar worker gunicorn) dan commit dilakukan lewat temp
+file + fsync + rename, jadi tidak ada lagi config setengah tertulis saat Xray
+atau script lain membacanya.
+
+Contoh:
+    with get_xray_config(path).transaction() as tx:
+        tag = tx.add_client("vmess", {"id": uuid, "email": "budi"})
+
+Transaksi bisa di-nest di thread yang sama: transaksi dalam ikut transaksi
+terluar dan config baru ditulis sekali saat transaksi terluar selesai
+(dipakai untuk batch endpoint).
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+import logging
+
+from services.file_lock import InterProcessLock, lock_path_for
+from services.metrics import get_metrics
+from services.request_timing import span
+
+logger = logging.getLogger(__name__)
+
+
+class XrayConfigError(Exception):
+    """Error saat membaca/menulis config Xray"""
+
+
+class XrayConfigParseError(XrayConfigError):
+    """Config tidak bisa di-parse sebagai JSON"""
+
+
+class XrayConfigFormatError(XrayConfigError):
+    """Config memakai baris marker (#vmess, ### user exp, dst) sehingga tidak boleh ditulis ulang sebagai JSON"""
+
+
+MARKER_LINE = re.compile(r"^[ \t\r\f\v]*#[^\n]*\n?", re.M)
+
+
+class XrayConfigTransaction:
+    """Perubahan config dalam satu lock; ditulis sekali saat context manager selesai"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._config = None
+        self._text = None
+        self._mode = None
+
+    @property
+    def exists(self):
+        return self.manager._signature is not None
+
+    @property
+    def has_markers(self):
+        return self.manager._has_markers
+
+    @property
+    def config(self):
+        """Config hasil parse (mutable); perubahan langsung ditandai untuk ditulis sebagai JSON"""
+        if self._config is None:
+            self._config = self.manager._parsed_config()
+        if self._config is None:
+            if self.manager._parse_error:
+                raise XrayConfigParseError(self.manager._parse_error)
+            return None
+        self._set_mode("json")
+        return self._config
+
+    def _require_config(self):
+        config = self.config
+        if config is None:
+            raise XrayConfigError(f"{self.manager.path} tidak ditemukan")
+        return config
+
+    def _set_mode(self, mode):
+        if self._mode and self._mode != mode:
+            raise XrayConfigError("Tidak bisa mencampur edit JSON dan edit baris dalam satu transaksi")
+        if mode == "json" and self.manager._has_markers:
+            raise XrayConfigFormatError(
+                f"{self.manager.path} memakai baris marker komentar, tulis ulang JSON akan menghapus marker"
+            )
+        self._mode = mode
+
+    # --- Edit JSON ---
+
+    def replace(self, config):
+        """Ganti seluruh config (dipakai saat membuat config baru atau recovery)"""
+        self._set_mode("json")
+        self._config = config
+
+    def add_client(self, protocol, client):
+        """Tambah client ke inbound pertama dengan protocol tsb.
+
+        Return (True, tag) jika berhasil, (False, None) jika belum ada inbound protocol itu.
+        """
+        for inbound in self._require_config().get("inbounds", []):
+            if inbound.get("protocol") == protocol:
+                inbound.setdefault("settings", {}).setdefault("clients", []).append(client)
+                return True, inbound.get("tag")
+        return False, None
+
+    def add_inbound(self, inbound):
+        self._require_config().setdefault("inbounds", []).append(inbound)
+
+    def remove_client(self, email, protocol=None):
+        """Hapus client dari semua inbound (opsional filter protocol), return list tag yang berubah"""
+        if self._mode is None and self.manager._parsed_config() is not None and email not in self.manager._index:
+            return []
+        tags = []
+        for inbound in self._require_config().get("inbounds", []):
+            if protocol and inbound.get("protocol") != protocol:
+                continue
+            settings = inbound.get("settings")
+            if not isinstance(settings, dict) or not settings.get("clients"):
+                continue
+            clients = settings["clients"]
+            settings["clients"] = [client for client in clients if client.get("email") != email]
+            if len(settings["clients"]) < len(clients):
+                tags.append(inbound.get("tag"))
+        return tags
+
+    # --- Edit teks/baris (config dengan marker) ---
+
+    def get_text(self):
+        """Teks config mentah (termasuk marker)"""
+        return self.manager._text if self._text is None else self._text
+
+    def set_text(self, text):
+        self._set_mode("text")
+        self._text = text
+
+    def get_lines(self):
+        return self.get_text().splitlines(keepends=True)
+
+    def set_lines(self, lines):
+        self.set_text("".join(lines))
+
+    def _render(self):
+        if self._mode == "json":
+            return json.dumps(self._config, indent=2, ensure_ascii=False) + "\n"
+        if self._mode == "text":
+            return self._text
+        return None
+
+
+class XrayConfigManager:
+    """Cache config Xray + index email, dengan single writer dan commit atomik"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        # Lock antar proses untuk transaksi (beberapa worker gunicorn menulis file yang sama)
+        self._file_lock = InterProcessLock(lock_path_for(path))
+        self._local = threading.local()
+        self._signature = None
+        self._loaded = False
+        self._text = ""
+        self._parsed = False
+        self._config = None
+        self._parse_error = None
+        self._has_markers = False
+        self._index = {}
+
+    # --- Loading & invalidation ---
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _ensure_fresh(self):
+        signature = self._file_signature()
+        if not self._loaded or signature != self._signature:
+            self._load(signature)
+
+    def _load(self, signature):
+        text = ""
+        if signature is not None:
+            metrics = get_metrics()
+            with span("config_read"), metrics.timer("api_config_read_duration_seconds", path=self.path):
+                with open(self.path, "r") as f:
+                    text = f.read()
+            metrics.inc("api_config_read_bytes_total", len(text), path=self.path)
+        self._apply_text(text, signature)
+        logger.debug(f"Loaded Xray config {self.path} ({len(text)} bytes)")
+
+    def _apply_text(self, text, signature, config=None):
+        self._text = text
+        self._has_markers = MARKER_LINE.search(self._text) is not None
+        self._parse_error = None
+        self._config = config
+        self._signature = signature
+        self._loaded = True
+        # Parse JSON ditunda sampai ada yang butuh (edit baris beruntun tidak perlu parse)
+        self._parsed = config is not None
+        self._index = {}
+        if self._parsed:
+            self._build_index()
+
+    def _parsed_config(self):
+        if not self._parsed:
+            self._parsed = True
+            if self._text:
+                try:
+                    self._config = json.loads(MARKER_LINE.sub("", self._text))
+                except ValueError as e:
+                    self._parse_error = f"Invalid JSON in {self.path}: {e}"
+                    logger.error(self._parse_error)
+            self._build_index()
+        return self._config
+
+    def _build_index(self):
+        index = {}
+        inbounds = self._config.get("inbounds", []) if isinstance(self._config, dict) else []
+        for inbound_pos, inbound in enumerate(inbounds):
+            clients = inbound.get("settings", {}).get("clients", []) if isinstance(inbound.get("settings"), dict) else []
+            for client_pos, client in enumerate(clients):
+                email = client.get("email") if isinstance(client, dict) else None
+                if email:
+                    index.setdefault(email, []).append((inbound_pos, client_pos))
+        self._index = index
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    # --- Reads ---
+
+    def has_client(self, email):
+        """Cek email ada di config (O(1) dari index)"""
+        with self._lock:
+            self._ensure_fresh()
+            if self._parsed_config() is None:
+                # Config rusak: fallback ke pencarian string seperti sebelumnya
+                return f'"email": "{email}"' in self._text
+            return email in self._index
+
+    def inbound_tags(self, email, protocol=None):
+        """Tag inbound yang memuat client dengan email tsb; [None] jika config tidak bisa di-parse"""
+        with self._lock:
+            self._ensure_fresh()
+            if self._parsed_config() is None:
+                return [None] if self._parse_error else []
+            tags = []
+            inbounds = self._config.get("inbounds", [])
+            for inbound_pos, _ in self._index.get(email, []):
+                inbound = inbounds[inbound_pos]
+                if protocol and inbound.get("protocol") != protocol:
+                    continue
+                if inbound.get("tag") not in tags:
+                    tags.append(inbound.get("tag"))
+            return tags
+
+    def clients(self, email, protocol=None):
+        """List (tag, protocol, salinan client) untuk email tsb; None jika config tidak bisa di-parse"""
+        with self._lock:
+            self._ensure_fresh()
+            if self._parsed_config() is None:
+                return None
+            result = []
+            inbounds = self._config.get("inbounds", [])
+            for inbound_pos, client_pos in self._index.get(email, []):
+                inbound = inbounds[inbound_pos]
+                if protocol and inbound.get("protocol") != protocol:
+                    continue
+                client = inbound["settings"]["clients"][client_pos]
+                result.append((inbound.get("tag"), inbound.get("protocol"), dict(client)))
+            return result
+
+    def locate(self, email):
+        """List (inbound index, client index) untuk email tsb"""
+        with self._lock:
+            self._ensure_fresh()
+            self._parsed_config()
+            return list(self._index.get(email, []))
+
+    def get_config(self):
+        """Config hasil parse (jangan diubah langsung, pakai transaction())"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._parsed_config()
+
+    # --- Writes ---
+
+    def transaction(self):
+        return _TransactionContext(self)
+
+    def _commit(self, tx):
+        text = tx._render()
+        if text is None:
+            return
+        self._atomic_write(text)
+        # Mode JSON: config di memory sudah final, tidak perlu parse ulang
+        self._apply_text(text, self._file_signature(), tx._config if tx._mode == "json" else None)
+
+    def _atomic_write(self, text):
+        metrics = get_metrics()
+        with span("config_write"), metrics.timer("api_config_write_duration_seconds", path=self.path):
+            self._write_file(text)
+        metrics.inc("api_config_write_bytes_total", len(text), path=self.path)
+
+    def _write_file(self, text):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.path):
+                st = os.stat(self.path)
+                os.chmod(tmp_path, st.st_mode & 0o7777)
+                try:
+                    os.chown(tmp_path, st.st_uid, st.st_gid)
+                except (PermissionError, AttributeError):
+                    pass
+            else:
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+
+class _TransactionContext:
+    def __init__(self, manager):
+        self.manager = manager
+        self.tx = None
+        self.joined = False
+
+    def __enter__(self):
+        self.manager._lock.acquire()
+        active = getattr(self.manager._local, "tx", None)
+        if active is not None:
+            # Sudah ada transaksi di thread ini: ikut transaksi itu, commit di transaksi terluar
+            self.tx = active
+            self.joined = True
+            return self.tx
+        try:
+            with span("config_lock"):
+                self.manager._file_lock.acquire()
+        except Exception:
+            self.manager._lock.release()
+            raise
+        try:
+            # Reload di dalam file lock supaya commit worker lain ikut terbaca
+            self.manager._ensure_fresh()
+            self.tx = XrayConfigTransaction(self.manager)
+        except Exception:
+            self.manager._file_lock.release()
+            self.manager._lock.release()
+            raise
+        self.manager._local.tx = self.tx
+        return self.tx
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.joined:
+            self.manager._lock.release()
+            return False
+        self.manager._local.tx = None
+        try:
+            if exc_type is None:
+                self.manager._commit(self.tx)
+            elif self.tx._mode == "json":
+                # Config di memory mungkin sudah setengah diubah, parse ulang dari disk
+                self.manager.invalidate()
+        except Exception:
+            self.manager.invalidate()
+            raise
+        finally:
+            self.manager._file_lock.release()
+            self.manager._lock.release()
+        return False
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_xray_config(path="/etc/xray/config.json"):
+    """Manager bersama per file config"""
+    with _managers_lock:
+        manager = _managers.get(path)
+        if manager is None:
+            manager = XrayConfigManager(path)
+            _managers[path] = manager
+        return manager
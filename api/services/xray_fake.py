@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Fake Xray gRPC Server untuk AlrelShop API Panel
+Meniru HandlerService dan StatsService Xray secara lokal supaya hot-reload
+user dan pembacaan counter trafik bisa dites tanpa Xray sungguhan.
+
+Contoh:
+    server = FakeXrayServer(tags=["vmess-ws", "trojan-ws"]).start()
+    client = XrayHandlerClient(address=server.address)
+    client.add_user("vmess-ws", "vmess", "budi", "uuid...")
+    assert "budi" in server.users["vmess-ws"]
+    server.add_traffic("budi", uplink=1024, downlink=4096)
+    XrayStatsClient(address=server.address).user_traffic()  # {"budi": [1024, 4096]}
+    server.stop()
+"""
+
+import threading
+from concurrent import futures
+
+import grpc
+
+from services.xray_api import HANDLER_SERVICE, STATS_SERVICE, decode_message, encode_bytes, encode_uint, first
+
+
+class FakeXrayServer:
+    """In-process gRPC server yang menyimpan user per inbound tag di memory"""
+
+    def __init__(self, address="127.0.0.1:0", tags=None):
+        self.bind_address = address
+        self.address = None
+        self.tags = set(tags) if tags else None
+        self.users = {}
+        self.stats = {}
+        self.calls = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        self._server.add_generic_rpc_handlers((
+            grpc.method_handlers_generic_handler(HANDLER_SERVICE, {
+                "AlterInbound": grpc.unary_unary_rpc_method_handler(self._alter_inbound),
+            }),
+            grpc.method_handlers_generic_handler(STATS_SERVICE, {
+                "QueryStats": grpc.unary_unary_rpc_method_handler(self._query_stats),
+                "GetStats": grpc.unary_unary_rpc_method_handler(self._get_stats),
+            }),
+        ))
+        port = self._server.add_insecure_port(self.bind_address)
+        self.address = f"{self.bind_address.rsplit(':', 1)[0]}:{port}"
+        self._server.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop(grace=None)
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _alter_inbound(self, request, context):
+        fields = decode_message(request)
+        tag = first(fields, 1, b"").decode()
+        operation = decode_message(first(fields, 2, b""))
+        op_type = first(operation, 1, b"").decode()
+        op_value = decode_message(first(operation, 2, b""))
+
+        with self._lock:
+            self.calls.append((tag, op_type))
+            if self.tags is not None and tag not in self.tags:
+                context.abort(grpc.StatusCode.UNKNOWN, f"handler not found: {tag}")
+            inbound_users = self.users.setdefault(tag, {})
+
+            if op_type.endswith("AddUserOperation"):
+                user = decode_message(first(op_value, 1, b""))
+                email = first(user, 2, b"").decode()
+                if email in inbound_users:
+                    context.abort(grpc.StatusCode.UNKNOWN, f"User {email} already exists.")
+                account = decode_message(first(user, 3, b""))
+                inbound_users[email] = {
+                    "level": first(user, 1, 0),
+                    "account_type": first(account, 1, b"").decode(),
+                    "account": decode_message(first(account, 2, b"")),
+                }
+            elif op_type.endswith("RemoveUserOperation"):
+                email = first(op_value, 1, b"").decode()
+                if email not in inbound_users:
+                    context.abort(grpc.StatusCode.UNKNOWN, f"User {email} not found.")
+                del inbound_users[email]
+            else:
+                context.abort(grpc.StatusCode.UNIMPLEMENTED, f"unknown operation {op_type}")
+
+        return b""
+
+    # --- StatsService ---
+
+    def add_traffic(self, email, uplink=0, downlink=0):
+        """Tambah counter trafik user (seperti Xray saat user terhubung)"""
+        with self._lock:
+            for link, value in (("uplink", uplink), ("downlink", downlink)):
+                name = f"user>>>{email}>>>traffic>>>{link}"
+                self.stats[name] = self.stats.get(name, 0) + value
+
+    def reset_stats(self):
+        """Semua counter kembali 0, seperti setelah Xray restart"""
+        with self._lock:
+            self.stats = {}
+
+    def _query_stats(self, request, context):
+        fields = decode_message(request)
+        patterns = [p.decode() for p in fields.get(3, [])] or [first(fields, 1, b"").decode()]
+        reset = bool(first(fields, 2, 0))
+        with self._lock:
+            self.calls.append(("stats", "QueryStats"))
+            matched = [name for name in self.stats if any(pattern in name for pattern in patterns)]
+            response = b"".join(encode_bytes(1, encode_bytes(1, name) + encode_uint(2, self.stats[name])) for name in matched)
+            if reset:
+                for name in matched:
+                    self.stats[name] = 0
+        return response
+
+    def _get_stats(self, request, context):
+        fields = decode_message(request)
+        name = first(fields, 1, b"").decode()
+        with self._lock:
+            self.calls.append(("stats", "GetStats"))
+            if name not in self.stats:
+                context.abort(grpc.StatusCode.UNKNOWN, f"{name} not found.")
+            value = self.stats[name]
+            if first(fields, 2, 0):
+                self.stats[name] = 0
+        return encode_bytes(1, encode_bytes(1, name) + encode_uint(2, value))
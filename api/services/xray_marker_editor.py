@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Xray Marker Editor untuk AlrelShop API Panel
+Editor in-process untuk config.json yang memakai baris marker komentar
+(#vless, #vlessgrpc, #ssws, #ssgrpc, #& user expiry, dst) seperti script m-vless/m-ssws.
+
+Semua perubahan dilakukan di buffer teks di memory lalu di-flush sekali lewat
+XrayConfigManager, menggantikan beberapa proses `sed -i` per operasi. Hasilnya
+byte-identical dengan perintah sed yang ditiru:
+
+    append_after("#vless", [...])      ->  sed '/#vless$/a\\...'
+    delete_block("#& user exp")        ->  sed '/^#& user exp/,/^},{/d'
+    change_line("#& user ", "#& ...")  ->  sed '/^#& user /c\\#& ...'
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+BLOCK_END = "},{"
+
+
+def _with_newline(line):
+    return line if line.endswith("\n") else line + "\n"
+
+
+class MarkerEditor:
+    """Buffer teks config dengan operasi setara sed append/range delete/change.
+
+    Pencarian memakai str.find di seluruh buffer (bukan loop per baris),
+    jadi biaya per operasi tetap kecil walau config berisi puluhan ribu akun.
+    """
+
+    def __init__(self, text):
+        self.buffer = text
+        self.changes = 0
+
+    def _line_end(self, start):
+        end = self.buffer.find("\n", start)
+        return len(self.buffer) if end == -1 else end
+
+    def _line_starts(self, prefix):
+        """Offset awal setiap baris yang diawali prefix"""
+        positions = [0] if self.buffer.startswith(prefix) else []
+        needle = "\n" + prefix
+        pos = self.buffer.find(needle)
+        while pos != -1:
+            positions.append(pos + 1)
+            pos = self.buffer.find(needle, pos + 1)
+        return positions
+
+    def append_after(self, marker, new_lines):
+        """Sisipkan baris setelah setiap baris yang diakhiri marker (sed /marker$/a\\)"""
+        block = "".join(_with_newline(line) for line in new_lines)
+        buffer = self.buffer
+        pieces = []
+        last = 0
+        count = 0
+        pos = buffer.find(marker)
+        while pos != -1:
+            end = pos + len(marker)
+            if end == len(buffer):
+                # sed selalu menulis newline sebelum teks append, termasuk di baris terakhir
+                pieces.append(buffer[last:end] + "\n" + block)
+                last = end
+                count += 1
+            elif buffer[end] == "\n":
+                pieces.append(buffer[last:end + 1] + block)
+                last = end + 1
+                count += 1
+            pos = buffer.find(marker, end)
+        if count:
+            pieces.append(buffer[last:])
+            self.buffer = "".join(pieces)
+            self.changes += count
+        return count
+
+    def delete_block(self, start_prefix, end_prefix=BLOCK_END):
+        """Hapus dari baris berawalan start_prefix sampai baris berikutnya berawalan end_prefix (sed /^a/,/^b/d)"""
+        ranges = []
+        deleted_until = 0
+        for start in self._line_starts(start_prefix):
+            if start < deleted_until:
+                continue
+            ends = self.buffer.find("\n" + end_prefix, self._line_end(start))
+            if ends == -1:
+                deleted_until = len(self.buffer)
+            else:
+                deleted_until = min(self._line_end(ends + 1) + 1, len(self.buffer))
+            ranges.append((start, deleted_until))
+
+        if ranges:
+            pieces = []
+            last = 0
+            for start, end in ranges:
+                pieces.append(self.buffer[last:start])
+                last = end
+            pieces.append(self.buffer[last:])
+            self.buffer = "".join(pieces)
+            self.changes += len(ranges)
+        return len(ranges)
+
+    def change_line(self, prefix, new_line):
+        """Ganti setiap baris berawalan prefix dengan new_line (sed /^prefix/c\\)"""
+        new_line = new_line.rstrip("\n")
+        starts = self._line_starts(prefix)
+        if starts:
+            pieces = []
+            last = 0
+            for start in starts:
+                end = self._line_end(start)
+                pieces.append(self.buffer[last:start] + new_line)
+                if end == len(self.buffer):
+                    pieces.append("\n")
+                last = end
+            pieces.append(self.buffer[last:])
+            self.buffer = "".join(pieces)
+            self.changes += len(starts)
+        return len(starts)
+
+    def text(self):
+        return self.buffer
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point untuk AlrelShop API Panel
+Dipakai server production (gunicorn), menggantikan `python api/main_api.py`:
+
+    gunicorn --config api/gunicorn_conf.py wsgi:app
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from main_api import app
+
+application = app
@@ -120,7 +120,8 @@ Type=simple
 User=root
 WorkingDirectory=/etc/API-Panel
 Environment=PATH=/etc/API-Panel/venv/bin
-ExecStart=/etc/API-Panel/venv/bin/python api/main_api.py
+ExecStart=/etc/API-Panel/venv/bin/gunicorn --config api/gunicorn_conf.py wsgi:app
+ExecReload=/bin/kill -HUP \$MAINPID
 Restart=always
 RestartSec=10
 
@@ -295,7 +296,7 @@ cat > /etc/API-Panel/start_api.sh << 'EOF'
 # AlrelShop API Panel Startup Script
 cd /etc/API-Panel
 source venv/bin/activate
-python api/main_api.py
+gunicorn --config api/gunicorn_conf.py wsgi:app
 EOF
 
 chmod +x /etc/API-Panel/start_api.sh
@@ -149,7 +149,7 @@ setup_python() {
         fi
     else
         log_message "${YELLOW}⚠️  requirements.txt not found, installing basic packages${NC}"
-        pip install flask flask-cors >> "$LOG_FILE" 2>&1
+        pip install flask flask-cors gunicorn >> "$LOG_FILE" 2>&1
     fi
 }
 
@@ -170,7 +170,7 @@ Group=root
 WorkingDirectory=/etc/API-Panel
 Environment=PATH=/etc/API-Panel/venv/bin
 Environment=PYTHONPATH=/etc/API-Panel
-ExecStart=/etc/API-Panel/venv/bin/python api/main_api.py
+ExecStart=/etc/API-Panel/venv/bin/gunicorn --config api/gunicorn_conf.py wsgi:app
 ExecReload=/bin/kill -HUP $MAINPID
 Restart=always
 RestartSec=5
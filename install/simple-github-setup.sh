@@ -104,7 +104,8 @@ Type=simple
 User=root
 WorkingDirectory=/etc/API-Panel
 Environment=PATH=/etc/API-Panel/venv/bin
-ExecStart=/etc/API-Panel/venv/bin/python api/main_api.py
+ExecStart=/etc/API-Panel/venv/bin/gunicorn --config api/gunicorn_conf.py wsgi:app
+ExecReload=/bin/kill -HUP \$MAINPID
 Restart=always
 
 [Install]
@@ -67,15 +67,7 @@ generate_api_key() {
     
     if [ $? -eq 0 ]; then
         echo -e "\n${GREEN}✅ API key generation completed!${NC}"
-        echo -e "${YELLOW}⚠️  Don't forget to restart the API service:${NC}"
-        echo -e "${CYAN}    sudo systemctl restart api-panel${NC}"
-        
-        # Ask if user wants to restart service
-        read -p "Restart API service now? (y/N): " -n 1 -r
-        echo ""
-        if [[ $REPLY =~ ^[Yy]$ ]]; then
-            restart_api_service
-        fi
+        echo -e "${CYAN}ℹ️  API Panel yang berjalan memakai key baru otomatis, tidak perlu restart${NC}"
     else
         echo -e "\n${RED}❌ Failed to generate API key${NC}"
         return 1
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Benchmark Account Store
+
+Bandingkan latency list/create/delete akun antara:
+- legacy   : pola lama (baca seluruh file, tulis ulang setiap operasi)
+- flatfile : FlatFileAccountStore (cache in-memory + append/compaction)
+- sqlite   : SQLiteAccountStore (WAL + mirror ke file legacy)
+
+Usage: python3 scripts/bench_account_store.py [1000 10000 100000]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.account_store import FlatFileAccountStore
+from services.sqlite_store import SQLiteAccountStore
+
+OPERATIONS = 50
+
+
+def seed(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(f"### user{i} 2030-{i % 12 + 1:02d}-{i % 28 + 1:02d} {uuid.uuid4()} 10 2\n")
+
+
+class LegacyStore:
+    """Pola lama di service class: scan dan rewrite seluruh file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def all(self):
+        with open(self.path, "r") as f:
+            return [line.split()[1:] for line in f if line.startswith("### ")]
+
+    def add(self, record):
+        with open(self.path, "a") as f:
+            f.write("### " + " ".join(record) + "\n")
+
+    def remove(self, username):
+        with open(self.path, "r") as f:
+            lines = f.readlines()
+        with open(self.path, "w") as f:
+            for line in lines:
+                if not line.startswith(f"### {username} "):
+                    f.write(line)
+
+
+def measure(func, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(i)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench(name, store, count):
+    store.all()  # warm up / initial import
+    results = {
+        "list": measure(lambda i: store.all(), 5),
+        "create": measure(lambda i: store.add([f"bench{i}", "2030-01-01", str(uuid.uuid4()), "10", "2"]), OPERATIONS),
+        "delete": measure(lambda i: store.remove(f"bench{i}"), OPERATIONS),
+    }
+    print(f"{count:>8} {name:<9} " + " ".join(f"{op}={ms:9.3f}ms" for op, ms in results.items()))
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    workdir = tempfile.mkdtemp(prefix="bench-store-")
+    try:
+        for count in sizes:
+            for name in ("legacy", "flatfile", "sqlite"):
+                path = os.path.join(workdir, f"{name}-{count}", ".vmess.db")
+                os.makedirs(os.path.dirname(path))
+                seed(path, count)
+                if name == "legacy":
+                    store = LegacyStore(path)
+                elif name == "flatfile":
+                    store = FlatFileAccountStore(path)
+                else:
+                    store = SQLiteAccountStore(os.path.join(os.path.dirname(path), "accounts.sqlite3"), "vmess", path)
+                bench(name, store, count)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
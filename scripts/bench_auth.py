@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Benchmark Auth & Rate Limit
+
+Ukur biaya per request dari jalur require_api_key (tanpa Flask):
+- verify cold   : sha256(salt + secret) + compare_digest, key belum di cache
+- verify cached : lookup cache verifikasi per proses
+- legacy        : compare_digest dengan key lama api_config.json
+- scope         : request_scope(path) + identity.allows()
+- rate limit    : token bucket di file mmap (lockf + refill + tulis)
+
+Usage: python3 scripts/bench_auth.py [jumlah_key] [--iterations 20000]
+"""
+
+import json
+import os
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.api_keys import TOKEN_PREFIX, APIKeyIndex, hash_secret, request_scope
+from services.rate_limiter import RateLimiter
+
+DEFAULT_ITERATIONS = 20000
+LEGACY_KEY = "alrelshop-secret-api-key-2024"
+
+
+def build_index(count):
+    records, tokens = [], []
+    for i in range(count):
+        key_id, secret, salt = f"{i:08x}", secrets.token_urlsafe(32), secrets.token_bytes(16)
+        records.append({
+            "id": key_id,
+            "name": f"reseller{i}",
+            "salt": salt.hex(),
+            "hash": hash_secret(salt, secret).hex(),
+            "protocols": ["vmess", "vless"],
+            "actions": ["read", "create"],
+        })
+        tokens.append(f"{TOKEN_PREFIX}{key_id}_{secret}")
+    return APIKeyIndex(json.loads(json.dumps({"keys": records}))), tokens
+
+
+def per_call(func, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    args = sys.argv[1:]
+    iterations = DEFAULT_ITERATIONS
+    if "--iterations" in args:
+        pos = args.index("--iterations")
+        iterations = int(args[pos + 1])
+        del args[pos:pos + 2]
+    count = int(args[0]) if args else 1000
+
+    index, tokens = build_index(count)
+    cold = per_call(lambda i: index.verify(tokens[i % count]), min(iterations, count))
+    cached = per_call(lambda i: index.verify(tokens[i % count]), iterations)
+    legacy = per_call(lambda i: index.verify(LEGACY_KEY, LEGACY_KEY), iterations)
+    identity = index.verify(tokens[0])
+    scope = per_call(lambda i: identity.allows(*request_scope("/api/vmess/create", "POST")), iterations)
+
+    root = tempfile.mkdtemp(prefix="bench-auth-")
+    try:
+        limiter = RateLimiter({"read": (10 ** 9, 10 ** 9)}, path=os.path.join(root, "rate-limit.bin"))
+        limit = per_call(lambda i: limiter.hit("read", f"key:{i % count:08x}"), iterations)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(f"--- {count} key, {iterations} iterasi ---")
+    print(f"verify cold   : {cold:8.2f}us")
+    print(f"verify cached : {cached:8.2f}us")
+    print(f"legacy key    : {legacy:8.2f}us")
+    print(f"scope check   : {scope:8.2f}us")
+    print(f"rate limit    : {limit:8.2f}us")
+    print(f"total (cached): {cached + scope + limit:8.2f}us per request")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Benchmark IP Limiter
+
+Tulis access log sintetis lalu ukur biaya per baris jalur IP limiter (tanpa Flask):
+- tail    : pread dari offset + potong per baris
+- feed    : parse baris Xray + update sliding window IP per email
+- tick    : tail + feed + cek pelanggar (dry-run, tanpa ubah config)
+
+Hasil dikonversi ke persen CPU satu core pada laju log tertentu (default 10k baris/detik).
+
+Usage: python3 scripts/bench_ip_limit.py [jumlah_baris] [--users 5000] [--rate 10000]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.account_suspender import AccountSuspender
+from services.ip_limiter import AccessLogTailer, IPLimiter
+
+DEFAULT_LINES = 200000
+DEFAULT_USERS = 5000
+DEFAULT_RATE = 10000
+DEFAULT_LIMIT = 2
+
+
+class BenchStore:
+    """Store minimal: daftar username dengan signature tetap"""
+
+    def __init__(self, usernames):
+        self.usernames = usernames
+
+    def all(self):
+        return [[username] for username in self.usernames]
+
+    def signature(self):
+        return len(self.usernames)
+
+
+class BenchService:
+    def __init__(self, usernames, limit_ip_path):
+        self.store = BenchStore(usernames)
+        self.limit_ip_path = limit_ip_path
+
+
+def write_log(path, count, usernames):
+    rng = random.Random(1)
+    with open(path, "w") as f:
+        for i in range(count):
+            user = usernames[rng.randrange(len(usernames))]
+            # Sebagian kecil user memakai banyak IP
+            ip = f"10.{rng.randrange(4)}.{rng.randrange(256)}.{rng.randrange(1, 255)}" if user.endswith("7") else \
+                f"10.9.{hash(user) % 256}.{rng.randrange(1, 3)}"
+            f.write(f"2026/10/17 19:45:{i % 60:02d} {ip}:{40000 + i % 20000} accepted "
+                    f"tcp:www.example{i % 50}.com:443 [vmess-ws >> direct] email: {user}\n")
+
+
+def main():
+    args = sys.argv[1:]
+    options = {"--users": DEFAULT_USERS, "--rate": DEFAULT_RATE}
+    for name in list(options):
+        if name in args:
+            pos = args.index(name)
+            options[name] = int(args[pos + 1])
+            del args[pos:pos + 2]
+    count = int(args[0]) if args else DEFAULT_LINES
+    users, rate = options["--users"], options["--rate"]
+
+    root = tempfile.mkdtemp(prefix="bench-ip-limit-")
+    try:
+        usernames = [f"user{i}" for i in range(users)]
+        limit_dir = os.path.join(root, "limit")
+        os.makedirs(limit_dir)
+        for username in usernames:
+            with open(os.path.join(limit_dir, username), "w") as f:
+                f.write(str(DEFAULT_LIMIT))
+        log_path = os.path.join(root, "access.log")
+        write_log(log_path, count, usernames)
+        size = os.path.getsize(log_path)
+
+        tailer = AccessLogTailer(log_path, start_at_end=False)
+        start = time.perf_counter()
+        lines = []
+        while True:
+            chunk = tailer.read_lines()
+            if not chunk:
+                break
+            lines.extend(chunk)
+        tail = (time.perf_counter() - start) / count * 1e6
+
+        suspender = AccountSuspender(os.path.join(root, "config.json"), state_path=os.path.join(root, "suspended.json"))
+        services = {"vmess": BenchService(usernames, limit_dir)}
+
+        limiter = IPLimiter(services, suspender, AccessLogTailer(log_path, start_at_end=False), dry_run=True)
+        limiter.refresh_table()
+        start = time.perf_counter()
+        limiter.feed(lines, time.monotonic())
+        feed = (time.perf_counter() - start) / count * 1e6
+
+        limiter = IPLimiter(services, suspender, AccessLogTailer(log_path, start_at_end=False,
+                                                                 max_read_bytes=1024 * 1024), dry_run=True)
+        limiter.refresh_table()
+        start = time.perf_counter()
+        ticks, violators = 0, set()
+        while True:
+            result = limiter.run()
+            ticks += 1
+            violators.update(result["violators"])
+            if not result["lines"]:
+                break
+        tick = (time.perf_counter() - start) / count * 1e6
+        stats = limiter.stats()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(f"--- {count} baris ({size / 1e6:.1f} MB), {users} user, limit {DEFAULT_LIMIT} IP ---")
+    print(f"tail          : {tail:8.2f}us/baris")
+    print(f"parse + window: {feed:8.2f}us/baris")
+    print(f"tick lengkap  : {tick:8.2f}us/baris ({ticks} tick, maks {stats['max_tick_ms']:.1f}ms per tick)")
+    print(f"pelanggar     : {len(violators)} user, {stats['ips_tracked']} IP di memory")
+    print(f"CPU @ {rate} baris/detik: {tick * rate / 1e4:.1f}% satu core")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
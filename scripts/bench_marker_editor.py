@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Benchmark Marker Editor
+
+Jalankan urutan add/renew/delete akun VLess + Shadowsocks dua kali:
+- sed    : 2 proses `sed -i` per operasi (pola lama)
+- editor : MarkerEditor in-process, satu flush per operasi
+
+Lalu cek output config byte-identical dan tampilkan selisih waktunya.
+
+Usage: python3 scripts/bench_marker_editor.py [jumlah_akun_awal] [jumlah_operasi]
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.xray_config import XrayConfigManager
+from services.xray_marker_editor import MarkerEditor
+
+# (marker inbound, prefix baris user) untuk WS dan gRPC, seperti di service
+PROTOCOLS = {
+    "vless": [("#vless", "#&"), ("#vlessgrpc", "#&&")],
+    "shadowsocks": [("#ssws", "#!!"), ("#ssgrpc", "#&!")],
+}
+
+
+def entry(protocol, username, credential):
+    if protocol == "vless":
+        return f'}},{{"id": "{credential}","email": "{username}"'
+    return f'}},{{"password": "{credential}","method": "aes-128-gcm","email": "{username}"'
+
+
+def seed(path, count):
+    lines = ['{\n', '  "inbounds": [\n']
+    for protocol, markers in PROTOCOLS.items():
+        for marker, prefix in markers:
+            lines.append(f'    {{"protocol": "{protocol}", "settings": {{"clients": [\n')
+            lines.append('      {"id": "00000000-0000-0000-0000-000000000000"\n')
+            lines.append(f'{marker}\n')
+            for i in range(count):
+                lines.append(f'{prefix} seed{i} 2030-01-01\n')
+                lines.append(entry(protocol, f"seed{i}", uuid.uuid4()) + '\n')
+            lines.append('      }]}},\n')
+    lines.append('    {"protocol": "freedom"}\n  ]\n}\n')
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+
+def operations(count):
+    ops = []
+    for i in range(count):
+        protocol = "vless" if i % 2 == 0 else "shadowsocks"
+        ops.append(("add", protocol, f"bench{i}", str(uuid.uuid4()), "2030-06-01"))
+    for i in range(0, count, 2):
+        protocol = "vless" if i % 2 == 0 else "shadowsocks"
+        ops.append(("renew", protocol, f"bench{i}", None, "2031-01-01"))
+    for i in range(0, count, 3):
+        protocol = "vless" if i % 2 == 0 else "shadowsocks"
+        ops.append(("delete", protocol, f"bench{i}", None, "2031-01-01" if i % 2 == 0 else "2030-06-01"))
+    return ops
+
+
+def run_sed(path, ops):
+    for op, protocol, username, credential, expiry in ops:
+        for marker, prefix in PROTOCOLS[protocol]:
+            if op == "add":
+                text = f"{prefix} {username} {expiry}\\n{entry(protocol, username, credential)}"
+                script = f"/{marker}$/a\\{text}"
+            elif op == "renew":
+                script = f"/^{prefix} {username} /c\\{prefix} {username} {expiry}"
+            else:
+                script = f"/^{prefix} {username} {expiry}/,/^}},{{/d"
+            subprocess.run(["sed", "-i", script, path], check=True)
+
+
+def run_editor(path, ops):
+    manager = XrayConfigManager(path)
+    for op, protocol, username, credential, expiry in ops:
+        with manager.transaction() as tx:
+            editor = MarkerEditor(tx.get_text())
+            for marker, prefix in PROTOCOLS[protocol]:
+                if op == "add":
+                    editor.append_after(marker, [f"{prefix} {username} {expiry}", entry(protocol, username, credential)])
+                elif op == "renew":
+                    editor.change_line(f"{prefix} {username} ", f"{prefix} {username} {expiry}")
+                else:
+                    editor.delete_block(f"{prefix} {username} {expiry}")
+            tx.set_text(editor.text())
+
+
+def main():
+    accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    workdir = tempfile.mkdtemp(prefix="bench-marker-")
+    try:
+        base = os.path.join(workdir, "base.json")
+        seed(base, accounts)
+        ops = operations(count)
+        results = {}
+        for name, runner in (("sed", run_sed), ("editor", run_editor)):
+            path = os.path.join(workdir, f"{name}.json")
+            shutil.copy(base, path)
+            start = time.perf_counter()
+            runner(path, ops)
+            results[name] = time.perf_counter() - start
+            print(f"{name:<7} {len(ops)} ops: {results[name] * 1000:9.1f}ms total, {results[name] / len(ops) * 1000:7.3f}ms/op")
+
+        with open(os.path.join(workdir, "sed.json"), "rb") as f:
+            sed_output = f.read()
+        with open(os.path.join(workdir, "editor.json"), "rb") as f:
+            editor_output = f.read()
+        print("byte-identical:", sed_output == editor_output)
+        print(f"speedup: {results['sed'] / results['editor']:.1f}x")
+        return 0 if sed_output == editor_output else 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
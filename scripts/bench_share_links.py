@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Benchmark Share Link & Template
+
+Bandingkan biaya membuat link + config + pesan Telegram satu akun VMess (jalur create):
+- legacy : pola lama, info server dibaca dari file dan link dibuat ulang
+           (dict -> json.dumps -> base64) untuk config dan lagi untuk Telegram,
+           template diformat penuh setiap kali
+- compiled : ShareLinks, template sudah di-compile dengan info server, semua
+             link dibuat sekali lalu dipakai ulang dari cache
+
+Usage: python3 scripts/bench_share_links.py [jumlah_akun ...]
+"""
+
+import base64
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.client_templates import TEMPLATES
+from services.host_info import HOST_FILES, SERVER_INFO_FIELDS
+from services.share_links import ShareLinks
+
+DOMAIN = "vpn.example.com"
+BUG = "bug.com"
+
+
+def legacy_vmess_link(username, user_uuid, port, tls, network, path, host):
+    """Salinan _generate_vmess_link lama"""
+    vmess_config = {
+        "v": "2",
+        "ps": username,
+        "add": host,
+        "port": port,
+        "id": user_uuid,
+        "aid": "0",
+        "net": network,
+        "type": "none",
+        "host": host,
+        "tls": "tls" if tls else "none"
+    }
+    if network == "ws":
+        vmess_config["path"] = path
+    elif network == "grpc":
+        vmess_config["path"] = path
+        vmess_config["sni"] = host
+    vmess_json = json.dumps(vmess_config)
+    return f"vmess://{base64.b64encode(vmess_json.encode()).decode()}"
+
+
+def read_server_info():
+    """Salinan _get_server_info lama: baca semua file setiap dipanggil"""
+    info = {}
+    for field in SERVER_INFO_FIELDS:
+        try:
+            with open(HOST_FILES[field][0], "r") as f:
+                info[field] = f.read().strip()
+        except:
+            info[field] = "Unknown"
+    return info
+
+
+def legacy_render(kind, username, user_uuid):
+    server_info = read_server_info()
+    links = {
+        "ws_tls": legacy_vmess_link(username, user_uuid, 443, True, "ws", "/vmess", BUG),
+        "ws_nontls": legacy_vmess_link(username, user_uuid, 80, False, "ws", "/vmess", BUG),
+        "grpc": legacy_vmess_link(username, user_uuid, 443, True, "grpc", "vmess-grpc", DOMAIN),
+    }
+    return TEMPLATES["vmess"][kind].format(
+        domain=DOMAIN, username=username, uuid=user_uuid, quota_gb=5, ip_limit=2, bug=BUG,
+        duration_text="30 Hari", expiry_text="16 Nov 2026", **server_info, **links
+    )
+
+
+def bench_legacy(accounts):
+    start = time.perf_counter()
+    output = [(legacy_render("config", name, user_uuid), legacy_render("telegram", name, user_uuid))
+              for name, user_uuid in accounts]
+    return time.perf_counter() - start, output
+
+
+def bench_compiled(accounts):
+    start = time.perf_counter()
+    share_links = ShareLinks(DOMAIN, read_server_info())
+    output = []
+    for name, user_uuid in accounts:
+        # Response create, file config dan Telegram memakai link yang sama
+        links = share_links.links("vmess", name, user_uuid, bug=BUG)
+        fields = dict(username=name, uuid=user_uuid, quota_gb=5, ip_limit=2, bug=BUG, duration_text="30 Hari")
+        config = share_links.render("vmess", "config", expiry_text="16 Nov 2026",
+                                    **fields, **share_links.links("vmess", name, user_uuid, bug=BUG))
+        message = share_links.render("vmess", "telegram", **fields, **links)
+        output.append((config, message))
+    return time.perf_counter() - start, output
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000]
+
+    for count in sizes:
+        accounts = [(f"user{i}", str(uuid.uuid4())) for i in range(count)]
+        legacy, expected = bench_legacy(accounts)
+        compiled, output = bench_compiled(accounts)
+        mismatches = sum(1 for a, b in zip(expected, output) if a != b)
+        print(f"--- {count} akun ---")
+        print(f"legacy   : {legacy * 1000:10.1f}ms ({legacy / count * 1e6:.1f}us/akun)")
+        print(f"compiled : {compiled * 1000:10.1f}ms ({compiled / count * 1e6:.1f}us/akun), mismatch={mismatches}")
+        print(f"speedup  : {legacy / compiled:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
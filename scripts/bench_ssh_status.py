@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Benchmark Status Akun SSH
+
+Bandingkan biaya status akun SSH untuk list_accounts:
+- passwd : pola lama, satu `passwd -S <user>` per akun (diukur dari sampel
+           lalu diekstrapolasi, karena user fixture tidak ada di sistem)
+- reader : SystemAccountReader, parse /etc/passwd + /etc/shadow fixture sekali
+           (cold) lalu dari cache (warm)
+
+Usage: python3 scripts/bench_ssh_status.py [jumlah_user ...] [--sample 100]
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.system_accounts import SystemAccountReader
+
+DEFAULT_SAMPLE = 100
+
+
+def seed(root, count):
+    """Fixture passwd/shadow: campuran user aktif, locked, tanpa password dan expired"""
+    os.makedirs(os.path.join(root, "etc"), exist_ok=True)
+    today = int(time.time() // 86400)
+    expected = {}
+    with open(os.path.join(root, "etc/passwd"), "w") as passwd, open(os.path.join(root, "etc/shadow"), "w") as shadow:
+        passwd.write("root:x:0:0:root:/root:/bin/bash\n")
+        shadow.write("root:*:19000:0:99999:7:::\n")
+        for i in range(count):
+            name = f"user{i}"
+            kind = i % 10
+            password, expire, status = "$6$salt$hash", today + 30, "active"
+            if kind == 0:
+                password, status = "!$6$salt$hash", "locked"
+            elif kind == 1:
+                password, status = "", "expired"
+            elif kind == 2:
+                expire, status = today - 1, "expired"
+            passwd.write(f"{name}:x:{1000 + i}:{1000 + i}::/home/{name}:/bin/false\n")
+            shadow.write(f"{name}:{password}:19000:0:99999:7::{expire}:\n")
+            expected[name] = status
+    return expected
+
+
+def bench_passwd(count, sample):
+    if not shutil.which("passwd"):
+        return None
+    start = time.perf_counter()
+    for _ in range(sample):
+        subprocess.run(["passwd", "-S", "root"], capture_output=True, text=True)
+    per_call = (time.perf_counter() - start) / sample
+    return per_call * count
+
+
+def bench_reader(root, users, expected):
+    reader = SystemAccountReader(root)
+    start = time.perf_counter()
+    statuses = reader.statuses(users)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    reader.statuses(users)
+    warm = time.perf_counter() - start
+    mismatches = sum(1 for name in users if statuses[name] != expected[name])
+    return cold, warm, mismatches
+
+
+def main():
+    args = sys.argv[1:]
+    sample = DEFAULT_SAMPLE
+    if "--sample" in args:
+        pos = args.index("--sample")
+        sample = int(args[pos + 1])
+        del args[pos:pos + 2]
+    sizes = [int(arg) for arg in args] or [1000, 10000]
+
+    for count in sizes:
+        root = tempfile.mkdtemp(prefix="bench-ssh-")
+        try:
+            expected = seed(root, count)
+            users = list(expected)
+            legacy = bench_passwd(count, sample)
+            cold, warm, mismatches = bench_reader(root, users, expected)
+            print(f"--- {count} user ---")
+            if legacy is None:
+                print("passwd  : (passwd tidak tersedia)")
+            else:
+                print(f"passwd  : {legacy * 1000:10.1f}ms (ekstrapolasi dari {sample} fork)")
+            print(f"reader  : {cold * 1000:10.1f}ms cold, {warm * 1000:.1f}ms warm, mismatch={mismatches}")
+            if legacy:
+                print(f"speedup : {legacy / cold:.0f}x cold, {legacy / warm:.0f}x warm")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -67,7 +67,7 @@ kill_api_processes() {
     echo -e "${YELLOW}Checking for running API Panel processes...${NC}"
     
     # Find Python processes running main_api.py
-    API_PIDS=$(pgrep -f "main_api.py")
+    API_PIDS=$(pgrep -f "main_api.py|wsgi:app")
     
     if [ -n "$API_PIDS" ]; then
         echo -e "${YELLOW}Found API Panel processes: $API_PIDS${NC}"
@@ -78,7 +78,7 @@ kill_api_processes() {
         sleep 3
         
         # Check if processes still running
-        REMAINING_PIDS=$(pgrep -f "main_api.py")
+        REMAINING_PIDS=$(pgrep -f "main_api.py|wsgi:app")
         if [ -n "$REMAINING_PIDS" ]; then
             echo -e "${YELLOW}Force killing remaining processes...${NC}"
             kill -9 $REMAINING_PIDS 2>/dev/null
@@ -107,7 +107,7 @@ show_status() {
     fi
     
     # Check for any remaining processes
-    API_PIDS=$(pgrep -f "main_api.py")
+    API_PIDS=$(pgrep -f "main_api.py|wsgi:app")
     if [ -n "$API_PIDS" ]; then
         echo -e "Running Processes: ${YELLOW}$API_PIDS${NC}"
     else
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Test Account Store
+
+FlatFileAccountStore dan SQLiteAccountStore di direktori sementara:
+- page (username/expiry, prefix, filter tanggal, cursor) sama dengan hasil brute force
+- expiring_before / count_expiring_before dari index expiry
+- SQLite <-> file legacy: perubahan API di-mirror, perubahan dari script shell di-import
+
+Usage: python3 scripts/test_account_store.py  (atau pytest scripts/test_account_store.py)
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.account_store import FlatFileAccountStore
+from services.sqlite_store import SQLiteAccountStore
+
+
+def seed_lines(count=200, seed=7):
+    rng = random.Random(seed)
+    lines = ["#vmess\n"]
+    for i in range(count):
+        expiry = rng.choice(["", f"2030-01-{rng.randint(1, 28):02d}"])
+        lines.append(f"### {rng.choice('abc')}user{i:03d} {expiry}".rstrip() + "\n")
+    return lines
+
+
+def expected(records, sort, descending, prefix, expiry_from, expiry_to):
+    def expiry(record):
+        return record[1] if len(record) > 1 else ""
+    if expiry_from is not None or expiry_to is not None:
+        records = [r for r in records if expiry(r)
+                   and (expiry_from is None or expiry(r) >= expiry_from)
+                   and (expiry_to is None or expiry(r) <= expiry_to)]
+    if prefix:
+        records = [r for r in records if r[0].startswith(prefix)]
+    key = (lambda r: (expiry(r), r[0])) if sort == "expiry" else (lambda r: r[0])
+    return [r[0] for r in sorted(records, key=key, reverse=descending)]
+
+
+def all_pages(store, limit, **kwargs):
+    usernames, cursor = [], None
+    while True:
+        records, cursor = store.page(limit=limit, after=cursor, **kwargs)
+        usernames += [r[0] for r in records]
+        if cursor is None:
+            return usernames
+
+
+CASES = [
+    dict(sort="username", descending=False, prefix=None, expiry_from=None, expiry_to=None),
+    dict(sort="username", descending=True, prefix="b", expiry_from=None, expiry_to=None),
+    dict(sort="username", descending=False, prefix=None, expiry_from="2030-01-05", expiry_to="2030-01-20"),
+    dict(sort="username", descending=True, prefix="a", expiry_from=None, expiry_to="2030-01-10"),
+    dict(sort="expiry", descending=False, prefix=None, expiry_from=None, expiry_to=None),
+    dict(sort="expiry", descending=True, prefix="c", expiry_from="2030-01-10", expiry_to=None),
+    dict(sort="expiry", descending=False, prefix=None, expiry_from="2030-01-03", expiry_to="2030-01-03"),
+]
+
+
+class FlatFileAccountStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test-store-")
+        self.path = os.path.join(self.root, ".vmess.db")
+        with open(self.path, "w") as f:
+            f.writelines(seed_lines())
+        self.store = FlatFileAccountStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_page_matches_brute_force(self):
+        records = self.store.all()
+        for case in CASES:
+            for limit in (1, 7, 500):
+                self.assertEqual(all_pages(self.store, limit, **case), expected(records, **case), (case, limit))
+
+    def test_expiring_before(self):
+        records = self.store.all()
+        want = sorted((r[1], r[0]) for r in records if len(r) > 1 and r[1] < "2030-01-15")
+        self.assertEqual(self.store.expiring_before("2030-01-15"), [username for _, username in want])
+        self.assertEqual(self.store.count_expiring_before("2030-01-15"), len(want))
+        self.assertEqual(self.store.expiring_before("2000-01-01"), [])
+
+    def test_writes_update_index(self):
+        self.store.add(["zz", "2029-12-31"])
+        self.assertEqual(self.store.expiring_before("2030-01-01"), ["zz"])
+        self.store.set_expiry("zz", "2031-01-01")
+        self.assertEqual(self.store.expiring_before("2030-01-01"), [])
+        records, _ = self.store.page(limit=1, sort="expiry", descending=True)
+        self.assertEqual(records, [["zz", "2031-01-01"]])
+        self.store.remove("zz")
+        self.assertIsNone(self.store.get("zz"))
+        # Baris non-akun (marker) tetap ada setelah compact
+        with open(self.path) as f:
+            self.assertEqual(f.readline(), "#vmess\n")
+
+    def test_external_edit_is_reloaded(self):
+        self.assertIsNone(self.store.get("shell"))
+        with open(self.path, "a") as f:
+            f.write("### shell 2030-02-01\n")
+        self.assertEqual(self.store.get("shell"), ["shell", "2030-02-01"])
+        self.assertIn("shell", self.store.expiring_before("2030-03-01"))
+
+
+class SQLiteAccountStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test-sqlite-")
+        self.legacy_path = os.path.join(self.root, ".vmess.db")
+        with open(self.legacy_path, "w") as f:
+            f.writelines(seed_lines())
+        self.store = SQLiteAccountStore(os.path.join(self.root, "accounts.sqlite3"), "vmess", self.legacy_path)
+        self.flat = FlatFileAccountStore(self.legacy_path)
+        self.first = next(r[0] for r in self.flat.all() if len(r) > 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def legacy(self):
+        return FlatFileAccountStore(self.legacy_path).all()
+
+    def test_imports_legacy_and_matches_flatfile(self):
+        self.assertEqual(self.store.all(), self.flat.all())
+        self.assertEqual(self.store.expiring_before("2030-01-15"), self.flat.expiring_before("2030-01-15"))
+        for case in CASES:
+            self.assertEqual(all_pages(self.store, 7, **case), all_pages(self.flat, 7, **case), case)
+
+    def test_api_writes_are_mirrored(self):
+        self.store.add(["budi", "2030-05-01"])
+        self.store.set_expiry(self.first, "2031-01-01")
+        with self.store.batch():
+            self.store.add(["ani", "2030-06-01"])
+            self.store.remove("budi")
+        self.assertEqual(self.legacy(), self.store.all())
+        self.assertEqual(self.store.get(self.first)[1], "2031-01-01")
+
+    def test_shell_edits_are_imported(self):
+        self.store.count()
+        # Script m-vmess menambah dan menghapus baris langsung di file legacy
+        with open(self.legacy_path) as f:
+            lines = [line for line in f if not line.startswith(f"### {self.first} ")]
+        lines.append("### shell 2030-02-01\n")
+        with open(self.legacy_path, "w") as f:
+            f.writelines(lines)
+        self.assertEqual(self.store.get("shell"), ["shell", "2030-02-01"])
+        self.assertIsNone(self.store.get(self.first))
+        self.assertEqual(self.store.all(), self.legacy())
+
+    def test_failed_batch_rolls_back(self):
+        before = self.store.all()
+        with self.assertRaises(RuntimeError):
+            with self.store.batch():
+                self.store.add(["budi", "2030-05-01"])
+                raise RuntimeError("batal")
+        self.assertIsNone(self.store.get("budi"))
+        self.assertEqual(self.store.all(), before)
+        self.assertEqual(self.legacy(), before)
+
+    def test_export_and_import(self):
+        target = os.path.join(self.root, "export.db")
+        self.assertEqual(self.store.export_legacy(target), len(self.flat.all()))
+        self.assertEqual(FlatFileAccountStore(target).all(), self.store.all())
+
+        # Import paksa: isi SQLite diganti isi file legacy
+        with open(self.legacy_path, "w") as f:
+            f.write("### satu 2030-01-01\n")
+        self.store.import_legacy()
+        self.assertEqual(self.store.all(), [["satu", "2030-01-01"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Test Batch Service
+
+BatchService di atas service palsu (config Xray + database akun di direktori
+sementara, restart Xray palsu), tanpa Xray sungguhan dan tanpa menyentuh /etc:
+- item gagal tidak membatalkan item lain (status partial), restart hanya sekali
+- hot-reload yang berhasil tidak memicu restart
+- commit config gagal: database ikut di-rollback dan item sukses dilaporkan gagal
+- restart gagal: item sukses dilaporkan gagal, error ada di xray_reload
+
+Usage: python3 scripts/test_batch_service.py  (atau pytest scripts/test_batch_service.py)
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services import restart_scheduler
+from services.account_store import FlatFileAccountStore
+from services.batch_service import BatchService, current_batch
+from services.restart_scheduler import XrayRestartScheduler
+from services.xray_config import XrayConfigManager
+
+EXPIRY = "2099-12-31"
+
+
+class FakeService:
+    """create_account minimal dengan pola service asli: config Xray, database, lalu hot-add atau restart"""
+
+    def __init__(self, root, xray_config, protocol, hot=False):
+        self.store = FlatFileAccountStore(os.path.join(root, f"{protocol}.db"))
+        self.xray_config = xray_config
+        self.protocol = protocol
+        self.hot = hot
+
+    def create_account(self, data):
+        username = data["username"]
+        if username.startswith("gagal"):
+            return {"status": "error", "message": "Username ditolak"}
+        with self.xray_config.transaction() as tx:
+            tx.add_client(self.protocol, {"id": f"uuid-{username}", "email": username})
+        self.store.add([username, EXPIRY])
+        batch = current_batch()
+        if self.hot:
+            batch.defer(lambda: True)
+        else:
+            batch.request_restart()
+        return {"status": "success", "message": "ok", "data": {"username": username}}
+
+
+class BatchServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test-batch-")
+        self.config_path = os.path.join(self.root, "config.json")
+        inbounds = [{"tag": f"{protocol}-ws", "protocol": protocol, "settings": {"clients": []}}
+                    for protocol in ("vmess", "vless")]
+        with open(self.config_path, "w") as f:
+            json.dump({"inbounds": inbounds}, f, indent=2)
+        self.xray_config = XrayConfigManager(self.config_path)
+
+        self.restarts = []
+        self.restart_error = None
+        self._scheduler = restart_scheduler._scheduler
+        restart_scheduler._scheduler = XrayRestartScheduler(window_ms=0, restart_func=self.fake_restart)
+
+    def tearDown(self):
+        restart_scheduler._scheduler = self._scheduler
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def fake_restart(self):
+        if self.restart_error:
+            raise RuntimeError(self.restart_error)
+        self.restarts.append(1)
+
+    def service(self, protocol="vmess", hot=False):
+        return FakeService(self.root, self.xray_config, protocol, hot=hot)
+
+    def emails(self, protocol="vmess"):
+        with open(self.config_path) as f:
+            config = json.load(f)
+        inbound = next(i for i in config["inbounds"] if i["protocol"] == protocol)
+        return [client["email"] for client in inbound["settings"]["clients"]]
+
+    def test_partial_batch_restarts_once(self):
+        service = self.service()
+        result = BatchService({"vmess": service}).run("vmess", "create", ["budi", "gagal1", "ani", "budi"])
+        self.assertEqual(result["status"], "partial")
+        self.assertEqual((result["succeeded"], result["failed"]), (2, 2))
+        self.assertEqual([r["status"] for r in result["results"]], ["success", "error", "success", "error"])
+        self.assertEqual(result["results"][3]["message"], "Username duplikat di dalam batch")
+        self.assertEqual(self.emails(), ["budi", "ani"])
+        self.assertEqual(sorted(r[0] for r in service.store.all()), ["ani", "budi"])
+        self.assertTrue(result["xray_reload"]["restarted"])
+        self.assertEqual(result["xray_reload"]["restart"]["status"], "completed")
+        self.assertEqual(self.restarts, [1])
+
+    def test_hot_applied_skips_restart(self):
+        result = BatchService({"vmess": self.service(hot=True)}).run("vmess", "create", ["budi", "ani"])
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["xray_reload"]["hot_applied"], 2)
+        self.assertFalse(result["xray_reload"]["restarted"])
+        self.assertEqual(self.restarts, [])
+
+    def test_commit_failure_rolls_back(self):
+        service = self.service()
+
+        def broken_write(text):
+            raise OSError("disk penuh")
+        self.xray_config._write_file = broken_write
+
+        result = BatchService({"vmess": service}).run("vmess", "create", ["budi", "ani"])
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(result["succeeded"], 0)
+        for item in result["results"]:
+            self.assertEqual(item["message"], "Commit batch gagal: disk penuh")
+        # Config dan database tetap seperti sebelum batch
+        self.assertEqual(self.emails(), [])
+        self.assertEqual(service.store.all(), [])
+        self.assertFalse(os.path.exists(service.store.path))
+
+    def test_restart_failure_reported(self):
+        self.restart_error = "xray.service gagal start"
+        result = BatchService({"vmess": self.service()}).run("vmess", "create", ["budi"])
+        self.assertEqual(result["status"], "error")
+        self.assertIn("xray.service gagal start", result["results"][0]["message"])
+        self.assertIn("xray.service gagal start", result["xray_reload"]["error"])
+        self.assertEqual(result["xray_reload"]["restart"]["status"], "failed")
+        # Config sudah tersimpan, hanya reload yang gagal
+        self.assertEqual(self.emails(), ["budi"])
+
+    def test_run_many_single_restart(self):
+        services = {"vmess": self.service("vmess"), "vless": self.service("vless")}
+        result = BatchService(services).run_many("create", {"vmess": ["budi"], "vless": ["ani", "gagal1"]},
+                                                 reason="test-many")
+        self.assertEqual(result["results"]["vmess"]["status"], "success")
+        self.assertEqual(result["results"]["vless"]["status"], "partial")
+        self.assertEqual(self.emails("vmess"), ["budi"])
+        self.assertEqual(self.emails("vless"), ["ani"])
+        self.assertIsNone(result["results"]["vmess"]["xray_reload"])
+        self.assertEqual(result["xray_reload"]["error"], None)
+        self.assertEqual(self.restarts, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
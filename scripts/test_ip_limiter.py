@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Test IP Limiter
+
+IP limiter melawan access log sintetis dan HandlerService palsu
+(services/xray_fake.py), tanpa Xray sungguhan dan tanpa menyentuh /etc:
+- hanya IP dalam sliding window yang dihitung terhadap limit
+- pelanggar di-suspend selama lock_seconds lalu diaktifkan lagi otomatis
+- log dibaca incremental, termasuk setelah rotasi
+- dengan lock_path yang sama hanya satu limiter yang membaca log
+
+Usage: python3 scripts/test_ip_limiter.py  (atau pytest scripts/test_ip_limiter.py)
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services import restart_scheduler
+from services.account_suspender import AccountSuspender
+from services.ip_limiter import AccessLogTailer, IPLimiter
+from services.restart_scheduler import XrayRestartScheduler
+from services.xray_api import XrayStatsClient
+from services.xray_fake import FakeXrayServer
+
+TAG = "vmess-ws"
+USERS = {"budi": "uuid-budi", "ani": "uuid-ani"}
+START = 1000.0
+
+
+class FakeStore:
+    def __init__(self, usernames):
+        self.usernames = usernames
+
+    def all(self):
+        return [[username, "2099-12-31"] for username in self.usernames]
+
+    def signature(self):
+        return tuple(self.usernames)
+
+
+class FakeService:
+    def __init__(self, usernames, limit_ip_path):
+        self.store = FakeStore(usernames)
+        self.limit_ip_path = limit_ip_path
+
+
+class IPLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test-ip-limit-")
+        self.limit_dir = os.path.join(self.root, "limit")
+        os.makedirs(self.limit_dir)
+        for username in USERS:
+            with open(os.path.join(self.limit_dir, username), "w") as f:
+                f.write("2")
+
+        self.config_path = os.path.join(self.root, "config.json")
+        clients = [{"id": uuid, "alterId": 0, "email": email} for email, uuid in USERS.items()]
+        with open(self.config_path, "w") as f:
+            json.dump({"inbounds": [{"tag": TAG, "protocol": "vmess", "settings": {"clients": clients}}]}, f, indent=2)
+
+        self.server = FakeXrayServer(tags=[TAG]).start()
+        self.client = XrayStatsClient(address=self.server.address, enabled=True)
+        for email, uuid in USERS.items():
+            self.client.add_user(TAG, "vmess", email, uuid)
+
+        self.restarts = []
+        self._scheduler = restart_scheduler._scheduler
+        restart_scheduler._scheduler = XrayRestartScheduler(window_ms=0, restart_func=lambda: self.restarts.append(1))
+
+        self.log_path = os.path.join(self.root, "access.log")
+        open(self.log_path, "w").close()
+        self.suspender = AccountSuspender(self.config_path, client=self.client,
+                                          state_path=os.path.join(self.root, "suspended.json"))
+        self.services = {"vmess": FakeService(list(USERS), self.limit_dir)}
+
+    def tearDown(self):
+        restart_scheduler._scheduler = self._scheduler
+        self.server.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def limiter(self, **kwargs):
+        tailer = AccessLogTailer(self.log_path, offset_path=os.path.join(self.root, "offset.json"),
+                                 start_at_end=False)
+        kwargs.setdefault("window", 120)
+        kwargs.setdefault("lock_seconds", 900)
+        return IPLimiter(self.services, self.suspender, tailer, limit_dirs={"vmess": self.limit_dir}, **kwargs)
+
+    def log(self, email, *ips):
+        with open(self.log_path, "a") as f:
+            for ip in ips:
+                f.write(f"2026/10/17 19:45:01 from {ip}:51234 accepted tcp:example.com:443 "
+                        f"[{TAG} >> direct] email: {email}\n")
+
+    def secret(self, email):
+        with open(self.config_path) as f:
+            config = json.load(f)
+        return next(c["id"] for c in config["inbounds"][0]["settings"]["clients"] if c["email"] == email)
+
+    def test_only_ips_inside_window_count(self):
+        limiter = self.limiter(dry_run=True)
+        self.log("budi", "1.1.1.1")
+        self.assertEqual(limiter.run(now=START)["violators"], [])
+        self.log("budi", "2.2.2.2")
+        self.assertEqual(limiter.run(now=START + 100)["violators"], [])
+        # 1.1.1.1 sudah di luar window 120 detik: tetap 2 IP
+        self.log("budi", "3.3.3.3")
+        self.assertEqual(limiter.run(now=START + 200)["violators"], [])
+        # IP yang sama terlihat lagi tidak dihitung dua kali
+        self.log("budi", "3.3.3.3", "2.2.2.2")
+        self.assertEqual(limiter.run(now=START + 205)["violators"], [])
+        self.log("budi", "4.4.4.4")
+        self.assertEqual(limiter.run(now=START + 210)["violators"], ["budi"])
+        # Dry-run: tidak ada yang diubah
+        self.assertEqual(self.secret("budi"), USERS["budi"])
+        self.assertEqual(self.suspender.suspended("ip_limit"), {})
+
+    def test_ignored_ips_and_unlimited_users(self):
+        limiter = self.limiter(dry_run=True)
+        self.log("budi", "127.0.0.1", "::1", "1.1.1.1", "2.2.2.2")
+        self.log("tamu", "1.1.1.1", "2.2.2.2", "3.3.3.3")
+        self.assertEqual(limiter.run(now=START)["violators"], [])
+
+    def test_violator_locked_then_resumed(self):
+        limiter = self.limiter(lock_seconds=0.3)
+        self.log("budi", "1.1.1.1", "2.2.2.2", "3.3.3.3")
+        self.log("ani", "1.1.1.1", "2.2.2.2")
+        result = limiter.run(now=START)
+        self.assertEqual(result["suspended"], ["budi"])
+        self.assertNotEqual(self.secret("budi"), USERS["budi"])
+        self.assertEqual(self.secret("ani"), USERS["ani"])
+        self.assertNotIn("budi", self.server.users[TAG])
+        locked = self.suspender.suspended("ip_limit")["budi"]
+        self.assertEqual((locked["limit"], sorted(locked["ips"])), (2, ["1.1.1.1", "2.2.2.2", "3.3.3.3"]))
+
+        # Masih dalam masa lock
+        self.assertEqual(limiter.run(now=START + 1)["resumed"], [])
+        time.sleep(0.35)
+        self.assertEqual(limiter.run(now=START + 2)["resumed"], ["budi"])
+        self.assertEqual(self.secret("budi"), USERS["budi"])
+        self.assertEqual(self.server.users[TAG]["budi"]["account"][1], [USERS["budi"].encode()])
+        self.assertEqual(self.restarts, [])
+        # Window pelanggar dikosongkan: IP lama tidak langsung memicu lock lagi
+        self.log("budi", "4.4.4.4")
+        self.assertEqual(limiter.run(now=START + 3)["suspended"], [])
+
+    def test_log_read_incrementally_across_rotation(self):
+        limiter = self.limiter(dry_run=True)
+        self.log("budi", "1.1.1.1", "2.2.2.2")
+        self.assertEqual(limiter.run(now=START)["lines"], 2)
+        self.assertEqual(limiter.run(now=START)["lines"], 0)
+        with open(self.log_path, "a") as f:
+            f.write("2026/10/17 19:45:01 from 9.9.9.9:1 accepted tcp:example.com:443 [vmess-ws >> dir")
+        self.assertEqual(limiter.run(now=START)["lines"], 0)
+
+        os.rename(self.log_path, self.log_path + ".1")
+        self.log("budi", "3.3.3.3")
+        # Baris terpotong di file lama tidak pernah lengkap; file baru dibaca dari awal
+        result = limiter.run(now=START + 1)
+        self.assertEqual(result["lines"], 1)
+        self.assertEqual(result["violators"], ["budi"])
+        self.assertEqual(limiter.tailer.stats()["rotations"], 1)
+
+    def test_single_leader_per_lock(self):
+        lock_path = os.path.join(self.root, "ip-limit.lock")
+        first = self.limiter(dry_run=True, lock_path=lock_path, interval=0.02)
+        second = self.limiter(dry_run=True, lock_path=lock_path, interval=0.02)
+        first.start()
+        try:
+            deadline = time.monotonic() + 2
+            while not first.stats()["leader"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            second.start()
+            time.sleep(0.1)
+            self.assertTrue(first.stats()["leader"])
+            self.assertFalse(second.stats()["leader"])
+            self.assertEqual(second.stats()["ticks"], 0)
+        finally:
+            first.stop()
+            second.stop()
+        # Leader berhenti: lock dilepas dan limiter lain bisa mengambil alih
+        first._worker.join(2)
+        second._worker.join(2)
+        third = self.limiter(dry_run=True, lock_path=lock_path, interval=0.02)
+        third.start()
+        try:
+            deadline = time.monotonic() + 2
+            while not third.stats()["leader"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(third.stats()["leader"])
+        finally:
+            third.stop()
+            third._worker.join(2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Test Marker Editor
+
+MarkerEditor harus byte-identical dengan perintah sed yang ditirunya
+(m-vless/m-ssws): append setelah marker, hapus blok user, ganti baris expiry.
+Dibandingkan langsung dengan GNU sed jika tersedia, plus kasus tepi dengan
+output yang sudah diketahui.
+
+Usage: python3 scripts/test_marker_editor.py  (atau pytest scripts/test_marker_editor.py)
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.xray_marker_editor import MarkerEditor
+
+CONFIG = (
+    '{\n'
+    '  "inbounds": [\n'
+    '    {"protocol": "vless", "settings": {"clients": [\n'
+    '      {"id": "00000000-0000-0000-0000-000000000000"\n'
+    '#vless\n'
+    '#& budi 2030-01-01\n'
+    '},{"id": "uuid-budi","email": "budi"\n'
+    '#& ani 2030-02-01\n'
+    '},{"id": "uuid-ani","email": "ani"\n'
+    '      }]}},\n'
+    '    {"protocol": "vless", "settings": {"clients": [\n'
+    '      {"id": "00000000-0000-0000-0000-000000000000"\n'
+    '#vlessgrpc\n'
+    '#&& budi 2030-01-01\n'
+    '},{"id": "uuid-budi","email": "budi"\n'
+    '      }]}},\n'
+    '    {"protocol": "freedom"}\n'
+    '  ]\n'
+    '}\n'
+)
+
+
+class MarkerEditorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test-marker-")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def sed(self, text, script):
+        path = os.path.join(self.root, "config.json")
+        with open(path, "w") as f:
+            f.write(text)
+        subprocess.run(["sed", "-i", script, path], check=True)
+        with open(path) as f:
+            return f.read()
+
+    @unittest.skipUnless(shutil.which("sed"), "sed tidak tersedia")
+    def test_matches_sed(self):
+        cases = [
+            (lambda e: e.append_after("#vless", ["#& cici 2030-03-01", '},{"id": "uuid-cici","email": "cici"']),
+             '/#vless$/a\\#& cici 2030-03-01\\n},{"id": "uuid-cici","email": "cici"'),
+            (lambda e: e.delete_block("#& budi 2030-01-01"), "/^#& budi 2030-01-01/,/^},{/d"),
+            (lambda e: e.delete_block("#&& budi 2030-01-01"), "/^#&& budi 2030-01-01/,/^},{/d"),
+            (lambda e: e.change_line("#& ani ", "#& ani 2031-01-01"), "/^#& ani /c\\#& ani 2031-01-01"),
+            (lambda e: e.change_line("#& nobody ", "#& nobody 2031-01-01"), "/^#& nobody /c\\#& nobody 2031-01-01"),
+        ]
+        # Juga tanpa newline di akhir file: sed tetap menambah newline setelah baris yang diubah
+        for text in (CONFIG, CONFIG.rstrip("\n") + "\n#vless", CONFIG + "#& ani 2030-02-01"):
+            for apply, script in cases:
+                editor = MarkerEditor(text)
+                apply(editor)
+                self.assertEqual(editor.text(), self.sed(text, script), script)
+
+    def test_append_only_on_exact_marker(self):
+        editor = MarkerEditor(CONFIG)
+        self.assertEqual(editor.append_after("#vless", ["#& cici 2030-03-01"]), 1)
+        self.assertIn("#vless\n#& cici 2030-03-01\n#& budi", editor.text())
+        self.assertIn("#vlessgrpc\n#&& budi", editor.text())
+
+    def test_delete_block_without_end_runs_to_eof(self):
+        editor = MarkerEditor("a\n#& budi 2030-01-01\nb\nc\n")
+        self.assertEqual(editor.delete_block("#& budi 2030-01-01"), 1)
+        self.assertEqual(editor.text(), "a\n")
+
+    def test_no_match_leaves_text_untouched(self):
+        editor = MarkerEditor(CONFIG)
+        self.assertEqual(editor.delete_block("#& nobody 2030-01-01"), 0)
+        self.assertEqual(editor.change_line("#& nobody ", "#& nobody x"), 0)
+        self.assertEqual(editor.text(), CONFIG)
+        self.assertEqual(editor.changes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
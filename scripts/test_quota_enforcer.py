@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Test Quota Enforcer
+
+Quota enforcer melawan StatsService/HandlerService palsu (services/xray_fake.py),
+tanpa Xray sungguhan dan tanpa menyentuh /etc:
+- user lewat kuota dinonaktifkan (config + hot-remove runtime)
+- counter Xray kembali 0 (restart) tidak mengaktifkan user lagi
+- kuota dinaikkan / dihapus / reset manual mengaktifkan user lagi
+
+Usage: python3 scripts/test_quota_enforcer.py  (atau pytest scripts/test_quota_enforcer.py)
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services import restart_scheduler
+from services.account_suspender import AccountSuspender
+from services.quota_enforcer import QuotaEnforcer
+from services.restart_scheduler import XrayRestartScheduler
+from services.xray_api import XrayStatsClient
+from services.xray_fake import FakeXrayServer
+
+TAG = "vmess-ws"
+USERS = {"budi": "uuid-budi", "ani": "uuid-ani"}
+
+
+class FakeStore:
+    def __init__(self, usernames):
+        self.usernames = usernames
+
+    def all(self):
+        return [[username, "2099-12-31"] for username in self.usernames]
+
+    def signature(self):
+        return tuple(self.usernames)
+
+
+class FakeService:
+    def __init__(self, usernames):
+        self.store = FakeStore(usernames)
+
+
+class QuotaEnforcerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test-quota-")
+        self.quota_dir = os.path.join(self.root, "vmess")
+        os.makedirs(self.quota_dir)
+        self.set_quota("budi", 1000)
+        self.set_quota("ani", 5000)
+
+        self.config_path = os.path.join(self.root, "config.json")
+        clients = [{"id": uuid, "alterId": 0, "email": email} for email, uuid in USERS.items()]
+        with open(self.config_path, "w") as f:
+            json.dump({"inbounds": [{"tag": TAG, "protocol": "vmess", "settings": {"clients": clients}}]}, f, indent=2)
+
+        self.server = FakeXrayServer(tags=[TAG]).start()
+        self.client = XrayStatsClient(address=self.server.address, enabled=True)
+        for email, uuid in USERS.items():
+            self.client.add_user(TAG, "vmess", email, uuid)
+
+        # Resume memanggil restart Xray: ganti scheduler global dengan restart palsu
+        self.restarts = []
+        self._scheduler = restart_scheduler._scheduler
+        restart_scheduler._scheduler = XrayRestartScheduler(window_ms=0, restart_func=lambda: self.restarts.append(1))
+
+        suspender = AccountSuspender(self.config_path, client=self.client,
+                                     state_path=os.path.join(self.root, "suspended.json"))
+        self.enforcer = QuotaEnforcer({"vmess": FakeService(list(USERS))}, suspender, client=self.client,
+                                      quota_dirs={"vmess": self.quota_dir})
+
+    def tearDown(self):
+        restart_scheduler._scheduler = self._scheduler
+        self.server.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def set_quota(self, username, quota):
+        with open(os.path.join(self.quota_dir, username), "w") as f:
+            f.write(str(quota))
+
+    def secret(self, email):
+        with open(self.config_path) as f:
+            config = json.load(f)
+        return next(c["id"] for c in config["inbounds"][0]["settings"]["clients"] if c["email"] == email)
+
+    def suspend_budi(self):
+        self.server.add_traffic("budi", uplink=600, downlink=600)
+        self.server.add_traffic("ani", uplink=100, downlink=100)
+        result = self.enforcer.run()
+        self.assertEqual(result["disabled"], ["budi"])
+        return result
+
+    def test_over_quota_is_suspended(self):
+        report = self.enforcer.run(dry_run=True)
+        self.assertEqual(report["over_quota"], {})
+
+        self.suspend_budi()
+        self.assertEqual(self.enforcer.disabled()["budi"]["quota"], 1000)
+        self.assertEqual(self.enforcer.disabled()["budi"]["used"], 1200)
+        self.assertNotEqual(self.secret("budi"), USERS["budi"])
+        self.assertEqual(self.secret("ani"), USERS["ani"])
+        self.assertNotIn("budi", self.server.users[TAG])
+        self.assertIn("ani", self.server.users[TAG])
+
+        # Tick berikutnya tidak menonaktifkan dua kali
+        self.assertEqual(self.enforcer.run()["disabled"], [])
+
+    def test_counter_reset_does_not_restore(self):
+        self.suspend_budi()
+        # Xray restart: semua counter kembali 0
+        self.server.reset_stats()
+        result = self.enforcer.run()
+        self.assertEqual(result["restore"], [])
+        self.assertIn("budi", self.enforcer.disabled())
+        self.assertNotEqual(self.secret("budi"), USERS["budi"])
+
+    def test_raised_quota_restores(self):
+        self.suspend_budi()
+        self.set_quota("budi", 99999)
+        self.enforcer.refresh_table(force=True)
+        result = self.enforcer.run()
+        self.assertEqual(result["enabled"], ["budi"])
+        self.assertEqual(self.enforcer.disabled(), {})
+        self.assertEqual(self.secret("budi"), USERS["budi"])
+        # Client asli di-hot-add lagi, tanpa restart Xray
+        self.assertEqual(self.server.users[TAG]["budi"]["account"][1], [USERS["budi"].encode()])
+        self.assertEqual(self.restarts, [])
+
+    def test_removed_quota_restores(self):
+        self.suspend_budi()
+        os.remove(os.path.join(self.quota_dir, "budi"))
+        self.enforcer.refresh_table(force=True)
+        self.assertEqual(self.enforcer.run()["enabled"], ["budi"])
+        self.assertEqual(self.secret("budi"), USERS["budi"])
+
+    def test_explicit_reset_restores(self):
+        self.suspend_budi()
+        self.assertEqual(self.enforcer.enable(["budi"], reset_usage=True), ["budi"])
+        self.assertEqual(self.secret("budi"), USERS["budi"])
+        self.assertEqual(self.client.user_traffic().get("budi", [0, 0]), [0, 0])
+        self.assertEqual(self.enforcer.run()["disabled"], [])
+
+    def test_start_requires_ledger(self):
+        self.assertFalse(self.enforcer.start())
+        self.assertFalse(self.enforcer.stats()["enabled"])
+
+
+if __name__ == "__main__":
+    unittest.main()
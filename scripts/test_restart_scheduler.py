@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Test Restart Scheduler
+
+XrayRestartScheduler dengan restart palsu, tanpa systemctl:
+- burst request dalam satu window digabung menjadi satu restart
+- restart gagal / belum selesai dilaporkan dan di-raise oleh check_restart
+- dua scheduler dengan lock file yang sama tidak restart dua kali
+
+Usage: python3 scripts/test_restart_scheduler.py  (atau pytest scripts/test_restart_scheduler.py)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.restart_scheduler import XrayRestartError, XrayRestartScheduler, check_restart
+
+
+class RestartSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test-restart-")
+        self.restarts = []
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def fake_restart(self):
+        self.restarts.append(time.monotonic())
+
+    def test_burst_is_coalesced(self):
+        scheduler = XrayRestartScheduler(window_ms=200, restart_func=self.fake_restart)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(scheduler.request_restart(reason="burst")))
+                   for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.restarts), 1)
+        self.assertEqual({r["status"] for r in results}, {"completed"})
+        self.assertEqual({r["generation"] for r in results}, {1})
+        self.assertEqual(results[0]["coalesced"], 20)
+        for result in results:
+            self.assertIs(check_restart(result), result)
+        stats = scheduler.stats()
+        self.assertEqual((stats["requests"], stats["reloads"], stats["reloads_saved"]), (20, 1, 19))
+
+    def test_request_during_restart_gets_next_generation(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_restart():
+            started.set()
+            release.wait(5)
+            self.fake_restart()
+
+        scheduler = XrayRestartScheduler(window_ms=0, restart_func=slow_restart)
+        first = scheduler.request_restart(wait=False)
+        self.assertTrue(started.wait(5))
+        # Config diubah saat restart berjalan: perubahan ini belum terbaca Xray
+        second = scheduler.request_restart(wait=False)
+        release.set()
+        self.assertEqual((first["status"], second["status"]), ("scheduled", "scheduled"))
+        self.assertEqual(second["generation"], first["generation"] + 1)
+        self.assertEqual(scheduler.request_restart()["status"], "completed")
+        self.assertEqual(len(self.restarts), 2)
+
+    def test_failed_restart_raises(self):
+        def broken_restart():
+            raise RuntimeError("Job for xray.service failed")
+
+        scheduler = XrayRestartScheduler(window_ms=0, restart_func=broken_restart)
+        result = scheduler.request_restart()
+        self.assertEqual(result["status"], "failed")
+        with self.assertRaises(XrayRestartError) as ctx:
+            check_restart(result)
+        self.assertIn("Job for xray.service failed", str(ctx.exception))
+        self.assertEqual(scheduler.stats()["failures"], 1)
+
+    def test_pending_restart_raises(self):
+        release = threading.Event()
+        scheduler = XrayRestartScheduler(window_ms=0, restart_func=lambda: release.wait(5), wait_timeout=0.05)
+        try:
+            result = scheduler.request_restart()
+        finally:
+            release.set()
+        self.assertEqual(result["status"], "pending")
+        with self.assertRaises(XrayRestartError):
+            check_restart(result)
+
+    def test_shared_lock_skips_covered_restart(self):
+        lock_path = os.path.join(self.root, "xray-restart.lock")
+        fast = XrayRestartScheduler(window_ms=0, restart_func=self.fake_restart, lock_path=lock_path)
+        slow = XrayRestartScheduler(window_ms=200, restart_func=self.fake_restart, lock_path=lock_path)
+        # Worker lambat: perubahannya sudah di-commit sebelum worker cepat restart
+        pending = slow.request_restart(wait=False)
+        self.assertEqual(fast.request_restart()["status"], "completed")
+        result = slow.request_restart()
+        self.assertEqual(result["generation"], pending["generation"])
+        self.assertTrue(result["shared"])
+        self.assertEqual(len(self.restarts), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
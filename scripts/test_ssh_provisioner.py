@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+AlrelShop API Panel - Test SSH Provisioner
+
+Provisioner dalam mode dry-run (useradd/usermod/userdel/chpasswd ditiru di
+<root>/etc/passwd + <root>/etc/shadow), tanpa root dan tanpa menyentuh sistem:
+- username/password yang bisa menyisipkan baris chpasswd ditolak
+- batch gagal / chpasswd gagal: user baru dihapus lagi dan file limit tidak ditulis
+
+Usage: python3 scripts/test_ssh_provisioner.py  (atau pytest scripts/test_ssh_provisioner.py)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.account_store import FlatFileAccountStore
+from services.ssh_provisioner import SSHProvisionError, SSHProvisioner
+from services.ssh_service import SSHService
+
+EXPIRY = "2099-12-31"
+
+
+class SSHProvisionerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="test-ssh-")
+        self.provisioner = SSHProvisioner(root=self.root, dry_run=True)
+        with open(os.path.join(self.root, "etc/passwd"), "w") as f:
+            f.write("root:x:0:0:root:/root:/bin/bash\n")
+        with open(os.path.join(self.root, "etc/shadow"), "w") as f:
+            f.write("root:$6$asli:19000:0:99999:7:::\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def shadow(self):
+        with open(os.path.join(self.root, "etc/shadow")) as f:
+            return {line.split(":")[0]: line.split(":")[1] for line in f if line.strip()}
+
+    def service(self):
+        service = SSHService.__new__(SSHService)
+        service.provisioner = self.provisioner
+        service.store = FlatFileAccountStore(os.path.join(self.root, "etc/ssh/.ssh.db"), expiry_index=3)
+        return service
+
+    def test_provisioner_rejects_injected_lines(self):
+        for username, password in (("budi", "x\nroot:owned"), ("budi", "x\rroot:owned"), ("budi", "a:b"),
+                                   ("budi", "x\0"), ("root:owned\nbudi", "rahasia")):
+            with self.assertRaises(SSHProvisionError):
+                self.provisioner.create_user(username, password, EXPIRY)
+        with self.assertRaises(SSHProvisionError):
+            self.provisioner.renew_user("root", EXPIRY, password="x\nroot:owned")
+        self.assertEqual(self.shadow(), {"root": "$6$asli"})
+        self.assertEqual(list(self.provisioner.commands), [])
+
+    def test_service_rejects_before_provisioner(self):
+        service = self.service()
+        result = service.create_account({"username": "budi", "password": "x\nroot:owned", "days": 1})
+        self.assertEqual(result["status"], "error")
+        result = service.renew_account({"username": "root", "password": "x\nroot:owned", "days": 1})
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(list(self.provisioner.commands), [])
+        self.assertEqual(self.shadow(), {"root": "$6$asli"})
+
+    def passwd_users(self):
+        with open(os.path.join(self.root, "etc/passwd")) as f:
+            return [line.split(":")[0] for line in f if line.strip()]
+
+    def test_failed_batch_removes_created_users(self):
+        with self.assertRaises(RuntimeError):
+            with self.provisioner.batch():
+                self.provisioner.create_user("budi", "rahasia", EXPIRY, ip_limit=2)
+                self.provisioner.create_user("ani", "rahasia", EXPIRY, ip_limit=1)
+                raise RuntimeError("item berikutnya gagal")
+        self.assertEqual(self.passwd_users(), ["root"])
+        self.assertFalse(os.path.exists(self.provisioner.limit_ip_file("budi")))
+        self.assertEqual(os.listdir(os.path.dirname(self.provisioner.limit_ip_file("budi"))), [])
+        self.assertNotIn("chpasswd", self.provisioner.commands)
+
+    def test_failed_chpasswd_removes_created_users(self):
+        fixture = self.provisioner._fixture
+        apply = fixture.apply
+
+        def failing_chpasswd(cmd, stdin=None):
+            if cmd[0] == "chpasswd":
+                raise SSHProvisionError("chpasswd gagal (1): PAM error")
+            apply(cmd, stdin)
+        fixture.apply = failing_chpasswd
+
+        with self.assertRaises(SSHProvisionError):
+            with self.provisioner.batch():
+                self.provisioner.create_user("budi", "rahasia", EXPIRY, quota_bytes=1024)
+                self.provisioner.renew_user("root", EXPIRY, password="baru")
+        # User baru tanpa password dihapus lagi, user lama tetap ada
+        self.assertEqual(self.passwd_users(), ["root"])
+        self.assertEqual(self.shadow(), {"root": "$6$asli"})
+        self.assertFalse(os.path.exists(self.provisioner.quota_file("budi")))
+        self.assertEqual(list(self.provisioner.commands)[-1], "userdel --force budi")
+
+        # State transaksi bersih: batch berikutnya jalan normal
+        fixture.apply = apply
+        self.provisioner.create_user("budi", "rahasia", EXPIRY)
+        self.assertIn("budi", self.shadow())
+
+    def test_plain_password_is_applied(self):
+        self.provisioner.create_user("budi", "rahasia", EXPIRY)
+        self.assertTrue(self.shadow()["budi"].startswith("$6$dryrun$"))
+        self.assertEqual(self.shadow()["root"], "$6$asli")
+
+
+if __name__ == "__main__":
+    unittest.main()